@@ -695,7 +695,9 @@ You are provided with a pre-initialized `data_store` object for persisting data
 Data stored here is available to ALL agents owned by the same user, enabling workflows where one agent
 creates data that another agent consumes.
 
-**Data store operations are synchronous (no `await` needed).**
+The methods shown below are synchronous (no `await` needed). Each one also has an awaitable
+`a`-prefixed twin (`aget`, `aset`, `aget_many`, ...) that doesn't block the event loop; prefer those
+when the run also makes concurrent LLM or HTTP calls (see "Async Operations" below).
 
 ## Discovering Available Data
 
@@ -734,6 +736,14 @@ keys = data_store.list_keys()
 
 # List keys matching a prefix
 keys = data_store.list_keys(prefix="analysis:")
+
+# Page through keys: at most 500 per call, resuming after the last one
+page = data_store.list_keys(prefix="analysis:", limit=500)
+next_page = data_store.list_keys(prefix="analysis:", start_after=page[-1], limit=500)
+
+# Walk a large namespace without loading it all at once
+for key, value in data_store.iter_items(prefix="analysis:", page_size=100):
+    ...
 ```
 
 ## Using Namespaces
@@ -766,8 +776,44 @@ data_store.set_many({
 # Get multiple values at once
 results = data_store.get_many(["file:a.py", "file:b.py"])
 # Returns: {"file:a.py": {"lines": 100}, "file:b.py": {"lines": 200}}
+
+# Writing many results in a loop? Batch them: set()/delete() calls are
+# buffered and sent in bulk (every 500 writes, and when the block ends).
+# Reading a key you just wrote still returns the new value.
+with data_store.batch():
+    for path, summary in summaries.items():
+        data_store.set(path, summary)
 ```
 
+## Async Operations
+
+Every method has an awaitable twin with an `a` prefix: `aget`, `aset`, `adelete`, `aget_many`,
+`aset_many`, `aget_all`, `alist_keys`, `alist_namespaces`, `aclear`, plus `async for ... in
+data_store.aiter_items(...)` and `async with data_store.abatch():`. They behave exactly like the
+synchronous versions, but the storage I/O runs off the event loop, so other coroutines
+(LLM calls, HTTP requests) keep making progress while it waits.
+
+```python
+# Overlap reading cached results with a fresh LLM call
+cached, (fresh, _) = await asyncio.gather(
+    data_store.aget_many(["file:a.py", "file:b.py"]),
+    call_llm(provider, model, messages, parameters),
+)
+
+# Save each result as soon as its LLM call finishes
+summaries = data_store.use_namespace("file-summaries")
+
+async def summarize(path, content):
+    summary, _ = await call_llm(provider, model, build_messages(content), parameters)
+    await summaries.aset(path, summary)
+    return summary
+
+await asyncio.gather(*(summarize(p, c) for p, c in files.items()))
+```
+
+Don't mix a synchronous call into a hot async loop: `data_store.get(...)` inside
+`asyncio.gather(...)` blocks every other task until it returns.
+
 ## Common Patterns
 
 ### Discovering and searching across all data
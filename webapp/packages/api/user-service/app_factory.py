@@ -6,6 +6,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config.routes_config import RouterConfig, resolve_router_configs
+from services.database_service.identity_map import IdentityScopeMiddleware
 from services.observability_service import (
     ObservabilityMiddleware,
     get_observability_service,
@@ -21,7 +22,50 @@ async def lifespan(app: FastAPI):
         event_type="lifecycle",
         message="Application startup complete."
     )
-    yield
+    purger = _start_retention_purger()
+    try:
+        yield
+    finally:
+        if purger is not None:
+            await purger.stop()
+        await _flush_namespace_summaries()
+        await _close_database_service()
+
+
+async def _flush_namespace_summaries() -> None:
+    """Write out buffered data store summary deltas before the database closes."""
+    from services import data_store_summary
+    if data_store_summary._summaries is not None:
+        await data_store_summary._summaries.stop()
+
+
+async def _close_database_service() -> None:
+    """Close the database service's connections if it was ever created."""
+    from services import database_service
+    if database_service._db_instance is not None:
+        await database_service._db_instance.aclose()
+
+
+def _start_retention_purger():
+    """Start the expired-document purge job; None if it can't be set up."""
+    try:
+        from config import settings as app_settings
+        from services.database_service import (
+            RetentionPurger,
+            get_database_service,
+            parse_retention_config,
+        )
+        purger = RetentionPurger(
+            lambda: get_database_service(app_settings),
+            parse_retention_config(app_settings.DATABASE_RETENTION),
+            app_settings.DATABASE_PURGE_INTERVAL_SECONDS,
+        )
+        purger.start()
+        return purger
+    except Exception as e:
+        # Expired documents just stay around until the next start.
+        print(f"Warning: retention purge job not started: {e}")
+        return None
 
 
 def _configure_cors(app: FastAPI) -> None:
@@ -57,6 +101,7 @@ def create_app() -> FastAPI:
     """Create and configure a FastAPI application instance."""
     app = FastAPI(lifespan=lifespan)
     app.add_middleware(ObservabilityMiddleware)
+    app.add_middleware(IdentityScopeMiddleware)
     _configure_cors(app)
 
     # Phase B: initialize the auth provider registry from AUTH_CONFIG.
@@ -54,16 +54,84 @@ class Settings:
     AWS_SECRET_ACCESS_KEY: str | None = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_DEFAULT_REGION: str | None = os.getenv("AWS_DEFAULT_REGION")
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "local-bucket")
+    # Root directory for STORAGE_PROVIDER=local.
+    LOCAL_STORAGE_PATH: str = os.getenv("LOCAL_STORAGE_PATH", "data/storage")
 
     # Database Settings
     DATABASE_PROVIDER: str = os.getenv("DATABASE_PROVIDER", "memory") # Default to memory if not set
     COUCHDB_URL: str | None = os.getenv("COUCHDB_URL")
     COUCHDB_USER: str | None = os.getenv("COUCHDB_USER")
     COUCHDB_PASSWORD: str | None = os.getenv("COUCHDB_PASSWORD")
+    # CouchDB databases created partitioned, as "db_name:partition_field"
+    # entries, e.g. "agent_data_store:userId".  Existing databases need
+    # services/database_service/couchdb_migrate.py.
+    COUCHDB_PARTITIONED_DATABASES: str = os.getenv("COUCHDB_PARTITIONED_DATABASES", "")
+    # Serve the async database APIs over a pooled HTTP client instead of
+    # python-couchdb on worker threads (services/database_service/couchdb_async.py).
+    COUCHDB_ASYNC_CLIENT: bool = _get_bool_env("COUCHDB_ASYNC_CLIENT", False)
+    # Connections (HTTP/1.1 keep-alive) the async client keeps to CouchDB,
+    # how long an idle one stays open, and the default request timeout.
+    COUCHDB_POOL_SIZE: int = int(os.getenv("COUCHDB_POOL_SIZE", "20"))
+    COUCHDB_KEEPALIVE_SECONDS: float = float(os.getenv("COUCHDB_KEEPALIVE_SECONDS", "30"))
+    COUCHDB_TIMEOUT_SECONDS: float = float(os.getenv("COUCHDB_TIMEOUT_SECONDS", "30"))
+    # Worker threads backing the async DatabaseService adapters (aget,
+    # asave, ...) for drivers without a native async client.
+    DATABASE_THREADPOOL_SIZE: int = int(os.getenv("DATABASE_THREADPOOL_SIZE", "16"))
+    # Opt-in read-through cache, e.g. "agents:60:2000,deployments:60,users:15".
+    # Format: name[:ttl_seconds[:max_entries]]. Empty disables caching.
+    DATABASE_CACHE_COLLECTIONS: str = os.getenv("DATABASE_CACHE_COLLECTIONS", "")
+    # Collections whose documents are read at most once per request,
+    # e.g. "agents,deployments,demos,users" ("*" for all).  Empty (the
+    # default) disables it; see database_service/identity_map.py.
+    DATABASE_IDENTITY_MAP_COLLECTIONS: str = os.getenv("DATABASE_IDENTITY_MAP_COLLECTIONS", "")
+    # Comma-separated collections to create/validate once at startup.
+    # Empty uses the built-in list of collections the app reads and writes.
+    DATABASE_COLLECTIONS: str = os.getenv("DATABASE_COLLECTIONS", "")
+    # Per-collection query metrics and a slow-query log (see
+    # services/database_service/instrumentation.py).
+    DATABASE_METRICS_ENABLED: bool = _get_bool_env("DATABASE_METRICS_ENABLED", False)
+    DATABASE_SLOW_QUERY_MS: float = float(os.getenv("DATABASE_SLOW_QUERY_MS", "500"))
+    # Document expiry per collection, e.g. "tickets:86400,user_sessions".
+    # Format: name[:retention_seconds]; a bare name only expires documents
+    # saved with an explicit expires_at.  Empty (the default) disables expiry.
+    DATABASE_RETENTION: str = os.getenv("DATABASE_RETENTION", "")
+    # How often expired documents are purged on backends without native
+    # TTL (CouchDB, SQLite, memory).  0 disables the purge job.
+    DATABASE_PURGE_INTERVAL_SECONDS: float = float(os.getenv("DATABASE_PURGE_INTERVAL_SECONDS", "3600"))
+    # Segments list_all reads concurrently on DynamoDB (parallel Scan),
+    # Firestore (partition queries) and CouchDB (_all_docs key ranges).
+    # 1 keeps the single sequential scan.
+    DATABASE_SCAN_PARALLELISM: int = int(os.getenv("DATABASE_SCAN_PARALLELISM", "1"))
+    # Serve repeated data_store reads within one agent run (nested
+    # gofannon_client calls included) from memory; see
+    # services/data_store_cache.py.
+    DATA_STORE_RUN_CACHE: bool = _get_bool_env("DATA_STORE_RUN_CACHE", False)
+    # Data store values whose JSON encoding is larger than this many
+    # bytes are kept in the STORAGE_PROVIDER bucket instead of the
+    # record; see services/data_store_blobs.py.  0 disables offload.
+    DATA_STORE_OFFLOAD_BYTES: int = int(os.getenv("DATA_STORE_OFFLOAD_BYTES", "0"))
+    # Data store values whose JSON encoding is larger than this many
+    # bytes are stored compressed with DATA_STORE_COMPRESS_CODEC ("gzip",
+    # or "zstd" if zstandard is installed); see
+    # services/data_store_codec.py.  0 disables compression.
+    DATA_STORE_COMPRESS_BYTES: int = int(os.getenv("DATA_STORE_COMPRESS_BYTES", "0"))
+    DATA_STORE_COMPRESS_CODEC: str = os.getenv("DATA_STORE_COMPRESS_CODEC", "gzip")
+    # Keep a per-user namespace summary document up to date on every
+    # data store write, so listing namespaces and their stats is one
+    # read; see services/data_store_summary.py.
+    DATA_STORE_NAMESPACE_SUMMARIES: bool = _get_bool_env("DATA_STORE_NAMESPACE_SUMMARIES", False)
     
+    # SQLite Settings (DATABASE_PROVIDER=sqlite)
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "data/gofannon.sqlite3")
+    SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+
     # DynamoDB Settings
     DYNAMODB_REGION: str | None = os.getenv("DYNAMODB_REGION")
     DYNAMODB_ENDPOINT_URL: str | None = os.getenv("DYNAMODB_ENDPOINT_URL")
+    # Fields stored as one compressed binary attribute instead of a nested
+    # map, e.g. "agent_data_store:value".  Format: table:field|field,...
+    # Packed fields can't be used in server-side filters.
+    DYNAMODB_PACKED_FIELDS: str = os.getenv("DYNAMODB_PACKED_FIELDS", "")
 
     # AWS CloudWatch Logging Settings
     CLOUDWATCH_LOG_GROUP_NAME: str | None = os.getenv("CLOUDWATCH_LOG_GROUP_NAME")
@@ -37,6 +37,7 @@ from services.data_store_service import (
     AgentDataStoreProxy,
     get_data_store_service,
 )
+from services.data_store_cache import DataStoreRunCache, bind_run_cache, get_current_run_cache
 from typing import Generator
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
@@ -157,24 +158,47 @@ async def _execute_agent_code(
     user_service = get_user_service(db) if user_id else None
 
     class GofannonClient:
-        def __init__(self, agent_ids: List[str], db_service: DatabaseService, llm_settings: Optional[LlmSettings] = None):
+        def __init__(
+            self,
+            agent_map: Dict[str, Agent],
+            db_service: DatabaseService,
+            llm_settings: Optional[LlmSettings] = None,
+            data_store: Optional[AgentDataStoreProxy] = None,
+        ):
             self.db = db_service
             self.llm_settings = llm_settings
-            self.agent_map = {}
+            self.agent_map = agent_map
+            self.data_store = data_store
+
+        @classmethod
+        async def load(
+            cls,
+            agent_ids: List[str],
+            db_service: DatabaseService,
+            llm_settings: Optional[LlmSettings] = None,
+            data_store: Optional[AgentDataStoreProxy] = None,
+        ):
+            agent_map: Dict[str, Agent] = {}
             if agent_ids:
                 try:
-                    all_agents = [Agent(**self.db.get("agents", agent_id)) for agent_id in agent_ids]
-                    for agent in all_agents:
-                        self.agent_map[agent.name] = agent
+                    for agent_id in agent_ids:
+                        agent = Agent(**await db_service.aget("agents", agent_id))
+                        agent_map[agent.name] = agent
                 except Exception as e:
                     print(f"Error loading dependent agents: {e}")
                     raise ValueError("Could not load one or more dependent Gofannon agents.")
+            return cls(agent_map, db_service, llm_settings, data_store)
 
         async def call(self, agent_name: str, input_dict: dict) -> Any:
             agent_to_run = self.agent_map.get(agent_name)
             if not agent_to_run:
                 raise ValueError(f"Gofannon agent '{agent_name}' not found or not imported for this run.")
 
+            # The nested run has its own write buffer but reads the same
+            # store, so writes this run is still batching land first.
+            if self.data_store is not None:
+                await self.data_store.aflush()
+
             # Recursive call. The active trace (if any) flows in via the
             # contextvar so nested events appear in the same trace as
             # the parent's, with depth incremented automatically by
@@ -349,15 +373,20 @@ async def _execute_agent_code(
         return _llm_resp
 
     # Create data store proxy for agent access, with a shared ops_log so the
-    # sandbox UI can show live operation timelines.
+    # sandbox UI can show live operation timelines.  Nested agent calls
+    # join the run cache (if any) their top-level caller bound.
     data_store_service = get_data_store_service(db)
     data_store_ops_log: List[Dict[str, Any]] = []
+    run_cache = get_current_run_cache()
+    if run_cache is None and settings.DATA_STORE_RUN_CACHE:
+        run_cache = DataStoreRunCache()
     data_store_proxy = AgentDataStoreProxy(
         service=data_store_service,
         user_id=user_id or "anonymous",
         agent_name=agent_name or "unknown",
         default_namespace="default",
         ops_log=data_store_ops_log,
+        run_cache=run_cache,
     )
 
     exec_globals = {
@@ -371,7 +400,7 @@ async def _execute_agent_code(
         "re": __import__('re'),
         "json": __import__('json'),
         "http_client": httpx.AsyncClient(follow_redirects=True),  # Follow redirects automatically
-        "gofannon_client": GofannonClient(gofannon_agents, db, llm_settings),
+        "gofannon_client": await GofannonClient.load(gofannon_agents, db, llm_settings, data_store_proxy),
         "data_store": data_store_proxy,
         "__builtins__": __builtins__,
     }
@@ -386,6 +415,22 @@ async def _execute_agent_code(
     if not run_function or not asyncio.iscoroutinefunction(run_function):
         raise ValueError("Code did not define an 'async def run(input_dict, tools)' function.")
 
+    async def run_agent():
+        # Writes the agent left in a data_store batch are flushed when
+        # the run ends; a failed flush fails a run that otherwise
+        # succeeded.  Writes issued before an error still land, as
+        # they would have without batching.
+        try:
+            agent_result = await run_function(input_dict=input_dict, tools=tools)
+        except Exception:
+            try:
+                await data_store_proxy.aflush()
+            except Exception as flush_exc:
+                print(f"Warning: could not flush buffered data store writes: {flush_exc}")
+            raise
+        await data_store_proxy.aflush()
+        return agent_result
+
     # Trace integration. When trace is provided, every event from this
     # invocation (and any nested gofannon-client calls) lands in it.
     # capture_user_io routes stdout/stderr/logging into the trace as
@@ -398,9 +443,9 @@ async def _execute_agent_code(
             agent_id=None,
             called_by=None,
         )
-        with bind_trace(trace), capture_user_io(trace):
+        with bind_trace(trace), capture_user_io(trace), bind_run_cache(run_cache):
             try:
-                result = await run_function(input_dict=input_dict, tools=tools)
+                result = await run_agent()
                 trace.agent_end(
                     agent_name=agent_name or "unknown",
                     start_ms=_agent_start_ms,
@@ -415,7 +460,8 @@ async def _execute_agent_code(
                 )
                 raise
     else:
-        result = await run_function(input_dict=input_dict, tools=tools)
+        with bind_run_cache(run_cache):
+            result = await run_agent()
 
     # Return both the agent's return value and the accumulated ops log so
     # the sandbox UI can render the live timeline. Callers that don't want
@@ -439,7 +485,7 @@ async def process_chat(ticket_id: str, request: ChatRequest, user: dict, req: Re
             "created_at": datetime.utcnow().isoformat(),  # Use isoformat for JSON serialization
             "request": request.dict(by_alias=True),
         }
-        db_service.save("tickets", ticket_id, dict(ticket_data))
+        await db_service.asave("tickets", ticket_id, dict(ticket_data))
 
         messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
 
@@ -456,9 +502,9 @@ async def process_chat(ticket_id: str, request: ChatRequest, user: dict, req: Re
             agent_friendly_name = request.model
 
             try:
-                deployment_doc = db_service.get("deployments", agent_friendly_name)
+                deployment_doc = await db_service.aget("deployments", agent_friendly_name)
                 agent_id = deployment_doc["agentId"]
-                agent_data = db_service.get("agents", agent_id)
+                agent_data = await db_service.aget("agents", agent_id)
                 agent = Agent(**agent_data)
             except Exception:
                 raise ValueError(f"Could not find a deployed agent with name '{agent_friendly_name}'")
@@ -541,7 +587,7 @@ async def process_chat(ticket_id: str, request: ChatRequest, user: dict, req: Re
                 "model": f"{request.provider}/{request.model}",
             },
         }
-        db_service.save("tickets", ticket_id, completed_ticket_data)
+        await db_service.asave("tickets", ticket_id, completed_ticket_data)
 
     except Exception as e:
         logger.log(
@@ -551,7 +597,7 @@ async def process_chat(ticket_id: str, request: ChatRequest, user: dict, req: Re
             metadata={"traceback": traceback.format_exc(), "request": get_sanitized_request_data(req)},
         )
         if "ticket_data" not in locals():
-            ticket_data = db_service.get("tickets", ticket_id)
+            ticket_data = await db_service.aget("tickets", ticket_id)
 
         ticket_data.update(
             {
@@ -560,7 +606,7 @@ async def process_chat(ticket_id: str, request: ChatRequest, user: dict, req: Re
                 "error": str(e),
             }
         )
-        db_service.save("tickets", ticket_id, ticket_data)
+        await db_service.asave("tickets", ticket_id, ticket_data)
 
 
 def get_available_providers(user_id: Optional[str] = None, user_basic_info: Optional[Dict[str, Any]] = None):
@@ -683,7 +729,7 @@ async def fetch_spec_content(url: str):
 
 
 async def deploy_agent(agent_id: str, db: DatabaseService):
-    agent_doc = db.get("agents", agent_id)
+    agent_doc = await db.aget("agents", agent_id)
     agent = Agent(**agent_doc)
     friendly_name = agent.friendly_name
 
@@ -691,7 +737,7 @@ async def deploy_agent(agent_id: str, db: DatabaseService):
         raise HTTPException(status_code=400, detail="Agent must have a friendly_name to be deployed.")
 
     try:
-        existing_deployment = db.get("deployments", friendly_name)
+        existing_deployment = await db.aget("deployments", friendly_name)
         if existing_deployment.get("agentId") == agent_id:
             return {"message": "Agent is already deployed", "endpoint": f"/rest/{friendly_name}"}
         raise HTTPException(
@@ -701,7 +747,7 @@ async def deploy_agent(agent_id: str, db: DatabaseService):
     except HTTPException as e:
         if e.status_code == 404:
             deployment_doc = {"agentId": agent_id}
-            db.save("deployments", friendly_name, deployment_doc)
+            await db.asave("deployments", friendly_name, deployment_doc)
             return {"message": "Agent deployed successfully", "endpoint": f"/rest/{friendly_name}"}
         raise e
 
@@ -716,18 +762,18 @@ async def undeploy_agent(agent_id: str, db: DatabaseService):
       - Callers don't need to pre-check with `get_agent_deployment`.
     """
     try:
-        deployments = db.find("deployments", {"agentId": agent_id})
+        deployments = await db.afind("deployments", {"agentId": agent_id})
     except Exception as e:
         # Fallback: if find() fails for any reason, fall back to the
         # friendly_name lookup so we still delete the primary deployment.
         print(f"undeploy_agent: find() failed ({e}); falling back to friendly_name lookup")
         deployments = []
         try:
-            agent_doc = db.get("agents", agent_id)
+            agent_doc = await db.aget("agents", agent_id)
             agent = Agent(**agent_doc)
             if agent.friendly_name:
                 try:
-                    deployments = [db.get("deployments", agent.friendly_name)]
+                    deployments = [await db.aget("deployments", agent.friendly_name)]
                 except HTTPException as get_e:
                     if get_e.status_code != 404:
                         raise
@@ -740,7 +786,7 @@ async def undeploy_agent(agent_id: str, db: DatabaseService):
         if not dep_id:
             continue
         try:
-            db.delete("deployments", dep_id)
+            await db.adelete("deployments", dep_id)
         except HTTPException as e:
             if e.status_code == 404:
                 continue
@@ -748,7 +794,7 @@ async def undeploy_agent(agent_id: str, db: DatabaseService):
 
 
 async def get_agent_deployment(agent_id: str, db: DatabaseService):
-    agent_doc = db.get("agents", agent_id)
+    agent_doc = await db.aget("agents", agent_id)
     agent = Agent(**agent_doc)
     friendly_name = agent.friendly_name
 
@@ -756,7 +802,7 @@ async def get_agent_deployment(agent_id: str, db: DatabaseService):
         return {"is_deployed": False}
 
     try:
-        deployment_doc = db.get("deployments", friendly_name)
+        deployment_doc = await db.aget("deployments", friendly_name)
         if deployment_doc.get("agentId") == agent_id:
             return {"is_deployed": True, "friendly_name": friendly_name}
         return {"is_deployed": False}
@@ -810,7 +856,7 @@ async def build_agent_chain(
         if depth > max_depth:
             if agent_id not in nodes:
                 try:
-                    agent_doc = db.get("agents", agent_id)
+                    agent_doc = await db.aget("agents", agent_id)
                     agent = Agent(**agent_doc)
                     nodes[agent_id] = {
                         "id": agent_id,
@@ -836,7 +882,7 @@ async def build_agent_chain(
 
         if not already_have_node:
             try:
-                agent_doc = db.get("agents", agent_id)
+                agent_doc = await db.aget("agents", agent_id)
                 agent = Agent(**agent_doc)
             except HTTPException as e:
                 if e.status_code == 404:
@@ -859,9 +905,10 @@ async def build_agent_chain(
                 "truncated": False,
             }
         else:
-            # Load again for traversal — cheap, and avoids caching Agent
-            # objects alongside the nodes dict.
-            agent_doc = db.get("agents", agent_id)
+            # Load again for traversal — served from the request's
+            # identity map, and avoids caching Agent objects alongside
+            # the nodes dict.
+            agent_doc = await db.aget("agents", agent_id)
             agent = Agent(**agent_doc)
 
         # MCP tool edges
@@ -901,13 +948,13 @@ async def build_agent_chain(
 
 async def list_deployments(db: DatabaseService):
     try:
-        all_deployments_docs = db.list_all("deployments")
         deployment_infos = []
-        for dep_doc in all_deployments_docs:
+        # Stream page by page; orphan deletes below don't disturb the cursor.
+        async for dep_doc in db.afind_iter("deployments", {}):
             dep_id = dep_doc.get("_id")
             agent_id = dep_doc.get("agentId")
             try:
-                agent_doc = db.get("agents", agent_id)
+                agent_doc = await db.aget("agents", agent_id)
                 agent = Agent(**agent_doc)
                 dep_info = {
                     "friendlyName": dep_id,
@@ -926,7 +973,7 @@ async def list_deployments(db: DatabaseService):
                         f"(agent '{agent_id}' not found)"
                     )
                     try:
-                        db.delete("deployments", dep_id)
+                        await db.adelete("deployments", dep_id)
                     except Exception as del_e:
                         print(f"Failed to delete orphan deployment '{dep_id}': {del_e}")
                     continue
@@ -955,10 +1002,10 @@ async def run_deployed_agent(
     llm_settings: Optional[LlmSettings] = None,
 ):
     try:
-        deployment_doc = db.get("deployments", friendly_name)
+        deployment_doc = await db.aget("deployments", friendly_name)
         agent_id = deployment_doc["agentId"]
 
-        agent_data = db.get("agents", agent_id)
+        agent_data = await db.aget("agents", agent_id)
         agent = Agent(**agent_data)
 
         result, _ops = await _execute_agent_code(
@@ -20,6 +20,15 @@ class DataStoreRecord(BaseModel):
     namespace: str
     key: str
     value: Any
+    # JSON size of the value, and its size as stored when compressed.
+    # Compressed values (valueCodec, see services/data_store_codec.py)
+    # and values in blob storage (valueRef, services/data_store_blobs.py)
+    # come back from list endpoints with value=None; GET the record for
+    # the body.
+    value_size: Optional[int] = Field(None, alias="valueSize")
+    stored_size: Optional[int] = Field(None, alias="storedSize")
+    value_codec: Optional[str] = Field(None, alias="valueCodec")
+    value_ref: Optional[Dict[str, Any]] = Field(None, alias="valueRef")
     metadata: Dict[str, Any] = Field(default_factory=dict)
     created_by_agent: Optional[str] = Field(None, alias="createdByAgent")
     last_accessed_by_agent: Optional[str] = Field(None, alias="lastAccessedByAgent")
@@ -36,6 +45,8 @@ class NamespaceStats(BaseModel):
     namespace: str
     record_count: int = Field(..., alias="recordCount")
     size_bytes: int = Field(..., alias="sizeBytes")
+    # Size after compression; equals size_bytes when nothing is compressed.
+    stored_bytes: int = Field(0, alias="storedBytes")
     # Agents that have written to or read from this namespace. Derived from
     # createdByAgent + lastAccessedByAgent across all records.
     agents: List[str] = Field(default_factory=list)
@@ -49,6 +60,7 @@ class NamespaceListResponse(BaseModel):
     namespaces: List[NamespaceStats]
     total_record_count: int = Field(..., alias="totalRecordCount")
     total_size_bytes: int = Field(..., alias="totalSizeBytes")
+    total_stored_bytes: int = Field(0, alias="totalStoredBytes")
 
     model_config = ConfigDict(populate_by_name=True)
 
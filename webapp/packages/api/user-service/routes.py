@@ -6,7 +6,7 @@ import uuid
 from typing import Optional, Dict, Any, List
 
 from fastapi.responses import StreamingResponse
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request, Response
 from pydantic import BaseModel, Field
 from pydantic.config import ConfigDict
 
@@ -55,7 +55,7 @@ from models.data_store import (
     SetRecordRequest,
 )
 from models.user import User, ApiKeys
-from services.database_service import DatabaseService
+from services.database_service import DEFAULT_PAGE_SIZE, DatabaseService, find_instrumented
 from services.data_store_service import (
     DataStoreService,
     get_data_store_service,
@@ -310,6 +310,18 @@ def update_user_allowances(
     )
 
 
+@router.get("/admin/database/metrics")
+def get_database_metrics(
+    db: DatabaseService = Depends(get_db),
+    _: None = Depends(require_admin_access),
+):
+    """Query counters and the slow-query log (DATABASE_METRICS_ENABLED)."""
+    metrics = find_instrumented(db)
+    if metrics is None:
+        return {"enabled": False, "stats": {}, "slowQueries": []}
+    return {"enabled": True, "stats": metrics.query_stats(), "slowQueries": metrics.slow_queries()}
+
+
 @router.put("/users/me/monthly-allowance", response_model=User)
 def set_monthly_allowance(
     request: UpdateMonthlyAllowanceRequest,
@@ -427,7 +439,7 @@ async def chat(request: ChatRequest, req: Request, background_tasks: BackgroundT
 async def get_chat_status(ticket_id: str, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Get the status and result of a chat request"""
     try:
-        ticket_data = db.get("tickets", ticket_id)
+        ticket_data = await db.aget("tickets", ticket_id)
         return ChatResponse(
             ticket_id=ticket_data.get("_id", ticket_id),
             status=ticket_data["status"],
@@ -444,7 +456,7 @@ async def get_chat_status(ticket_id: str, db: DatabaseService = Depends(get_db),
 async def update_session_config(session_id: str, config: ProviderConfig, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Update session configuration"""
     try:
-        session_doc = db.get("sessions", session_id)
+        session_doc = await db.aget("sessions", session_id)
     except HTTPException as e:
         if e.status_code == 404:
             session_doc = {"created_at": datetime.utcnow().isoformat()}
@@ -454,21 +466,21 @@ async def update_session_config(session_id: str, config: ProviderConfig, db: Dat
     session_doc["provider_config"] = config.dict()
     session_doc["updated_at"] = datetime.utcnow().isoformat()
 
-    db.save("sessions", session_id, session_doc)
+    await db.asave("sessions", session_id, session_doc)
     return {"message": "Configuration updated", "session_id": session_id}
 
 
 @router.get("/sessions/{session_id}/config")
 async def get_session_config(session_id: str, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Get session configuration"""
-    session_doc = db.get("sessions", session_id)
+    session_doc = await db.aget("sessions", session_id)
     return session_doc.get("provider_config")
 
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Delete a session"""
-    db.delete("sessions", session_id)
+    await db.adelete("sessions", session_id)
     return {"message": "Session deleted"}
 
 
@@ -490,7 +502,7 @@ async def create_agent(
     agent = Agent(**agent_data_internal_names)
 
     saved_doc_data = agent.model_dump(by_alias=True, mode="json")
-    saved_doc = db.save("agents", agent.id, saved_doc_data)
+    saved_doc = await db.asave("agents", agent.id, saved_doc_data)
 
     agent.rev = saved_doc.get("rev")
 
@@ -509,7 +521,7 @@ async def list_agents(
     logger: ObservabilityService = Depends(get_logger)
 ):
     """Lists all saved agents."""
-    all_docs = db.list_all("agents")
+    all_docs = await db.alist_all("agents")
     logger.log("INFO", "user_action", "Listed all agents.", metadata={"request": get_sanitized_request_data(req)})
     return [Agent(**doc) for doc in all_docs]
 
@@ -517,7 +529,7 @@ async def list_agents(
 @router.get("/agents/{agent_id}", response_model=Agent)
 async def get_agent(agent_id: str, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Retrieves a specific agent by its ID."""
-    agent_doc = db.get("agents", agent_id)
+    agent_doc = await db.aget("agents", agent_id)
     return Agent(**agent_doc)
 
 
@@ -555,7 +567,7 @@ async def delete_agent(
         # unconditionally, including when there are no deployments or when
         # the agent's friendly_name no longer matches any deployment.
         await undeploy_agent(agent_id, db)
-        db.delete("agents", agent_id)
+        await db.adelete("agents", agent_id)
         logger.log("INFO", "user_action", f"Agent '{agent_id}' deleted.", metadata={"agent_id": agent_id, "request": get_sanitized_request_data(req)})
         return
     except HTTPException as e:
@@ -572,7 +584,7 @@ async def update_agent(
     logger: ObservabilityService = Depends(get_logger)
 ):
     """Updates an existing agent configuration."""
-    existing_doc = db.get("agents", agent_id)
+    existing_doc = await db.aget("agents", agent_id)
 
     update_data = request.model_dump(by_alias=True, exclude_unset=True)
     merged_data = {**existing_doc, **update_data}
@@ -591,7 +603,7 @@ async def update_agent(
     saved_doc_data = updated_agent.model_dump(by_alias=True, mode="json")
     saved_doc_data["_rev"] = existing_doc.get("_rev")
 
-    saved_doc = db.save("agents", agent_id, saved_doc_data)
+    saved_doc = await db.asave("agents", agent_id, saved_doc_data)
     updated_agent.rev = saved_doc.get("rev")
 
     logger.log(
@@ -934,7 +946,7 @@ async def create_demo_app(request: CreateDemoAppRequest, db: DatabaseService = D
     demo_app_data = request.model_dump(by_alias=True)
     demo_app = DemoApp(**demo_app_data)
     saved_doc_data = demo_app.model_dump(by_alias=True, mode="json")
-    saved_doc = db.save("demos", demo_app.id, saved_doc_data)
+    saved_doc = await db.asave("demos", demo_app.id, saved_doc_data)
     demo_app.rev = saved_doc.get("rev")
     return demo_app
 
@@ -942,14 +954,14 @@ async def create_demo_app(request: CreateDemoAppRequest, db: DatabaseService = D
 @router.get("/demos", response_model=List[DemoApp])
 async def list_demo_apps(db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Lists all saved demo apps."""
-    all_docs = db.list_all("demos")
+    all_docs = await db.alist_all("demos")
     return [DemoApp(**doc) for doc in all_docs]
 
 
 @router.get("/demos/{demo_id}", response_model=DemoApp)
 async def get_demo_app(demo_id: str, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Retrieves a specific demo app."""
-    doc = db.get("demos", demo_id)
+    doc = await db.aget("demos", demo_id)
     return DemoApp(**doc)
 
 
@@ -959,7 +971,7 @@ async def update_demo_app(demo_id: str, request: CreateDemoAppRequest, db: Datab
     demo_app_data = request.model_dump(by_alias=True)
     updated_model = DemoApp(_id=demo_id, **demo_app_data)
     saved_doc_data = updated_model.model_dump(by_alias=True, mode="json")
-    saved_doc = db.save("demos", demo_id, saved_doc_data)
+    saved_doc = await db.asave("demos", demo_id, saved_doc_data)
     updated_model.rev = saved_doc.get("rev")
     return updated_model
 
@@ -967,7 +979,7 @@ async def update_demo_app(demo_id: str, request: CreateDemoAppRequest, db: Datab
 @router.delete("/demos/{demo_id}", status_code=204)
 async def delete_demo_app(demo_id: str, db: DatabaseService = Depends(get_db), user: dict = Depends(get_current_user)):
     """Deletes a demo app."""
-    db.delete("demos", demo_id)
+    await db.adelete("demos", demo_id)
     return
 
 
@@ -984,76 +996,42 @@ def _get_data_store_dep(db: DatabaseService = Depends(get_db)) -> DataStoreServi
     return get_data_store_service(db)
 
 
-def _namespace_stats_from_docs(docs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    """Aggregate raw record docs into per-namespace stats.
-
-    Returned shape:
-      { namespace: {recordCount, sizeBytes, agents, updatedAt} }
-
-    Agents are the deduped union of createdByAgent and lastAccessedByAgent
-    across every record. sizeBytes is a JSON-size estimate — cheap to compute
-    and good enough for the UI's "1.2 MB" chips.
-    """
-    import json as _json
-    buckets: Dict[str, Dict[str, Any]] = {}
-    for doc in docs:
-        ns = doc.get("namespace") or "default"
-        b = buckets.setdefault(ns, {
-            "recordCount": 0, "sizeBytes": 0, "agents": set(), "updatedAt": None,
-        })
-        b["recordCount"] += 1
-        try:
-            b["sizeBytes"] += len(_json.dumps(doc.get("value")))
-        except (TypeError, ValueError):
-            pass
-        for agent_field in ("createdByAgent", "lastAccessedByAgent"):
-            v = doc.get(agent_field)
-            if v:
-                b["agents"].add(v)
-        updated = doc.get("updatedAt")
-        if updated and (b["updatedAt"] is None or updated > b["updatedAt"]):
-            b["updatedAt"] = updated
-    # Convert sets to sorted lists for serialization stability
-    return {
-        ns: {**b, "agents": sorted(b["agents"])}
-        for ns, b in buckets.items()
-    }
-
-
 @router.get("/data-store/namespaces", response_model=NamespaceListResponse)
 async def list_data_store_namespaces(
-    db: DatabaseService = Depends(get_db),
+    store: DataStoreService = Depends(_get_data_store_dep),
     user: dict = Depends(get_current_user),
 ):
-    """List every namespace with aggregate stats for the current user."""
+    """List every namespace with aggregate stats for the current user.
+
+    Stats are aggregated in the database (see
+    DataStoreService.namespace_stats); record values are not fetched.
+    """
     user_id = user.get("uid", "anonymous")
-    # list_all + filter: simpler than adding a new service method, and
-    # record counts are typically small. Could move to indexed query later.
-    all_docs = db.find("agent_data_store", {"userId": user_id})
-    stats_map = _namespace_stats_from_docs(all_docs)
+    stats_map = await store.anamespace_stats(user_id)
     namespaces = [
         NamespaceStats(namespace=ns, **data)
         for ns, data in sorted(stats_map.items())
     ]
     total_count = sum(ns.record_count for ns in namespaces)
     total_size = sum(ns.size_bytes for ns in namespaces)
+    total_stored = sum(ns.stored_bytes for ns in namespaces)
     return NamespaceListResponse(
         namespaces=namespaces,
         total_record_count=total_count,
         total_size_bytes=total_size,
+        total_stored_bytes=total_stored,
     )
 
 
 @router.get("/data-store/namespaces/{namespace}", response_model=NamespaceStats)
 async def get_namespace_stats(
     namespace: str,
-    db: DatabaseService = Depends(get_db),
+    store: DataStoreService = Depends(_get_data_store_dep),
     user: dict = Depends(get_current_user),
 ):
     """Stats for a single namespace (record count, size, agents, last update)."""
     user_id = user.get("uid", "anonymous")
-    docs = db.find("agent_data_store", {"userId": user_id, "namespace": namespace})
-    stats = _namespace_stats_from_docs(docs)
+    stats = await store.anamespace_stats(user_id, namespace)
     if namespace not in stats:
         return NamespaceStats(namespace=namespace, recordCount=0, sizeBytes=0, agents=[])
     return NamespaceStats(namespace=namespace, **stats[namespace])
@@ -1062,17 +1040,38 @@ async def get_namespace_stats(
 @router.get("/data-store/namespaces/{namespace}/records", response_model=List[DataStoreRecord])
 async def list_records(
     namespace: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
     db: DatabaseService = Depends(get_db),
     user: dict = Depends(get_current_user),
 ):
-    """List every record in a namespace (full docs, not paginated).
+    """List records in a namespace (full docs, including values).
+
+    Compressed values are not decoded and values offloaded to blob
+    storage are not downloaded: those records have ``valueCodec`` or
+    ``valueRef`` set and ``value`` null.
 
-    Returns the raw records including values. For large namespaces a paginated
-    endpoint may be needed later; for now the UI handles up-to-several-thousand
-    rows without issue.
+    Without ``limit``/``cursor`` every record is returned, as before.
+    With them the result is one page; when more records follow, the
+    ``X-Next-Cursor`` response header carries the token for the next
+    request.
     """
     user_id = user.get("uid", "anonymous")
-    docs = db.find("agent_data_store", {"userId": user_id, "namespace": namespace})
+    selector = {"userId": user_id, "namespace": namespace}
+    if limit is None and cursor is None:
+        return [
+            DataStoreRecord(**doc)
+            async for doc in db.afind_iter("agent_data_store", selector)
+        ]
+    try:
+        docs, next_cursor = await db.afind_page(
+            "agent_data_store", selector, page_size=limit or DEFAULT_PAGE_SIZE, cursor=cursor,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [DataStoreRecord(**doc) for doc in docs]
 
 
@@ -1085,7 +1084,7 @@ async def get_record(
 ):
     """Get a single record by key. Uses :path so keys can contain slashes."""
     user_id = user.get("uid", "anonymous")
-    doc = store.get(user_id, namespace, key)
+    doc = await store.aget(user_id, namespace, key)
     if not doc:
         raise HTTPException(status_code=404, detail=f"Record '{key}' not found in '{namespace}'")
     return DataStoreRecord(**doc)
@@ -1103,7 +1102,7 @@ async def set_record(
     through AgentDataStoreProxy during execution.
     """
     user_id = user.get("uid", "anonymous")
-    doc = store.set(
+    doc = await store.aset(
         user_id=user_id,
         namespace=namespace,
         key=key,
@@ -1123,7 +1122,7 @@ async def delete_record(
 ):
     """Delete a single record."""
     user_id = user.get("uid", "anonymous")
-    deleted = store.delete(user_id, namespace, key)
+    deleted = await store.adelete(user_id, namespace, key)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Record '{key}' not found in '{namespace}'")
     return
@@ -1137,5 +1136,5 @@ async def clear_namespace(
 ):
     """Delete every record in a namespace."""
     user_id = user.get("uid", "anonymous")
-    count = store.clear_namespace(user_id, namespace)
+    count = await store.aclear_namespace(user_id, namespace)
     return ClearNamespaceResponse(namespace=namespace, deleted_count=count)
@@ -206,7 +206,8 @@ class Trace:
         })
 
     def data_store(self, op: str, namespace: str, key: Optional[str] = None,
-                   found: Optional[bool] = None, count: Optional[int] = None) -> None:
+                   found: Optional[bool] = None, count: Optional[int] = None,
+                   cached: Optional[bool] = None) -> None:
         self.append({
             "type": "data_store",
             "ts": _now_iso(),
@@ -217,6 +218,7 @@ class Trace:
             "key": key,
             "found": found,
             "count": count,
+            "cached": cached,
             "source": "system",
         })
 
@@ -58,6 +58,13 @@ class AuditService:
 
     def __init__(self, db: DatabaseService):
         self.db = db
+        # list_for_actor asks for one actor's newest entries; this index
+        # lets the backend serve that sorted instead of reading them all.
+        try:
+            self.db.ensure_index(_AUDIT_COLLECTION, ["actorUid", "ts"], index_name="actor-ts-index")
+        except Exception as e:
+            # Best-effort — queries still work, just slower.
+            print(f"Warning: could not ensure audit index: {e}")
 
     async def record(
         self,
@@ -89,18 +96,23 @@ class AuditService:
     async def list_for_actor(self, actor_uid: str, limit: int = 100) -> List[AuditEntry]:
         """Return the most recent audit entries for one actor.
 
-        Used by the self-service audit viewer in B-3. Ordering is
-        best-effort by ``ts`` descending.
+        Used by the self-service audit viewer in B-3. The backend sorts
+        by ``ts`` descending and stops at ``limit``; ``ts`` is stored as
+        an ISO-8601 string, so string order is time order.
         """
-        docs = self.db.find(_AUDIT_COLLECTION, {"actorUid": actor_uid})
+        docs = self.db.find(
+            _AUDIT_COLLECTION,
+            {"actorUid": actor_uid},
+            limit=limit,
+            sort=[{"ts": "desc"}],
+        )
         entries = []
         for doc in docs:
             try:
                 entries.append(AuditEntry(**doc))
             except Exception:
                 continue
-        entries.sort(key=lambda e: e.ts, reverse=True)
-        return entries[:limit]
+        return entries
 
 
 def get_audit_service(db: DatabaseService) -> AuditService:
@@ -0,0 +1,183 @@
+"""Large-value offload from data store records to blob storage.
+
+Agents store whole source files and long LLM summaries as data store
+values.  Kept inline, those push records toward DynamoDB's 400 KB and
+Firestore's 1 MB item limits, and every ``find`` / ``get_all`` ships
+them whether the caller wants the bodies or not.
+
+With ``DATA_STORE_OFFLOAD_BYTES`` set, ``DataStoreService`` writes any
+value whose JSON encoding is larger than that to the configured
+``StorageService`` (S3, GCS or local disk) and keeps only a pointer in
+the record::
+
+    {"value": None,
+     "valueSize": 812345,
+     "valueRef": {"key": "data-store/<sha256>.json", "sha256": "<sha256>",
+                  "size": 812345}}
+
+Blobs are content-addressed, so one value stored under many keys (or
+rewritten unchanged) is kept once in the bucket and uploaded once.  Reads
+fetch the body only when a caller asks for the value: ``get`` fetches
+one blob, ``get_many`` / ``get_all`` / ``iter_items`` fetch theirs in
+parallel.  Anything that works from record metadata — namespace stats,
+the record listing endpoint — never downloads a body.
+
+Tradeoffs:
+
+  * A blob may back several records, so deletes and overwrites leave
+    it in place; orphans are only found by comparing the bucket with
+    the valueRef keys still in use.
+  * Values are only offloaded on write; existing records stay inline
+    until they are next written.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from services.storage_service import StorageService, get_storage_service
+
+# Storage key prefix for offloaded values.
+BLOB_PREFIX = "data-store/"
+
+# Blob uploads or downloads one bulk call runs at once.
+BLOB_FETCH_WORKERS = 8
+
+
+class DataStoreBlobStore:
+    """Writes large values to a StorageService and reads them back.
+
+    The storage client is only created on first use, so a service that
+    never meets an offloaded record never connects to the bucket.
+    """
+
+    def __init__(
+        self,
+        threshold_bytes: int,
+        storage: Optional[StorageService] = None,
+        max_workers: int = BLOB_FETCH_WORKERS,
+    ) -> None:
+        self._threshold = threshold_bytes
+        self._storage = storage
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def storage(self) -> StorageService:
+        if self._storage is None:
+            with self._lock:
+                if self._storage is None:
+                    self._storage = get_storage_service()
+        return self._storage
+
+    def offload(self, value: Any, stored_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Upload ``value`` if it is over the threshold.
+
+        ``stored_size`` is the size the value would take up in its
+        record (smaller than its JSON when compressed; see
+        services/data_store_codec.py) and defaults to its JSON size.
+        Returns the valueRef to store in the record, or None to keep
+        the value inline.
+        """
+        if self._threshold <= 0:
+            return None
+        if stored_size is not None and stored_size <= self._threshold:
+            return None
+        try:
+            data = json.dumps(value).encode()
+        except (TypeError, ValueError):
+            return None  # left for the backend save to reject
+        if stored_size is None and len(data) <= self._threshold:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{BLOB_PREFIX}{digest}.json"
+        # Content-addressed: a blob already under this key holds these bytes.
+        if not self.storage.exists(key):
+            self.storage.upload(key, io.BytesIO(data))
+        return {"key": key, "sha256": digest, "size": len(data)}
+
+    def offload_many(
+        self, values: List[Any], stored_sizes: Optional[List[Optional[int]]] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """:meth:`offload` each value, uploading in parallel."""
+        if self._threshold <= 0:
+            return [None] * len(values)
+        sizes = stored_sizes or [None] * len(values)
+        if len(values) <= 1:
+            return [self.offload(value, size) for value, size in zip(values, sizes)]
+        return list(self._pool().map(self.offload, values, sizes))
+
+    def load(self, ref: Dict[str, Any]) -> Any:
+        """Download the value behind a valueRef."""
+        return json.loads(self.storage.download(ref["key"]))
+
+    def load_many(self, refs: List[Dict[str, Any]]) -> List[Any]:
+        """Download several values in parallel, in ``refs`` order."""
+        if len(refs) <= 1:
+            return [self.load(ref) for ref in refs]
+        return list(self._pool().map(self.load, refs))
+
+    async def aoffload(self, value: Any, stored_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Awaitable :meth:`offload`; the upload runs on the blob pool."""
+        if self._threshold <= 0 or (stored_size is not None and stored_size <= self._threshold):
+            return None
+        return await self._run(self.offload, value, stored_size)
+
+    async def aoffload_many(
+        self, values: List[Any], stored_sizes: Optional[List[Optional[int]]] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Awaitable :meth:`offload_many`."""
+        if self._threshold <= 0:
+            return [None] * len(values)
+        sizes = stored_sizes or [None] * len(values)
+        return list(await asyncio.gather(*(
+            self.aoffload(value, size) for value, size in zip(values, sizes)
+        )))
+
+    async def aload_many(self, refs: List[Dict[str, Any]]) -> List[Any]:
+        """Awaitable :meth:`load_many`."""
+        return list(await asyncio.gather(*(self._run(self.load, ref) for ref in refs)))
+
+    async def _run(self, fn, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool(), functools.partial(ctx.run, fn, *args))
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # A pool of its own rather than the database one: get_all may
+        # itself be running on a database worker thread.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers,
+                        thread_name_prefix="data-store-blob",
+                    )
+        return self._executor
+
+
+_blob_store: Optional[DataStoreBlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> DataStoreBlobStore:
+    """The process-wide blob store.
+
+    Returned even when ``DATA_STORE_OFFLOAD_BYTES`` is 0: nothing new is
+    offloaded then, but records offloaded earlier still read back.
+    """
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = DataStoreBlobStore(settings.DATA_STORE_OFFLOAD_BYTES)
+    return _blob_store
@@ -0,0 +1,145 @@
+"""Per-run read cache for the agent data store.
+
+Generated agents often ``data_store.get()`` the same keys over and
+over in one run — inside a loop over batches, or once per nested
+``gofannon_client`` call.  Each call is a backend round trip plus an
+access-tracking update.  With ``DATA_STORE_RUN_CACHE`` enabled,
+``_execute_agent_code`` binds one :class:`DataStoreRunCache` for the
+whole run and every :class:`~services.data_store_service.AgentDataStoreProxy`
+created during it (``use_namespace`` copies, nested agents) answers
+repeated ``get`` / ``get_many`` / ``get_all`` calls from it.
+
+The cache is write-through for the run's own writes: ``set``,
+``set_many``, ``delete`` and ``clear`` update it after the backend
+call succeeds, so an agent always reads its own writes.  Writes made
+by anyone else during the run are not seen — that is the trade the
+opt-in buys.
+
+Tradeoffs:
+
+  * Cache hits skip access tracking, so ``accessCount`` counts backend
+    reads rather than agent reads.
+  * Values are deep-copied in and out; an agent mutating a value it
+    read does not change what the next read returns.
+  * At most ``RUN_CACHE_MAX_ENTRIES`` keys are held, least recently
+    used first out.  A namespace loaded by ``get_all`` is only served
+    whole while all of its keys fit.
+
+Like the trace, the cache lives in a contextvar, so nested agent calls
+find it without a signature change.
+"""
+from __future__ import annotations
+
+import contextvars
+import copy
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Keys one run may hold in memory.
+RUN_CACHE_MAX_ENTRIES = 10000
+
+# Stored for a key the run knows is absent (a miss or its own delete).
+ABSENT = object()
+
+_Entry = Tuple[str, str, str]
+
+
+class DataStoreRunCache:
+    """Values keyed by (user, namespace, key) for the duration of one run."""
+
+    def __init__(self, max_entries: int = RUN_CACHE_MAX_ENTRIES) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[_Entry, Any]" = OrderedDict()
+        # (user, namespace) pairs whose every key is in _entries.
+        self._complete: set = set()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: str, namespace: str, key: str) -> Tuple[bool, Any]:
+        """``(True, value)`` on a hit — ``value`` may be ABSENT — else ``(False, None)``."""
+        entry = (user_id, namespace, key)
+        if entry in self._entries:
+            self._entries.move_to_end(entry)
+            self.hits += 1
+            return True, self._copy(self._entries[entry])
+        if (user_id, namespace) in self._complete:
+            self.hits += 1
+            return True, ABSENT
+        self.misses += 1
+        return False, None
+
+    def store(self, user_id: str, namespace: str, key: str, value: Any) -> None:
+        """Remember ``value`` (or ABSENT) for a key."""
+        entry = (user_id, namespace, key)
+        self._entries[entry] = self._copy(value)
+        self._entries.move_to_end(entry)
+        while len(self._entries) > self._max_entries:
+            (user, ns, _), _ = self._entries.popitem(last=False)
+            self._complete.discard((user, ns))
+
+    def discard(self, user_id: str, namespace: str, keys: Optional[Iterable[str]]) -> None:
+        """Forget keys (None: the whole namespace) whose state is unknown,
+        e.g. after a failed write."""
+        if keys is None:
+            self._drop_namespace(user_id, namespace)
+            return
+        for key in keys:
+            self._entries.pop((user_id, namespace, key), None)
+        self._complete.discard((user_id, namespace))
+
+    def namespace(self, user_id: str, namespace: str) -> Optional[Dict[str, Any]]:
+        """Every key of a fully cached namespace, or None."""
+        if (user_id, namespace) not in self._complete:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            key: self._copy(value)
+            for (user, ns, key), value in self._entries.items()
+            if user == user_id and ns == namespace and value is not ABSENT
+        }
+
+    def store_namespace(self, user_id: str, namespace: str, items: Dict[str, Any]) -> None:
+        """Replace a namespace's entries with its full contents."""
+        self._drop_namespace(user_id, namespace)
+        for key, value in items.items():
+            self.store(user_id, namespace, key, value)
+        if len(items) <= self._max_entries:
+            self._complete.add((user_id, namespace))
+
+    def clear_namespace(self, user_id: str, namespace: str) -> None:
+        """Record that a namespace is now empty."""
+        self._drop_namespace(user_id, namespace)
+        self._complete.add((user_id, namespace))
+
+    def _drop_namespace(self, user_id: str, namespace: str) -> None:
+        for entry in [e for e in self._entries if e[0] == user_id and e[1] == namespace]:
+            del self._entries[entry]
+        self._complete.discard((user_id, namespace))
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return value if value is ABSENT else copy.deepcopy(value)
+
+
+_current_run_cache: contextvars.ContextVar[Optional[DataStoreRunCache]] = contextvars.ContextVar(
+    "gofannon_data_store_run_cache", default=None
+)
+
+
+def get_current_run_cache() -> Optional[DataStoreRunCache]:
+    return _current_run_cache.get()
+
+
+@contextmanager
+def bind_run_cache(cache: Optional[DataStoreRunCache]) -> Iterator[Optional[DataStoreRunCache]]:
+    """Make ``cache`` the run cache for nested agent calls; None is a no-op."""
+    if cache is None:
+        yield None
+        return
+    token = _current_run_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_run_cache.reset(token)
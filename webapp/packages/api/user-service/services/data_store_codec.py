@@ -0,0 +1,137 @@
+"""Value compression for data store records.
+
+Data store values are mostly text — source code, JSON analysis
+results, LLM output — and compress 3-10x, but are stored as raw JSON.
+With ``DATA_STORE_COMPRESS_BYTES`` set, ``DataStoreService`` compresses
+any value whose JSON encoding is larger than that and stores it as a
+tagged, base64 field instead of the plain value::
+
+    {"value": None,
+     "valueCodec": "gzip",
+     "valueEncoded": "H4sIAAAAAAAC/...",
+     "valueSize": 48211,     # JSON size of the value
+     "storedSize": 9630}     # size of valueEncoded
+
+Reads decode it before anyone sees the value.  The record stays a
+plain JSON document, so every backend stores it, and on CouchDB it
+shrinks the database file, replication traffic and the
+``_all_docs?include_docs`` transfers behind bulk reads.
+
+``DATA_STORE_COMPRESS_CODEC`` picks ``gzip`` (the default, always
+available) or ``zstd`` (faster and smaller, needs the ``zstandard``
+package; without it gzip is used).  A value that doesn't get smaller
+is stored plain.  Records are decoded by the codec named in their tag,
+so changing either setting never makes existing records unreadable.
+"""
+from __future__ import annotations
+
+import base64
+import gzip
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+
+# gzip level 6 and zstd level 3: their defaults, most of the size win
+# for little CPU.
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot decode a zstd data store value")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_GZIP:
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown data store value codec: {codec}")
+
+
+class DataStoreCodec:
+    """Turns values into record fields and back."""
+
+    def __init__(self, threshold_bytes: int, codec: str = CODEC_GZIP) -> None:
+        if codec == CODEC_ZSTD and zstandard is None:
+            print("Warning: zstandard not installed; compressing data store values with gzip")
+            codec = CODEC_GZIP
+        elif codec not in (CODEC_GZIP, CODEC_ZSTD):
+            print(f"Warning: unknown DATA_STORE_COMPRESS_CODEC '{codec}'; using gzip")
+            codec = CODEC_GZIP
+        self._threshold = threshold_bytes
+        self.codec = codec
+
+    def encode(self, value: Any) -> Dict[str, Any]:
+        """The value fields of a record holding ``value``.
+
+        ``{"value", "valueSize"}`` when stored plain; ``{"value": None,
+        "valueCodec", "valueEncoded", "valueSize", "storedSize"}`` when
+        compressed.
+        """
+        try:
+            raw = json.dumps(value).encode()
+        except (TypeError, ValueError):
+            # Left for the backend save to reject.
+            return {"value": value, "valueSize": 0}
+        if self._threshold <= 0 or len(raw) <= self._threshold:
+            return {"value": value, "valueSize": len(raw)}
+        encoded = base64.b64encode(_compress(self.codec, raw)).decode("ascii")
+        if len(encoded) >= len(raw):
+            return {"value": value, "valueSize": len(raw)}
+        return {
+            "value": None,
+            "valueCodec": self.codec,
+            "valueEncoded": encoded,
+            "valueSize": len(raw),
+            "storedSize": len(encoded),
+        }
+
+    @staticmethod
+    def decode(doc: Dict[str, Any]) -> Any:
+        """The value of a record, decompressing it if it was encoded."""
+        codec = doc.get("valueCodec")
+        if not codec:
+            return doc.get("value")
+        data = _decompress(codec, base64.b64decode(doc["valueEncoded"]))
+        return json.loads(data)
+
+    @staticmethod
+    def stored_size(fields: Dict[str, Any]) -> int:
+        """Bytes the value takes up in the record built from ``fields``."""
+        size = fields.get("storedSize")
+        return size if isinstance(size, int) else fields.get("valueSize", 0)
+
+
+_codec: Optional[DataStoreCodec] = None
+_codec_lock = threading.Lock()
+
+
+def get_codec() -> DataStoreCodec:
+    """The process-wide codec, from DATA_STORE_COMPRESS_BYTES / _CODEC.
+
+    Returned even when compression is off (threshold 0), so records
+    compressed earlier still decode.
+    """
+    global _codec
+    if _codec is None:
+        with _codec_lock:
+            if _codec is None:
+                _codec = DataStoreCodec(
+                    settings.DATA_STORE_COMPRESS_BYTES, settings.DATA_STORE_COMPRESS_CODEC
+                )
+    return _codec
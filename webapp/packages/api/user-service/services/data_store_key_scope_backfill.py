@@ -0,0 +1,35 @@
+"""Stamp keyScope on data store records written before it was stored.
+
+Usage (from the user-service directory)::
+
+    python -m services.data_store_key_scope_backfill [user_id ...]
+
+Ranged key listings (list_keys with start_after / limit, iter_items)
+select on keyScope.  On CouchDB the service stamps old records itself
+the first time a namespace is listed; other backends would overwrite a
+write racing the stamp, so they list without keyScope (and without the
+scope-key index) until this has run.  It re-saves every unstamped
+record whole, so stop the app's writers first unless the backend is
+CouchDB.  Processes already running re-check each namespace they found
+unstamped every KEY_SCOPE_RECHECK_SECONDS and then use keyScope again.
+"""
+import argparse
+
+from config import settings
+from services.data_store_service import DataStoreService
+from services.database_service import get_database_service
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("users", nargs="*", help="user ids (default: every user)")
+    args = parser.parse_args(argv)
+
+    store = DataStoreService(get_database_service(settings))
+    for selector in [{"userId": user_id} for user_id in args.users] or [{}]:
+        stamped = store.backfill_key_scope(selector)
+        print(f"{selector.get('userId', 'all users')!r}: stamped {stamped} records.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,25 @@ The data store allows agents to persist and share data across executions.
 Data is scoped to users - all agents owned by a user can access the same data pool.
 """
 
+import asyncio
+import contextlib
+import copy
 import json
-import sys
+import time
+import weakref
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from fastapi import HTTPException
 
+from config import settings
 from services.database_service import DatabaseService
 from services.access_tracking import AccessAccumulator
+from services.agent_trace import get_current_trace
+from services.data_store_blobs import DataStoreBlobStore, get_blob_store
+from services.data_store_cache import ABSENT, DataStoreRunCache
+from services.data_store_codec import DataStoreCodec, get_codec
+from services.data_store_summary import NamespaceSummaries, get_namespace_summaries, summaries_supported
 
 
 # Database/collection name for data store records
@@ -25,20 +35,362 @@ DATA_STORE_DB = "agent_data_store"
 # Each entry is (fields, index_name).
 _STANDARD_INDEXES = [
     (["userId", "namespace"], "user-namespace-index"),
+    # Serves ranged, key-ordered listings (list_keys with start_after /
+    # limit, iter_items).  keyScope is one field so that DynamoDB, whose
+    # keys have two attributes, can still range-scan key within it.
+    (["keyScope", "key"], "scope-key-index"),
 ]
 
+# Keys fetched per query when list_keys pages through a namespace.
+KEY_PAGE_SIZE = 1000
+
+# Records stamped per save_many when backfilling keyScope.
+_KEY_SCOPE_BACKFILL_BATCH = 200
+
+# Seconds a namespace found without keyScope stays cached as unscoped
+# before it is counted again, so a backfill run from another process is
+# picked up without a restart.
+KEY_SCOPE_RECHECK_SECONDS = 300.0
+
+# Per-database caches shared by every DataStoreService on that database,
+# since services are built per request:
+#   * namespaces whose index has been ensured (_ensure_namespace_indexed);
+#   * (user, namespace) -> (whether every record carries keyScope,
+#     when that was checked) (_ensure_key_scope).
+# Keyed weakly, so a discarded database (e.g. in tests) takes its
+# entries with it.
+_INDEXED_NAMESPACES: "weakref.WeakKeyDictionary[DatabaseService, set]" = weakref.WeakKeyDictionary()
+_SCOPED_NAMESPACES: "weakref.WeakKeyDictionary[DatabaseService, Dict[Tuple[str, str], Tuple[bool, float]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Defaults for AgentDataStoreProxy batching: buffered writes are flushed
+# once this many are pending, or once the oldest is this old.
+BATCH_MAX_OPS = 500
+BATCH_MAX_SECONDS = 5.0
+
+# Record fields naming the agents that touched it, reported per
+# namespace by namespace_stats.
+_AGENT_FIELDS = ("createdByAgent", "lastAccessedByAgent")
+
+# Fields the streaming namespace_stats path reads.  Records that
+# predate the stored valueSize are re-read whole to size their value.
+_STATS_FIELDS = ["namespace", "valueSize", "storedSize", *_AGENT_FIELDS, "updatedAt"]
+
+# Aggregate groupings for namespace_stats: compressed records (with a
+# valueCodec) are stored at their storedSize, every other record at its
+# valueSize; agents come from one grouping over both agent fields.
+_TOTALS_GROUP = ["namespace", "valueCodec"]
+_AGENTS_GROUP = ["namespace", *_AGENT_FIELDS]
+_SIZE_FIELDS = ["valueSize", "storedSize"]
+_TOTALS_QUERY: Dict[str, Any] = {"group_by": _TOTALS_GROUP, "sum_fields": _SIZE_FIELDS, "max_fields": ["updatedAt"]}
+
+# Record fields holding a value stored other than as plain JSON:
+# compressed (services/data_store_codec.py) or offloaded
+# (services/data_store_blobs.py).
+_PACKED_VALUE_FIELDS = ("valueRef", "valueCodec", "valueEncoded", "storedSize")
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {"recordCount": 0, "sizeBytes": 0, "storedBytes": 0, "agents": set(), "updatedAt": None}
+
+
+def _later(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    if not a:
+        return b
+    if not b:
+        return a
+    return max(a, b)
+
+
+def _stats_from_aggregates(
+    totals: Dict[Tuple, Dict[str, Any]],
+    agents: Dict[Tuple, Dict[str, Any]],
+) -> Dict[str, Dict[str, Any]]:
+    """Build namespace_stats output from DatabaseService.aggregate results.
+
+    ``totals`` is grouped by _TOTALS_GROUP and ``agents`` by
+    _AGENTS_GROUP; see :func:`_sized` for when they can be used.
+    """
+    stats: Dict[str, Dict[str, Any]] = {}
+    for (ns, codec), bucket in totals.items():
+        entry = stats.setdefault(ns or "default", _empty_stats())
+        size = int(bucket["sum"]["valueSize"])
+        entry["recordCount"] += bucket["count"]
+        entry["sizeBytes"] += size
+        entry["storedBytes"] += int(bucket["sum"]["storedSize"]) if codec else size
+        entry["updatedAt"] = _later(entry["updatedAt"], bucket["max"]["updatedAt"])
+    for (ns, *names) in agents:
+        entry = stats.get(ns or "default")
+        if entry is not None:
+            entry["agents"].update(name for name in names if name)
+    return _finish_stats(stats)
+
+
+def _sized(totals: Dict[Tuple, Dict[str, Any]]) -> bool:
+    """True if every record in ``totals`` carries the sizes the aggregates sum.
+
+    Records written before valueSize was stored can only be sized by
+    reading their value.
+    """
+    return all(
+        bucket["counts"]["valueSize"] == bucket["count"]
+        and (not codec or bucket["counts"]["storedSize"] == bucket["count"])
+        for (_, codec), bucket in totals.items()
+    )
+
+
+def _record_sizes(doc: Dict[str, Any]) -> Tuple[int, int]:
+    """JSON size of a record's value and the size it is stored at."""
+    size = doc.get("valueSize")
+    size = size if isinstance(size, int) else _value_size(doc.get("value"))
+    stored = doc.get("storedSize")
+    return size, stored if isinstance(stored, int) else size
+
+
+def _fold_record_stats(stats: Dict[str, Dict[str, Any]], doc: Dict[str, Any]) -> bool:
+    """Add one record (streaming path) to the per-namespace ``stats``.
+
+    Returns False, without adding it, for a record that predates the
+    stored valueSize and was read without its value.
+    """
+    if "value" not in doc and not isinstance(doc.get("valueSize"), int):
+        return False
+    entry = stats.setdefault(doc.get("namespace") or "default", _empty_stats())
+    entry["recordCount"] += 1
+    size, stored = _record_sizes(doc)
+    entry["sizeBytes"] += size
+    entry["storedBytes"] += stored
+    for field in _AGENT_FIELDS:
+        if doc.get(field):
+            entry["agents"].add(doc[field])
+    entry["updatedAt"] = _later(entry["updatedAt"], doc.get("updatedAt"))
+    return True
+
+
+def _finish_stats(stats: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    # Sorted agent lists for serialization stability
+    return {ns: {**entry, "agents": sorted(entry["agents"])} for ns, entry in stats.items()}
+
+
+def _finish_streamed_stats(
+    stats: Dict[str, Dict[str, Any]],
+    legacy_docs: Dict[str, Optional[Dict[str, Any]]],
+) -> Dict[str, Dict[str, Any]]:
+    """Fold the legacy records the streaming pass skipped, re-read whole, into ``stats``."""
+    for doc in legacy_docs.values():
+        if doc is not None:
+            _fold_record_stats(stats, doc)
+    return _finish_stats(stats)
+
+
+def _summary_stats(
+    summary: Dict[str, Dict[str, Any]],
+    namespace: Optional[str],
+) -> Dict[str, Dict[str, Any]]:
+    return {ns: entry for ns, entry in summary.items() if namespace in (None, ns)}
+
+
+def _namespace_names(docs: List[Dict[str, Any]]) -> List[str]:
+    return sorted({doc.get("namespace") or "default" for doc in docs})
+
+
+def _keys_of(docs: List[Dict[str, Any]]) -> List[str]:
+    return [doc.get("key", "") for doc in docs]
+
+
+def _key_page_size(limit: Optional[int]) -> int:
+    return min(limit, KEY_PAGE_SIZE) if limit is not None else KEY_PAGE_SIZE
+
+
+def _take_keys(keys: List[str], page: List[Dict[str, Any]], limit: Optional[int]) -> bool:
+    """Add ``page``'s keys to ``keys``; True once ``limit`` are held."""
+    keys.extend(_keys_of(page))
+    return limit is not None and len(keys) >= limit
+
+
+def _next_start(page: List[Dict[str, Any]], page_size: int) -> Optional[str]:
+    """The key a ranged listing resumes after, or None if ``page`` was its last."""
+    if len(page) < page_size:
+        return None
+    return page[-1].get("key", "")
+
+
+def _mark_access(doc: Optional[Dict[str, Any]], agent_name: Optional[str]) -> bool:
+    """Record an agent's read on ``doc``; True if it needs saving."""
+    if not (agent_name and doc):
+        return False
+    doc["lastAccessedByAgent"] = agent_name
+    doc["lastAccessedAt"] = datetime.utcnow().isoformat()
+    doc["accessCount"] = doc.get("accessCount", 0) + 1
+    return True
+
+
+def _ok_ids(results: List[Dict[str, Any]]) -> List[str]:
+    return [r["id"] for r in results if r.get("ok")]
+
+
+def _ok_count(results: List[Dict[str, Any]]) -> int:
+    return sum(1 for r in results if r.get("ok"))
+
+
+def _failed_keys(doc_ids: List[str], keys: List[str], results: List[Dict[str, Any]]) -> List[str]:
+    """The ``keys`` whose bulk-call result in ``results`` failed."""
+    key_by_id = dict(zip(doc_ids, keys))
+    return [key_by_id[r["id"]] for r in results if not r.get("ok") and r.get("id") in key_by_id]
+
+
+def _retry_items(
+    results: List[Dict[str, Any]],
+    item_by_id: Dict[str, Tuple[str, str, Any, Optional[Dict[str, Any]]]],
+) -> List[Tuple[str, str, Any, Optional[Dict[str, Any]]]]:
+    """The set_many items whose bulk save failed, to retry one by one.
+
+    ResourceConflict is the expected reason; other errors (network
+    etc.) are still worth one retry too.
+    """
+    return [
+        item_by_id[r.get("id")]
+        for r in results
+        if not r.get("ok") and r.get("id") in item_by_id
+    ]
+
+
+def _with_loaded(values: List[Any], refs: Dict[int, Dict[str, Any]], loaded: List[Any]) -> List[Any]:
+    """``values`` with the offloaded ones at ``refs``' indexes replaced by ``loaded``."""
+    for i, value in zip(refs, loaded):
+        values[i] = value
+    return values
+
+
+def _key_scope(user_id: str, namespace: str) -> str:
+    """The keyScope stored on every record of ``namespace``."""
+    return f"{user_id}:{namespace}"
+
+
+# Fields backfill_key_scope reads to find unstamped records.
+_KEY_SCOPE_FIELDS = ["userId", "namespace", "keyScope"]
+
+
+def _with_key_scope(selector: Dict[str, Any]) -> Dict[str, Any]:
+    """A ``{"userId", "namespace"}`` selector narrowed to the namespace's keyScope."""
+    return {"keyScope": _key_scope(selector["userId"], selector["namespace"]), **selector}
+
+
+def _lacks_key_scope(doc: Dict[str, Any]) -> bool:
+    return doc.get("keyScope") != _key_scope(doc.get("userId", ""), doc.get("namespace", ""))
+
+
+def _key_scope_batches(missing: List[str]) -> Iterator[List[str]]:
+    for start in range(0, len(missing), _KEY_SCOPE_BACKFILL_BATCH):
+        yield missing[start:start + _KEY_SCOPE_BACKFILL_BATCH]
+
+
+def _stamped(docs: Dict[str, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """The records in ``docs`` that still lack keyScope, stamped with it."""
+    return [
+        {**doc, "keyScope": _key_scope(doc["userId"], doc["namespace"])}
+        for doc in docs.values()
+        if doc and _lacks_key_scope(doc)
+    ]
+
+
+def _cached_key_scope(
+    cache: Dict[Tuple[str, str], Tuple[bool, float]], user_id: str, namespace: str
+) -> Optional[bool]:
+    """The cached keyScope verdict for a namespace, or None to count again.
+
+    Scoped is final, since every save stamps keyScope; unscoped expires
+    after KEY_SCOPE_RECHECK_SECONDS.
+    """
+    entry = cache.get((user_id, namespace))
+    if entry is None:
+        return None
+    scoped, checked_at = entry
+    if scoped or time.monotonic() - checked_at < KEY_SCOPE_RECHECK_SECONDS:
+        return scoped
+    return None
+
+
+def _forget_key_scope(cache: Dict[Tuple[str, str], Tuple[bool, float]], selector: Dict[str, Any]) -> None:
+    """Drop the cached verdicts a backfill over ``selector`` may have changed."""
+    for user_id, namespace in list(cache):
+        if selector.get("userId", user_id) == user_id and selector.get("namespace", namespace) == namespace:
+            del cache[(user_id, namespace)]
+
+
+def _sorted_keys_after(keys: Iterator[str], start_after: Optional[str]) -> List[str]:
+    """``keys`` greater than ``start_after``, sorted."""
+    return sorted(k for k in keys if start_after is None or k > start_after)
+
+
+def _found_in_order(doc_ids: List[str], found: Dict[str, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """The records get_many found, in ``doc_ids`` order."""
+    return [found[doc_id] for doc_id in doc_ids if found.get(doc_id)]
+
+
+def _key_chunks(keys: List[str], page_size: int) -> Iterator[List[str]]:
+    for start in range(0, len(keys), page_size):
+        yield keys[start:start + page_size]
+
+
+def _warn_unscoped(user_id: str, namespace: str) -> None:
+    print(
+        f"Warning: records in '{user_id}:{namespace}' lack keyScope, so ranged listings "
+        "can't use the scope-key index; run python -m services.data_store_key_scope_backfill"
+    )
+
+
+def _value_size(value: Any) -> int:
+    """JSON size of a record value, in bytes (0 if it can't be encoded)."""
+    try:
+        return len(json.dumps(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _is_packed(doc: Dict[str, Any]) -> bool:
+    """Whether ``doc``'s value is compressed or offloaded rather than inline."""
+    return bool(doc.get("valueRef") or doc.get("valueCodec"))
+
+
+def _with_value(doc: Dict[str, Any], value: Any) -> Dict[str, Any]:
+    """``doc`` as callers see it: with its value, even if packed."""
+    return {**doc, "value": value} if _is_packed(doc) else doc
+
 
 class DataStoreService:
     """Service for agent data store operations."""
 
-    def __init__(self, db: DatabaseService):
+    def __init__(
+        self,
+        db: DatabaseService,
+        blobs: Optional[DataStoreBlobStore] = None,
+        codec: Optional[DataStoreCodec] = None,
+        summaries: Optional[NamespaceSummaries] = None,
+    ):
         self.db = db
+        # Where values over DATA_STORE_OFFLOAD_BYTES live; records keep
+        # a valueRef.  See services/data_store_blobs.py.
+        self._blobs = blobs if blobs is not None else get_blob_store()
+        # Compresses values over DATA_STORE_COMPRESS_BYTES; see
+        # services/data_store_codec.py.
+        self._codec = codec if codec is not None else get_codec()
+        # Per-user namespace totals kept up to date on write, so
+        # list_namespaces / namespace_stats are one read.  None unless
+        # DATA_STORE_NAMESPACE_SUMMARIES is on; see
+        # services/data_store_summary.py.
+        self._summaries = summaries
         # Background batcher for access-tracking metadata.  Keeps the
         # read paths off the write path; see services/access_tracking.py.
         self._access_accumulator = AccessAccumulator(db, DATA_STORE_DB)
         # Track namespaces we've already ensured indexes for so we
-        # don't call ensure_index on every single write.
-        self._indexed_namespaces: set = set()
+        # don't call ensure_index on every single write.  Shared per
+        # database, so this holds once per process, not per request.
+        self._indexed_namespaces: set = _INDEXED_NAMESPACES.setdefault(db, set())
+        # (user, namespace) -> (whether its records all carry keyScope,
+        # when that was checked); see _ensure_key_scope.
+        self._scoped_namespaces: Dict[Tuple[str, str], Tuple[bool, float]] = _SCOPED_NAMESPACES.setdefault(db, {})
         # Eagerly create the standard indexes on startup so that
         # queries are fast from the very first request.
         self._ensure_standard_indexes()
@@ -77,17 +429,277 @@ class DataStoreService:
         self._indexed_namespaces.add(cache_key)
 
     def _make_doc_id(self, user_id: str, namespace: str, key: str) -> str:
-        """Generate document ID from composite key."""
+        """Generate document ID from composite key.
+
+        The user id part comes from ``partition_key`` so that on a
+        partitioned CouchDB the whole user id is the partition.
+        """
         import base64
         safe_key = base64.urlsafe_b64encode(key.encode()).decode()
-        return f"{user_id}:{namespace}:{safe_key}"
+        return f"{self.db.partition_key(DATA_STORE_DB, user_id)}:{namespace}:{safe_key}"
 
-    def _estimate_size(self, value: Any) -> int:
-        """Estimate the size of a value in bytes."""
-        try:
-            return sys.getsizeof(json.dumps(value))
-        except (TypeError, ValueError):
-            return 0
+    def _estimate_size(self, value: Any) -> Tuple[int, int]:
+        """Raw JSON size of a value and the size it would be stored at, in bytes."""
+        fields = self._codec.encode(value)
+        return fields["valueSize"], DataStoreCodec.stored_size(fields)
+
+    def _encode(self, value: Any) -> Dict[str, Any]:
+        """A record's value fields for ``value``: plain, compressed or offloaded.
+
+        Compression comes first, so a value that compresses below
+        DATA_STORE_OFFLOAD_BYTES stays in the record.
+        """
+        fields = self._codec.encode(value)
+        ref = self._blobs.offload(value, DataStoreCodec.stored_size(fields))
+        return self._offloaded(fields, ref)
+
+    async def _aencode(self, value: Any) -> Dict[str, Any]:
+        """Awaitable :meth:`_encode`."""
+        fields = self._codec.encode(value)
+        ref = await self._blobs.aoffload(value, DataStoreCodec.stored_size(fields))
+        return self._offloaded(fields, ref)
+
+    def _encode_many(self, values: List[Any]) -> List[Dict[str, Any]]:
+        """:meth:`_encode` each value, uploading offloaded ones in parallel."""
+        fields = [self._codec.encode(value) for value in values]
+        refs = self._blobs.offload_many(values, [DataStoreCodec.stored_size(f) for f in fields])
+        return [self._offloaded(f, ref) for f, ref in zip(fields, refs)]
+
+    async def _aencode_many(self, values: List[Any]) -> List[Dict[str, Any]]:
+        """Awaitable :meth:`_encode_many`."""
+        fields = [self._codec.encode(value) for value in values]
+        refs = await self._blobs.aoffload_many(values, [DataStoreCodec.stored_size(f) for f in fields])
+        return [self._offloaded(f, ref) for f, ref in zip(fields, refs)]
+
+    @staticmethod
+    def _offloaded(fields: Dict[str, Any], ref: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # An offloaded value is kept whole (uncompressed) in the blob.
+        if ref is None:
+            return fields
+        return {"value": None, "valueSize": fields["valueSize"], "valueRef": ref}
+
+    def _new_record(
+        self,
+        doc_id: str,
+        user_id: str,
+        namespace: str,
+        key: str,
+        value: Any,
+        agent_name: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        now_iso: str,
+        fields: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Build a fresh record document for a key that doesn't exist yet.
+
+        ``fields`` are the value fields from :meth:`_encode`, when the
+        caller already has them.
+        """
+        return {
+            "_id": doc_id,
+            "userId": user_id,
+            "namespace": namespace,
+            "key": key,
+            "keyScope": _key_scope(user_id, namespace),
+            **(fields or self._codec.encode(value)),
+            "metadata": metadata or {},
+            "createdByAgent": agent_name,
+            "lastAccessedByAgent": agent_name,
+            "accessCount": 0,
+            "createdAt": now_iso,
+            "updatedAt": now_iso,
+            "lastAccessedAt": now_iso if agent_name else None,
+        }
+
+    def _merge_record(
+        self,
+        existing: Dict[str, Any],
+        value: Any,
+        agent_name: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        now_iso: str,
+        fields: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Apply a write on top of an existing record, preserving created*."""
+        fields = fields or self._codec.encode(value)
+        doc = {
+            **existing,
+            "keyScope": _key_scope(existing.get("userId", ""), existing.get("namespace", "")),
+            **fields,
+            "updatedAt": now_iso,
+        }
+        for field in _PACKED_VALUE_FIELDS:
+            if field not in fields:
+                doc.pop(field, None)
+        if metadata:
+            doc["metadata"] = {**existing.get("metadata", {}), **metadata}
+        if agent_name:
+            doc["lastAccessedByAgent"] = agent_name
+            doc["lastAccessedAt"] = now_iso
+        return doc
+
+    def _record_for(
+        self,
+        doc_id: str,
+        user_id: str,
+        namespace: str,
+        key: str,
+        value: Any,
+        agent_name: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        now_iso: str,
+        fields: Dict[str, Any],
+        existing: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """The record a write saves: merged into ``existing``, or fresh."""
+        if existing:
+            return self._merge_record(existing, value, agent_name, metadata, now_iso, fields)
+        return self._new_record(doc_id, user_id, namespace, key, value, agent_name, metadata, now_iso, fields)
+
+    def _finish_write(
+        self,
+        user_id: str,
+        namespace: str,
+        existing: Optional[Dict[str, Any]],
+        doc: Dict[str, Any],
+        saved: Dict[str, Any],
+        value: Any,
+    ) -> Dict[str, Any]:
+        doc["_rev"] = saved.get("rev")
+        self._note_write(user_id, namespace, existing, doc)
+        return _with_value(doc, value)
+
+    def _decode(self, docs: List[Dict[str, Any]]) -> Tuple[List[Any], Dict[int, Dict[str, Any]]]:
+        """The inline values of ``docs``, and the blob refs of the offloaded ones by index."""
+        values = [self._codec.decode(doc) for doc in docs]
+        return values, {i: doc["valueRef"] for i, doc in enumerate(docs) if doc.get("valueRef")}
+
+    def _values(self, docs: List[Dict[str, Any]]) -> List[Any]:
+        """The values of ``docs``, decoded; offloaded ones are fetched in parallel."""
+        values, refs = self._decode(docs)
+        if not refs:
+            return values
+        return _with_loaded(values, refs, self._blobs.load_many(list(refs.values())))
+
+    async def _avalues(self, docs: List[Dict[str, Any]]) -> List[Any]:
+        """Awaitable :meth:`_values`."""
+        values, refs = self._decode(docs)
+        if not refs:
+            return values
+        return _with_loaded(values, refs, await self._blobs.aload_many(list(refs.values())))
+
+    # -- namespace summaries (services/data_store_summary.py) -----------
+
+    def _note_write(
+        self,
+        user_id: str,
+        namespace: str,
+        old: Optional[Dict[str, Any]],
+        new: Dict[str, Any],
+    ) -> None:
+        """Buffer the summary change from saving ``new`` over ``old`` (None for a new key)."""
+        if self._summaries is None:
+            return
+        size, stored = _record_sizes(new)
+        old_size, old_stored = _record_sizes(old) if old else (0, 0)
+        self._summaries.record(
+            user_id, namespace,
+            records=0 if old else 1,
+            size=size - old_size,
+            stored=stored - old_stored,
+            agents=[new.get(field) for field in _AGENT_FIELDS],
+            updated_at=new.get("updatedAt"),
+        )
+
+    def _note_saved(
+        self,
+        user_id: str,
+        new_docs: List[Dict[str, Any]],
+        existing_map: Dict[str, Optional[Dict[str, Any]]],
+        results: List[Dict[str, Any]],
+    ) -> None:
+        """:meth:`_note_write` each record a save_many saved."""
+        if self._summaries is None:
+            return
+        saved = {r.get("id") for r in results if r.get("ok")}
+        for doc in new_docs:
+            if doc["_id"] in saved:
+                self._note_write(user_id, doc["namespace"], existing_map.get(doc["_id"]), doc)
+
+    def _note_deleted(
+        self,
+        user_id: str,
+        namespace: str,
+        old_docs: Dict[str, Optional[Dict[str, Any]]],
+        deleted_ids: List[str],
+    ) -> None:
+        """Buffer the summary change from deleting ``deleted_ids``."""
+        if self._summaries is None:
+            return
+        for doc_id in deleted_ids:
+            doc = old_docs.get(doc_id)
+            if doc:
+                size, stored = _record_sizes(doc)
+                self._summaries.record(user_id, namespace, records=-1, size=-size, stored=-stored)
+
+    def _note_access(self, user_id: str, namespace: str, agent_name: Optional[str]) -> None:
+        if self._summaries is not None and agent_name:
+            self._summaries.record(user_id, namespace, agents=[agent_name])
+
+    def _finish_clear(
+        self,
+        user_id: str,
+        namespace: str,
+        doc_ids: List[str],
+        results: List[Dict[str, Any]],
+    ) -> int:
+        """How many records a clear_namespace deleted; a full clear resets the summary.
+
+        A partial clear leaves the summary to the caller to invalidate,
+        so that it is rebuilt from what is left on next read.
+        """
+        count = _ok_count(results)
+        if self._summaries is not None and count == len(doc_ids):
+            self._summaries.reset(user_id, namespace)
+        return count
+
+    def _partly_cleared(self, doc_ids: List[str], count: int) -> bool:
+        return self._summaries is not None and count < len(doc_ids)
+
+    def _rebuild_target(self, user_id: str) -> NamespaceSummaries:
+        """The summaries a rebuild stores into, with the user's buffered deltas dropped."""
+        summaries = self._summaries or get_namespace_summaries(self.db)
+        summaries.discard(user_id)
+        return summaries
+
+    def _summary_docs(self, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Current records of ``doc_ids``, whose sizes the summary needs.
+
+        Empty when summaries are off, so the write paths stay one round trip.
+        """
+        if self._summaries is None:
+            return {}
+        return self.db.get_many(DATA_STORE_DB, doc_ids)
+
+    async def _asummary_docs(self, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Awaitable :meth:`_summary_docs`."""
+        if self._summaries is None:
+            return {}
+        return await self.db.aget_many(DATA_STORE_DB, doc_ids)
+
+    def _namespace_summary(self, user_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """The user's namespace summary, built on first use; None when summaries are off."""
+        if self._summaries is None:
+            return None
+        summary = self._summaries.read(user_id)
+        return summary if summary is not None else self.rebuild_namespace_summary(user_id)
+
+    async def _anamespace_summary(self, user_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Awaitable :meth:`_namespace_summary`."""
+        if self._summaries is None:
+            return None
+        summary = await self._summaries.aread(user_id)
+        return summary if summary is not None else await self.arebuild_namespace_summary(user_id)
 
     def get(
         self,
@@ -102,12 +714,13 @@ class DataStoreService:
         try:
             doc = self.db.get(DATA_STORE_DB, doc_id)
 
-            if agent_name and doc:
-                doc["lastAccessedByAgent"] = agent_name
-                doc["lastAccessedAt"] = datetime.utcnow().isoformat()
-                doc["accessCount"] = doc.get("accessCount", 0) + 1
+            if _mark_access(doc, agent_name):
                 self.db.save(DATA_STORE_DB, doc_id, doc)
+                self._note_access(user_id, namespace, agent_name)
 
+            if doc and _is_packed(doc):
+                [value] = self._values([doc])
+                return _with_value(doc, value)
             return doc
         except HTTPException as e:
             if e.status_code == 404:
@@ -138,60 +751,47 @@ class DataStoreService:
         rather than retry indefinitely.  That choice is deliberate:
         retrying forever masks bugs that produce contention; one retry
         absorbs the common race.
+
+        With namespace summaries on, the existing record is read first
+        instead: the summary needs its old size, which a 409 doesn't
+        carry.
         """
         doc_id = self._make_doc_id(user_id, namespace, key)
-        now = datetime.utcnow()
+        now_iso = datetime.utcnow().isoformat()
 
         self._ensure_namespace_indexed(user_id, namespace)
-
-        # Build the doc as-if-fresh first.  If the optimistic write
-        # collides, we'll merge into the existing doc on retry.
-        new_doc = {
-            "_id": doc_id,
-            "userId": user_id,
-            "namespace": namespace,
-            "key": key,
-            "value": value,
-            "metadata": metadata or {},
-            "createdByAgent": agent_name,
-            "lastAccessedByAgent": agent_name,
-            "accessCount": 0,
-            "createdAt": now.isoformat(),
-            "updatedAt": now.isoformat(),
-            "lastAccessedAt": now.isoformat() if agent_name else None,
-        }
+        # Compress / offload once, before either save attempt.
+        fields = self._encode(value)
+
+        # Build the doc as-if-fresh first (unless the summary read found
+        # the record).  If the optimistic write collides, we'll merge
+        # into the existing doc on retry.
+        existing = self._summary_docs([doc_id]).get(doc_id)
+        new_doc = self._record_for(
+            doc_id, user_id, namespace, key, value, agent_name, metadata, now_iso, fields, existing
+        )
 
         try:
             saved = self.db.save(DATA_STORE_DB, doc_id, new_doc)
-            new_doc["_rev"] = saved.get("rev")
-            return new_doc
+            return self._finish_write(user_id, namespace, existing, new_doc, saved, value)
         except HTTPException as e:
             if e.status_code != 409:
                 raise
 
         # Conflict: doc exists.  Re-fetch, merge, retry.
         existing = self.db.get(DATA_STORE_DB, doc_id)
-        record_data = {
-            **existing,
-            "value": value,
-            "updatedAt": now.isoformat(),
-        }
-        if metadata:
-            record_data["metadata"] = {**existing.get("metadata", {}), **metadata}
-        if agent_name:
-            record_data["lastAccessedByAgent"] = agent_name
-            record_data["lastAccessedAt"] = now.isoformat()
-
+        record_data = self._merge_record(existing, value, agent_name, metadata, now_iso, fields)
         saved = self.db.save(DATA_STORE_DB, doc_id, record_data)
-        record_data["_rev"] = saved.get("rev")
-        return record_data
+        return self._finish_write(user_id, namespace, existing, record_data, saved, value)
 
     def delete(self, user_id: str, namespace: str, key: str) -> bool:
         """Delete a value from the data store."""
         doc_id = self._make_doc_id(user_id, namespace, key)
+        old_docs = self._summary_docs([doc_id])
 
         try:
             self.db.delete(DATA_STORE_DB, doc_id)
+            self._note_deleted(user_id, namespace, old_docs, [doc_id])
             return True
         except HTTPException as e:
             if e.status_code == 404:
@@ -202,22 +802,226 @@ class DataStoreService:
         self,
         user_id: str,
         namespace: str,
-        prefix: Optional[str] = None
+        prefix: Optional[str] = None,
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
     ) -> List[str]:
-        """List all keys in a namespace.
+        """List keys in a namespace, sorted.
 
-        Uses an indexed query instead of scanning all documents.
+        Uses an indexed query instead of scanning all documents.  The
+        prefix filter is part of the selector, so the backend only
+        returns matching keys.
+
+        With ``start_after`` and/or ``limit`` the listing is a range
+        scan over the ``(keyScope, key)`` index instead: only keys
+        greater than ``start_after`` are read, in key order, and
+        reading stops after ``limit`` of them.  Pass the last key of
+        one call as ``start_after`` to get the next page.
         """
-        docs = self.db.find(
-            DATA_STORE_DB,
-            {"userId": user_id, "namespace": namespace},
-            fields=["key"],
+        if start_after is None and limit is None:
+            docs = self.db.find(
+                DATA_STORE_DB,
+                self._keys_selector(user_id, namespace, prefix),
+                fields=["key"],
+            )
+            return sorted(_keys_of(docs))
+        if limit is not None and limit <= 0:
+            return []
+
+        keys: List[str] = []
+        for page in self._key_range_pages(user_id, namespace, prefix, start_after, _key_page_size(limit), ["key"]):
+            if _take_keys(keys, page, limit):
+                break
+        return keys[:limit]
+
+    def iter_items(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str] = None,
+        page_size: int = 100,
+        agent_name: Optional[str] = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """Yield ``(key, value)`` pairs of a namespace in key order.
+
+        Reads ``page_size`` records per query, resuming each page after
+        the previous page's last key, so only one page is held in
+        memory and the first items arrive after one round trip however
+        large the namespace is.  Access is recorded per page, as in
+        :meth:`get_all`.
+        """
+        for page in self._key_range_pages(user_id, namespace, prefix, None, page_size):
+            self._record_page_access(user_id, namespace, page, agent_name)
+            for doc, value in zip(page, self._values(page)):
+                yield doc.get("key", ""), value
+
+    def _key_range_pages(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str],
+        start_after: Optional[str],
+        page_size: int,
+        fields: Optional[List[str]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Key-ordered pages of a namespace, each one ranged find."""
+        if not self._ensure_key_scope(user_id, namespace):
+            yield from self._unscoped_key_pages(user_id, namespace, prefix, start_after, page_size, fields)
+            return
+        while True:
+            page = self.db.find(
+                DATA_STORE_DB,
+                self._range_selector(user_id, namespace, prefix, start_after),
+                fields=fields,
+                limit=page_size,
+                sort=["key"],
+            )
+            if page:
+                yield page
+            start_after = _next_start(page, page_size)
+            if start_after is None:
+                return
+
+    def _unscoped_key_pages(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str],
+        start_after: Optional[str],
+        page_size: int,
+        fields: Optional[List[str]],
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """:meth:`_key_range_pages` for a namespace not yet stamped with keyScope.
+
+        Without the scope-key index a ranged find would read and sort
+        the whole namespace for every page, so the keys are streamed
+        once through find_iter, sorted, and each page's records fetched
+        by id.
+        """
+        keys = _sorted_keys_after(
+            (doc.get("key", "") for doc in self.db.find_iter(
+                DATA_STORE_DB, self._keys_selector(user_id, namespace, prefix), fields=["key"],
+            )),
+            start_after,
+        )
+        for chunk in _key_chunks(keys, page_size):
+            if fields == ["key"]:
+                yield [{"key": key} for key in chunk]
+                continue
+            doc_ids = [self._make_doc_id(user_id, namespace, key) for key in chunk]
+            found = self.db.get_many(DATA_STORE_DB, doc_ids)
+            page = _found_in_order(doc_ids, found)
+            if page:
+                yield page
+
+    def _ensure_key_scope(self, user_id: str, namespace: str) -> bool:
+        """Whether every record of the namespace carries keyScope.
+
+        Ranged listings select on keyScope, so a record written before
+        it was stored would silently drop out of them.  Checked with two
+        counts, once per namespace per process while it is scoped and
+        every KEY_SCOPE_RECHECK_SECONDS while it isn't.  On a backend
+        that rejects stale writes (CouchDB) unstamped records are
+        stamped here; a record that conflicts is being written
+        concurrently, and that write stamps it.  Elsewhere stamping
+        could overwrite a concurrent write, so the listing streams the
+        namespace without keyScope until
+        ``python -m services.data_store_key_scope_backfill`` has run.
+        """
+        scoped = _cached_key_scope(self._scoped_namespaces, user_id, namespace)
+        if scoped is not None:
+            return scoped
+        selector = self._keys_selector(user_id, namespace, None)
+        unscoped = self.db.count(DATA_STORE_DB, _with_key_scope(selector)) < self.db.count(DATA_STORE_DB, selector)
+        if unscoped and self.db.rejects_stale_writes:
+            self.backfill_key_scope(selector)
+        return self._note_key_scope(user_id, namespace, unscoped)
+
+    def _note_key_scope(self, user_id: str, namespace: str, unscoped: bool) -> bool:
+        """Cache whether ranged listings of the namespace can select on keyScope."""
+        scoped = not unscoped or self.db.rejects_stale_writes
+        if not scoped:
+            _warn_unscoped(user_id, namespace)
+        self._scoped_namespaces[(user_id, namespace)] = (scoped, time.monotonic())
+        return scoped
+
+    def backfill_key_scope(self, selector: Optional[Dict[str, Any]] = None) -> int:
+        """Stamp keyScope on the records matching ``selector`` that lack it.
+
+        Each record is re-read and saved whole, so on a backend that
+        doesn't reject stale writes a write racing this can be lost; run
+        it from services/data_store_key_scope_backfill.py with writers
+        stopped there.  Cached keyScope verdicts the backfill may have
+        changed are dropped.  Returns the number of records stamped.
+        """
+        missing = [
+            doc["_id"]
+            for doc in self.db.find_iter(DATA_STORE_DB, selector or {}, fields=_KEY_SCOPE_FIELDS)
+            if _lacks_key_scope(doc)
+        ]
+        stamped = 0
+        for batch in _key_scope_batches(missing):
+            docs = self.db.get_many(DATA_STORE_DB, batch)
+            stamped += _ok_count(self.db.save_many(DATA_STORE_DB, _stamped(docs)))
+        _forget_key_scope(self._scoped_namespaces, selector or {})
+        return stamped
+
+    @staticmethod
+    def _keys_selector(user_id: str, namespace: str, prefix: Optional[str]) -> Dict[str, Any]:
+        selector: Dict[str, Any] = {"userId": user_id, "namespace": namespace}
+        if prefix:
+            selector["key"] = {"$prefix": prefix}
+        return selector
+
+    @staticmethod
+    def _range_selector(
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str],
+        start_after: Optional[str],
+    ) -> Dict[str, Any]:
+        # userId and namespace stay in the selector: keyScope alone is
+        # ambiguous when either contains ":", and userId routes the
+        # query to its partition on a partitioned CouchDB.
+        selector = _with_key_scope({"userId": user_id, "namespace": namespace})
+        key: Dict[str, Any] = {}
+        if prefix:
+            key["$prefix"] = prefix
+        # Every key with the prefix sorts after a start_after below it.
+        if start_after is not None and not (prefix and start_after < prefix):
+            key["$gt"] = start_after
+        if key:
+            selector["key"] = key
+        return selector
+
+    def _record_page_access(
+        self,
+        user_id: str,
+        namespace: str,
+        docs: List[Dict[str, Any]],
+        agent_name: Optional[str],
+    ) -> None:
+        if not agent_name or not docs:
+            return
+        self._note_access(user_id, namespace, agent_name)
+        self._access_accumulator.ensure_started()
+        self._access_accumulator.record_many(
+            [doc.get("_id") or self._make_doc_id(user_id, namespace, doc.get("key", "")) for doc in docs],
+            agent_name,
         )
 
-        keys = [doc.get("key", "") for doc in docs]
-        if prefix is not None:
-            keys = [k for k in keys if k.startswith(prefix)]
-        return sorted(keys)
+    def _finish_read(
+        self,
+        user_id: str,
+        namespace: str,
+        keys: List[str],
+        docs: List[Dict[str, Any]],
+        values: List[Any],
+        agent_name: Optional[str],
+    ) -> Dict[str, Any]:
+        """``{key: value}`` for the records read, with the agent's access recorded."""
+        self._record_page_access(user_id, namespace, docs, agent_name)
+        return dict(zip(keys, values))
 
     def list_namespaces(self, user_id: str) -> List[str]:
         """List all namespaces for a user.
@@ -225,15 +1029,18 @@ class DataStoreService:
         Uses an indexed query instead of scanning all documents.
         Returns a sorted list of all unique namespace names that contain
         data for the specified user. Useful for discovering what data
-        exists before querying specific namespaces.
+        exists before querying specific namespaces.  With namespace
+        summaries on, this is one read of the user's summary instead.
         """
+        summary = self._namespace_summary(user_id)
+        if summary is not None:
+            return sorted(summary)
         docs = self.db.find(
             DATA_STORE_DB,
             {"userId": user_id},
             fields=["namespace"],
         )
-        namespaces = {doc.get("namespace") or "default" for doc in docs}
-        return sorted(namespaces)
+        return _namespace_names(docs)
 
     def get_all(
         self,
@@ -254,21 +1061,7 @@ class DataStoreService:
             DATA_STORE_DB,
             {"userId": user_id, "namespace": namespace},
         )
-
-        results = {}
-        accessed_ids: List[str] = []
-        for doc in docs:
-            key = doc.get("key", "")
-            results[key] = doc.get("value")
-            if agent_name:
-                doc_id = doc.get("_id") or self._make_doc_id(user_id, namespace, key)
-                accessed_ids.append(doc_id)
-
-        if accessed_ids:
-            self._access_accumulator.ensure_started()
-            self._access_accumulator.record_many(accessed_ids, agent_name)
-
-        return results
+        return self._finish_read(user_id, namespace, _keys_of(docs), docs, self._values(docs), agent_name)
 
     def get_many(
         self,
@@ -290,8 +1083,20 @@ class DataStoreService:
         doc_ids = [self._make_doc_id(user_id, namespace, k) for k in keys]
         docs = self.db.get_many(DATA_STORE_DB, doc_ids)
 
-        results: Dict[str, Any] = {}
-        accessed_ids: List[str] = []
+        found_keys, found = self._owned_docs(user_id, namespace, keys, doc_ids, docs)
+        return self._finish_read(user_id, namespace, found_keys, found, self._values(found), agent_name)
+
+    @staticmethod
+    def _owned_docs(
+        user_id: str,
+        namespace: str,
+        keys: List[str],
+        doc_ids: List[str],
+        docs: Dict[str, Optional[Dict[str, Any]]],
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """The keys in ``keys`` that were fetched, and their records."""
+        found_keys: List[str] = []
+        found: List[Dict[str, Any]] = []
         for key, doc_id in zip(keys, doc_ids):
             doc = docs.get(doc_id)
             if doc is None:
@@ -299,15 +1104,9 @@ class DataStoreService:
             # Defensive: ensure the doc still belongs to this user/namespace.
             if doc.get("userId") != user_id or doc.get("namespace") != namespace:
                 continue
-            results[key] = doc.get("value")
-            if agent_name:
-                accessed_ids.append(doc_id)
-
-        if accessed_ids:
-            self._access_accumulator.ensure_started()
-            self._access_accumulator.record_many(accessed_ids, agent_name)
-
-        return results
+            found_keys.append(key)
+            found.append(doc)
+        return found_keys, found
 
     def set_many(
         self,
@@ -332,91 +1131,610 @@ class DataStoreService:
         """
         if not items:
             return 0
+        return len(items) - len(self.save_items(user_id, items, agent_name))
+
+    def save_items(
+        self,
+        user_id: str,
+        items: List[Tuple[str, str, Any, Optional[Dict[str, Any]]]],
+        agent_name: Optional[str],
+    ) -> List[Tuple[str, str]]:
+        """:meth:`set_many` that reports which items were not saved.
 
+        Returns the ``(namespace, key)`` pairs that failed, so a caller
+        such as a write buffer can say exactly what was lost.
+        """
         # Prep: one ensure-index per unique namespace, doc_id list.
-        unique_namespaces = {ns for ns, _, _, _ in items}
-        for ns in unique_namespaces:
+        for ns in {ns for ns, _, _, _ in items}:
             self._ensure_namespace_indexed(user_id, ns)
 
         doc_ids = [self._make_doc_id(user_id, ns, key) for ns, key, _, _ in items]
 
         # One bulk fetch for any existing docs.
         existing_map = self.db.get_many(DATA_STORE_DB, doc_ids)
+        encoded = self._encode_many([value for _, _, value, _ in items])
+        new_docs, item_by_id = self._bulk_records(user_id, items, doc_ids, existing_map, agent_name, encoded)
 
+        results = self.db.save_many(DATA_STORE_DB, new_docs)
+        self._note_saved(user_id, new_docs, existing_map, results)
+
+        # Retry losers via set() (has conflict retry).
+        failed: List[Tuple[str, str]] = []
+        for ns, key, value, metadata in _retry_items(results, item_by_id):
+            try:
+                self.set(user_id, ns, key, value, agent_name, metadata)
+            except Exception:
+                # Best-effort; caller can retry the whole batch.
+                failed.append((ns, key))
+
+        return failed
+
+    def _bulk_records(
+        self,
+        user_id: str,
+        items: List[Tuple[str, str, Any, Optional[Dict[str, Any]]]],
+        doc_ids: List[str],
+        existing_map: Dict[str, Optional[Dict[str, Any]]],
+        agent_name: Optional[str],
+        encoded: List[Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Tuple[str, str, Any, Optional[Dict[str, Any]]]]]:
+        """Records to save for ``items``, and each doc_id's item (for retries).
+
+        ``encoded`` holds each item's value fields from :meth:`_encode_many`.
+        """
         now_iso = datetime.utcnow().isoformat()
         new_docs: List[Dict[str, Any]] = []
         # Index from doc_id back to the items tuple so we can retry
         # the losers individually after the bulk save.
         item_by_id: Dict[str, Tuple[str, str, Any, Optional[Dict[str, Any]]]] = {}
 
-        for (ns, key, value, metadata), doc_id in zip(items, doc_ids):
-            existing = existing_map.get(doc_id)
-            if existing:
-                doc = {
-                    **existing,
-                    "value": value,
-                    "updatedAt": now_iso,
-                }
-                if metadata:
-                    doc["metadata"] = {**existing.get("metadata", {}), **metadata}
-                if agent_name:
-                    doc["lastAccessedByAgent"] = agent_name
-                    doc["lastAccessedAt"] = now_iso
-            else:
-                doc = {
-                    "_id": doc_id,
-                    "userId": user_id,
-                    "namespace": ns,
-                    "key": key,
-                    "value": value,
-                    "metadata": metadata or {},
-                    "createdByAgent": agent_name,
-                    "lastAccessedByAgent": agent_name,
-                    "accessCount": 0,
-                    "createdAt": now_iso,
-                    "updatedAt": now_iso,
-                    "lastAccessedAt": now_iso if agent_name else None,
-                }
-            new_docs.append(doc)
+        for (ns, key, value, metadata), doc_id, fields in zip(items, doc_ids, encoded):
+            new_docs.append(self._record_for(
+                doc_id, user_id, ns, key, value, agent_name, metadata, now_iso, fields,
+                existing_map.get(doc_id),
+            ))
             item_by_id[doc_id] = (ns, key, value, metadata)
+        return new_docs, item_by_id
 
-        results = self.db.save_many(DATA_STORE_DB, new_docs)
-
-        # Count successes, retry losers via set() (has conflict retry).
-        count = 0
-        for r in results:
-            if r.get("ok"):
-                count += 1
-                continue
-            # Retry — ResourceConflict is the expected reason; other
-            # errors (network etc.) are still worth one retry too.
-            doc_id = r.get("id")
-            tup = item_by_id.get(doc_id)
-            if tup is None:
-                continue
-            ns, key, value, metadata = tup
-            try:
-                self.set(user_id, ns, key, value, agent_name, metadata)
-                count += 1
-            except Exception:
-                pass  # Best-effort; caller can retry the whole batch.
-
-        return count
-
-    def clear_namespace(self, user_id: str, namespace: str) -> int:
-        """Delete all records in a namespace via one bulk call.
+    def delete_many(self, user_id: str, namespace: str, keys: List[str]) -> int:
+        """Delete several keys via one bulk call; returns how many are gone.
 
-        Old shape: list_keys() + N delete() calls = N+1 round trips.
-        New shape: list_keys() + one delete_many() = 2 round trips
-        (or 3 because delete_many internally does a get_many to fetch
-        _revs, but that's still O(1) regardless of N).
+        Keys that don't exist count as deleted, as in
+        DatabaseService.delete_many.
         """
-        keys = self.list_keys(user_id, namespace)
         if not keys:
             return 0
+        return len(keys) - len(self.delete_keys(user_id, namespace, keys))
+
+    def delete_keys(self, user_id: str, namespace: str, keys: List[str]) -> List[str]:
+        """:meth:`delete_many` that returns the keys not deleted."""
         doc_ids = [self._make_doc_id(user_id, namespace, k) for k in keys]
+        old_docs = self._summary_docs(doc_ids)
         results = self.db.delete_many(DATA_STORE_DB, doc_ids)
-        return sum(1 for r in results if r.get("ok"))
+        self._note_deleted(user_id, namespace, old_docs, _ok_ids(results))
+        return _failed_keys(doc_ids, keys, results)
+
+    @staticmethod
+    def _stats_selector(user_id: str, namespace: Optional[str]) -> Dict[str, Any]:
+        selector: Dict[str, Any] = {"userId": user_id}
+        if namespace is not None:
+            selector["namespace"] = namespace
+        return selector
+
+    def namespace_stats(
+        self,
+        user_id: str,
+        namespace: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Per-namespace stats for a user (or just ``namespace``).
+
+        Returns ``{namespace: {recordCount, sizeBytes, storedBytes,
+        agents, updatedAt}}``.  Agents are the deduped union of
+        createdByAgent and lastAccessedByAgent; sizeBytes sums the
+        valueSize stored with each record (the JSON size of its value)
+        and storedBytes the size values are stored at, i.e. after
+        compression.
+
+        With namespace summaries on, the stats are read from the user's
+        summary document.  Otherwise, on backends that aggregate
+        server-side, they come from two DatabaseService.aggregate calls,
+        so values never leave the database.  Other backends, and scopes
+        still holding records written before valueSize was stored, are
+        summed in one streaming pass over the records without their
+        values; only those legacy records are re-read whole.
+        """
+        summary = self._namespace_summary(user_id)
+        if summary is not None:
+            return _summary_stats(summary, namespace)
+        return self._aggregate_stats(user_id, namespace)
+
+    def _aggregate_stats(
+        self,
+        user_id: str,
+        namespace: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """:meth:`namespace_stats` computed from the records.
+
+        Two aggregates where the backend runs them server-side, else
+        (or while legacy records remain) one streaming pass.
+        """
+        selector = self._stats_selector(user_id, namespace)
+        if self.db.native_aggregate:
+            totals = self.db.aggregate(DATA_STORE_DB, selector, **_TOTALS_QUERY)
+            if _sized(totals):
+                agents = self.db.aggregate(DATA_STORE_DB, selector, group_by=_AGENTS_GROUP)
+                return _stats_from_aggregates(totals, agents)
+        stats: Dict[str, Dict[str, Any]] = {}
+        legacy = [
+            doc["_id"]
+            for doc in self.db.find_iter(DATA_STORE_DB, selector, fields=_STATS_FIELDS)
+            if not _fold_record_stats(stats, doc)
+        ]
+        return _finish_streamed_stats(stats, self.db.get_many(DATA_STORE_DB, legacy) if legacy else {})
+
+    def clear_namespace(self, user_id: str, namespace: str) -> int:
+        """Delete all records in a namespace via one bulk call.
+
+        Old shape: list_keys() + N delete() calls = N+1 round trips.
+        New shape: list_keys() + one delete_many() = 2 round trips
+        (or 3 because delete_many internally does a get_many to fetch
+        _revs, but that's still O(1) regardless of N).
+        """
+        keys = self.list_keys(user_id, namespace)
+        if not keys:
+            return 0
+        doc_ids = [self._make_doc_id(user_id, namespace, k) for k in keys]
+        count = self._finish_clear(user_id, namespace, doc_ids, self.db.delete_many(DATA_STORE_DB, doc_ids))
+        if self._partly_cleared(doc_ids, count):
+            self._summaries.invalidate(user_id)
+        return count
+
+    def rebuild_namespace_summary(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Recompute a user's namespace summary from their records and store it.
+
+        Deltas still buffered for the user are dropped: the records
+        already hold those writes.  Works whether or not summaries are
+        on, so a summary can be built ahead of turning them on.
+        Returns the new summary.
+        """
+        summaries = self._rebuild_target(user_id)
+        stats = self._aggregate_stats(user_id)
+        summaries.store(user_id, stats)
+        return stats
+
+
+    # ------------------------------------------------------------------
+    # Async API.  Same semantics as the sync methods above, but every
+    # backend round trip goes through the DatabaseService a* methods so
+    # callers on the event loop (route handlers, async agent code)
+    # never block it.
+    # ------------------------------------------------------------------
+
+    async def _aensure_namespace_indexed(self, user_id: str, namespace: str) -> None:
+        cache_key = (user_id, namespace)
+        if cache_key in self._indexed_namespaces:
+            return
+        for fields, name in _STANDARD_INDEXES:
+            try:
+                await self.db.aensure_index(DATA_STORE_DB, fields, index_name=name)
+            except Exception:
+                pass
+        self._indexed_namespaces.add(cache_key)
+
+    async def aget(
+        self,
+        user_id: str,
+        namespace: str,
+        key: str,
+        agent_name: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Awaitable :meth:`get`."""
+        doc_id = self._make_doc_id(user_id, namespace, key)
+
+        try:
+            doc = await self.db.aget(DATA_STORE_DB, doc_id)
+
+            if _mark_access(doc, agent_name):
+                await self.db.asave(DATA_STORE_DB, doc_id, doc)
+                self._note_access(user_id, namespace, agent_name)
+
+            if doc and _is_packed(doc):
+                [value] = await self._avalues([doc])
+                return _with_value(doc, value)
+            return doc
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    async def aset(
+        self,
+        user_id: str,
+        namespace: str,
+        key: str,
+        value: Any,
+        agent_name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Awaitable :meth:`set` (same optimistic write + one retry)."""
+        doc_id = self._make_doc_id(user_id, namespace, key)
+        now_iso = datetime.utcnow().isoformat()
+
+        await self._aensure_namespace_indexed(user_id, namespace)
+        fields = await self._aencode(value)
+
+        existing = (await self._asummary_docs([doc_id])).get(doc_id)
+        new_doc = self._record_for(
+            doc_id, user_id, namespace, key, value, agent_name, metadata, now_iso, fields, existing
+        )
+
+        try:
+            saved = await self.db.asave(DATA_STORE_DB, doc_id, new_doc)
+            return self._finish_write(user_id, namespace, existing, new_doc, saved, value)
+        except HTTPException as e:
+            if e.status_code != 409:
+                raise
+
+        existing = await self.db.aget(DATA_STORE_DB, doc_id)
+        record_data = self._merge_record(existing, value, agent_name, metadata, now_iso, fields)
+        saved = await self.db.asave(DATA_STORE_DB, doc_id, record_data)
+        return self._finish_write(user_id, namespace, existing, record_data, saved, value)
+
+    async def adelete(self, user_id: str, namespace: str, key: str) -> bool:
+        """Awaitable :meth:`delete`."""
+        doc_id = self._make_doc_id(user_id, namespace, key)
+        old_docs = await self._asummary_docs([doc_id])
+
+        try:
+            await self.db.adelete(DATA_STORE_DB, doc_id)
+            self._note_deleted(user_id, namespace, old_docs, [doc_id])
+            return True
+        except HTTPException as e:
+            if e.status_code == 404:
+                return False
+            raise
+
+    async def alist_keys(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str] = None,
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """Awaitable :meth:`list_keys`."""
+        if start_after is None and limit is None:
+            docs = await self.db.afind(
+                DATA_STORE_DB,
+                self._keys_selector(user_id, namespace, prefix),
+                fields=["key"],
+            )
+            return sorted(_keys_of(docs))
+        if limit is not None and limit <= 0:
+            return []
+
+        keys: List[str] = []
+        async for page in self._akey_range_pages(
+            user_id, namespace, prefix, start_after, _key_page_size(limit), ["key"]
+        ):
+            if _take_keys(keys, page, limit):
+                break
+        return keys[:limit]
+
+    async def aiter_items(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str] = None,
+        page_size: int = 100,
+        agent_name: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Async-iterator :meth:`iter_items`."""
+        async for page in self._akey_range_pages(user_id, namespace, prefix, None, page_size):
+            self._record_page_access(user_id, namespace, page, agent_name)
+            for doc, value in zip(page, await self._avalues(page)):
+                yield doc.get("key", ""), value
+
+    async def _akey_range_pages(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str],
+        start_after: Optional[str],
+        page_size: int,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        if not await self._aensure_key_scope(user_id, namespace):
+            async for page in self._aunscoped_key_pages(user_id, namespace, prefix, start_after, page_size, fields):
+                yield page
+            return
+        while True:
+            page = await self.db.afind(
+                DATA_STORE_DB,
+                self._range_selector(user_id, namespace, prefix, start_after),
+                fields=fields,
+                limit=page_size,
+                sort=["key"],
+            )
+            if page:
+                yield page
+            start_after = _next_start(page, page_size)
+            if start_after is None:
+                return
+
+    async def _aunscoped_key_pages(
+        self,
+        user_id: str,
+        namespace: str,
+        prefix: Optional[str],
+        start_after: Optional[str],
+        page_size: int,
+        fields: Optional[List[str]],
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Awaitable :meth:`_unscoped_key_pages`."""
+        keys = _sorted_keys_after(
+            [doc.get("key", "") async for doc in self.db.afind_iter(
+                DATA_STORE_DB, self._keys_selector(user_id, namespace, prefix), fields=["key"],
+            )],
+            start_after,
+        )
+        for chunk in _key_chunks(keys, page_size):
+            if fields == ["key"]:
+                yield [{"key": key} for key in chunk]
+                continue
+            doc_ids = [self._make_doc_id(user_id, namespace, key) for key in chunk]
+            found = await self.db.aget_many(DATA_STORE_DB, doc_ids)
+            page = _found_in_order(doc_ids, found)
+            if page:
+                yield page
+
+    async def _aensure_key_scope(self, user_id: str, namespace: str) -> bool:
+        """Awaitable :meth:`_ensure_key_scope`."""
+        scoped = _cached_key_scope(self._scoped_namespaces, user_id, namespace)
+        if scoped is not None:
+            return scoped
+        selector = self._keys_selector(user_id, namespace, None)
+        unscoped = await self.db.acount(DATA_STORE_DB, _with_key_scope(selector)) < await self.db.acount(
+            DATA_STORE_DB, selector
+        )
+        if unscoped and self.db.rejects_stale_writes:
+            await self.abackfill_key_scope(selector)
+        return self._note_key_scope(user_id, namespace, unscoped)
+
+    async def abackfill_key_scope(self, selector: Optional[Dict[str, Any]] = None) -> int:
+        """Awaitable :meth:`backfill_key_scope`."""
+        missing = [
+            doc["_id"]
+            async for doc in self.db.afind_iter(DATA_STORE_DB, selector or {}, fields=_KEY_SCOPE_FIELDS)
+            if _lacks_key_scope(doc)
+        ]
+        stamped = 0
+        for batch in _key_scope_batches(missing):
+            docs = await self.db.aget_many(DATA_STORE_DB, batch)
+            stamped += _ok_count(await self.db.asave_many(DATA_STORE_DB, _stamped(docs)))
+        _forget_key_scope(self._scoped_namespaces, selector or {})
+        return stamped
+
+    async def alist_namespaces(self, user_id: str) -> List[str]:
+        """Awaitable :meth:`list_namespaces`."""
+        summary = await self._anamespace_summary(user_id)
+        if summary is not None:
+            return sorted(summary)
+        docs = await self.db.afind(
+            DATA_STORE_DB,
+            {"userId": user_id},
+            fields=["namespace"],
+        )
+        return _namespace_names(docs)
+
+    async def aget_all(
+        self,
+        user_id: str,
+        namespace: str,
+        agent_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Awaitable :meth:`get_all`."""
+        docs = await self.db.afind(
+            DATA_STORE_DB,
+            {"userId": user_id, "namespace": namespace},
+        )
+        return self._finish_read(user_id, namespace, _keys_of(docs), docs, await self._avalues(docs), agent_name)
+
+    async def aget_many(
+        self,
+        user_id: str,
+        namespace: str,
+        keys: List[str],
+        agent_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Awaitable :meth:`get_many`."""
+        if not keys:
+            return {}
+
+        doc_ids = [self._make_doc_id(user_id, namespace, k) for k in keys]
+        docs = await self.db.aget_many(DATA_STORE_DB, doc_ids)
+
+        found_keys, found = self._owned_docs(user_id, namespace, keys, doc_ids, docs)
+        return self._finish_read(user_id, namespace, found_keys, found, await self._avalues(found), agent_name)
+
+    async def aset_many(
+        self,
+        user_id: str,
+        items: List[Tuple[str, str, Any, Optional[Dict[str, Any]]]],
+        agent_name: Optional[str] = None
+    ) -> int:
+        """Awaitable :meth:`set_many`."""
+        if not items:
+            return 0
+        return len(items) - len(await self.asave_items(user_id, items, agent_name))
+
+    async def asave_items(
+        self,
+        user_id: str,
+        items: List[Tuple[str, str, Any, Optional[Dict[str, Any]]]],
+        agent_name: Optional[str],
+    ) -> List[Tuple[str, str]]:
+        """Awaitable :meth:`save_items`."""
+        for ns in {ns for ns, _, _, _ in items}:
+            await self._aensure_namespace_indexed(user_id, ns)
+
+        doc_ids = [self._make_doc_id(user_id, ns, key) for ns, key, _, _ in items]
+        existing_map = await self.db.aget_many(DATA_STORE_DB, doc_ids)
+        encoded = await self._aencode_many([value for _, _, value, _ in items])
+        new_docs, item_by_id = self._bulk_records(user_id, items, doc_ids, existing_map, agent_name, encoded)
+        results = await self.db.asave_many(DATA_STORE_DB, new_docs)
+        self._note_saved(user_id, new_docs, existing_map, results)
+
+        failed: List[Tuple[str, str]] = []
+        for ns, key, value, metadata in _retry_items(results, item_by_id):
+            try:
+                await self.aset(user_id, ns, key, value, agent_name, metadata)
+            except Exception:
+                failed.append((ns, key))
+        return failed
+
+    async def adelete_many(self, user_id: str, namespace: str, keys: List[str]) -> int:
+        """Awaitable :meth:`delete_many`."""
+        if not keys:
+            return 0
+        return len(keys) - len(await self.adelete_keys(user_id, namespace, keys))
+
+    async def adelete_keys(self, user_id: str, namespace: str, keys: List[str]) -> List[str]:
+        """Awaitable :meth:`delete_keys`."""
+        doc_ids = [self._make_doc_id(user_id, namespace, k) for k in keys]
+        old_docs = await self._asummary_docs(doc_ids)
+        results = await self.db.adelete_many(DATA_STORE_DB, doc_ids)
+        self._note_deleted(user_id, namespace, old_docs, _ok_ids(results))
+        return _failed_keys(doc_ids, keys, results)
+
+    async def anamespace_stats(
+        self,
+        user_id: str,
+        namespace: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Awaitable :meth:`namespace_stats`."""
+        summary = await self._anamespace_summary(user_id)
+        if summary is not None:
+            return _summary_stats(summary, namespace)
+        return await self._aaggregate_stats(user_id, namespace)
+
+    async def _aaggregate_stats(
+        self,
+        user_id: str,
+        namespace: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Awaitable :meth:`_aggregate_stats`."""
+        selector = self._stats_selector(user_id, namespace)
+        if self.db.native_aggregate:
+            totals = await self.db.aaggregate(DATA_STORE_DB, selector, **_TOTALS_QUERY)
+            if _sized(totals):
+                agents = await self.db.aaggregate(DATA_STORE_DB, selector, group_by=_AGENTS_GROUP)
+                return _stats_from_aggregates(totals, agents)
+        stats: Dict[str, Dict[str, Any]] = {}
+        legacy = [
+            doc["_id"]
+            async for doc in self.db.afind_iter(DATA_STORE_DB, selector, fields=_STATS_FIELDS)
+            if not _fold_record_stats(stats, doc)
+        ]
+        return _finish_streamed_stats(stats, await self.db.aget_many(DATA_STORE_DB, legacy) if legacy else {})
+
+    async def aclear_namespace(self, user_id: str, namespace: str) -> int:
+        """Awaitable :meth:`clear_namespace`."""
+        keys = await self.alist_keys(user_id, namespace)
+        if not keys:
+            return 0
+        doc_ids = [self._make_doc_id(user_id, namespace, k) for k in keys]
+        count = self._finish_clear(user_id, namespace, doc_ids, await self.db.adelete_many(DATA_STORE_DB, doc_ids))
+        if self._partly_cleared(doc_ids, count):
+            await self._summaries.ainvalidate(user_id)
+        return count
+
+    async def arebuild_namespace_summary(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Awaitable :meth:`rebuild_namespace_summary`."""
+        summaries = self._rebuild_target(user_id)
+        stats = await self._aaggregate_stats(user_id)
+        await summaries.astore(user_id, stats)
+        return stats
+
+
+class DataStoreBatchError(Exception):
+    """Buffered writes that could not be flushed.
+
+    ``failed`` lists their ``(namespace, key)`` pairs; every other write
+    in the flush was saved.
+    """
+
+    def __init__(self, failed: List[Tuple[str, str]]):
+        self.failed = failed
+        preview = ", ".join(f"{ns}/{key}" for ns, key in failed[:5])
+        more = f" (+{len(failed) - 5} more)" if len(failed) > 5 else ""
+        super().__init__(f"{len(failed)} buffered data store write(s) failed: {preview}{more}")
+
+
+class WriteBuffer:
+    """Pending ``set``/``delete`` calls of one agent run, latest per key.
+
+    Shared by a proxy and its ``use_namespace`` copies.  Only buffers
+    while ``enabled``; AgentDataStoreProxy decides when to flush.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.max_ops = BATCH_MAX_OPS
+        self.max_seconds = BATCH_MAX_SECONDS
+        # (namespace, key) -> ("set", value, metadata) | ("delete", None, None)
+        self._ops: Dict[Tuple[str, str], Tuple[str, Any, Optional[Dict[str, Any]]]] = {}
+        self._oldest: Optional[float] = None
+        # Writes drained by a flush that hasn't finished; they still
+        # count as pending until it has.
+        self._flushing: Dict[Tuple[str, str], Tuple[str, Any, Optional[Dict[str, Any]]]] = {}
+        # Held by an async flush for its whole round trip, so a read
+        # that waits on pending writes waits for the one in flight.
+        self.flush_lock = asyncio.Lock()
+
+    def add(
+        self,
+        namespace: str,
+        key: str,
+        op: str,
+        value: Any = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if not self._ops:
+            self._oldest = time.monotonic()
+        previous = self._ops.pop((namespace, key), None)
+        if op == "set" and previous and previous[0] == "set" and previous[2]:
+            # Two buffered sets merge their metadata, as two saves would.
+            metadata = {**previous[2], **(metadata or {})}
+        # Copy now: the agent may keep mutating the value it passed in.
+        self._ops[(namespace, key)] = (op, copy.deepcopy(value), metadata)
+
+    def due(self) -> bool:
+        return bool(self._ops) and (
+            len(self._ops) >= self.max_ops
+            or time.monotonic() - self._oldest >= self.max_seconds
+        )
+
+    def holds(self, namespace: str, keys: Optional[List[str]] = None) -> bool:
+        """Whether writes to ``keys`` (None: any key) of ``namespace`` are pending or being flushed."""
+        pending = (self._ops, self._flushing)
+        if keys is None:
+            return any(ns == namespace for ops in pending for ns, _ in ops)
+        return any((namespace, key) in ops for ops in pending for key in keys)
+
+    def drain(self) -> Dict[Tuple[str, str], Tuple[str, Any, Optional[Dict[str, Any]]]]:
+        """Take the pending writes; they stay visible to ``holds`` until :meth:`landed`."""
+        ops, self._ops, self._oldest = self._ops, {}, None
+        self._flushing.update(ops)
+        return ops
+
+    def landed(self, ops: Dict[Tuple[str, str], Tuple[str, Any, Optional[Dict[str, Any]]]]) -> None:
+        """Drop drained ``ops`` once their flush has finished, saved or not."""
+        for op_key in ops:
+            self._flushing.pop(op_key, None)
+
+    def __len__(self) -> int:
+        return len(self._ops)
 
 
 class AgentDataStoreProxy:
@@ -429,6 +1747,16 @@ class AgentDataStoreProxy:
     is shared across the root proxy and any namespace-scoped copies returned
     by ``use_namespace`` — so ``data_store.use_namespace("x").set(...)`` and
     ``data_store.set(...)`` both land in the same list.
+
+    A ``run_cache`` (see services/data_store_cache.py) is shared the same
+    way: reads it can answer never reach the service, and are logged
+    with ``cached=True``.
+
+    So is the ``write_buffer`` behind batching mode (``batch()`` /
+    ``enable_batching()``): ``set``/``delete`` calls are held and sent
+    through the bulk ``set_many``/``delete_many`` paths when enough are
+    pending or the oldest is old enough, before any read of a pending
+    key, and at the end of the run.
     """
 
     # Cap value previews so the ops log doesn't bloat on large records.
@@ -442,6 +1770,8 @@ class AgentDataStoreProxy:
         agent_name: str,
         default_namespace: str = "default",
         ops_log: Optional[List[Dict[str, Any]]] = None,
+        run_cache: Optional[DataStoreRunCache] = None,
+        write_buffer: Optional[WriteBuffer] = None,
     ):
         self._service = service
         self._user_id = user_id
@@ -450,6 +1780,8 @@ class AgentDataStoreProxy:
         # Shared ops log (may be None when running outside the sandbox, e.g.
         # via the deployed-agent path where we don't surface ops to a UI).
         self._ops_log = ops_log
+        self._run_cache = run_cache
+        self._writes = write_buffer if write_buffer is not None else WriteBuffer()
 
     def _preview(self, value: Any) -> Any:
         """Make a compact display-safe preview of a stored value."""
@@ -464,6 +1796,13 @@ class AgentDataStoreProxy:
         return s
 
     def _log(self, op: str, **fields) -> None:
+        trace = get_current_trace()
+        if trace is not None:
+            trace.data_store(
+                op, self._namespace,
+                key=fields.get("key"), found=fields.get("found"),
+                count=fields.get("count"), cached=fields.get("cached"),
+            )
         if self._ops_log is None:
             return
         entry = {
@@ -487,48 +1826,387 @@ class AgentDataStoreProxy:
             self._agent_name,
             namespace,
             ops_log=self._ops_log,
+            run_cache=self._run_cache,
+            write_buffer=self._writes,
+        )
+
+    def enable_batching(self, max_ops: int = BATCH_MAX_OPS, max_seconds: float = BATCH_MAX_SECONDS) -> None:
+        """Buffer set()/delete() calls for the rest of the run.
+
+        Pending writes are flushed in bulk once ``max_ops`` are pending
+        or the oldest is ``max_seconds`` old (checked on each write),
+        before a read that could see them, on flush(), and when the run
+        ends.  A flush that can't save some writes raises
+        DataStoreBatchError from whichever call triggered it.
+        """
+        self._writes.enabled = True
+        self._writes.max_ops = max_ops
+        self._writes.max_seconds = max_seconds
+
+    @contextlib.contextmanager
+    def batch(self, max_ops: int = BATCH_MAX_OPS, max_seconds: float = BATCH_MAX_SECONDS):
+        """Batch writes inside a ``with`` block; everything is flushed on exit.
+
+        If the block raises, writes issued before the error are still
+        flushed, as they would have landed without batching, and the
+        block's exception is the one re-raised; a failed flush is only
+        logged then.
+
+        Example:
+            with data_store.batch():
+                for path, summary in summaries.items():
+                    data_store.set(path, summary)  # one bulk write per 500
+        """
+        was_enabled = self._writes.enabled
+        if not was_enabled:
+            self.enable_batching(max_ops, max_seconds)
+        try:
+            yield self
+        except BaseException:
+            if not was_enabled:
+                self._writes.enabled = False
+            try:
+                self.flush()
+            except Exception as flush_exc:
+                print(f"Warning: could not flush buffered data store writes: {flush_exc}")
+            raise
+        if not was_enabled:
+            self._writes.enabled = False
+        self.flush()
+
+    @contextlib.asynccontextmanager
+    async def abatch(self, max_ops: int = BATCH_MAX_OPS, max_seconds: float = BATCH_MAX_SECONDS):
+        """:meth:`batch` for ``async with``; flushes with :meth:`aflush`."""
+        was_enabled = self._writes.enabled
+        if not was_enabled:
+            self.enable_batching(max_ops, max_seconds)
+        try:
+            yield self
+        except BaseException:
+            if not was_enabled:
+                self._writes.enabled = False
+            try:
+                await self.aflush()
+            except Exception as flush_exc:
+                print(f"Warning: could not flush buffered data store writes: {flush_exc}")
+            raise
+        if not was_enabled:
+            self._writes.enabled = False
+        await self.aflush()
+
+    def flush(self) -> int:
+        """Write every buffered set()/delete() now; returns how many were saved.
+
+        Raises DataStoreBatchError naming the writes that failed.
+        """
+        ops = self._writes.drain()
+        if not ops:
+            return 0
+        sets, deletes = self._flush_plan(ops)
+        failed: List[Tuple[str, str]] = []
+        try:
+            if sets:
+                try:
+                    failed.extend(self._service.save_items(self._user_id, sets, self._agent_name))
+                except Exception:
+                    failed.extend((ns, key) for ns, key, _, _ in sets)
+            for ns, keys in deletes.items():
+                try:
+                    failed.extend((ns, key) for key in self._service.delete_keys(self._user_id, ns, keys))
+                except Exception:
+                    failed.extend((ns, key) for key in keys)
+        finally:
+            self._writes.landed(ops)
+        return self._finish_flush(ops, failed)
+
+    async def aflush(self) -> int:
+        """Awaitable :meth:`flush`.
+
+        Async flushes run one at a time.  A write being flushed still
+        counts as pending, so an ``aget`` of it from another coroutine
+        flushes too, which waits for the flush in flight instead of
+        reading the value stored before it.
+        """
+        async with self._writes.flush_lock:
+            ops = self._writes.drain()
+            if not ops:
+                return 0
+            sets, deletes = self._flush_plan(ops)
+            failed: List[Tuple[str, str]] = []
+            try:
+                if sets:
+                    try:
+                        failed.extend(await self._service.asave_items(self._user_id, sets, self._agent_name))
+                    except Exception:
+                        failed.extend((ns, key) for ns, key, _, _ in sets)
+                for ns, keys in deletes.items():
+                    try:
+                        failed.extend((ns, key) for key in await self._service.adelete_keys(self._user_id, ns, keys))
+                    except Exception:
+                        failed.extend((ns, key) for key in keys)
+            finally:
+                self._writes.landed(ops)
+            return self._finish_flush(ops, failed)
+
+    @staticmethod
+    def _flush_plan(ops) -> Tuple[List[Tuple[str, str, Any, Optional[Dict[str, Any]]]], Dict[str, List[str]]]:
+        """Split drained writes into set_many items and per-namespace deletes."""
+        sets = [(ns, key, value, metadata) for (ns, key), (op, value, metadata) in ops.items() if op == "set"]
+        deletes: Dict[str, List[str]] = {}
+        for (ns, key), (op, _, _) in ops.items():
+            if op == "delete":
+                deletes.setdefault(ns, []).append(key)
+        return sets, deletes
+
+    def _finish_flush(self, ops, failed: List[Tuple[str, str]]) -> int:
+        if self._run_cache is not None:
+            lost = set(failed)
+            for (ns, key), (op, value, _) in ops.items():
+                if (ns, key) in lost:
+                    self._run_cache.discard(self._user_id, ns, [key])
+                else:
+                    self._run_cache.store(self._user_id, ns, key, value if op == "set" else ABSENT)
+        self._log("flush", count=len(ops) - len(failed), failed=len(failed))
+        if failed:
+            raise DataStoreBatchError(failed)
+        return len(ops)
+
+    def _flush_pending(self, keys: Optional[List[str]] = None) -> None:
+        """Flush first if a read of ``keys`` (None: the namespace) could see buffered writes."""
+        if self._writes.holds(self._namespace, keys):
+            self.flush()
+
+    async def _aflush_pending(self, keys: Optional[List[str]] = None) -> None:
+        if self._writes.holds(self._namespace, keys):
+            await self.aflush()
+
+    def _write_through(self, keys: Optional[List[str]], write):
+        """Run ``write`` and forget ``keys`` (None: the namespace) in the run cache if it raises."""
+        try:
+            return write()
+        except Exception:
+            self._forget(keys)
+            raise
+
+    async def _awrite_through(self, keys: Optional[List[str]], write):
+        try:
+            return await write
+        except Exception:
+            self._forget(keys)
+            raise
+
+    def _forget(self, keys: Optional[List[str]]) -> None:
+        if self._run_cache is not None:
+            self._run_cache.discard(self._user_id, self._namespace, keys)
+
+    def _buffer(self, key: str, op: str, value: Any = None, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue one write; returns whether the buffer is due for a flush."""
+        self._writes.add(self._namespace, key, op, value, metadata)
+        self._log(op, key=key, buffered=True, valuePreview=self._preview(value))
+        return self._writes.due()
+
+    def _buffer_many(self, items: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> bool:
+        for key, value in items.items():
+            self._writes.add(self._namespace, key, "set", value, metadata)
+        self._log("set_many", count=len(items), keys=list(items.keys())[:10], buffered=True)
+        return self._writes.due()
+
+    # -- read/write bookkeeping shared by the sync and async methods ----
+
+    def _cached_get(self, key: str, default: Any) -> Tuple[bool, Any]:
+        """``(True, value)`` when the run cache answers a get."""
+        if self._run_cache is None:
+            return False, None
+        hit, cached = self._run_cache.lookup(self._user_id, self._namespace, key)
+        if not hit:
+            return False, None
+        found = cached is not ABSENT
+        value = cached if found else default
+        self._log("get", key=key, found=found, cached=True, valuePreview=self._preview(value))
+        return True, value
+
+    def _finish_get(self, key: str, record: Optional[Dict[str, Any]], default: Any) -> Any:
+        if self._run_cache is not None:
+            self._run_cache.store(
+                self._user_id, self._namespace, key, record.get("value") if record else ABSENT
+            )
+        value = record.get("value") if record else default
+        self._log(
+            "get", key=key,
+            found=bool(record),
+            valuePreview=self._preview(value),
+        )
+        return value
+
+    def _finish_set(self, key: str, value: Any) -> None:
+        if self._run_cache is not None:
+            self._run_cache.store(self._user_id, self._namespace, key, value)
+        self._log("set", key=key, valuePreview=self._preview(value))
+
+    def _finish_delete(self, key: str, result: bool) -> bool:
+        if self._run_cache is not None:
+            self._run_cache.store(self._user_id, self._namespace, key, ABSENT)
+        self._log("delete", key=key, found=result)
+        return result
+
+    def _cached_all(self) -> Optional[Dict[str, Any]]:
+        if self._run_cache is None:
+            return None
+        cached = self._run_cache.namespace(self._user_id, self._namespace)
+        if cached is not None:
+            self._log("get_all", count=len(cached), cached=True)
+        return cached
+
+    def _finish_get_all(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if self._run_cache is not None:
+            self._run_cache.store_namespace(self._user_id, self._namespace, result)
+        self._log("get_all", count=len(result))
+        return result
+
+    def _split_cached(self, keys: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Values the run cache holds for ``keys``, and the keys it doesn't."""
+        if self._run_cache is None:
+            return {}, list(keys)
+        result: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            hit, cached = self._run_cache.lookup(self._user_id, self._namespace, key)
+            if not hit:
+                missing.append(key)
+            elif cached is not ABSENT:
+                result[key] = cached
+        return result, missing
+
+    def _finish_get_many(
+        self,
+        keys: List[str],
+        result: Dict[str, Any],
+        missing: List[str],
+        fetched: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        if self._run_cache is None:
+            self._log("get_many", requested=len(keys), found=len(fetched))
+            return fetched
+        for key in missing:
+            self._run_cache.store(self._user_id, self._namespace, key, fetched.get(key, ABSENT))
+        result.update(fetched)
+        self._log(
+            "get_many", requested=len(keys), found=len(result),
+            cached=not missing, cacheHits=len(keys) - len(missing),
         )
+        return result
+
+    def _finish_set_many(self, items: Dict[str, Any], count: int) -> int:
+        if self._run_cache is not None:
+            if count == len(items):
+                for key, value in items.items():
+                    self._run_cache.store(self._user_id, self._namespace, key, value)
+            else:
+                # Some writes failed and we can't tell which.
+                self._run_cache.discard(self._user_id, self._namespace, list(items))
+        self._log("set_many", count=count, keys=list(items.keys())[:10])
+        return count
+
+    def _finish_clear(self, count: int) -> int:
+        if self._run_cache is not None:
+            self._run_cache.clear_namespace(self._user_id, self._namespace)
+        self._log("clear", count=count)
+        return count
+
+    def _set_items(self, items: Dict[str, Any], metadata: Optional[Dict[str, Any]]):
+        return [(self._namespace, key, value, metadata) for key, value in items.items()]
+
+    # -- agent API --------------------------------------------------------
 
     def get(self, key: str, default: Any = None) -> Any:
         """Get a value by key."""
+        self._flush_pending([key])
+        hit, value = self._cached_get(key, default)
+        if hit:
+            return value
         record = self._service.get(
             self._user_id,
             self._namespace,
             key,
             self._agent_name
         )
-        value = record.get("value") if record else default
-        self._log(
-            "get", key=key,
-            found=bool(record),
-            valuePreview=self._preview(value),
-        )
-        return value
+        return self._finish_get(key, record, default)
 
     def set(self, key: str, value: Any, metadata: Optional[Dict[str, Any]] = None) -> None:
         """Set a value by key."""
-        self._service.set(
+        if self._writes.enabled:
+            if self._buffer(key, "set", value, metadata):
+                self.flush()
+            return
+        self._write_through([key], lambda: self._service.set(
             self._user_id,
             self._namespace,
             key,
             value,
             self._agent_name,
             metadata
-        )
-        self._log("set", key=key, valuePreview=self._preview(value))
+        ))
+        self._finish_set(key, value)
 
     def delete(self, key: str) -> bool:
-        """Delete a value by key."""
-        result = self._service.delete(self._user_id, self._namespace, key)
-        self._log("delete", key=key, found=result)
-        return result
+        """Delete a value by key.
+
+        In batching mode the delete is only queued and True is returned.
+        """
+        if self._writes.enabled:
+            if self._buffer(key, "delete"):
+                self.flush()
+            return True
+        result = self._write_through(
+            [key], lambda: self._service.delete(self._user_id, self._namespace, key)
+        )
+        return self._finish_delete(key, result)
 
-    def list_keys(self, prefix: Optional[str] = None) -> List[str]:
-        """List all keys, optionally filtered by prefix."""
-        keys = self._service.list_keys(self._user_id, self._namespace, prefix)
-        self._log("list_keys", prefix=prefix, count=len(keys))
+    def list_keys(
+        self,
+        prefix: Optional[str] = None,
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """List keys in sorted order, optionally filtered by prefix.
+
+        Pass ``limit`` to get one page, and the last key of a page as
+        ``start_after`` to get the next one.
+
+        Example:
+            page = data_store.list_keys(prefix="file:", limit=500)
+            while page:
+                ...
+                page = data_store.list_keys(prefix="file:", start_after=page[-1], limit=500)
+        """
+        self._flush_pending()
+        keys = self._service.list_keys(
+            self._user_id, self._namespace, prefix, start_after, limit
+        )
+        self._log("list_keys", prefix=prefix, startAfter=start_after, count=len(keys))
         return keys
 
+    def iter_items(self, prefix: Optional[str] = None, page_size: int = 100) -> Iterator[Tuple[str, Any]]:
+        """Yield ``(key, value)`` pairs in key order, one page at a time.
+
+        Unlike get_all() this holds only ``page_size`` records in
+        memory, so it suits namespaces of any size.
+
+        Example:
+            for filepath, content in data_store.iter_items(prefix="src/"):
+                ...
+        """
+        self._flush_pending()
+        count = 0
+        try:
+            for key, value in self._service.iter_items(
+                self._user_id, self._namespace, prefix, page_size, self._agent_name
+            ):
+                count += 1
+                yield key, value
+        finally:
+            self._log("iter_items", prefix=prefix, count=count)
+
     def list_namespaces(self) -> List[str]:
         """List all namespaces containing data for this user.
 
@@ -539,6 +2217,8 @@ class AgentDataStoreProxy:
             namespaces = data_store.list_namespaces()
             # Returns: ["default", "files:apache/repo", "summary:apache/repo", ...]
         """
+        if len(self._writes):
+            self.flush()
         namespaces = self._service.list_namespaces(self._user_id)
         self._log("list_namespaces", count=len(namespaces))
         return namespaces
@@ -555,42 +2235,161 @@ class AgentDataStoreProxy:
             for filepath, content in all_files.items():
                 ...
         """
+        self._flush_pending()
+        cached = self._cached_all()
+        if cached is not None:
+            return cached
         result = self._service.get_all(
             self._user_id,
             self._namespace,
             self._agent_name
         )
-        self._log("get_all", count=len(result))
-        return result
+        return self._finish_get_all(result)
 
     def get_many(self, keys: List[str]) -> Dict[str, Any]:
         """Get multiple values at once."""
-        result = self._service.get_many(
-            self._user_id,
-            self._namespace,
-            keys,
-            self._agent_name
-        )
-        self._log("get_many", requested=len(keys), found=len(result))
-        return result
+        self._flush_pending(keys)
+        result, missing = self._split_cached(keys)
+        fetched = self._service.get_many(
+            self._user_id, self._namespace, missing, self._agent_name
+        ) if missing else {}
+        return self._finish_get_many(keys, result, missing, fetched)
 
     def set_many(self, items: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> int:
         """Set multiple values at once."""
-        item_list = [
-            (self._namespace, key, value, metadata)
-            for key, value in items.items()
-        ]
-        count = self._service.set_many(self._user_id, item_list, self._agent_name)
-        self._log("set_many", count=count, keys=list(items.keys())[:10])
-        return count
+        if self._writes.enabled:
+            if self._buffer_many(items, metadata):
+                self.flush()
+            return len(items)
+        item_list = self._set_items(items, metadata)
+        count = self._write_through(
+            list(items), lambda: self._service.set_many(self._user_id, item_list, self._agent_name)
+        )
+        return self._finish_set_many(items, count)
 
     def clear(self) -> int:
         """Clear all data in the current namespace."""
-        count = self._service.clear_namespace(self._user_id, self._namespace)
-        self._log("clear", count=count)
-        return count
+        self._flush_pending()
+        count = self._write_through(
+            None, lambda: self._service.clear_namespace(self._user_id, self._namespace)
+        )
+        return self._finish_clear(count)
+
+    # -- async agent API ----------------------------------------------------
+    # Same behaviour as the methods above, but the backend I/O runs
+    # through the DataStoreService a* methods, so an ``async def run()``
+    # agent doesn't block the event loop (and can overlap data store
+    # calls with LLM calls via asyncio.gather).
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """Awaitable :meth:`get`."""
+        await self._aflush_pending([key])
+        hit, value = self._cached_get(key, default)
+        if hit:
+            return value
+        record = await self._service.aget(self._user_id, self._namespace, key, self._agent_name)
+        return self._finish_get(key, record, default)
+
+    async def aset(self, key: str, value: Any, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Awaitable :meth:`set`."""
+        if self._writes.enabled:
+            if self._buffer(key, "set", value, metadata):
+                await self.aflush()
+            return
+        await self._awrite_through([key], self._service.aset(
+            self._user_id, self._namespace, key, value, self._agent_name, metadata
+        ))
+        self._finish_set(key, value)
+
+    async def adelete(self, key: str) -> bool:
+        """Awaitable :meth:`delete`."""
+        if self._writes.enabled:
+            if self._buffer(key, "delete"):
+                await self.aflush()
+            return True
+        result = await self._awrite_through(
+            [key], self._service.adelete(self._user_id, self._namespace, key)
+        )
+        return self._finish_delete(key, result)
+
+    async def alist_keys(
+        self,
+        prefix: Optional[str] = None,
+        start_after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """Awaitable :meth:`list_keys`."""
+        await self._aflush_pending()
+        keys = await self._service.alist_keys(
+            self._user_id, self._namespace, prefix, start_after, limit
+        )
+        self._log("list_keys", prefix=prefix, startAfter=start_after, count=len(keys))
+        return keys
+
+    async def aiter_items(self, prefix: Optional[str] = None, page_size: int = 100) -> AsyncIterator[Tuple[str, Any]]:
+        """Async-iterator :meth:`iter_items` (``async for key, value in ...``)."""
+        await self._aflush_pending()
+        count = 0
+        try:
+            async for key, value in self._service.aiter_items(
+                self._user_id, self._namespace, prefix, page_size, self._agent_name
+            ):
+                count += 1
+                yield key, value
+        finally:
+            self._log("iter_items", prefix=prefix, count=count)
+
+    async def alist_namespaces(self) -> List[str]:
+        """Awaitable :meth:`list_namespaces`."""
+        if len(self._writes):
+            await self.aflush()
+        namespaces = await self._service.alist_namespaces(self._user_id)
+        self._log("list_namespaces", count=len(namespaces))
+        return namespaces
+
+    async def aget_all(self) -> Dict[str, Any]:
+        """Awaitable :meth:`get_all`."""
+        await self._aflush_pending()
+        cached = self._cached_all()
+        if cached is not None:
+            return cached
+        result = await self._service.aget_all(self._user_id, self._namespace, self._agent_name)
+        return self._finish_get_all(result)
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Awaitable :meth:`get_many`."""
+        await self._aflush_pending(keys)
+        result, missing = self._split_cached(keys)
+        fetched = await self._service.aget_many(
+            self._user_id, self._namespace, missing, self._agent_name
+        ) if missing else {}
+        return self._finish_get_many(keys, result, missing, fetched)
+
+    async def aset_many(self, items: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Awaitable :meth:`set_many`."""
+        if self._writes.enabled:
+            if self._buffer_many(items, metadata):
+                await self.aflush()
+            return len(items)
+        count = await self._awrite_through(
+            list(items), self._service.aset_many(self._user_id, self._set_items(items, metadata), self._agent_name)
+        )
+        return self._finish_set_many(items, count)
+
+    async def aclear(self) -> int:
+        """Awaitable :meth:`clear`."""
+        await self._aflush_pending()
+        count = await self._awrite_through(
+            None, self._service.aclear_namespace(self._user_id, self._namespace)
+        )
+        return self._finish_clear(count)
 
 
 def get_data_store_service(db: DatabaseService) -> DataStoreService:
     """Factory function to create DataStoreService instance."""
-    return DataStoreService(db)
\ No newline at end of file
+    summaries = (
+        get_namespace_summaries(db)
+        if settings.DATA_STORE_NAMESPACE_SUMMARIES and summaries_supported(db)
+        else None
+    )
+    return DataStoreService(db, get_blob_store(), get_codec(), summaries)
\ No newline at end of file
@@ -0,0 +1,375 @@
+"""Incrementally maintained per-user namespace summaries.
+
+``list_namespaces`` and ``namespace_stats`` used to be computed from the
+records on every call: a query over all of a user's records for the
+namespace list, and aggregates (or a pass over the records) for the
+stats.  With
+``DATA_STORE_NAMESPACE_SUMMARIES`` on, the data store keeps one summary
+document per user instead, and both become a single document read::
+
+    {"_id": "<user_id>",
+     "userId": "<user_id>",
+     "namespaces": {"default": {"recordCount": 12,
+                                "sizeBytes": 48211,
+                                "storedBytes": 9630,
+                                "agents": ["indexer", "reviewer"],
+                                "updatedAt": "2026-10-17T09:12:44.120311"}},
+     "rebuiltAt": "2026-10-17T08:00:02.981442"}
+
+``DataStoreService`` writes (``set``, ``set_many``, ``delete``,
+``delete_many``, ``clear_namespace``) record count and size deltas
+here; a background task folds them into the summary documents every
+couple of seconds, one read-modify-write per user, retrying on
+conflict.  A read flushes the reader's own pending deltas first, so a
+process always sees its own writes.
+
+A user without a summary document gets one built from their records on
+first read, so turning the setting on needs no migration.  Deltas for
+such users are dropped rather than applied to an empty summary: the
+records already hold those writes.
+
+Only CouchDB is supported (see :func:`summaries_supported`): a flush
+is a read-modify-write of a document every replica writes, and CouchDB
+is the backend that rejects a save made from a stale revision, so a
+replica that lost the race re-reads and retries.  DynamoDB, Firestore,
+SQLite and the memory backend overwrite blindly, and a concurrent flush
+from another process would be lost; there the setting is ignored with a
+warning.
+
+Tradeoffs:
+
+  * Summaries are eventually consistent across replicas: each process
+    buffers its own deltas for up to FLUSH_INTERVAL_SECONDS.
+  * ``agents`` only grows until the namespace is cleared or emptied;
+    deleting the last record an agent touched doesn't remove it.
+  * Deltas still buffered when a process dies are lost, as are writes
+    racing a rebuild, so a summary can drift.  Rebuild it from the
+    records with::
+
+        python -m services.data_store_summary_rebuild [user_id ...]
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import copy
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .database_service.base import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Collection holding one summary document per user (_id = user id).
+SUMMARY_DB = "agent_data_store_summary"
+
+# How often the background task writes buffered deltas.  Short, since
+# deltas still buffered when a process dies leave the summary off
+# until it is rebuilt.
+FLUSH_INTERVAL_SECONDS = 2.0
+
+# Read-modify-write attempts per flush before conflicting deltas are
+# put back for the next one.
+FLUSH_ATTEMPTS = 3
+
+
+def _empty_delta() -> Dict[str, Any]:
+    return {"reset": False, "recordCount": 0, "sizeBytes": 0, "storedBytes": 0,
+            "agents": set(), "updatedAt": None}
+
+
+def _later(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    if not a:
+        return b
+    if not b:
+        return a
+    return max(a, b)
+
+
+def _merge_delta(into: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    """Fold ``delta`` (the newer one) into ``into``."""
+    if delta["reset"]:
+        into.update(_empty_delta(), reset=True)
+    for field in ("recordCount", "sizeBytes", "storedBytes"):
+        into[field] += delta[field]
+    into["agents"] |= delta["agents"]
+    into["updatedAt"] = _later(into["updatedAt"], delta["updatedAt"])
+
+
+def _apply(namespaces: Dict[str, Dict[str, Any]], deltas: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """The summary ``namespaces`` with ``deltas`` applied.
+
+    Namespaces left without records are dropped.
+    """
+    result = copy.deepcopy(namespaces)
+    for ns, delta in deltas.items():
+        entry = result.get(ns)
+        if entry is None or delta["reset"]:
+            entry = {"recordCount": 0, "sizeBytes": 0, "storedBytes": 0, "agents": [], "updatedAt": None}
+        for field in ("recordCount", "sizeBytes", "storedBytes"):
+            # Clamped: a summary that has drifted low mustn't go negative.
+            entry[field] = max(0, int(entry.get(field, 0)) + delta[field])
+        entry["agents"] = sorted(set(entry.get("agents", [])) | delta["agents"])
+        entry["updatedAt"] = _later(entry.get("updatedAt"), delta["updatedAt"])
+        if entry["recordCount"]:
+            result[ns] = entry
+        else:
+            result.pop(ns, None)
+    return result
+
+
+class NamespaceSummaries:
+    """Buffers namespace deltas and keeps the summary documents up to date.
+
+    One instance per process (see :func:`get_namespace_summaries`):
+    ``DataStoreService`` is built per request, and deltas must outlive
+    the request that made them.
+    """
+
+    def __init__(self, db_service: "DatabaseService") -> None:
+        self._db = db_service
+        # user_id → namespace → delta since the last flush.
+        self._buffer: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        # Serializes flushes within the process; flushes from other
+        # processes are caught by CouchDB's _rev check, which is why
+        # summaries are only enabled there (summaries_supported).
+        self._flush_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    # -- recording ------------------------------------------------------
+
+    def record(
+        self,
+        user_id: str,
+        namespace: str,
+        records: int = 0,
+        size: int = 0,
+        stored: int = 0,
+        agents: Iterable[Optional[str]] = (),
+        updated_at: Optional[str] = None,
+    ) -> None:
+        """Buffer a change to one namespace's totals.  Cheap (dict updates)."""
+        delta = {**_empty_delta(), "recordCount": records, "sizeBytes": size,
+                 "storedBytes": stored, "agents": {a for a in agents if a}, "updatedAt": updated_at}
+        self._add(user_id, namespace, delta)
+
+    def reset(self, user_id: str, namespace: str) -> None:
+        """Buffer the emptying of a namespace (``clear_namespace``)."""
+        self._add(user_id, namespace, {**_empty_delta(), "reset": True})
+
+    def _add(self, user_id: str, namespace: str, delta: Dict[str, Any]) -> None:
+        with self._lock:
+            pending = self._buffer.setdefault(user_id, {})
+            if namespace in pending:
+                _merge_delta(pending[namespace], delta)
+            else:
+                pending[namespace] = delta
+        self.ensure_started()
+
+    def discard(self, user_id: str) -> None:
+        """Drop a user's buffered deltas (their summary is being rebuilt)."""
+        with self._lock:
+            self._buffer.pop(user_id, None)
+
+    # -- reading and rebuilding ----------------------------------------
+
+    def read(self, user_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """A user's summary, or None if they have none yet.
+
+        The user's buffered deltas are flushed first.
+        """
+        self.flush([user_id])
+        doc = self._db.get_many(SUMMARY_DB, [user_id]).get(user_id)
+        return copy.deepcopy(doc.get("namespaces", {})) if doc else None
+
+    async def aread(self, user_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Awaitable :meth:`read`."""
+        return await self._run(self.read, user_id)
+
+    def store(self, user_id: str, namespaces: Dict[str, Dict[str, Any]]) -> None:
+        """Replace a user's summary with one rebuilt from their records."""
+        with self._flush_lock:
+            for _ in range(FLUSH_ATTEMPTS):
+                existing = self._db.get_many(SUMMARY_DB, [user_id]).get(user_id)
+                doc = {
+                    **(existing or {}),
+                    "_id": user_id,
+                    "userId": user_id,
+                    "namespaces": {ns: entry for ns, entry in namespaces.items() if entry["recordCount"]},
+                    "rebuiltAt": datetime.utcnow().isoformat(),
+                }
+                [result] = self._db.save_many(SUMMARY_DB, [doc])
+                if result.get("ok"):
+                    return
+        logger.warning("NamespaceSummaries: could not store the rebuilt summary for %s", user_id)
+
+    async def astore(self, user_id: str, namespaces: Dict[str, Dict[str, Any]]) -> None:
+        """Awaitable :meth:`store`."""
+        await self._run(self.store, user_id, namespaces)
+
+    def invalidate(self, user_id: str) -> None:
+        """Delete a user's summary so the next read rebuilds it."""
+        self.discard(user_id)
+        with self._flush_lock:
+            self._db.delete_many(SUMMARY_DB, [user_id])
+
+    async def ainvalidate(self, user_id: str) -> None:
+        """Awaitable :meth:`invalidate`."""
+        await self._run(self.invalidate, user_id)
+
+    # -- flushing -------------------------------------------------------
+
+    def ensure_started(self) -> None:
+        """Start the background flush task once inside an event loop."""
+        if self._task is not None or self._stopped:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop yet — try again next time.
+        self._task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while not self._stopped:
+            try:
+                await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+                await self.aflush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Never let a flush error kill the loop.
+                logger.exception("NamespaceSummaries: flush failed; continuing")
+
+    def flush(self, user_ids: Optional[List[str]] = None) -> int:
+        """Write buffered deltas (all users, or just ``user_ids``).
+
+        Returns how many summaries were updated.  Deltas that still
+        conflict after FLUSH_ATTEMPTS, or that fail to save, go back in
+        the buffer for the next flush.
+        """
+        with self._lock:
+            users = list(self._buffer) if user_ids is None else [u for u in user_ids if u in self._buffer]
+            if not users:
+                return 0
+            pending = {user: self._buffer.pop(user) for user in users}
+
+        updated = 0
+        with self._flush_lock:
+            try:
+                for _ in range(FLUSH_ATTEMPTS):
+                    if not pending:
+                        break
+                    updated += self._write(pending)
+            except Exception:
+                logger.exception("NamespaceSummaries: flush failed; keeping %d users' deltas", len(pending))
+        if pending:
+            self._restore(pending)
+        return updated
+
+    async def aflush(self, user_ids: Optional[List[str]] = None) -> int:
+        """Awaitable :meth:`flush`."""
+        return await self._run(self.flush, user_ids)
+
+    def _write(self, pending: Dict[str, Dict[str, Dict[str, Any]]]) -> int:
+        """One read-modify-write pass.  Removes the users it settles from ``pending``."""
+        docs = self._db.get_many(SUMMARY_DB, list(pending))
+        updates: List[Dict[str, Any]] = []
+        for user, deltas in list(pending.items()):
+            doc = docs.get(user)
+            if doc is None:
+                # Built from the records, these writes included, on first read.
+                del pending[user]
+                continue
+            namespaces = _apply(doc.get("namespaces", {}), deltas)
+            if namespaces == doc.get("namespaces", {}):
+                del pending[user]
+                continue
+            updates.append({**doc, "namespaces": namespaces})
+        if not updates:
+            return 0
+        results = self._db.save_many(SUMMARY_DB, updates)
+        saved = [r.get("id") for r in results if r.get("ok")]
+        for user in saved:
+            pending.pop(user, None)
+        if len(saved) < len(updates):
+            logger.info("NamespaceSummaries: %d/%d summaries conflicted; retrying",
+                        len(updates) - len(saved), len(updates))
+        return len(saved)
+
+    def _restore(self, pending: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+        """Put unwritten deltas back in front of anything buffered since."""
+        with self._lock:
+            for user, deltas in pending.items():
+                newer = self._buffer.get(user, {})
+                for ns, delta in newer.items():
+                    if ns in deltas:
+                        _merge_delta(deltas[ns], delta)
+                    else:
+                        deltas[ns] = delta
+                self._buffer[user] = deltas
+
+    async def _run(self, fn, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool(), functools.partial(ctx.run, fn, *args))
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # A pool of its own: flushes serialize on _flush_lock and
+        # shouldn't tie up database workers while they wait.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="data-store-summary")
+        return self._executor
+
+    async def stop(self) -> None:
+        """Stop the background task and write whatever is still buffered."""
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.aflush()
+
+
+_summaries: Optional[NamespaceSummaries] = None
+_summaries_lock = threading.Lock()
+_unsupported_warned = False
+
+
+def summaries_supported(db: "DatabaseService") -> bool:
+    """True if summary flushes from several processes can't overwrite each other.
+
+    That needs a backend that rejects stale writes (CouchDB).  Warns
+    once per process when it can't.
+    """
+    global _unsupported_warned
+    if getattr(db, "rejects_stale_writes", False):
+        return True
+    if not _unsupported_warned:
+        _unsupported_warned = True
+        logger.warning(
+            "DATA_STORE_NAMESPACE_SUMMARIES needs a backend that rejects stale writes "
+            "(CouchDB); %s overwrites concurrent flushes, so summaries stay off",
+            type(db).__name__,
+        )
+    return False
+
+
+def get_namespace_summaries(db: "DatabaseService") -> NamespaceSummaries:
+    """The process-wide NamespaceSummaries for ``db``."""
+    global _summaries
+    with _summaries_lock:
+        if _summaries is None or _summaries._db is not db:
+            _summaries = NamespaceSummaries(db)
+        return _summaries
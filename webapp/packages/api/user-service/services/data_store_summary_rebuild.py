@@ -0,0 +1,43 @@
+"""Rebuild data store namespace summaries from the records.
+
+Usage (from the user-service directory)::
+
+    python -m services.data_store_summary_rebuild [user_id ...]
+
+Recomputes each user's summary document (see
+services/data_store_summary.py) from their data store records and
+replaces it.  With no user ids, every user that has records or a
+summary is rebuilt.  Safe to run with the app up; writes racing a
+rebuild can leave that user's summary slightly off, so rerun it for
+them if the numbers look wrong.
+"""
+import argparse
+from typing import List
+
+from config import settings
+from services.data_store_service import DATA_STORE_DB, DataStoreService
+from services.data_store_summary import SUMMARY_DB, NamespaceSummaries
+from services.database_service import DatabaseService, get_database_service
+
+
+def _all_users(db: DatabaseService) -> List[str]:
+    users = {doc.get("userId") for doc in db.find_iter(DATA_STORE_DB, {}, fields=["userId"])}
+    users |= {doc.get("userId") for doc in db.find_iter(SUMMARY_DB, {}, fields=["userId"])}
+    return sorted(user for user in users if user)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("users", nargs="*", help="user ids (default: every user)")
+    args = parser.parse_args(argv)
+
+    db = get_database_service(settings)
+    store = DataStoreService(db, summaries=NamespaceSummaries(db))
+    for user_id in args.users or _all_users(db):
+        stats = store.rebuild_namespace_summary(user_id)
+        records = sum(entry["recordCount"] for entry in stats.values())
+        print(f"'{user_id}': {len(stats)} namespaces, {records} records.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,64 @@
-from .base import DatabaseService
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, configure_executor, decode_cursor, encode_cursor
 from .couchdb import CouchDBService
+from .couchdb_async import AsyncCouchDBService, request_timeout
 from .memory import MemoryDBService
 from .firestore import FirestoreDBService
-from .dynamodb import DynamoDBService
+from .dynamodb import DynamoDBService, parse_packed_fields
+from .sqlite import SqliteDBService
+from .caching import CachingDatabaseService, CachePolicy, parse_cache_config
+from .identity_map import (
+    IdentityMapDatabaseService,
+    IdentityScopeMiddleware,
+    identity_scope,
+    parse_identity_map_config,
+)
+from .instrumentation import InstrumentedDatabaseService, find_instrumented, note_query
+from .retention import EXPIRES_AT_FIELD, RetentionPurger, parse_retention_config
+from .selectors import matches as selector_matches
 
 __all__ = [
     'DatabaseService',
+    'DEFAULT_PAGE_SIZE',
+    'decode_cursor',
+    'encode_cursor',
+    'selector_matches',
     'CouchDBService',
+    'AsyncCouchDBService',
+    'request_timeout',
     'MemoryDBService',
     'FirestoreDBService',
     'DynamoDBService',
+    'SqliteDBService',
+    'CachingDatabaseService',
+    'CachePolicy',
+    'IdentityMapDatabaseService',
+    'IdentityScopeMiddleware',
+    'identity_scope',
+    'InstrumentedDatabaseService',
+    'find_instrumented',
+    'note_query',
+    'EXPIRES_AT_FIELD',
+    'RetentionPurger',
+    'parse_retention_config',
+    'DEFAULT_COLLECTIONS',
     'get_database_service',
 ]
 
+# Collections the app reads and writes.  Provisioned once when the
+# service is built; anything else is still created lazily on first use.
+DEFAULT_COLLECTIONS = (
+    "agents",
+    "deployments",
+    "demos",
+    "users",
+    "sessions",
+    "user_sessions",
+    "tickets",
+    "agent_data_store",
+    "agent_data_store_summary",
+    "site_admin_audit",
+)
+
 # --- Service Factory ---
 
 _db_instance = None
@@ -33,10 +79,14 @@ def get_database_service(settings) -> DatabaseService:
     """
     global _db_instance
     if _db_instance is None:
+        configure_executor(getattr(settings, "DATABASE_THREADPOOL_SIZE", None))
         if settings.DATABASE_PROVIDER == "couchdb":
             if not all([settings.COUCHDB_URL, settings.COUCHDB_USER, settings.COUCHDB_PASSWORD]):
                 raise ValueError("COUCHDB_URL, COUCHDB_USER, and COUCHDB_PASSWORD must be set for couchdb provider")
-            _db_instance = CouchDBService(
+            couchdb_class = (
+                AsyncCouchDBService if getattr(settings, "COUCHDB_ASYNC_CLIENT", False) else CouchDBService
+            )
+            _db_instance = couchdb_class(
                 settings.COUCHDB_URL,
                 settings.COUCHDB_USER,
                 settings.COUCHDB_PASSWORD,
@@ -55,9 +105,44 @@ def get_database_service(settings) -> DatabaseService:
                 region_name=region_name,
                 endpoint_url=endpoint_url,
                 aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key
+                aws_secret_access_key=aws_secret_access_key,
+                packed_fields=parse_packed_fields(getattr(settings, "DYNAMODB_PACKED_FIELDS", None)),
+            )
+        elif settings.DATABASE_PROVIDER == "sqlite":
+            _db_instance = SqliteDBService(
+                settings.SQLITE_PATH,
+                pool_size=settings.SQLITE_POOL_SIZE,
             )
         else:
             # Default to in-memory if not configured
             _db_instance = MemoryDBService()
-    return _db_instance
\ No newline at end of file
+
+        collections = [
+            name.strip()
+            for name in (getattr(settings, "DATABASE_COLLECTIONS", "") or "").split(",")
+            if name.strip()
+        ] or list(DEFAULT_COLLECTIONS)
+        _db_instance.provision(collections)
+        _db_instance.configure_retention(
+            parse_retention_config(getattr(settings, "DATABASE_RETENTION", None))
+        )
+        _db_instance.scan_parallelism = max(1, getattr(settings, "DATABASE_SCAN_PARALLELISM", 1) or 1)
+
+        # Instrument the backend itself, inside the cache, so the
+        # metrics count real round trips rather than cache hits.
+        if getattr(settings, "DATABASE_METRICS_ENABLED", False):
+            slow_ms = getattr(settings, "DATABASE_SLOW_QUERY_MS", 500)
+            print(f"Recording database query metrics (slow query threshold {slow_ms} ms)")
+            _db_instance = InstrumentedDatabaseService(_db_instance, slow_query_ms=slow_ms)
+
+        cache_policies = parse_cache_config(getattr(settings, "DATABASE_CACHE_COLLECTIONS", None))
+        if cache_policies:
+            print(f"Caching database reads for: {', '.join(sorted(cache_policies))}")
+            _db_instance = CachingDatabaseService(_db_instance, cache_policies)
+
+        # Outermost, so a repeat read in the same request skips even the
+        # process cache's copy.
+        covers = parse_identity_map_config(getattr(settings, "DATABASE_IDENTITY_MAP_COLLECTIONS", None))
+        if covers is not None:
+            _db_instance = IdentityMapDatabaseService(_db_instance, covers)
+    return _db_instance
@@ -0,0 +1,115 @@
+"""Grouped count / sum / max shared by every backend's ``aggregate``.
+
+``DatabaseService.aggregate`` returns ``{group_key: bucket}`` where
+``group_key`` is the tuple of the ``group_by`` field values (``()``
+when not grouping) and each bucket is::
+
+    {"count": 3, "sum": {"valueSize": 1200}, "counts": {"valueSize": 2},
+     "max": {"updatedAt": "2024-..."}}
+
+Only numbers are summed; bools, strings and missing fields are
+skipped, and ``counts`` says how many documents had a number to sum.  ``max`` takes numbers and strings (numbers order before
+strings, as in CouchDB and SQLite collation) and is None when no
+document had a usable value.  Backends computing these natively must
+produce the same shapes; the streaming fallback folds documents one at
+a time with :func:`fold`.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, Sequence, Tuple
+
+GroupKey = Tuple[Any, ...]
+Buckets = Dict[GroupKey, Dict[str, Any]]
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _max_rank(value: Any):
+    if is_number(value):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return None
+
+
+def greater(value: Any, current: Any) -> bool:
+    """True if ``value`` should replace ``current`` as the max."""
+    rank = _max_rank(value)
+    if rank is None:
+        return False
+    return current is None or rank > _max_rank(current)
+
+
+def group_key(doc: Dict[str, Any], group_by: Sequence[str]) -> GroupKey:
+    """The bucket key for ``doc``; unhashable values are keyed by their JSON."""
+    key = []
+    for field in group_by:
+        value = doc.get(field)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, sort_keys=True, default=str)
+        key.append(value)
+    return tuple(key)
+
+
+def new_bucket(sum_fields: Sequence[str], max_fields: Sequence[str]) -> Dict[str, Any]:
+    return {
+        "count": 0,
+        "sum": {f: 0 for f in sum_fields},
+        "counts": {f: 0 for f in sum_fields},
+        "max": {f: None for f in max_fields},
+    }
+
+
+def fold(
+    buckets: Buckets,
+    doc: Dict[str, Any],
+    group_by: Sequence[str],
+    sum_fields: Sequence[str],
+    max_fields: Sequence[str],
+) -> None:
+    """Add one matching document to ``buckets``."""
+    key = group_key(doc, group_by)
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = buckets[key] = new_bucket(sum_fields, max_fields)
+    bucket["count"] += 1
+    for field in sum_fields:
+        value = doc.get(field)
+        if is_number(value):
+            bucket["sum"][field] += value
+            bucket["counts"][field] += 1
+    for field in max_fields:
+        value = doc.get(field)
+        if greater(value, bucket["max"][field]):
+            bucket["max"][field] = value
+
+
+def merge(buckets: Buckets, key: GroupKey, bucket: Dict[str, Any]) -> None:
+    """Combine a partial ``bucket`` (e.g. one server-side group) into ``buckets``."""
+    current = buckets.get(key)
+    if current is None:
+        buckets[key] = bucket
+        return
+    current["count"] += bucket["count"]
+    for field, value in bucket["sum"].items():
+        current["sum"][field] += value
+    for field, value in bucket["counts"].items():
+        current["counts"][field] += value
+    for field, value in bucket["max"].items():
+        if greater(value, current["max"][field]):
+            current["max"][field] = value
+
+
+def aggregate_docs(
+    docs: Iterable[Dict[str, Any]],
+    group_by: Sequence[str],
+    sum_fields: Sequence[str],
+    max_fields: Sequence[str],
+) -> Buckets:
+    buckets: Buckets = {}
+    for doc in docs:
+        fold(buckets, doc, group_by, sum_fields, max_fields)
+    return buckets
@@ -1,9 +1,133 @@
 import abc
-from typing import Any, Dict, List, Optional
+import asyncio
+import base64
+import contextvars
+import functools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .aggregates import Buckets, aggregate_docs
+from .retention import EXPIRES_AT_FIELD, PURGE_BATCH_SIZE
+from .scans import SegmentReader, merge_segments
+from .selectors import matches, normalize_sort, sort_docs
+
+
+# Worker pool the default async adapters run blocking driver calls on.
+# Bounded so a burst of slow round trips can't spawn unlimited threads;
+# sized by DATABASE_THREADPOOL_SIZE via configure_executor() when the
+# service factory runs.  Separate from the event loop's default
+# executor so DB I/O doesn't starve other run_in_executor users.
+DEFAULT_EXECUTOR_WORKERS = 16
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers: int = DEFAULT_EXECUTOR_WORKERS
+_executor_lock = threading.Lock()
+
+
+def configure_executor(max_workers: int) -> None:
+    """Set the size of the shared DB worker pool.
+
+    Only takes effect if the pool hasn't been created yet — resizing a
+    live ThreadPoolExecutor isn't supported, and the factory calls this
+    before the first request anyway.
+    """
+    global _executor_workers
+    with _executor_lock:
+        if _executor is None and max_workers and max_workers > 0:
+            _executor_workers = max_workers
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_executor_workers,
+                    thread_name_prefix="db-io",
+                )
+    return _executor
+
+
+# Page size find_iter / find_page use when the caller doesn't pass one.
+DEFAULT_PAGE_SIZE = 100
+
+
+def encode_cursor(state: Any) -> str:
+    """Pack backend paging state into an opaque, URL-safe cursor token."""
+    raw = json.dumps(state, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def expiry_epoch(expires_at: Any) -> float:
+    """Epoch seconds for an ``expires_at`` value.
+
+    Accepts a datetime (naive ones are UTC, as everywhere else in this
+    codebase) or a number of epoch seconds.
+    """
+    if isinstance(expires_at, datetime):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at.timestamp()
+    return float(expires_at)
+
+
+def decode_cursor(token: str, expected: type = object) -> Any:
+    """Inverse of :func:`encode_cursor`.
+
+    Raises ValueError on a bad token, including a well-formed one whose
+    state isn't an ``expected`` (a cursor from another backend, or one
+    a client made up).
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as exc:
+        raise ValueError(f"Invalid cursor: {token!r}") from exc
+    if not isinstance(state, expected):
+        raise ValueError(f"Invalid cursor: {token!r}")
+    return state
 
 
 class DatabaseService(abc.ABC):
-    """Abstract base class for a generic database service."""
+    """Abstract base class for a generic database service.
+
+    Every method has an ``a``-prefixed awaitable counterpart (``aget``,
+    ``asave``, ``afind``, ...) for use from ``async def`` code.  The
+    defaults run the synchronous method on a bounded worker pool so
+    the event loop never blocks on a round trip; backends with a
+    native async client override them.
+    """
+
+    # True when the backend deletes expired documents by itself (see
+    # services.database_service.retention); otherwise RetentionPurger
+    # calls purge_expired.
+    native_ttl = False
+
+    # True when a save carrying a stale ``_rev`` (or none, for a document
+    # that exists) fails with a conflict instead of overwriting, so
+    # read-modify-write cycles in several processes can't lose updates.
+    rejects_stale_writes = False
+
+    # True when aggregate runs server-side for equality selectors, so a
+    # few aggregate calls cost less than one pass over the documents.
+    # The default (and any backend that streams, e.g. for grouped
+    # queries) reads the matches once per call.
+    native_aggregate = False
+
+    # Default retention in seconds per collection (None: only documents
+    # saved with an explicit expires_at expire).  Set by
+    # configure_retention.
+    _retention: Dict[str, Optional[float]] = {}
+
+    # Segments list_all reads in parallel on backends that can split a
+    # full read (1: one sequential scan).  Set from
+    # DATABASE_SCAN_PARALLELISM by the factory.
+    scan_parallelism = 1
 
     @abc.abstractmethod
     def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
@@ -11,8 +135,20 @@ class DatabaseService(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def save(self, db_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
-        """Save (create or update) a document."""
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Save (create or update) a document.
+
+        ``expires_at`` (datetime or epoch seconds) marks the document for
+        deletion after that time; without it the collection's configured
+        retention, if any, applies.  Implementations call
+        :meth:`_stamp_expiry` before writing.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -25,12 +161,42 @@ class DatabaseService(abc.ABC):
         """List all documents in a database/collection."""
         raise NotImplementedError
 
+    def list_all_iter(
+        self,
+        db_name: str,
+        parallelism: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream every document in a collection.
+
+        With ``parallelism`` (default :attr:`scan_parallelism`) above 1,
+        backends that implement :meth:`_scan_segments` split the read
+        into that many segments and read them concurrently; documents
+        then arrive in no particular order.  Others just iterate
+        list_all.
+        """
+        segments = max(1, parallelism or self.scan_parallelism)
+        readers = self._scan_segments(db_name, segments)
+        if readers is None:
+            yield from self.list_all(db_name)
+            return
+        yield from merge_segments(readers, segments)
+
+    def _scan_segments(self, db_name: str, segments: int) -> Optional[List[SegmentReader]]:
+        """Split a full read of ``db_name`` into up to ``segments`` readers.
+
+        None means the backend can't read a collection in pieces.
+        Backends that can return one reader for ``segments == 1`` too,
+        and build list_all on :meth:`list_all_iter`.
+        """
+        return None
+
     def find(
         self,
         db_name: str,
         selector: Dict[str, Any],
         fields: Optional[List[str]] = None,
         limit: int = 10000,
+        sort: Optional[List[Any]] = None,
     ) -> List[Dict[str, Any]]:
         """Query documents matching a selector.
 
@@ -41,25 +207,190 @@ class DatabaseService(abc.ABC):
 
         Args:
             db_name:  Database / collection / table name.
-            selector: Dict of field → value equality filters.
+            selector: Dict of field → value or field → operator dict
+                      (``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$in``,
+                      ``$prefix``); see services.database_service.selectors.
             fields:   Optional list of fields to return (projection).
             limit:    Maximum number of documents to return.
+            sort:     Optional Mango-style sort, e.g. ``[{"ts": "desc"}]``.
+                      ``limit`` applies after sorting.
 
         Returns:
             List of matching documents (as dicts).
         """
-        all_docs = self.list_all(db_name)
+        order = normalize_sort(sort)
         results = []
-        for doc in all_docs:
-            if all(doc.get(k) == v for k, v in selector.items()):
-                if fields:
-                    results.append({f: doc.get(f) for f in fields})
-                else:
-                    results.append(doc)
-                if len(results) >= limit:
+        for doc in self.list_all(db_name):
+            if matches(doc, selector):
+                results.append(doc)
+                # Without a sort the first ``limit`` matches will do;
+                # with one every match has to be seen first.
+                if not order and len(results) >= limit:
                     break
+        if order:
+            results = sort_docs(results, order)[:limit]
+        if fields:
+            results = [{f: doc.get(f) for f in fields} for doc in results]
         return results
 
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Fetch one page of documents matching ``selector``.
+
+        Returns ``(docs, next_cursor)``.  Pass ``next_cursor`` back in to
+        get the following page; it is None once the results are
+        exhausted.  Cursors are opaque tokens, safe to hand to HTTP
+        clients, and only valid for the same ``db_name`` / ``selector``.
+
+        The default implementation pages over list_all, ordered by
+        ``_id``, so it still loads the whole collection per page.
+        Backends override this with their native paging (CouchDB
+        bookmarks, DynamoDB LastEvaluatedKey, Firestore start_after).
+        """
+        after = decode_cursor(cursor, str) if cursor else None
+        hits = sorted(
+            (
+                doc for doc in self.list_all(db_name)
+                if matches(doc, selector)
+                and (after is None or str(doc.get("_id")) > after)
+            ),
+            key=lambda doc: str(doc.get("_id")),
+        )
+        page = hits[:page_size]
+        if fields:
+            page = [{f: doc.get(f) for f in set(fields) | {"_id"}} for doc in page]
+        next_cursor = encode_cursor(str(page[-1]["_id"])) if len(hits) > page_size else None
+        return page, next_cursor
+
+    def find_iter(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream every document matching ``selector``, one page at a time.
+
+        Only one page is held in memory, so callers can walk
+        collections of any size.  Use :meth:`find_page` directly when
+        the cursor has to be handed back to a client.
+        """
+        while True:
+            page, cursor = self.find_page(db_name, selector, fields, page_size, cursor)
+            yield from page
+            if cursor is None:
+                return
+
+    def count(self, db_name: str, selector: Dict[str, Any]) -> int:
+        """Number of documents matching ``selector``."""
+        return self.aggregate(db_name, selector).get((), {}).get("count", 0)
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        """Count, sum and max over the matching documents, per group.
+
+        Returns ``{(group values...): {"count", "sum": {...}, "counts":
+        {...}, "max": {...}}}``; see services.database_service.aggregates
+        for the exact semantics.
+        Without ``group_by`` there is at most one bucket, keyed ``()``.
+
+        The default streams the matches a page at a time, projected to
+        just the fields involved, so document bodies never leave the
+        server.  Backends override this to aggregate server-side where
+        they can (CouchDB views, Firestore aggregation queries, SQL).
+        """
+        fields = list(dict.fromkeys([*group_by, *sum_fields, *max_fields])) or ["_id"]
+        return aggregate_docs(
+            self.find_iter(db_name, selector, fields=fields), group_by, sum_fields, max_fields
+        )
+
+    # ------------------------------------------------------------------
+    # Expiry (TTL).  See services.database_service.retention.
+    # ------------------------------------------------------------------
+
+    def configure_retention(self, policies: Dict[str, Optional[float]]) -> None:
+        """Set per-collection retention and enable TTL on those collections."""
+        self._retention = dict(policies)
+        for db_name in policies:
+            try:
+                self.enable_ttl(db_name)
+            except Exception as e:
+                # Best-effort — the purge job still removes expired docs.
+                print(f"Warning: failed to enable TTL on '{db_name}': {e}")
+
+    def enable_ttl(self, db_name: str) -> None:
+        """Turn on native expiry for a collection.
+
+        No-op by default.  DynamoDB overrides this to enable the table's
+        TTL attribute.
+        """
+        pass
+
+    def _expiry_value(self, epoch: float) -> Any:
+        """How EXPIRES_AT_FIELD is stored: epoch seconds by default."""
+        return int(epoch)
+
+    def _stamp_expiry(
+        self,
+        db_name: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[Any] = None,
+    ) -> Dict[str, Any]:
+        """Set EXPIRES_AT_FIELD on ``doc`` (in place) for a save.
+
+        An explicit ``expires_at`` wins; otherwise the collection's
+        retention counts from now.  With neither, ``doc`` is untouched,
+        so an expiry read back with the document is kept.
+        """
+        if expires_at is not None:
+            epoch = expiry_epoch(expires_at)
+        else:
+            retention = self._retention.get(db_name)
+            if retention is None:
+                return doc
+            epoch = time.time() + retention
+        doc[EXPIRES_AT_FIELD] = self._expiry_value(epoch)
+        return doc
+
+    def purge_expired(self, db_name: str, now: Optional[float] = None) -> int:
+        """Delete documents whose expiry has passed; returns how many.
+
+        Finds expired ids through an index on EXPIRES_AT_FIELD,
+        ``PURGE_BATCH_SIZE`` at a time, and removes each batch with
+        delete_many.  Used by RetentionPurger for backends without
+        native TTL.
+        """
+        cutoff = self._expiry_value(time.time() if now is None else now)
+        self.ensure_index(db_name, [EXPIRES_AT_FIELD], index_name="ttl-index")
+        removed = 0
+        while True:
+            expired = self.find(
+                db_name, {EXPIRES_AT_FIELD: {"$lt": cutoff}}, fields=["_id"], limit=PURGE_BATCH_SIZE,
+            )
+            if not expired:
+                return removed
+            ids = [doc["_id"] for doc in expired if doc.get("_id")]
+            results = self.delete_many(db_name, ids) if ids else []
+            deleted = sum(1 for r in results if r.get("ok"))
+            removed += deleted
+            # A short batch was the last; a batch that deleted nothing
+            # would just be found again.
+            if len(expired) < PURGE_BATCH_SIZE or not deleted:
+                return removed
+
     def ensure_index(
         self,
         db_name: str,
@@ -73,6 +404,26 @@ class DatabaseService(abc.ABC):
         """
         pass
 
+    def partition_key(self, db_name: str, value: str) -> str:
+        """The id prefix for documents whose partition field is ``value``.
+
+        Callers building ids as ``"{value}:..."`` (the data store's
+        ``"{userId}:{namespace}:{key}"``) use this for the leading part.
+        ``value`` unchanged by default; partitioned CouchDB databases
+        escape it so the whole value, colons included, is the partition.
+        """
+        return value
+
+    def provision(self, collections: Iterable[str]) -> None:
+        """Create or validate ``collections`` up front and keep their handles.
+
+        Called once when the service is built so the first request for
+        each collection doesn't pay for the existence check.  No-op by
+        default.  Backends with per-collection handles (CouchDB databases,
+        DynamoDB tables) override this to fill their handle registry.
+        """
+        pass
+
     # ------------------------------------------------------------------
     # Bulk APIs.  Default implementations loop the per-doc methods so
     # every backend works out of the box; backends that natively
@@ -156,4 +507,145 @@ class DatabaseService(abc.ABC):
                 out[doc_id] = self.get(db_name, doc_id)
             except Exception:
                 out[doc_id] = None
-        return out
\ No newline at end of file
+        return out
+
+    # ------------------------------------------------------------------
+    # Async APIs.  Route handlers and services running on the event
+    # loop must use these instead of the sync methods above — a sync
+    # call from ``async def`` stalls every concurrent request and SSE
+    # stream on the worker for the whole round trip.
+    # ------------------------------------------------------------------
+
+    async def _run_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking backend call on the shared DB worker pool.
+
+        The caller's contextvars are copied into the worker thread so
+        request-scoped state (the active trace, etc.) is still visible
+        to the backend code.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(
+            _get_executor(), functools.partial(ctx.run, fn, *args)
+        )
+
+    async def aget(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        """Awaitable :meth:`get`."""
+        return await self._run_sync(self.get, db_name, doc_id)
+
+    async def asave(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Awaitable :meth:`save`."""
+        if expires_at is None:
+            return await self._run_sync(self.save, db_name, doc_id, doc)
+        return await self._run_sync(
+            functools.partial(self.save, expires_at=expires_at), db_name, doc_id, doc
+        )
+
+    async def adelete(self, db_name: str, doc_id: str):
+        """Awaitable :meth:`delete`."""
+        return await self._run_sync(self.delete, db_name, doc_id)
+
+    async def alist_all(self, db_name: str) -> List[Dict[str, Any]]:
+        """Awaitable :meth:`list_all`."""
+        return await self._run_sync(self.list_all, db_name)
+
+    async def afind(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Awaitable :meth:`find`."""
+        return await self._run_sync(self.find, db_name, selector, fields, limit, sort)
+
+    async def afind_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Awaitable :meth:`find_page`."""
+        return await self._run_sync(self.find_page, db_name, selector, fields, page_size, cursor)
+
+    async def afind_iter(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async-iterator :meth:`find_iter`; each page is one awaited fetch."""
+        while True:
+            page, cursor = await self.afind_page(db_name, selector, fields, page_size, cursor)
+            for doc in page:
+                yield doc
+            if cursor is None:
+                return
+
+    async def acount(self, db_name: str, selector: Dict[str, Any]) -> int:
+        """Awaitable :meth:`count`."""
+        return await self._run_sync(self.count, db_name, selector)
+
+    async def aaggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        """Awaitable :meth:`aggregate`."""
+        return await self._run_sync(
+            self.aggregate, db_name, selector, group_by, sum_fields, max_fields
+        )
+
+    async def apurge_expired(self, db_name: str, now: Optional[float] = None) -> int:
+        """Awaitable :meth:`purge_expired`."""
+        return await self._run_sync(self.purge_expired, db_name, now)
+
+    async def aensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        """Awaitable :meth:`ensure_index`."""
+        return await self._run_sync(self.ensure_index, db_name, fields, index_name)
+
+    async def asave_many(
+        self,
+        db_name: str,
+        docs: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Awaitable :meth:`save_many`."""
+        return await self._run_sync(self.save_many, db_name, docs)
+
+    async def adelete_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Awaitable :meth:`delete_many`."""
+        return await self._run_sync(self.delete_many, db_name, doc_ids)
+
+    async def aget_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Awaitable :meth:`get_many`."""
+        return await self._run_sync(self.get_many, db_name, doc_ids)
+
+    async def aclose(self) -> None:
+        """Close connections held by a native async client; a no-op here."""
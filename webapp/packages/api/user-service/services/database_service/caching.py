@@ -0,0 +1,452 @@
+"""Read-through document cache in front of any DatabaseService.
+
+Some collections are read on nearly every request but rarely written:
+``agents`` and ``deployments`` on every ``/rest/{friendly_name}`` call
+and ``/providers`` listing, ``users`` twice per ``call_llm``.  Wrapping
+the backend in ``CachingDatabaseService`` serves repeated ``get`` /
+``get_many`` of those documents from process memory.
+
+Only collections named in the config are cached; everything else
+(``tickets``, ``user_sessions``, ``agent_data_store``...) passes
+straight through, so consistency-sensitive data is never served stale.
+
+Invalidation is write-through: ``save``/``delete``/``save_many``/
+``delete_many`` through this wrapper drop the affected entries before
+returning.  Writes made by *other* processes are only picked up when
+the entry's TTL expires, so TTLs should stay short (tens of seconds)
+in multi-replica deployments.  A stale cached ``_rev`` surfaces as a
+normal 409 on the next save, which callers already handle.
+
+Queries (``find``, ``find_page``, ``list_all``) are never cached — they
+pass through.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .aggregates import Buckets
+from .base import DEFAULT_PAGE_SIZE, DatabaseService
+
+
+@dataclass
+class CachePolicy:
+    """Per-collection cache limits."""
+    ttl_seconds: float = 60.0
+    max_entries: int = 1000
+
+
+def parse_cache_config(spec: Optional[str]) -> Dict[str, CachePolicy]:
+    """Parse ``DATABASE_CACHE_COLLECTIONS``.
+
+    Format is a comma-separated list of ``name[:ttl_seconds[:max_entries]]``,
+    e.g. ``"agents:60:2000,deployments:60,users:15:5000"``.  Omitted
+    values take the ``CachePolicy`` defaults.  Malformed entries are
+    skipped with a warning rather than failing startup.
+    """
+    policies: Dict[str, CachePolicy] = {}
+    for raw in (spec or "").split(","):
+        raw = raw.strip()
+        if not raw:
+            continue
+        parts = raw.split(":")
+        try:
+            policy = CachePolicy()
+            if len(parts) > 1 and parts[1]:
+                policy.ttl_seconds = float(parts[1])
+            if len(parts) > 2 and parts[2]:
+                policy.max_entries = int(parts[2])
+        except ValueError:
+            print(f"Warning: ignoring malformed cache config entry '{raw}'")
+            continue
+        policies[parts[0]] = policy
+    return policies
+
+
+class _CollectionCache:
+    """LRU + TTL map for one collection, with hit/miss counters."""
+
+    def __init__(self, policy: CachePolicy) -> None:
+        self.policy = policy
+        # doc_id -> (expires_at, doc)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped on every invalidation.  A read that started before a
+        # concurrent write must not repopulate the entry with the old
+        # document, so fills are dropped if the generation moved.
+        self.generation = 0
+
+    def get(self, doc_id: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(doc_id)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del self._entries[doc_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(doc_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, doc_id: str, doc: Dict[str, Any], now: float) -> None:
+        self._entries[doc_id] = (now + self.policy.ttl_seconds, doc)
+        self._entries.move_to_end(doc_id)
+        while len(self._entries) > self.policy.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, doc_id: str) -> None:
+        self._entries.pop(doc_id, None)
+        self.generation += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+
+class CachingDatabaseService(DatabaseService):
+    """DatabaseService wrapper that caches ``get``/``get_many`` per collection.
+
+    Cached documents are deep-copied on the way in and out: callers
+    routinely mutate the dict they get back (access tracking, merges
+    before save) and must not corrupt the cached copy.
+    """
+
+    def __init__(self, inner: DatabaseService, policies: Dict[str, CachePolicy]):
+        self.inner = inner
+        self._caches: Dict[str, _CollectionCache] = {
+            name: _CollectionCache(policy) for name, policy in policies.items()
+        }
+        # Sync methods run on the DB worker pool, so the caches are
+        # touched from several threads at once.
+        self._lock = threading.Lock()
+
+    # --- cache plumbing ----------------------------------------------------
+
+    def _lookup(self, db_name: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        cache = self._caches.get(db_name)
+        if cache is None:
+            return None
+        with self._lock:
+            doc = cache.get(doc_id, time.monotonic())
+        return copy.deepcopy(doc) if doc is not None else None
+
+    def _generation(self, db_name: str) -> int:
+        cache = self._caches.get(db_name)
+        if cache is None:
+            return 0
+        with self._lock:
+            return cache.generation
+
+    def _store(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Optional[Dict[str, Any]],
+        generation: int,
+    ) -> None:
+        cache = self._caches.get(db_name)
+        if cache is None or doc is None:
+            return
+        snapshot = copy.deepcopy(doc)
+        with self._lock:
+            if cache.generation == generation:
+                cache.put(doc_id, snapshot, time.monotonic())
+
+    def _invalidate(self, db_name: str, doc_ids: List[Optional[str]]) -> None:
+        cache = self._caches.get(db_name)
+        if cache is None:
+            return
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id:
+                    cache.pop(doc_id)
+
+    def _split_cached(
+        self, db_name: str, doc_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        hits: Dict[str, Dict[str, Any]] = {}
+        misses: List[str] = []
+        for doc_id in doc_ids:
+            doc = self._lookup(db_name, doc_id)
+            if doc is None:
+                misses.append(doc_id)
+            else:
+                hits[doc_id] = doc
+        return hits, misses
+
+    def is_cached(self, db_name: str) -> bool:
+        return db_name in self._caches
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-collection ``{hits, misses, evictions, size}`` counters."""
+        with self._lock:
+            return {name: cache.stats() for name, cache in self._caches.items()}
+
+    def clear_cache(self, db_name: Optional[str] = None) -> None:
+        """Drop every cached entry (or just one collection's)."""
+        with self._lock:
+            for name, cache in self._caches.items():
+                if db_name is None or name == db_name:
+                    cache.clear()
+
+    # --- sync API ----------------------------------------------------------
+
+    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        cached = self._lookup(db_name, doc_id)
+        if cached is not None:
+            return cached
+        generation = self._generation(db_name)
+        doc = self.inner.get(db_name, doc_id)
+        self._store(db_name, doc_id, doc, generation)
+        return doc
+
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        try:
+            return self.inner.save(db_name, doc_id, doc, expires_at=expires_at)
+        finally:
+            self._invalidate(db_name, [doc_id])
+
+    def delete(self, db_name: str, doc_id: str):
+        try:
+            return self.inner.delete(db_name, doc_id)
+        finally:
+            self._invalidate(db_name, [doc_id])
+
+    def list_all(self, db_name: str) -> List[Dict[str, Any]]:
+        return self.inner.list_all(db_name)
+
+    def list_all_iter(
+        self,
+        db_name: str,
+        parallelism: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        return self.inner.list_all_iter(db_name, parallelism)
+
+    def find(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.inner.find(db_name, selector, fields, limit, sort)
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return self.inner.find_page(db_name, selector, fields, page_size, cursor)
+
+    def count(self, db_name: str, selector: Dict[str, Any]) -> int:
+        return self.inner.count(db_name, selector)
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        return self.inner.aggregate(db_name, selector, group_by, sum_fields, max_fields)
+
+    def ensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        return self.inner.ensure_index(db_name, fields, index_name)
+
+    def partition_key(self, db_name: str, value: str) -> str:
+        return self.inner.partition_key(db_name, value)
+
+    def provision(self, collections: Iterable[str]) -> None:
+        return self.inner.provision(collections)
+
+    @property
+    def native_ttl(self) -> bool:  # type: ignore[override]
+        return self.inner.native_ttl
+
+    @property
+    def native_aggregate(self) -> bool:  # type: ignore[override]
+        return self.inner.native_aggregate
+
+    @property
+    def rejects_stale_writes(self) -> bool:  # type: ignore[override]
+        return self.inner.rejects_stale_writes
+
+    def configure_retention(self, policies: Dict[str, Optional[float]]) -> None:
+        return self.inner.configure_retention(policies)
+
+    def enable_ttl(self, db_name: str) -> None:
+        return self.inner.enable_ttl(db_name)
+
+    def purge_expired(self, db_name: str, now: Optional[float] = None) -> int:
+        removed = self.inner.purge_expired(db_name, now)
+        if removed:
+            # The deleted ids aren't known here; drop the collection.
+            self.clear_cache(db_name)
+        return removed
+
+    def save_many(self, db_name: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        try:
+            return self.inner.save_many(db_name, docs)
+        finally:
+            self._invalidate(db_name, [d.get("_id") for d in docs])
+
+    def delete_many(self, db_name: str, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        try:
+            return self.inner.delete_many(db_name, doc_ids)
+        finally:
+            self._invalidate(db_name, doc_ids)
+
+    def get_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not self.is_cached(db_name):
+            return self.inner.get_many(db_name, doc_ids)
+        hits, misses = self._split_cached(db_name, doc_ids)
+        generation = self._generation(db_name)
+        fetched = self.inner.get_many(db_name, misses) if misses else {}
+        for doc_id, doc in fetched.items():
+            self._store(db_name, doc_id, doc, generation)
+        return {doc_id: hits.get(doc_id, fetched.get(doc_id)) for doc_id in doc_ids}
+
+    # --- async API ---------------------------------------------------------
+    # Delegate to the inner backend's async methods so a native async
+    # client keeps working behind the cache.
+
+    async def aget(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        cached = self._lookup(db_name, doc_id)
+        if cached is not None:
+            return cached
+        generation = self._generation(db_name)
+        doc = await self.inner.aget(db_name, doc_id)
+        self._store(db_name, doc_id, doc, generation)
+        return doc
+
+    async def asave(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        try:
+            return await self.inner.asave(db_name, doc_id, doc, expires_at=expires_at)
+        finally:
+            self._invalidate(db_name, [doc_id])
+
+    async def adelete(self, db_name: str, doc_id: str):
+        try:
+            return await self.inner.adelete(db_name, doc_id)
+        finally:
+            self._invalidate(db_name, [doc_id])
+
+    async def alist_all(self, db_name: str) -> List[Dict[str, Any]]:
+        return await self.inner.alist_all(db_name)
+
+    async def afind(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self.inner.afind(db_name, selector, fields, limit, sort)
+
+    async def afind_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await self.inner.afind_page(db_name, selector, fields, page_size, cursor)
+
+    async def acount(self, db_name: str, selector: Dict[str, Any]) -> int:
+        return await self.inner.acount(db_name, selector)
+
+    async def aaggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        return await self.inner.aaggregate(db_name, selector, group_by, sum_fields, max_fields)
+
+    async def aensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        return await self.inner.aensure_index(db_name, fields, index_name)
+
+    async def apurge_expired(self, db_name: str, now: Optional[float] = None) -> int:
+        removed = await self.inner.apurge_expired(db_name, now)
+        if removed:
+            self.clear_cache(db_name)
+        return removed
+
+    async def asave_many(self, db_name: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        try:
+            return await self.inner.asave_many(db_name, docs)
+        finally:
+            self._invalidate(db_name, [d.get("_id") for d in docs])
+
+    async def adelete_many(self, db_name: str, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        try:
+            return await self.inner.adelete_many(db_name, doc_ids)
+        finally:
+            self._invalidate(db_name, doc_ids)
+
+    async def aget_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not self.is_cached(db_name):
+            return await self.inner.aget_many(db_name, doc_ids)
+        hits, misses = self._split_cached(db_name, doc_ids)
+        generation = self._generation(db_name)
+        fetched = await self.inner.aget_many(db_name, misses) if misses else {}
+        for doc_id, doc in fetched.items():
+            self._store(db_name, doc_id, doc, generation)
+        return {doc_id: hits.get(doc_id, fetched.get(doc_id)) for doc_id in doc_ids}
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -1,12 +1,77 @@
-from typing import Any, Dict, List, Optional
+import functools
+import hashlib
+import json
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from fastapi import HTTPException
 import couchdb
-from .base import DatabaseService
+from .aggregates import Buckets, group_key, merge, new_bucket
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, decode_cursor, encode_cursor
+from .instrumentation import note_query
+from .scans import SCAN_PAGE_SIZE, SegmentReader
+from .selectors import PREFIX_UPPER_BOUND, conditions, effective_sort, equality_value
+
+# Aggregate views live one per design doc, so adding a new aggregate
+# shape never invalidates (and rebuilds) the indexes of the others.
+AGGREGATE_DDOC_PREFIX = "_design/gofannon-agg-"
+
+# Error CouchDB answers a Mango sort with when no index covers it.
+NO_USABLE_INDEX = "no_usable_index"
+
+# Suffix of the temporary database migrate_to_partitioned copies through.
+MIGRATION_SUFFIX = "__partitioning"
+
+
+def parse_partitioned_config(spec: Optional[str]) -> Dict[str, str]:
+    """Parse ``COUCHDB_PARTITIONED_DATABASES``, e.g. ``"agent_data_store:userId"``.
+
+    Each entry names a database to create partitioned and the document
+    field whose value starts every id in it (``"{userId}:..."``).
+    """
+    partitioned: Dict[str, str] = {}
+    for entry in (spec or "").split(","):
+        name, _, field = entry.strip().partition(":")
+        if name.strip() and field.strip():
+            partitioned[name.strip()] = field.strip()
+        elif entry.strip():
+            print(f"Warning: ignoring invalid COUCHDB_PARTITIONED_DATABASES entry '{entry.strip()}'")
+    return partitioned
+
+
+def encode_partition(value: str) -> str:
+    """``value`` as a CouchDB partition name: ``%``, ``:`` and a leading ``_`` escaped.
+
+    A partition ends at the id's first colon and can't start with
+    ``_``, so user ids like ``"github:42"`` are escaped (to
+    ``"github%3A42"``) rather than cut, which would put every user of
+    one auth provider in the same partition.
+    """
+    encoded = value.replace("%", "%25").replace(":", "%3A")
+    return "%5F" + encoded[1:] if encoded.startswith("_") else encoded
+
+
+def _with_partitioned_id(doc: Dict[str, Any], field: str) -> Dict[str, Any]:
+    """``doc`` with a ``"{doc[field]}:"`` id prefix replaced by its encoded partition."""
+    value = doc.get(field)
+    if not isinstance(value, str) or not value or not doc["_id"].startswith(value + ":"):
+        return doc
+    return dict(doc, _id=encode_partition(value) + doc["_id"][len(value):])
 
 
 class CouchDBService(DatabaseService):
     """CouchDB implementation of the DatabaseService."""
 
+    # Databases configured as partitioned -> the field holding the
+    # partition (see _partition_for).
+    _partition_fields: Dict[str, str] = {}
+
+    # Saves are checked against the document's _rev (409 on mismatch).
+    rejects_stale_writes = True
+
+    # Equality selectors aggregate through incrementally built views.
+    native_aggregate = True
+
     def __init__(self, url: str, user: str, password: str, settings):
         try:
             self.server = couchdb.Server(url)
@@ -23,12 +88,170 @@ class CouchDBService(DatabaseService):
         # Key: (db_name, tuple(sorted(fields)))
         self._ensured_indexes: set = set()
 
+        # Collection registry: database handles that have been validated
+        # or created this process lifetime.  ``server[name]`` costs a HEAD
+        # request, so it is only paid once per database, and again only
+        # if an operation reports the database missing.
+        self._dbs: Dict[str, couchdb.Database] = {}
+        self._dbs_lock = threading.Lock()
+
+        # Partitioned databases: configured ones are created partitioned;
+        # _partitioned holds those confirmed partitioned on open (an
+        # existing global database stays global until migrated).
+        self._partition_fields = parse_partitioned_config(
+            getattr(settings, "COUCHDB_PARTITIONED_DATABASES", None)
+        )
+        self._partitioned: set = set()
+
     def _get_or_create_db(self, db_name: str):
+        db = self._dbs.get(db_name)
+        if db is not None:
+            return db
+        with self._dbs_lock:
+            db = self._dbs.get(db_name)
+            if db is None:
+                try:
+                    db = self.server[db_name]
+                except couchdb.http.ResourceNotFound:
+                    print(f"Database '{db_name}' not found. Creating it.")
+                    db = self._create_db(db_name, partitioned=db_name in self._partition_fields)
+                if db_name in self._partition_fields:
+                    self._check_partitioned(db_name, db)
+                self._dbs[db_name] = db
+            return db
+
+    def _create_db(self, db_name: str, partitioned: bool = False):
         try:
-            return self.server[db_name]
-        except couchdb.http.ResourceNotFound:
-            print(f"Database '{db_name}' not found. Creating it.")
+            if partitioned:
+                self.server.resource.put_json([db_name], partitioned=True)
+                return self.server[db_name]
             return self.server.create(db_name)
+        except couchdb.http.PreconditionFailed:
+            # Another process created it first.
+            return self.server[db_name]
+
+    def _check_partitioned(self, db_name: str, db) -> None:
+        if db.info().get("props", {}).get("partitioned"):
+            self._partitioned.add(db_name)
+        else:
+            self._partitioned.discard(db_name)
+            print(
+                f"Warning: '{db_name}' is configured as partitioned but is a global "
+                f"database; run `python -m services.database_service.couchdb_migrate "
+                f"{db_name}` to convert it."
+            )
+
+    def _is_partitioned(self, db_name: str) -> bool:
+        self._get_or_create_db(db_name)
+        return db_name in self._partitioned
+
+    def _partition_for(self, db_name: str, selector: Dict[str, Any]) -> Optional[str]:
+        """The partition a query is confined to, or None for a global query.
+
+        A partitioned database's ids start with ``"{partition}:"``; the
+        data store's are ``"{partition_key(userId)}:{namespace}:{key}"``,
+        so a selector pinning ``userId`` only needs that user's partition.
+        """
+        field = self._partition_fields.get(db_name)
+        if field is None or not self._is_partitioned(db_name):
+            return None
+        pinned, value = equality_value(selector, field)
+        if not pinned or not isinstance(value, str) or not value:
+            return None
+        return encode_partition(value)
+
+    def partition_key(self, db_name: str, value: str) -> str:
+        if db_name in self._partition_fields and self._is_partitioned(db_name):
+            return encode_partition(value)
+        return value
+
+    @staticmethod
+    def _is_missing_db(exc: Exception) -> bool:
+        """True if ``exc`` says the database itself (not a doc) is missing."""
+        if not isinstance(exc, couchdb.http.ResourceNotFound):
+            return False
+        reason = exc.args[0][1] if exc.args and isinstance(exc.args[0], tuple) else str(exc)
+        return "database does not exist" in str(reason).lower() or "no_db_file" in str(exc)
+
+    def migrate_to_partitioned(self, db_name: str) -> int:
+        """Rebuild a global database as a partitioned one; returns the docs moved.
+
+        CouchDB can't partition a database in place, so the documents
+        (with their revisions, design docs excluded) are copied to a
+        partitioned ``{db_name}__partitioning`` database, the original is
+        dropped and recreated partitioned, and the copy is moved back.
+        Ids that start with ``"{field}:"`` (the configured partition
+        field's value, e.g. the data store's ``"{userId}:..."``) are
+        rewritten to start with that value escaped by
+        :func:`encode_partition`, as :meth:`partition_key` builds them
+        once the database is partitioned.  Every other id must already
+        carry a ``"{partition}:"`` prefix; if any doesn't, the migration
+        stops before touching the original.
+
+        Writes made to the database while this runs are lost, so stop
+        the app first.  Indexes are re-created on the next query.
+        """
+        temp_name = db_name + MIGRATION_SUFFIX
+        source = self._get_or_create_db(db_name)
+        if source.info().get("props", {}).get("partitioned"):
+            print(f"'{db_name}' is already partitioned.")
+            return 0
+        if temp_name in self.server:
+            del self.server[temp_name]
+        temp = self._create_db(temp_name, partitioned=True)
+
+        try:
+            moved = self._copy_docs(source, temp, self._partition_fields.get(db_name))
+        except Exception:
+            del self.server[temp_name]
+            raise
+        with self._dbs_lock:
+            del self.server[db_name]
+            self._dbs.pop(db_name, None)
+            self._create_db(db_name, partitioned=True)
+        self._ensured_indexes = {k for k in self._ensured_indexes if k[0] != db_name}
+        self._copy_docs(temp, self._get_or_create_db(db_name))
+        del self.server[temp_name]
+        return moved
+
+    @staticmethod
+    def _copy_docs(source, target, field: Optional[str] = None) -> int:
+        copied = 0
+        options: Dict[str, Any] = {"include_docs": True, "limit": SCAN_PAGE_SIZE}
+        while True:
+            rows = list(source.view("_all_docs", **options))
+            docs = [dict(row.doc) for row in rows if row.doc is not None and not row.id.startswith("_design/")]
+            if field is not None:
+                docs = [_with_partitioned_id(doc, field) for doc in docs]
+            unkeyed = [doc["_id"] for doc in docs if not all(doc["_id"].partition(":")[::2])]
+            if unkeyed:
+                raise ValueError(f"Document ids without a partition prefix: {unkeyed[:5]}")
+            if docs:
+                # new_edits=False keeps each document's revision.
+                target.update(docs, new_edits=False)
+                copied += len(docs)
+            if len(rows) < SCAN_PAGE_SIZE:
+                return copied
+            options.update(startkey=rows[-1].id, skip=1)
+
+    def _with_db(self, db_name: str, fn: Callable[[Any], Any]) -> Any:
+        """Run ``fn(db)``; if the database vanished, re-provision and retry once."""
+        try:
+            return fn(self._get_or_create_db(db_name))
+        except couchdb.http.ResourceNotFound as exc:
+            if not self._is_missing_db(exc):
+                raise
+            self._dbs.pop(db_name, None)
+            self._ensured_indexes = {k for k in self._ensured_indexes if k[0] != db_name}
+            return fn(self._get_or_create_db(db_name))
+
+    def provision(self, collections: Iterable[str]) -> None:
+        """Open (creating if needed) each database and register its handle."""
+        for db_name in collections:
+            try:
+                self._get_or_create_db(db_name)
+            except Exception as e:
+                print(f"Warning: failed to provision database '{db_name}': {e}")
 
     def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
         db = self._get_or_create_db(db_name)
@@ -37,7 +260,13 @@ class CouchDBService(DatabaseService):
             raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
         return dict(doc)
 
-    def save(self, db_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
         """Save a document.
 
         Caller is responsible for providing ``_rev`` when updating an
@@ -49,7 +278,7 @@ class CouchDBService(DatabaseService):
         that wants the safety of automatic rev resolution should call
         ``DataStoreService.set()``, which handles conflict retry.
         """
-        db = self._get_or_create_db(db_name)
+        self._stamp_expiry(db_name, doc, expires_at)
         doc["_id"] = doc_id
         # If the doc has a _rev='', that's a serialization artifact;
         # treat it the same as missing.
@@ -57,23 +286,68 @@ class CouchDBService(DatabaseService):
             doc.pop("_rev", None)
 
         try:
-            saved_id, rev = db.save(doc)
+            saved_id, rev = self._with_db(db_name, lambda db: db.save(doc))
             return {"id": saved_id, "rev": rev}
         except couchdb.http.ResourceConflict as e:
             raise HTTPException(status_code=409, detail=f"Document update conflict: {e}")
 
     def delete(self, db_name: str, doc_id: str):
-        db = self._get_or_create_db(db_name)
-        if doc_id in db:
-            doc = db[doc_id]
-            db.delete(doc)
-        else:
+        def _delete(db) -> bool:
+            if doc_id not in db:
+                return False
+            db.delete(db[doc_id])
+            return True
+
+        if not self._with_db(db_name, _delete):
              raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
 
     def list_all(self, db_name: str) -> List[Dict[str, Any]]:
-        db = self._get_or_create_db(db_name)
-        # Using a simple all-docs query. For more complex queries, a view would be needed.
-        return [dict(row.doc) for row in db.view('_all_docs', include_docs=True)]
+        return list(self.list_all_iter(db_name))
+
+    def _scan_segments(self, db_name: str, segments: int) -> List[SegmentReader]:
+        """Split ``_all_docs`` into key ranges of roughly equal size.
+
+        Boundaries are the ids found at ``total_rows / segments``
+        offsets, one ``limit=1&skip=`` request each, so the ranges
+        follow the actual key distribution.
+        """
+        bounds: List[Optional[str]] = [None]
+        if segments > 1:
+            total = self._with_db(db_name, lambda db: db.view('_all_docs', limit=0).total_rows)
+            step = total // segments
+            for i in range(1, segments if step else 0):
+                rows = self._with_db(
+                    db_name, lambda db: list(db.view('_all_docs', limit=1, skip=i * step))
+                )
+                if rows and rows[0].id != bounds[-1]:
+                    bounds.append(rows[0].id)
+        bounds.append(None)
+        return [
+            functools.partial(self._all_docs_pages, db_name, start, end)
+            for start, end in zip(bounds, bounds[1:])
+        ]
+
+    def _all_docs_pages(
+        self,
+        db_name: str,
+        start: Optional[str],
+        end: Optional[str],
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """``_all_docs`` rows with ``start <= id < end``, a page at a time."""
+        options: Dict[str, Any] = {"include_docs": True, "limit": SCAN_PAGE_SIZE}
+        if start is not None:
+            options["startkey"] = start
+        if end is not None:
+            options.update(endkey=end, inclusive_end=False)
+        while True:
+            rows = self._with_db(db_name, lambda db: list(db.view('_all_docs', **options)))
+            page = [dict(row.doc) for row in rows if row.doc is not None]
+            if page:
+                yield page
+            if len(rows) < SCAN_PAGE_SIZE:
+                return
+            # Resume after the last id seen.
+            options.update(startkey=rows[-1].id, skip=1)
 
     def find(
         self,
@@ -81,24 +355,277 @@ class CouchDBService(DatabaseService):
         selector: Dict[str, Any],
         fields: Optional[List[str]] = None,
         limit: int = 10000,
+        sort: Optional[List[Any]] = None,
     ) -> List[Dict[str, Any]]:
         """Query using CouchDB Mango selector (uses indexes instead of full scan).
 
-        Falls back to the base-class in-Python filter if the Mango
-        request fails for any reason (e.g. missing _find endpoint on
-        an old CouchDB version).
+        Range and ``$in`` operators are native Mango; ``$prefix`` becomes
+        a ``$gte``/``$lt`` range so it can use an index too.  ``sort``
+        is passed through as a Mango sort, which needs an index covering
+        the sort fields.
+
+        Falls back to the base-class in-Python filter only when CouchDB
+        has no index for the requested sort (``no_usable_index``); the
+        fallback is warned about and noted for the slow-query log.  Any
+        other error is raised.
         """
+        query = self._mango_query(selector, fields, limit, sort)
         try:
-            db = self._get_or_create_db(db_name)
-            query: Dict[str, Any] = {"selector": selector, "limit": limit}
-            if fields:
-                # Always include _id so callers can identify docs
-                field_set = set(fields) | {"_id"}
-                query["fields"] = list(field_set)
-            return [dict(row) for row in db.find(query)]
+            data = self._post_find(db_name, query, self._partition_for(db_name, selector))
+        except couchdb.http.ServerError as e:
+            if not self._is_no_usable_index(e):
+                raise
+            return self._find_without_index(db_name, selector, fields, limit, sort, e)
+        return [dict(doc) for doc in data.get("docs", [])]
+
+    @staticmethod
+    def _is_no_usable_index(exc: couchdb.http.ServerError) -> bool:
+        """True if ``exc`` is Mango refusing a sort no index covers."""
+        status, error = exc.args[0] if exc.args and isinstance(exc.args[0], tuple) else (None, None)
+        return isinstance(error, tuple) and error[0] == NO_USABLE_INDEX
+
+    def _find_without_index(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]],
+        limit: int,
+        sort: Optional[List[Any]],
+        exc: Exception,
+    ) -> List[Dict[str, Any]]:
+        print(f"Warning: CouchDB has no index for a query on '{db_name}', falling back to list_all filter: {exc}")
+        note_query(fallback="list_all", scan=True)
+        return super().find(db_name, selector, fields, limit, sort)
+
+    def _post_find(
+        self,
+        db_name: str,
+        query: Dict[str, Any],
+        partition: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """POST a Mango query with ``execution_stats`` and report them.
+
+        With a ``partition`` the query goes to ``_partition/{p}/_find``
+        and only reads that partition's shard and partitioned indexes.
+
+        CouchDB answers a query no index can serve by scanning
+        ``_all_docs`` and adding a ``warning`` to the response; that
+        is reported as a scan so it shows up in the slow-query log.
+        """
+        body = dict(query, execution_stats=True)
+        path: Any = ["_partition", partition, "_find"] if partition else "_find"
+        _, _, data = self._with_db(db_name, lambda db: db.resource.post_json(path, body=body))
+        return self._report_find(db_name, data)
+
+    @staticmethod
+    def _report_find(db_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        warning = data.get("warning") or ""
+        no_index = "no matching index" in warning.lower()
+        if no_index:
+            print(f"Warning: CouchDB query on '{db_name}' used no index: {warning}")
+        note_query(
+            scan=no_index,
+            index=None if no_index else "mango",
+            execution_stats=data.get("execution_stats"),
+        )
+        return data
+
+    @staticmethod
+    def _mango_selector(selector: Dict[str, Any]) -> Dict[str, Any]:
+        """Translate the shared selector language to a Mango selector."""
+        mango: Dict[str, Any] = {}
+        for field, value in selector.items():
+            conds = conditions(value)
+            if set(conds) == {"$eq"}:
+                mango[field] = conds["$eq"]
+                continue
+            clause: Dict[str, Any] = {}
+            for op, operand in conds.items():
+                if op == "$prefix":
+                    clause["$gte"] = operand
+                    clause["$lt"] = operand + PREFIX_UPPER_BOUND
+                else:
+                    clause[op] = operand
+            mango[field] = clause
+        return mango
+
+    @classmethod
+    def _mango_query(
+        cls,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]],
+        limit: int,
+        sort: Optional[List[Any]] = None,
+    ) -> Dict[str, Any]:
+        query: Dict[str, Any] = {"selector": cls._mango_selector(selector), "limit": limit}
+        if fields:
+            # Always include _id so callers can identify docs
+            field_set = set(fields) | {"_id"}
+            query["fields"] = list(field_set)
+        order = effective_sort(selector, sort)
+        if order:
+            query["sort"] = [{f: "desc" if desc else "asc"} for f, desc in order]
+            # Mango only uses an index for a sort when the sorted fields
+            # appear in the selector.
+            for field, _ in order:
+                query["selector"].setdefault(field, {"$exists": True})
+        return query
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of a Mango query; the cursor wraps CouchDB's ``bookmark``.
+
+        Unlike find there is no list_all fallback: a cursor from one
+        paging scheme can't be resumed by another.
+        """
+        query = self._mango_query(selector, fields, page_size)
+        if cursor:
+            query["bookmark"] = decode_cursor(cursor, str)
+        data = self._post_find(db_name, query, self._partition_for(db_name, selector))
+        return self._find_result_page(data, page_size)
+
+    @staticmethod
+    def _find_result_page(
+        data: Dict[str, Any],
+        page_size: int,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        docs = [dict(doc) for doc in data.get("docs", [])]
+        bookmark = data.get("bookmark")
+        # A short page means the result set is exhausted; otherwise the
+        # bookmark resumes right after the last doc returned.
+        next_cursor = encode_cursor(bookmark) if bookmark and len(docs) == page_size else None
+        return docs, next_cursor
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        """Aggregate through map/reduce views keyed on the selector fields.
+
+        Works when the selector is pure equality: the view key is the
+        selector fields followed by ``group_by``, so one reduced query
+        over that key range returns every group.  Counts, sums and how
+        many documents had a number to sum come from a ``_stats`` (or
+        ``_count``) view per sum field; each max is the last key of a
+        view that appends the field to the key, read with
+        ``descending`` and ``limit=1`` per group.  Views are created
+        on first use and CouchDB keeps them current incrementally.
+        Anything else streams via the default implementation.
+        """
+        eq_fields = sorted(selector)
+        eq_values: List[Any] = []
+        for field in eq_fields:
+            pinned, value = equality_value(selector, field)
+            if not pinned or isinstance(value, (dict, list)):
+                return super().aggregate(db_name, selector, group_by, sum_fields, max_fields)
+            eq_values.append(value)
+        key_fields = [*eq_fields, *group_by]
+        try:
+            buckets: Buckets = {}
+            for i, field in enumerate(sum_fields or [None]):
+                view = self._aggregate_view(db_name, key_fields, "_stats" if field else "_count", field)
+                rows = self._query_view(db_name, view, {
+                    "start_key": eq_values,
+                    "end_key": [*eq_values, {}],
+                    "reduce": True,
+                    **({"group_level": len(key_fields)} if key_fields else {}),
+                })
+                for row in rows:
+                    key = group_key(dict(zip(group_by, (row["key"] or [])[len(eq_fields):])), group_by)
+                    # A _stats view emits [value, 1] for numbers and
+                    # [0, 0] otherwise: one stats object per element.
+                    stats, numeric = row["value"] if field else (row["value"], None)
+                    if key not in buckets:
+                        bucket = new_bucket(sum_fields, max_fields)
+                        bucket["count"] = stats["count"] if field else stats
+                        merge(buckets, key, bucket)
+                    if field:
+                        buckets[key]["sum"][field] += stats["sum"]
+                        buckets[key]["counts"][field] += int(numeric["sum"])
+            for field in max_fields:
+                view = self._aggregate_view(db_name, key_fields, "max", field)
+                for key, bucket in buckets.items():
+                    prefix = [*eq_values, *key]
+                    rows = self._query_view(db_name, view, {
+                        "start_key": [*prefix, {}],
+                        "end_key": prefix,
+                        "descending": True,
+                        "limit": 1,
+                    })
+                    if rows:
+                        bucket["max"][field] = rows[0]["key"][-1]
+            return {key: bucket for key, bucket in buckets.items() if bucket["count"]}
         except Exception as e:
-            print(f"CouchDB Mango find failed, falling back to list_all filter: {e}")
-            return super().find(db_name, selector, fields, limit)
+            print(f"CouchDB aggregate view failed, falling back to streaming: {e}")
+            note_query(fallback="find_iter")
+            return super().aggregate(db_name, selector, group_by, sum_fields, max_fields)
+
+    def _aggregate_view(
+        self,
+        db_name: str,
+        key_fields: List[str],
+        kind: str,
+        field: Optional[str],
+    ) -> str:
+        """Create (once) the design doc for one aggregate shape; returns its id.
+
+        ``kind`` is ``_count``, ``_stats`` (emits ``[field, 1]`` when
+        numeric, else ``[0, 0]``) or ``max`` (appends ``field`` to the key when it is a
+        number or string; no reduce).
+        """
+        # The trailing 2 marks the [value, flag] _stats map, so those
+        # views get new design docs instead of reusing scalar ones.
+        spec = json.dumps([key_fields, kind, field, *([2] if kind == "_stats" else [])])
+        ddoc_id = AGGREGATE_DDOC_PREFIX + hashlib.sha1(spec.encode()).hexdigest()[:16]
+        cache_key = (db_name, ("view", ddoc_id))
+        if cache_key in self._ensured_indexes:
+            return ddoc_id
+
+        def value(name: str) -> str:
+            ref = f"doc[{json.dumps(name)}]"
+            return f"({ref} === undefined ? null : {ref})"
+
+        key = ", ".join(value(f) for f in key_fields)
+        if kind == "max":
+            body = (
+                f"var v = {value(field)}; "
+                f"if (typeof v === 'number' || typeof v === 'string') emit([{key}, v], null);"
+            )
+            view: Dict[str, Any] = {"map": f"function (doc) {{ {body} }}"}
+        else:
+            emitted = f"(typeof {value(field)} === 'number' ? [{value(field)}, 1] : [0, 0])" if field else "null"
+            view = {"map": f"function (doc) {{ emit([{key}], {emitted}); }}", "reduce": kind}
+        ddoc: Dict[str, Any] = {"language": "javascript", "views": {"v": view}}
+        if db_name in self._partition_fields:
+            # Design docs default to partitioned in a partitioned
+            # database, and those views can't be queried globally.
+            ddoc["options"] = {"partitioned": False}
+        try:
+            # Path segments, not one string: python-couchdb escapes "/"
+            # inside a segment, which CouchDB wouldn't route.
+            self._with_db(db_name, lambda db: db.resource.put_json(ddoc_id.split("/"), body=ddoc))
+        except couchdb.http.ResourceConflict:
+            # Already created (by us earlier or another worker); the id
+            # is a hash of the definition, so it is the same view.
+            pass
+        self._ensured_indexes.add(cache_key)
+        return ddoc_id
+
+    def _query_view(self, db_name: str, ddoc_id: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        _, _, data = self._with_db(
+            db_name, lambda db: db.resource.post_json(ddoc_id.split("/") + ["_view", "v"], body=params)
+        )
+        return data.get("rows", [])
 
     def ensure_index(
         self,
@@ -117,16 +644,11 @@ class CouchDBService(DatabaseService):
             return
 
         try:
-            db = self._get_or_create_db(db_name)
-            name = index_name or f"idx-{'_'.join(fields)}"
             # CouchDB POST to _index is idempotent — if the index
             # already exists with the same definition it returns
             # {"result": "exists"} and does nothing.
-            db.resource.post_json("_index", body={
-                "index": {"fields": fields},
-                "name": name,
-                "type": "json",
-            })
+            for body in self._index_bodies(db_name, fields, index_name):
+                self._with_db(db_name, lambda db: db.resource.post_json("_index", body=body))
             self._ensured_indexes.add(cache_key)
         except Exception as e:
             # Index creation is best-effort — queries still work
@@ -147,17 +669,17 @@ class CouchDBService(DatabaseService):
         """
         if not docs:
             return []
-        db = self._get_or_create_db(db_name)
         # Strip _rev='' so CouchDB doesn't treat it as a stale rev.
         for d in docs:
             if not d.get("_rev"):
                 d.pop("_rev", None)
+            self._stamp_expiry(db_name, d)
 
         results: List[Dict[str, Any]] = []
         try:
             # python-couchdb's update() returns one (success, id, rev_or_exc)
             # tuple per input doc, in order.
-            for success, doc_id, rev_or_exc in db.update(docs):
+            for success, doc_id, rev_or_exc in self._with_db(db_name, lambda db: db.update(docs)):
                 if success:
                     results.append({"ok": True, "id": doc_id, "rev": rev_or_exc})
                 else:
@@ -185,7 +707,6 @@ class CouchDBService(DatabaseService):
         """
         if not doc_ids:
             return []
-        db = self._get_or_create_db(db_name)
 
         # Fetch existing rev for each id.  Missing docs are silently
         # treated as already-deleted.
@@ -209,7 +730,7 @@ class CouchDBService(DatabaseService):
             return results
 
         try:
-            for success, doc_id, rev_or_exc in db.update(markers):
+            for success, doc_id, rev_or_exc in self._with_db(db_name, lambda db: db.update(markers)):
                 idx = results_index[doc_id]
                 if success:
                     results[idx] = {"ok": True, "id": doc_id}
@@ -223,6 +744,33 @@ class CouchDBService(DatabaseService):
             print(f"CouchDB delete_many failed, falling back to per-doc delete: {exc}")
             return super().delete_many(db_name, doc_ids)
 
+    def _index_bodies(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        """The ``_index`` requests that create the index on ``fields``.
+
+        In a partitioned database a partition query (one pinning the
+        partition field) can only use partitioned indexes and a global
+        query only global ones.  An index on the partition field is
+        only useful to the former, so it is built partitioned; any other
+        (the data store's ``keyScope``/``key``, say) is built both ways,
+        the partitioned copy in its own design doc.
+        """
+        name = index_name or f"idx-{'_'.join(fields)}"
+        body: Dict[str, Any] = {"index": {"fields": fields}, "name": name, "type": "json"}
+        if db_name not in self._partition_fields or not self._is_partitioned(db_name):
+            return [body]
+        if self._partition_fields[db_name] in fields:
+            return [dict(body, partitioned=True)]
+        partitioned_name = f"{name}-partitioned"
+        return [
+            dict(body, partitioned=False),
+            dict(body, name=partitioned_name, ddoc=partitioned_name, partitioned=True),
+        ]
+
     def get_many(
         self,
         db_name: str,
@@ -230,14 +778,19 @@ class CouchDBService(DatabaseService):
     ) -> Dict[str, Optional[Dict[str, Any]]]:
         """Bulk fetch via _all_docs?keys=[...]&include_docs=true.
 
-        One HTTP call regardless of N.  Missing docs map to None.
+        One HTTP call regardless of N.  Missing docs map to None.  In a
+        partitioned database each key is already looked up on its
+        partition's shard, so this needs no partition routing.
         """
         if not doc_ids:
             return {}
-        db = self._get_or_create_db(db_name)
         try:
             out: Dict[str, Optional[Dict[str, Any]]] = {}
-            for row in db.view("_all_docs", keys=doc_ids, include_docs=True):
+            rows = self._with_db(
+                db_name,
+                lambda db: list(db.view("_all_docs", keys=doc_ids, include_docs=True)),
+            )
+            for row in rows:
                 # Rows for missing docs have row.error set and row.doc=None.
                 if getattr(row, "error", None) or row.doc is None:
                     out[row.key] = None
@@ -0,0 +1,390 @@
+"""CouchDB backend whose async APIs talk HTTP directly on a pooled client.
+
+:class:`CouchDBService` runs every ``a``-prefixed call on the DB worker
+pool, where python-couchdb holds a thread for each round trip and
+opens connections as it likes.  :class:`AsyncCouchDBService` keeps the
+synchronous methods (and everything built on them: aggregate views,
+segmented scans, migration) but sends ``aget``, ``asave``, ``afind``,
+``asave_many``, ``aget_many`` and friends straight to ``_find``,
+``_bulk_docs``, ``_all_docs?keys=`` and ``_index`` on one shared
+``httpx.AsyncClient``.  That client keeps up to ``COUCHDB_POOL_SIZE``
+HTTP/1.1 keep-alive connections, so many concurrent agent runs share a
+few sockets instead of a thread each.
+
+Row-returning responses (``_all_docs``, ``_find``) are parsed as they
+stream in; CouchDB writes one row per line, so a large result is never
+held as a raw body and a parsed copy at once.
+
+Requests use ``COUCHDB_TIMEOUT_SECONDS``; wrap a call in
+:func:`request_timeout` to give it a different budget.
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+from fastapi import HTTPException
+
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, decode_cursor
+from .couchdb import NO_USABLE_INDEX, CouchDBService
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_KEEPALIVE_SECONDS = 30.0
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+_request_timeout: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "couchdb_request_timeout", default=None
+)
+
+
+@contextlib.contextmanager
+def request_timeout(seconds: float) -> Iterator[None]:
+    """Use ``seconds`` as the timeout of every CouchDB request made inside the block."""
+    token = _request_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _request_timeout.reset(token)
+
+
+def _error_name(response: httpx.Response) -> Optional[str]:
+    """The ``error`` of a CouchDB JSON error response, or None."""
+    try:
+        return response.json().get("error")
+    except ValueError:
+        return None
+
+
+class AsyncCouchDBService(CouchDBService):
+    """CouchDB implementation with native async I/O on a pooled HTTP client."""
+
+    def __init__(self, url: str, user: str, password: str, settings):
+        super().__init__(url, user, password, settings)
+        self._base_url = url.rstrip("/")
+        self._auth = (user, password)
+        pool_size = getattr(settings, "COUCHDB_POOL_SIZE", None) or DEFAULT_POOL_SIZE
+        self._limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=getattr(settings, "COUCHDB_KEEPALIVE_SECONDS", None) or DEFAULT_KEEPALIVE_SECONDS,
+        )
+        self._timeout = getattr(settings, "COUCHDB_TIMEOUT_SECONDS", None) or DEFAULT_TIMEOUT_SECONDS
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ------------------------------------------------------------------
+    # HTTP plumbing
+    # ------------------------------------------------------------------
+
+    def _http(self) -> httpx.AsyncClient:
+        """The shared client, created on first use in the running loop.
+
+        Pooled connections belong to the loop that opened them, so a
+        new loop (a test, a worker restart) gets a client of its own.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                auth=self._auth,
+                limits=self._limits,
+                timeout=self._timeout,
+                http1=True,
+                http2=False,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def _aopen(self, db_name: str) -> None:
+        """Open (creating if needed) ``db_name`` off the event loop, once."""
+        if db_name not in self._dbs:
+            await self._run_sync(self._get_or_create_db, db_name)
+
+    @staticmethod
+    def _doc_path(doc_id: str) -> str:
+        if doc_id.startswith("_design/"):
+            return "_design/" + quote(doc_id[len("_design/"):], safe="")
+        return quote(doc_id, safe="")
+
+    async def _send(
+        self,
+        method: str,
+        db_name: str,
+        path: str,
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request under ``/{db_name}/``; re-provision and retry once if the database vanished."""
+        await self._aopen(db_name)
+        client = self._http()
+        timeout = _request_timeout.get()
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        url = f"/{quote(db_name, safe='')}/{path}"
+        for attempt in range(2):
+            response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+            if attempt or response.status_code != 404:
+                return response
+            await response.aread()
+            if "does not exist" not in response.text.lower():
+                return response
+            await response.aclose()
+            self._dbs.pop(db_name, None)
+            self._ensured_indexes = {k for k in self._ensured_indexes if k[0] != db_name}
+            await self._aopen(db_name)
+        return response
+
+    async def _request_json(self, method: str, db_name: str, path: str, **kwargs: Any) -> Any:
+        response = await self._send(method, db_name, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    async def _stream_rows(
+        response: httpx.Response,
+        key: str,
+        envelope: Dict[str, Any],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the ``key`` array of a streamed response row by row.
+
+        CouchDB writes each row of ``_all_docs`` and ``_find`` on its own
+        line between a header line ending in ``[`` and a footer starting
+        with ``]``.  Everything else (``total_rows``, ``bookmark``,
+        ``warning``, ...) is joined back up and parsed into
+        ``envelope``; a body that isn't laid out that way is simply
+        parsed whole.
+        """
+        try:
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+            rest: List[str] = []
+            in_rows = False
+            async for line in response.aiter_lines():
+                text = line.strip()
+                row = text.strip(",")
+                if in_rows and row.startswith("{"):
+                    yield json.loads(row)
+                    continue
+                if in_rows and text.startswith("]"):
+                    in_rows = False
+                elif text.endswith("["):
+                    in_rows = True
+                rest.append(text)
+            data = json.loads("".join(rest))
+            for row in data.pop(key, None) or []:
+                yield row
+            envelope.update(data)
+        finally:
+            await response.aclose()
+
+    async def _apartition_for(self, db_name: str, selector: Dict[str, Any]) -> Optional[str]:
+        if db_name in self._partition_fields:
+            await self._aopen(db_name)
+        return self._partition_for(db_name, selector)
+
+    async def _apost_find(
+        self,
+        db_name: str,
+        query: Dict[str, Any],
+        partition: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Async :meth:`_post_find`, streaming the matched docs."""
+        path = f"_partition/{quote(partition, safe='')}/_find" if partition else "_find"
+        response = await self._send(
+            "POST", db_name, path, stream=True, json=dict(query, execution_stats=True)
+        )
+        data: Dict[str, Any] = {}
+        data["docs"] = [doc async for doc in self._stream_rows(response, "docs", data)]
+        return self._report_find(db_name, data)
+
+    # ------------------------------------------------------------------
+    # Async APIs
+    # ------------------------------------------------------------------
+
+    async def aget(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        response = await self._send("GET", db_name, self._doc_path(doc_id))
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
+        response.raise_for_status()
+        return response.json()
+
+    async def asave(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Async :meth:`save`: one PUT, 409 on a stale or missing ``_rev``."""
+        self._stamp_expiry(db_name, doc, expires_at)
+        doc["_id"] = doc_id
+        if not doc.get("_rev"):
+            doc.pop("_rev", None)
+        response = await self._send("PUT", db_name, self._doc_path(doc_id), json=doc)
+        if response.status_code == 409:
+            raise HTTPException(status_code=409, detail=f"Document update conflict: {response.text}")
+        response.raise_for_status()
+        rev = response.json()["rev"]
+        doc["_rev"] = rev
+        return {"id": doc_id, "rev": rev}
+
+    async def adelete(self, db_name: str, doc_id: str):
+        # HEAD returns the current revision as the ETag.
+        path = self._doc_path(doc_id)
+        response = await self._send("HEAD", db_name, path)
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
+        response.raise_for_status()
+        rev = response.headers["etag"].strip('"')
+        (await self._send("DELETE", db_name, path, params={"rev": rev})).raise_for_status()
+
+    async def alist_all(self, db_name: str) -> List[Dict[str, Any]]:
+        if self.scan_parallelism > 1:
+            # Segmented scans run on their own threads.
+            return await super().alist_all(db_name)
+        response = await self._send(
+            "GET", db_name, "_all_docs", stream=True, params={"include_docs": "true"}
+        )
+        return [
+            row["doc"]
+            async for row in self._stream_rows(response, "rows", {})
+            if row.get("doc") is not None
+        ]
+
+    async def afind(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async :meth:`find`, with the same list_all fallback when no index covers the sort."""
+        query = self._mango_query(selector, fields, limit, sort)
+        partition = await self._apartition_for(db_name, selector)
+        try:
+            data = await self._apost_find(db_name, query, partition)
+        except httpx.HTTPStatusError as e:
+            if _error_name(e.response) != NO_USABLE_INDEX:
+                raise
+            return await self._run_sync(self._find_without_index, db_name, selector, fields, limit, sort, e)
+        return data["docs"]
+
+    async def afind_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = self._mango_query(selector, fields, page_size)
+        if cursor:
+            query["bookmark"] = decode_cursor(cursor, str)
+        partition = await self._apartition_for(db_name, selector)
+        data = await self._apost_find(db_name, query, partition)
+        return self._find_result_page(data, page_size)
+
+    async def aensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        cache_key = (db_name, tuple(sorted(fields)))
+        if cache_key in self._ensured_indexes:
+            return
+        try:
+            await self._aopen(db_name)
+            for body in self._index_bodies(db_name, fields, index_name):
+                await self._request_json("POST", db_name, "_index", json=body)
+            self._ensured_indexes.add(cache_key)
+        except Exception as e:
+            print(f"Warning: failed to ensure index on {db_name} {fields}: {e}")
+
+    async def asave_many(
+        self,
+        db_name: str,
+        docs: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Async :meth:`save_many`: one ``_bulk_docs`` POST."""
+        if not docs:
+            return []
+        for d in docs:
+            if not d.get("_rev"):
+                d.pop("_rev", None)
+            self._stamp_expiry(db_name, d)
+        try:
+            rows = await self._request_json("POST", db_name, "_bulk_docs", json={"docs": docs})
+        except Exception as exc:
+            print(f"CouchDB save_many failed, falling back to per-doc save: {exc}")
+            return await self._run_sync(DatabaseService.save_many, self, db_name, docs)
+        return [self._bulk_result(row, with_rev=True) for row in rows]
+
+    async def adelete_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Async :meth:`delete_many`: revisions from ``_all_docs``, then one ``_bulk_docs``."""
+        if not doc_ids:
+            return []
+        existing = await self.aget_many(db_name, doc_ids)
+        markers = [
+            {"_id": doc_id, "_rev": doc["_rev"], "_deleted": True}
+            for doc_id, doc in existing.items()
+            if doc is not None
+        ]
+        outcome: Dict[str, Dict[str, Any]] = {}
+        if markers:
+            try:
+                rows = await self._request_json("POST", db_name, "_bulk_docs", json={"docs": markers})
+            except Exception as exc:
+                print(f"CouchDB delete_many failed, falling back to per-doc delete: {exc}")
+                return await self._run_sync(DatabaseService.delete_many, self, db_name, doc_ids)
+            outcome = {row["id"]: self._bulk_result(row, with_rev=False) for row in rows}
+        # Missing docs are already gone: idempotent success.
+        return [outcome.get(doc_id, {"ok": True, "id": doc_id}) for doc_id in doc_ids]
+
+    @staticmethod
+    def _bulk_result(row: Dict[str, Any], with_rev: bool) -> Dict[str, Any]:
+        if "error" in row:
+            return {"ok": False, "id": row.get("id"), "error": row["error"]}
+        result = {"ok": True, "id": row["id"]}
+        if with_rev:
+            result["rev"] = row["rev"]
+        return result
+
+    async def aget_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Async :meth:`get_many`: one streamed ``_all_docs?keys=`` POST."""
+        if not doc_ids:
+            return {}
+        out: Dict[str, Optional[Dict[str, Any]]] = {doc_id: None for doc_id in doc_ids}
+        try:
+            response = await self._send(
+                "POST", db_name, "_all_docs", stream=True,
+                params={"include_docs": "true"}, json={"keys": doc_ids},
+            )
+            async for row in self._stream_rows(response, "rows", {}):
+                # Missing and deleted docs come back with an error or a
+                # null doc.
+                if not row.get("error") and row.get("doc") is not None:
+                    out[row["key"]] = row["doc"]
+            return out
+        except Exception as exc:
+            print(f"CouchDB get_many failed, falling back to per-doc get: {exc}")
+            return await self._run_sync(DatabaseService.get_many, self, db_name, doc_ids)
@@ -0,0 +1,33 @@
+"""Convert global CouchDB databases to partitioned ones.
+
+Usage (from the user-service directory, with the app stopped)::
+
+    python -m services.database_service.couchdb_migrate [db_name ...]
+
+Connects with ``COUCHDB_URL``/``COUCHDB_USER``/``COUCHDB_PASSWORD`` and
+runs :meth:`CouchDBService.migrate_to_partitioned` on each database
+(``agent_data_store`` by default), which rewrites ``"{userId}:..."`` ids
+to start with the escaped user id the partitioned database expects.
+"""
+import argparse
+
+from config import settings
+
+from .couchdb import CouchDBService
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("databases", nargs="*", default=["agent_data_store"])
+    args = parser.parse_args(argv)
+
+    service = CouchDBService(
+        settings.COUCHDB_URL, settings.COUCHDB_USER, settings.COUCHDB_PASSWORD, settings
+    )
+    for db_name in args.databases:
+        moved = service.migrate_to_partitioned(db_name)
+        print(f"'{db_name}': {moved} documents moved to a partitioned database.")
+
+
+if __name__ == "__main__":
+    main()
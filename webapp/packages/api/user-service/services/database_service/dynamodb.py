@@ -1,15 +1,128 @@
-from typing import Any, Dict, List, Optional
+import json
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from decimal import Decimal
 from fastapi import HTTPException
 import boto3
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
 from botocore.exceptions import ClientError
-from .base import DatabaseService
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, decode_cursor, encode_cursor
+from .instrumentation import note_query
+from .retention import EXPIRES_AT_FIELD
+from .scans import SegmentReader
+from .selectors import (
+    conditions,
+    effective_sort,
+    equality_value,
+    matches,
+    normalize_sort,
+    prefix_upper_bound,
+    sort_docs,
+)
+
+# Service limits for the batch APIs.
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+# Chunks of one bulk call are sent in parallel on a short-lived pool of
+# this size.  Kept separate from the shared db-io pool so a bulk call
+# running *on* that pool can never wait on its own workers.
+BATCH_MAX_WORKERS = 8
+# Retries for UnprocessedKeys / UnprocessedItems (throttled partial
+# batches).  Delay doubles from BATCH_RETRY_BASE_DELAY up to the cap.
+BATCH_MAX_RETRIES = 8
+BATCH_RETRY_BASE_DELAY = 0.05
+BATCH_RETRY_MAX_DELAY = 2.0
+
+# Global Secondary Index management.  ensure_index only requests a new
+# index and returns; find only queries ACTIVE indexes and re-checks
+# tables with indexes still CREATING at most every INDEX_REFRESH_SECONDS.
+# An index ensure_index has requested (or found CREATING) isn't looked
+# at again for INDEX_REFRESH_SECONDS either, and neither is one DynamoDB
+# refused because the table was already building another: a table
+# backfills one new GSI at a time.
+INDEX_REFRESH_SECONDS = 60.0
+
+# Key schema of the base table: every table is created with ``_id`` as
+# its only (HASH) key, so an ``_id`` selector can Query the table itself.
+_TABLE_KEY: Tuple[str, Optional[str]] = ("_id", None)
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+# Packed attributes (opt-in per collection, DYNAMODB_PACKED_FIELDS):
+# the field's JSON is stored as one Binary attribute instead of a nested
+# map, so a write costs one json.dumps rather than a float->Decimal walk
+# and per-attribute type tags, and the item shrinks.  The first byte
+# says how the rest is encoded.  Reads decode only the packed fields
+# the caller asked for (its projection, or the whole document for
+# get / get_many / list_all), and a selector on a packed field decodes
+# just that field for every scanned item and the rest for the matches.
+PACK_JSON = b"\x00"
+PACK_ZLIB = b"\x01"
+# Smaller values are stored as plain JSON; compression doesn't pay.
+PACK_COMPRESS_MIN_BYTES = 512
+# zlib level 1: most of the size win for a fraction of the CPU.
+PACK_COMPRESS_LEVEL = 1
+
+
+def _json_default(value: Any) -> Any:
+    # Values read back from unpacked items carry Decimals.
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+def pack_value(value: Any) -> bytes:
+    """Encode one field value for a packed (Binary) attribute."""
+    raw = json.dumps(value, separators=(",", ":"), default=_json_default).encode("utf-8")
+    if len(raw) >= PACK_COMPRESS_MIN_BYTES:
+        return PACK_ZLIB + zlib.compress(raw, PACK_COMPRESS_LEVEL)
+    return PACK_JSON + raw
+
+
+def unpack_value(data: Any) -> Any:
+    """Inverse of :func:`pack_value`; accepts ``bytes`` or boto3 ``Binary``."""
+    if isinstance(data, Binary):
+        data = data.value
+    data = bytes(data)
+    body = data[1:]
+    if data[:1] == PACK_ZLIB:
+        body = zlib.decompress(body)
+    return json.loads(body)
+
+
+def parse_packed_fields(spec: Optional[str]) -> Dict[str, frozenset]:
+    """Parse ``DYNAMODB_PACKED_FIELDS``, e.g. ``"agent_data_store:value|metadata"``."""
+    packed: Dict[str, frozenset] = {}
+    for entry in (spec or "").split(","):
+        name, _, fields = entry.strip().partition(":")
+        names = frozenset(f.strip() for f in fields.split("|") if f.strip()) - {"_id"}
+        if name.strip() and names:
+            packed[name.strip()] = names
+        elif entry.strip():
+            print(f"Warning: ignoring invalid DYNAMODB_PACKED_FIELDS entry '{entry.strip()}'")
+    return packed
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
 
 class DynamoDBService(DatabaseService):
     """DynamoDB implementation of the DatabaseService."""
 
+    # Tables with a retention have TTL enabled on EXPIRES_AT_FIELD.
+    native_ttl = True
+
+    # table -> fields stored as packed Binary attributes.
+    _packed_fields: Dict[str, frozenset] = {}
+
     @staticmethod
     def _convert_floats_to_decimal(obj: Any) -> Any:
         """
@@ -29,7 +142,7 @@ class DynamoDBService(DatabaseService):
             return [DynamoDBService._convert_floats_to_decimal(item) for item in obj]
         return obj
 
-    def __init__(self, region_name: str = None, endpoint_url: str = None, aws_access_key_id: str = None, aws_secret_access_key: str = None):
+    def __init__(self, region_name: str = None, endpoint_url: str = None, aws_access_key_id: str = None, aws_secret_access_key: str = None, packed_fields: Optional[Dict[str, frozenset]] = None):
         """
         Initialize DynamoDB service.
 
@@ -38,7 +151,10 @@ class DynamoDBService(DatabaseService):
             endpoint_url: Optional endpoint URL for local DynamoDB
             aws_access_key_id: Optional AWS access key ID
             aws_secret_access_key: Optional AWS secret access key
+            packed_fields: Optional table -> fields to store packed
+                (see parse_packed_fields)
         """
+        self._packed_fields = dict(packed_fields or {})
         try:
             # Create DynamoDB client
             client_kwargs = {}
@@ -53,12 +169,25 @@ class DynamoDBService(DatabaseService):
 
             self.dynamodb = boto3.resource('dynamodb', **client_kwargs)
             self.client = boto3.client('dynamodb', **client_kwargs)
+            # table -> {index_name: (hash_key, range_key)} for ACTIVE GSIs,
+            # and when each table's entry should next be re-described.
+            self._indexes: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {}
+            self._indexes_refresh_at: Dict[str, float] = {}
+            # (table, index_name) -> when ensure_index may next look at
+            # an index that is requested but not ACTIVE yet.
+            self._index_requests: Dict[Tuple[str, str], float] = {}
+            # Collection registry: Table handles validated or created this
+            # process lifetime.  table.load() is a DescribeTable round
+            # trip, so it is only paid once per table, and again only if
+            # an operation reports the table missing.
+            self._tables: Dict[str, Any] = {}
+            self._tables_lock = threading.Lock()
             print(f"Successfully connected to DynamoDB{' (local)' if endpoint_url else ''}.")
         except Exception as e:
             print(f"Failed to connect to DynamoDB: {e}")
             raise ConnectionError(f"Could not connect to DynamoDB: {e}") from e
 
-    def _get_or_create_table(self, table_name: str):
+    def _provision_table(self, table_name: str):
         """Get existing table or create a new one with a simple schema."""
         try:
             table = self.dynamodb.Table(table_name)
@@ -69,22 +198,28 @@ class DynamoDBService(DatabaseService):
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 print(f"Table '{table_name}' not found. Creating it.")
                 # Create table with simple schema: id as partition key
-                table = self.dynamodb.create_table(
-                    TableName=table_name,
-                    KeySchema=[
-                        {
-                            'AttributeName': '_id',
-                            'KeyType': 'HASH'  # Partition key
-                        }
-                    ],
-                    AttributeDefinitions=[
-                        {
-                            'AttributeName': '_id',
-                            'AttributeType': 'S'  # String
-                        }
-                    ],
-                    BillingMode='PAY_PER_REQUEST'  # On-demand pricing
-                )
+                try:
+                    table = self.dynamodb.create_table(
+                        TableName=table_name,
+                        KeySchema=[
+                            {
+                                'AttributeName': '_id',
+                                'KeyType': 'HASH'  # Partition key
+                            }
+                        ],
+                        AttributeDefinitions=[
+                            {
+                                'AttributeName': '_id',
+                                'AttributeType': 'S'  # String
+                            }
+                        ],
+                        BillingMode='PAY_PER_REQUEST'  # On-demand pricing
+                    )
+                except ClientError as create_error:
+                    # Another process is creating the same table.
+                    if create_error.response['Error']['Code'] != 'ResourceInUseException':
+                        raise
+                    table = self.dynamodb.Table(table_name)
                 # Wait for table to be created
                 table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
                 print(f"Table '{table_name}' created successfully.")
@@ -92,59 +227,465 @@ class DynamoDBService(DatabaseService):
             else:
                 raise
 
-    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
-        table = self._get_or_create_table(db_name)
+    def _get_or_create_table(self, table_name: str):
+        """Registered Table handle for ``table_name``, provisioning it once."""
+        table = self._tables.get(table_name)
+        if table is not None:
+            return table
+        with self._tables_lock:
+            table = self._tables.get(table_name)
+            if table is None:
+                table = self._provision_table(table_name)
+                self._tables[table_name] = table
+            return table
+
+    @staticmethod
+    def _is_missing_table(exc: Exception) -> bool:
+        return (
+            isinstance(exc, ClientError)
+            and exc.response.get('Error', {}).get('Code') == 'ResourceNotFoundException'
+        )
+
+    def _forget_table(self, table_name: str) -> None:
+        self._tables.pop(table_name, None)
+        self._indexes.pop(table_name, None)
+        self._indexes_refresh_at.pop(table_name, None)
+
+    def _with_table(self, table_name: str, fn: Callable[[Any], Any]) -> Any:
+        """Run ``fn(table)``; if the table vanished, re-provision and retry once."""
         try:
-            response = table.get_item(Key={'_id': doc_id})
-            if 'Item' not in response:
-                raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
-            return dict(response['Item'])
+            return fn(self._get_or_create_table(table_name))
         except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
-            raise
+            if not self._is_missing_table(e):
+                raise
+            print(f"Table '{table_name}' disappeared; re-provisioning.")
+            self._forget_table(table_name)
+            return fn(self._get_or_create_table(table_name))
+
+    def provision(self, collections: Iterable[str]) -> None:
+        """Load (creating if needed) each table and register its handle."""
+        for table_name in collections:
+            try:
+                self._get_or_create_table(table_name)
+            except Exception as e:
+                print(f"Warning: failed to provision table '{table_name}': {e}")
+
+    def enable_ttl(self, db_name: str) -> None:
+        """Enable the table's TTL on EXPIRES_AT_FIELD if it is not already on."""
+        self._get_or_create_table(db_name)
+        description = self.client.describe_time_to_live(TableName=db_name).get(
+            "TimeToLiveDescription", {}
+        )
+        if description.get("TimeToLiveStatus") in ("ENABLED", "ENABLING"):
+            if description.get("AttributeName") != EXPIRES_AT_FIELD:
+                print(
+                    f"Warning: TTL on '{db_name}' uses '{description.get('AttributeName')}', "
+                    f"not '{EXPIRES_AT_FIELD}'; expiring documents will not be removed."
+                )
+            return
+        self.client.update_time_to_live(
+            TableName=db_name,
+            TimeToLiveSpecification={"Enabled": True, "AttributeName": EXPIRES_AT_FIELD},
+        )
+        print(f"Enabled TTL on table '{db_name}' ({EXPIRES_AT_FIELD}).")
+
+    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        response = self._with_table(db_name, lambda table: table.get_item(Key={'_id': doc_id}))
+        if 'Item' not in response:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
+        return self._from_item(db_name, response['Item'])
+
+    # --- Packed attributes ----------------------------------------------
+
+    def _to_item(self, db_name: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """``doc`` as a DynamoDB item: floats as Decimal, packed fields as bytes."""
+        packed = self._packed_fields.get(db_name)
+        if not packed:
+            return self._convert_floats_to_decimal(doc)
+        return {
+            k: pack_value(v) if k in packed and v is not None else self._convert_floats_to_decimal(v)
+            for k, v in doc.items()
+        }
+
+    def _from_item(
+        self,
+        db_name: str,
+        item: Dict[str, Any],
+        fields: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """Inverse of :meth:`_to_item` for whichever packed fields ``item`` has.
+
+        With ``fields``, only packed fields among them are decoded; the
+        others are left as bytes for the caller to drop.  Items written
+        before a field was packed keep their native attribute and come
+        back unchanged.
+        """
+        doc = dict(item)
+        packed = self._packed_fields.get(db_name, frozenset())
+        for field in packed if fields is None else packed.intersection(fields):
+            value = doc.get(field)
+            if isinstance(value, (Binary, bytes, bytearray)):
+                doc[field] = unpack_value(value)
+        return doc
+
+    def _queries_packed(self, db_name: str, selector: Dict[str, Any]) -> bool:
+        """True if ``selector`` filters on a packed field, which DynamoDB can't see into."""
+        packed = self._packed_fields.get(db_name)
+        return bool(packed) and any(field in packed for field in selector)
+
+    def _find_packed(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        sort_fields: Iterable[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """Every match for a selector on packed fields, filtered here.
+
+        The scan is projected to the fields involved when ``fields`` is
+        given.  Only the packed fields the selector (or sort) reads are
+        decoded before matching; the rest are decoded for the matches.
+        """
+        note_query(fallback="list_all", scan=True)
+        tested = set(selector) | set(sort_fields)
+        kwargs = self._projection_kwargs(sorted(tested | set(fields))) if fields else {}
+        items = self._with_table(db_name, lambda table: self._collect_pages(table.scan, kwargs, None))
+        hits = []
+        for item in items:
+            doc = self._from_item(db_name, item, tested)
+            if matches(doc, selector):
+                hits.append(self._from_item(db_name, doc, fields))
+        return hits
 
-    def save(self, db_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
-        table = self._get_or_create_table(db_name)
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        self._stamp_expiry(db_name, doc, expires_at)
         try:
             # Ensure _id is set
             doc['_id'] = doc_id
             # Convert floats to Decimal for DynamoDB compatibility
-            doc_converted = self._convert_floats_to_decimal(doc)
-            table.put_item(Item=doc_converted)
+            doc_converted = self._to_item(db_name, doc)
+            self._with_table(db_name, lambda table: table.put_item(Item=doc_converted))
             return {"id": doc_id, "rev": "dynamodb-rev"}
         except ClientError as e:
             raise HTTPException(status_code=500, detail=f"Failed to save document: {e}")
 
     def delete(self, db_name: str, doc_id: str):
-        table = self._get_or_create_table(db_name)
-        try:
+        def _delete(table) -> bool:
             # First check if the item exists
             response = table.get_item(Key={'_id': doc_id})
             if 'Item' not in response:
-                raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
-
+                return False
             # Delete the item
             table.delete_item(Key={'_id': doc_id})
+            return True
+
+        if not self._with_table(db_name, _delete):
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
+
+    def list_all(self, db_name: str) -> List[Dict[str, Any]]:
+        return list(self.list_all_iter(db_name))
+
+    def _scan_segments(self, db_name: str, segments: int) -> List[SegmentReader]:
+        """One paginated Scan per ``Segment`` of ``TotalSegments``."""
+        def _reader(segment: int) -> SegmentReader:
+            def _read() -> Iterator[List[Dict[str, Any]]]:
+                kwargs: Dict[str, Any] = (
+                    {"Segment": segment, "TotalSegments": segments} if segments > 1 else {}
+                )
+                while True:
+                    try:
+                        response = self._with_table(db_name, lambda table: table.scan(**kwargs))
+                    except ClientError as e:
+                        raise HTTPException(status_code=500, detail=f"Failed to list documents: {e}")
+                    yield [self._from_item(db_name, item) for item in response.get('Items', [])]
+                    if 'LastEvaluatedKey' not in response:
+                        return
+                    kwargs["ExclusiveStartKey"] = response['LastEvaluatedKey']
+            return _read
+
+        return [_reader(segment) for segment in range(segments)]
+
+    # ------------------------------------------------------------------
+    # Secondary indexes.
+    # ------------------------------------------------------------------
+
+    def _describe_table(self, db_name: str) -> Dict[str, Any]:
+        """Fresh DescribeTable output (the registered handle's may be stale)."""
+        try:
+            return self.client.describe_table(TableName=db_name)["Table"]
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
+                return {}
             raise
 
-    def list_all(self, db_name: str) -> List[Dict[str, Any]]:
-        table = self._get_or_create_table(db_name)
+    def _describe_indexes(self, db_name: str) -> Tuple[Dict[str, Tuple[str, Optional[str]]], bool]:
+        """Return ``({name: (hash, range)}, any_pending)`` for the table's GSIs."""
+        table = self._describe_table(db_name)
+        active: Dict[str, Tuple[str, Optional[str]]] = {}
+        pending = False
+        for gsi in table.get("GlobalSecondaryIndexes", []):
+            if gsi.get("IndexStatus") != "ACTIVE":
+                pending = True
+                continue
+            keys = {k["KeyType"]: k["AttributeName"] for k in gsi["KeySchema"]}
+            active[gsi["IndexName"]] = (keys["HASH"], keys.get("RANGE"))
+        return active, pending
+
+    def _active_indexes(self, db_name: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        """ACTIVE GSIs of ``db_name``, described once and then cached.
+
+        Tables with an index still backfilling are re-described every
+        INDEX_REFRESH_SECONDS so find picks the index up once it is ready.
+        """
+        refresh_at = self._indexes_refresh_at.get(db_name)
+        if db_name in self._indexes and (refresh_at is None or time.monotonic() < refresh_at):
+            return self._indexes[db_name]
         try:
-            response = table.scan()
-            items = response.get('Items', [])
+            active, pending = self._describe_indexes(db_name)
+        except Exception as e:
+            print(f"Warning: failed to describe indexes on {db_name}: {e}")
+            active, pending = {}, True
+        self._indexes[db_name] = active
+        if pending:
+            self._indexes_refresh_at[db_name] = time.monotonic() + INDEX_REFRESH_SECONDS
+        else:
+            self._indexes_refresh_at.pop(db_name, None)
+        return active
+
+    def ensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        """Create a Global Secondary Index if it doesn't already exist.
 
-            # Handle pagination if there are more items
-            while 'LastEvaluatedKey' in response:
-                response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-                items.extend(response.get('Items', []))
+        The first field becomes the index's partition (HASH) key and the
+        second, if given, its sort (RANGE) key; both are declared as
+        string attributes.  DynamoDB keys have at most two attributes, so
+        further fields are ignored here and applied as a filter by find.
+        The index projects ALL attributes so find can return whole docs.
 
-            return [dict(item) for item in items]
+        Never waits for the backfill: the index is requested and find
+        keeps scanning until _active_indexes reports it ACTIVE.  Repeat
+        calls for an index that is ACTIVE or being created cost nothing
+        (see INDEX_REFRESH_SECONDS).  Best-effort, like the CouchDB
+        backend: on failure find keeps scanning.
+        """
+        if not fields:
+            return
+        key_fields = tuple(fields[:2])
+        key = (key_fields[0], key_fields[1] if len(key_fields) > 1 else None)
+        if key in self._active_indexes(db_name).values():
+            return
+
+        name = index_name or f"idx-{'_'.join(key_fields)}"
+        if time.monotonic() < self._index_requests.get((db_name, name), 0.0):
+            return
+        self._index_requests[(db_name, name)] = time.monotonic() + INDEX_REFRESH_SECONDS
+        try:
+            self._get_or_create_table(db_name)
+            table = self._describe_table(db_name)
+            existing = {g["IndexName"] for g in table.get("GlobalSecondaryIndexes", [])}
+            if name not in existing:
+                key_schema = [{"AttributeName": key[0], "KeyType": "HASH"}]
+                if key[1]:
+                    key_schema.append({"AttributeName": key[1], "KeyType": "RANGE"})
+                create: Dict[str, Any] = {
+                    "IndexName": name,
+                    "KeySchema": key_schema,
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+                billing = table.get("BillingModeSummary", {}).get("BillingMode")
+                if billing != "PAY_PER_REQUEST":
+                    throughput = table.get("ProvisionedThroughput", {})
+                    create["ProvisionedThroughput"] = {
+                        "ReadCapacityUnits": throughput.get("ReadCapacityUnits", 5),
+                        "WriteCapacityUnits": throughput.get("WriteCapacityUnits", 5),
+                    }
+                print(f"Creating index '{name}' on '{db_name}' {list(key_fields)}.")
+                self.client.update_table(
+                    TableName=db_name,
+                    AttributeDefinitions=[
+                        {"AttributeName": f, "AttributeType": "S"} for f in key_fields
+                    ],
+                    GlobalSecondaryIndexUpdates=[{"Create": create}],
+                )
+                # Backfilling: find re-describes the table every
+                # INDEX_REFRESH_SECONDS until the index is ACTIVE.
+                self._indexes_refresh_at[db_name] = time.monotonic() + INDEX_REFRESH_SECONDS
+            else:
+                # Created elsewhere; have find re-describe the table now.
+                self._indexes_refresh_at.setdefault(db_name, time.monotonic())
         except ClientError as e:
-            raise HTTPException(status_code=500, detail=f"Failed to list documents: {e}")
+            if e.response['Error']['Code'] in ('LimitExceededException', 'ResourceInUseException'):
+                # Another index on the table is still backfilling; the
+                # request is retried after INDEX_REFRESH_SECONDS.
+                print(f"Index '{name}' on '{db_name}' deferred: {e.response['Error']['Code']}.")
+            else:
+                print(f"Warning: failed to ensure index on {db_name} {fields}: {e}")
+        except Exception as e:
+            # Index creation is best-effort — queries still work
+            # (just slower) if the index is missing.
+            print(f"Warning: failed to ensure index on {db_name} {fields}: {e}")
+
+    def _pick_index(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        sort: Optional[List[Any]] = None,
+    ) -> Optional[Tuple[Optional[str], str, Optional[str]]]:
+        """Choose the key to Query for ``selector``.
+
+        Returns ``(index_name, hash_key, range_key)`` — ``index_name`` is
+        None for the base table — or None when no key applies and find
+        has to scan.  The hash key must be pinned to one value; the
+        range key is returned when the selector constrains it (equality,
+        a range or ``$prefix``) or when ``sort`` orders by it.  An index
+        whose range key is constrained beats one that only matches on
+        its hash key.  Only string values are usable: every key is
+        declared as type S.
+        """
+        order = effective_sort(selector, sort)
+        sort_field = order[0][0] if len(order) == 1 else None
+
+        def pinned(field: Optional[str]) -> bool:
+            if field is None:
+                return False
+            is_eq, value = equality_value(selector, field)
+            return is_eq and isinstance(value, str)
+
+        def constrained(field: Optional[str]) -> bool:
+            return field in selector and self._range_condition(field, selector[field])[0] is not None
+
+        candidates: List[Tuple[Optional[str], Tuple[str, Optional[str]]]] = [(None, _TABLE_KEY)]
+        candidates.extend(self._active_indexes(db_name).items())
+        best = None
+        best_score = 0
+        for name, (hash_key, range_key) in candidates:
+            if not pinned(hash_key):
+                continue
+            score = 1
+            use_range = False
+            if range_key is not None and constrained(range_key):
+                score, use_range = score + 2, True
+            if range_key is not None and range_key == sort_field:
+                score, use_range = score + 1, True
+            if score > best_score:
+                best, best_score = (name, hash_key, range_key if use_range else None), score
+        return best
+
+    @staticmethod
+    def _key_condition(field: str, value: Any):
+        """Key condition for one selector entry, or None if it can't be one.
+
+        DynamoDB allows a single condition per key attribute, so only
+        equality, one comparison, ``$prefix`` (begins_with) or a
+        ``$gte``+``$lte`` pair (between) qualify, all on strings.
+        """
+        conds = conditions(value)
+        if not all(isinstance(v, str) for v in conds.values()):
+            return None
+        key = Key(field)
+        if set(conds) == {"$gte", "$lte"}:
+            return key.between(conds["$gte"], conds["$lte"])
+        if len(conds) != 1:
+            return None
+        (op, operand), = conds.items()
+        if op == "$prefix":
+            return key.begins_with(operand)
+        method = {"$eq": "eq", "$gt": "gt", "$gte": "gte", "$lt": "lt", "$lte": "lte"}.get(op)
+        return getattr(key, method)(operand) if method else None
+
+    @classmethod
+    def _range_condition(cls, field: str, value: Any) -> Tuple[Any, bool]:
+        """Range-key condition for one selector entry, and whether it is exact.
+
+        When the entry combines more conditions than one key condition
+        can express (say ``$prefix`` with ``$gt``, as a paged prefix
+        listing sends), the tightest string bounds still narrow the
+        read: the largest lower bound and the smallest upper bound
+        become a ``between`` (or a single comparison), and the caller
+        re-applies the whole entry as a filter.  Returns
+        ``(None, False)`` when nothing bounds the key.
+        """
+        exact = cls._key_condition(field, value)
+        if exact is not None:
+            return exact, True
+        conds = conditions(value)
+        if not all(isinstance(v, str) for op, v in conds.items() if op != "$in"):
+            return None, False
+        lows = [conds[op] for op in ("$gt", "$gte", "$prefix", "$eq") if op in conds]
+        highs = [conds[op] for op in ("$lt", "$lte", "$eq") if op in conds]
+        if "$prefix" in conds and prefix_upper_bound(conds["$prefix"]) is not None:
+            highs.append(prefix_upper_bound(conds["$prefix"]))
+        low = max(lows) if lows else None
+        high = min(highs) if highs else None
+        key = Key(field)
+        if low is not None and high is not None:
+            # An empty range: DynamoDB rejects a reversed between, so
+            # leave the key unbounded and let the filter match nothing.
+            return (key.between(low, high), False) if low <= high else (None, False)
+        if low is not None:
+            return key.gte(low), False
+        if high is not None:
+            return key.lte(high), False
+        return None, False
+
+    @staticmethod
+    def _filter_expression(selector: Dict[str, Any], exclude: Optional[set] = None):
+        """AND of the conditions for every selector field not in ``exclude``."""
+        filter_expr = None
+        for field, value in selector.items():
+            if exclude and field in exclude:
+                continue
+            attr = Attr(field)
+            for op, operand in conditions(value).items():
+                if op == "$in":
+                    condition = attr.is_in(list(operand))
+                elif op == "$prefix":
+                    condition = attr.begins_with(operand)
+                else:
+                    condition = getattr(attr, op[1:])(operand)
+                filter_expr = condition if filter_expr is None else (filter_expr & condition)
+        return filter_expr
+
+    @staticmethod
+    def _projection_kwargs(fields: Optional[List[str]]) -> Dict[str, Any]:
+        if not fields:
+            return {}
+        # Always include _id
+        field_set = set(fields) | {"_id"}
+        # DynamoDB projection uses comma-separated field names
+        return {
+            "ProjectionExpression": ", ".join(f"#f_{i}" for i in range(len(field_set))),
+            "ExpressionAttributeNames": {f"#f_{i}": f for i, f in enumerate(field_set)},
+        }
+
+    @staticmethod
+    def _collect_pages(
+        call: Callable[..., Dict[str, Any]],
+        kwargs: Dict[str, Any],
+        limit: Optional[int],
+    ) -> List[Dict[str, Any]]:
+        """Follow LastEvaluatedKey until ``limit`` items (None: all) or the last page."""
+        if limit is not None:
+            kwargs["Limit"] = limit
+        response = call(**kwargs)
+        items = response.get("Items", [])
+        while "LastEvaluatedKey" in response and (limit is None or len(items) < limit):
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            if limit is not None:
+                kwargs["Limit"] = limit - len(items)
+            response = call(**kwargs)
+            items.extend(response.get("Items", []))
+        return [dict(item) for item in items[:limit]]
 
     def find(
         self,
@@ -152,51 +693,398 @@ class DynamoDBService(DatabaseService):
         selector: Dict[str, Any],
         fields: Optional[List[str]] = None,
         limit: int = 10000,
+        sort: Optional[List[Any]] = None,
     ) -> List[Dict[str, Any]]:
-        """Query using DynamoDB scan with server-side FilterExpression.
+        """Query via the best matching key, else scan with a FilterExpression.
 
-        DynamoDB doesn't support secondary indexes on arbitrary fields
-        without explicit GSI creation, so this is still a scan — but
-        the filter runs server-side, reducing data transfer.
+        If the selector pins the partition key of the table or of an
+        ACTIVE Global Secondary Index (see ensure_index), this issues a
+        paginated Query, so read cost scales with the matching items
+        rather than the whole table.  A constrained sort key becomes part
+        of the key condition (``between`` / ``begins_with`` / comparisons);
+        remaining selector fields become a server-side FilterExpression.
+        Without a usable key it falls back to a Scan with the same filter.
 
-        For high-throughput workloads, consider adding a GSI on
-        (userId, namespace) to the agent_data_store table.
+        A sort on the chosen index's range key is served by
+        ScanIndexForward, so ``limit`` stops the read early.  Any other
+        sort reads every match and orders them here.
         """
+        if self._queries_packed(db_name, selector):
+            order = normalize_sort(sort)
+            items = self._find_packed(db_name, selector, fields, [field for field, _ in order])
+            items = sort_docs(items, order)[:limit] if order else items[:limit]
+            if fields:
+                keep = set(fields) | {"_id"}
+                items = [{k: v for k, v in item.items() if k in keep} for item in items]
+            return items
         try:
-            table = self._get_or_create_table(db_name)
+            items = self._with_table(
+                db_name, lambda table: self._find_in_table(table, db_name, selector, fields, limit, sort)
+            )
+            return [self._from_item(db_name, item, fields) for item in items]
+        except Exception as e:
+            print(f"DynamoDB find failed, falling back to list_all filter: {e}")
+            note_query(fallback="list_all", scan=True)
+            return super().find(db_name, selector, fields, limit, sort)
 
-            # Build filter expression from selector
-            filter_expr = None
-            for field, value in selector.items():
-                condition = Attr(field).eq(value)
-                filter_expr = condition if filter_expr is None else (filter_expr & condition)
+    def _find_kwargs(
+        self,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]],
+        choice: Optional[Tuple[Optional[str], str, Optional[str]]],
+        sort: Optional[List[Any]] = None,
+    ) -> Dict[str, Any]:
+        """Query kwargs for ``choice`` (see _pick_index), or Scan kwargs if None."""
+        kwargs: Dict[str, Any] = self._projection_kwargs(fields)
+        exclude: set = set()
+        if choice is not None:
+            index_name, hash_key, range_key = choice
+            key_condition = Key(hash_key).eq(equality_value(selector, hash_key)[1])
+            exclude.add(hash_key)
+            range_condition, exact = (
+                self._range_condition(range_key, selector[range_key])
+                if range_key and range_key in selector else (None, False)
+            )
+            if range_condition is not None:
+                key_condition = key_condition & range_condition
+                if exact:
+                    exclude.add(range_key)
+            kwargs["KeyConditionExpression"] = key_condition
+            if index_name:
+                kwargs["IndexName"] = index_name
+            order = effective_sort(selector, sort)
+            if range_key and order and order[0][0] == range_key:
+                kwargs["ScanIndexForward"] = not order[0][1]
+        filter_expr = self._filter_expression(selector, exclude=exclude)
+        if filter_expr is not None:
+            kwargs["FilterExpression"] = filter_expr
+        return kwargs
+
+    def _find_in_table(
+        self,
+        table,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]],
+        limit: int,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        order = effective_sort(selector, sort)
+        choice = self._pick_index(db_name, selector, sort)
+        if choice is not None:
+            # Key order covers the sort only when it is a single field
+            # and that field is the range key being queried.
+            key_ordered = not order or (len(order) == 1 and order[0][0] == choice[2])
+            note_query(index=choice[0] or "table")
+            try:
+                if key_ordered:
+                    kwargs = self._find_kwargs(selector, fields, choice, sort)
+                    return self._collect_pages(table.query, kwargs, limit)
+                return self._sorted_pages(table.query, selector, fields, choice, order, limit)
+            except ClientError as e:
+                if self._is_missing_table(e):
+                    raise
+                print(f"DynamoDB query failed, falling back to scan: {e}")
+                note_query(fallback="scan")
+        note_query(scan=True, index=None)
+        if not order:
+            return self._collect_pages(table.scan, self._find_kwargs(selector, fields, None), limit)
+        return self._sorted_pages(table.scan, selector, fields, None, order, limit)
+
+    def _sorted_pages(self, call, selector, fields, choice, order, limit) -> List[Dict[str, Any]]:
+        """Read every match, sort here, then apply ``limit`` and the projection."""
+        fetch_fields = sorted(set(fields) | {f for f, _ in order}) if fields else None
+        items = sort_docs(
+            self._collect_pages(call, self._find_kwargs(selector, fetch_fields, choice), None), order
+        )[:limit]
+        if fields:
+            keep = set(fields) | {"_id"}
+            items = [{k: v for k, v in item.items() if k in keep} for item in items]
+        return items
+
+    def count(self, db_name: str, selector: Dict[str, Any]) -> int:
+        """Query (or Scan) with ``Select=COUNT``: items are matched server-side
+        but never returned, so only the counts cross the wire."""
+        if self._queries_packed(db_name, selector):
+            return len(self._find_packed(db_name, selector, ["_id"]))
+
+        def _count(table) -> int:
+            choice = self._pick_index(db_name, selector)
+            note_query(scan=choice is None, index=(choice[0] or "table") if choice else None)
+            call = table.query if choice is not None else table.scan
+            kwargs = self._find_kwargs(selector, None, choice)
+            kwargs["Select"] = "COUNT"
+            total = 0
+            while True:
+                response = call(**kwargs)
+                total += response.get("Count", 0)
+                if "LastEvaluatedKey" not in response:
+                    return total
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        try:
+            return self._with_table(db_name, _count)
+        except Exception as e:
+            print(f"DynamoDB count failed, falling back to streaming: {e}")
+            note_query(fallback="find_iter")
+            return super().count(db_name, selector)
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of find; the cursor wraps DynamoDB's LastEvaluatedKey.
 
-            # Build projection expression if fields requested
-            scan_kwargs = {}
-            if filter_expr is not None:
-                scan_kwargs["FilterExpression"] = filter_expr
+        The cursor also records which key (or scan) produced it, so a
+        GSI turning ACTIVE mid-iteration can't mix up key shapes.
+        Filtered pages can come back short from DynamoDB, so this keeps
+        reading until ``page_size`` items or the end of the results.
+        """
+        if self._queries_packed(db_name, selector):
+            # Paged by _id over the filtered scan, like the base class.
+            after = decode_cursor(cursor, str) if cursor else None
+            hits = sorted(
+                (
+                    doc for doc in self._find_packed(db_name, selector, fields)
+                    if after is None or str(doc["_id"]) > after
+                ),
+                key=lambda doc: str(doc["_id"]),
+            )
+            page = hits[:page_size]
             if fields:
-                # Always include _id
-                field_set = set(fields) | {"_id"}
-                # DynamoDB projection uses comma-separated field names
-                scan_kwargs["ProjectionExpression"] = ", ".join(
-                    f"#f_{i}" for i in range(len(field_set))
-                )
-                scan_kwargs["ExpressionAttributeNames"] = {
-                    f"#f_{i}": f for i, f in enumerate(field_set)
-                }
-            scan_kwargs["Limit"] = limit
+                keep = set(fields) | {"_id"}
+                page = [{k: v for k, v in doc.items() if k in keep} for doc in page]
+            next_cursor = encode_cursor(str(page[-1]["_id"])) if len(hits) > page_size else None
+            return page, next_cursor
+        if cursor:
+            state = decode_cursor(cursor, dict)
+            plan, start_key = state.get("plan"), state.get("key")
+            if not isinstance(start_key, dict) or not (plan is None or isinstance(plan, list) and len(plan) == 3):
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+            choice = tuple(plan) if plan else None
+        else:
+            choice = self._pick_index(db_name, selector)
+            start_key = None
 
-            response = table.scan(**scan_kwargs)
-            items = response.get("Items", [])
+        note_query(scan=choice is None, index=(choice[0] or "table") if choice else None)
 
-            while "LastEvaluatedKey" in response and len(items) < limit:
-                scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-                scan_kwargs["Limit"] = limit - len(items)
-                response = table.scan(**scan_kwargs)
+        def _page(table) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+            call = table.query if choice is not None else table.scan
+            kwargs = self._find_kwargs(selector, fields, choice)
+            last_key = start_key
+            items: List[Dict[str, Any]] = []
+            while True:
+                if last_key:
+                    kwargs["ExclusiveStartKey"] = last_key
+                kwargs["Limit"] = page_size - len(items)
+                response = call(**kwargs)
                 items.extend(response.get("Items", []))
+                last_key = response.get("LastEvaluatedKey")
+                if not last_key or len(items) >= page_size:
+                    break
+            next_cursor = (
+                encode_cursor({"plan": list(choice) if choice else None, "key": last_key})
+                if last_key else None
+            )
+            return [self._from_item(db_name, item, fields) for item in items], next_cursor
 
-            return [dict(item) for item in items[:limit]]
-        except Exception as e:
-            print(f"DynamoDB find failed, falling back to list_all filter: {e}")
-            return super().find(db_name, selector, fields, limit)
\ No newline at end of file
+        return self._with_table(db_name, _page)
+
+    # ------------------------------------------------------------------
+    # Bulk APIs (BatchGetItem / BatchWriteItem).
+    # These go through the low-level client, which is thread-safe,
+    # so chunks can be sent concurrently.
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _backoff(attempt: int) -> None:
+        delay = min(BATCH_RETRY_MAX_DELAY, BATCH_RETRY_BASE_DELAY * (2 ** attempt))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    @staticmethod
+    def _run_chunks(fn: Callable[[List[Any]], Any], chunks: List[List[Any]]) -> List[Any]:
+        """Run ``fn`` over every chunk, in parallel when there is more than one."""
+        if len(chunks) == 1:
+            return [fn(chunks[0])]
+        with ThreadPoolExecutor(
+            max_workers=min(BATCH_MAX_WORKERS, len(chunks)),
+            thread_name_prefix="dynamodb-batch",
+        ) as pool:
+            return list(pool.map(fn, chunks))
+
+    def _batch_write_chunk(self, table_name: str, requests: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Send one BatchWriteItem chunk, retrying unprocessed items.
+
+        Returns ``{doc_id: error}`` for requests that still failed;
+        ids absent from the result succeeded.
+        """
+        pending = requests
+        try:
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                response = self.client.batch_write_item(RequestItems={table_name: pending})
+                pending = response.get("UnprocessedItems", {}).get(table_name, [])
+                if not pending:
+                    return {}
+                if attempt < BATCH_MAX_RETRIES:
+                    self._backoff(attempt)
+            error = "unprocessed"
+        except ClientError as e:
+            error = e.response.get("Error", {}).get("Code", str(e))
+        failed: Dict[str, str] = {}
+        for request in pending:
+            item = request.get("PutRequest", {}).get("Item") or request["DeleteRequest"]["Key"]
+            failed[item["_id"]["S"]] = error
+        return failed
+
+    def _batch_write(self, table_name: str, requests: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """BatchWriteItem ``requests`` (keyed by doc id) in concurrent chunks."""
+        if not requests:
+            return {}
+        failed: Dict[str, str] = {}
+        chunks = _chunks(list(requests.values()), BATCH_WRITE_MAX_ITEMS)
+        for chunk_failed in self._run_chunks(
+            lambda chunk: self._batch_write_chunk(table_name, chunk), chunks
+        ):
+            failed.update(chunk_failed)
+
+        missing = [doc_id for doc_id, error in failed.items() if error == 'ResourceNotFoundException']
+        if missing:
+            # The table vanished under us: re-provision and retry once.
+            print(f"Table '{table_name}' disappeared; re-provisioning.")
+            self._forget_table(table_name)
+            self._get_or_create_table(table_name)
+            for doc_id in missing:
+                del failed[doc_id]
+            retry = _chunks([requests[doc_id] for doc_id in missing], BATCH_WRITE_MAX_ITEMS)
+            for chunk_failed in self._run_chunks(
+                lambda chunk: self._batch_write_chunk(table_name, chunk), retry
+            ):
+                failed.update(chunk_failed)
+        return failed
+
+    def save_many(
+        self,
+        db_name: str,
+        docs: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Bulk save via BatchWriteItem (25 puts per request, chunks in parallel).
+
+        Items DynamoDB reports as unprocessed are retried with
+        exponential backoff; any still pending after the last retry
+        come back as ``ok=False`` entries.  BatchWriteItem rejects two
+        writes to the same key in one call, so duplicate ids are
+        collapsed to the last occurrence.
+        """
+        if not docs:
+            return []
+        self._get_or_create_table(db_name)
+
+        requests: Dict[str, Dict[str, Any]] = {}
+        rejected: Dict[str, str] = {}
+        for doc in docs:
+            doc_id = doc.get("_id")
+            if not doc_id:
+                continue
+            self._stamp_expiry(db_name, doc)
+            item = self._to_item(db_name, doc)
+            try:
+                requests[doc_id] = {
+                    "PutRequest": {"Item": {k: _serializer.serialize(v) for k, v in item.items()}}
+                }
+                rejected.pop(doc_id, None)
+            except TypeError as e:
+                # Unserializable value: fail this doc, not the batch.
+                requests.pop(doc_id, None)
+                rejected[doc_id] = str(e)
+
+        failed = self._batch_write(db_name, requests)
+        failed.update(rejected)
+        results: List[Dict[str, Any]] = []
+        for doc in docs:
+            doc_id = doc.get("_id")
+            if not doc_id:
+                results.append({"ok": False, "id": None, "error": "missing _id"})
+            elif doc_id in failed:
+                results.append({"ok": False, "id": doc_id, "error": failed[doc_id]})
+            else:
+                results.append({"ok": True, "id": doc_id, "rev": "dynamodb-rev"})
+        return results
+
+    def delete_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Bulk delete via BatchWriteItem (25 deletes per request, chunks in parallel).
+
+        DeleteRequest is idempotent, so missing documents succeed
+        without a prior read.
+        """
+        if not doc_ids:
+            return []
+        self._get_or_create_table(db_name)
+        requests = {
+            doc_id: {"DeleteRequest": {"Key": {"_id": {"S": doc_id}}}}
+            for doc_id in doc_ids
+        }
+        failed = self._batch_write(db_name, requests)
+        return [
+            {"ok": False, "id": doc_id, "error": failed[doc_id]}
+            if doc_id in failed
+            else {"ok": True, "id": doc_id}
+            for doc_id in doc_ids
+        ]
+
+    def _batch_get_chunk(self, table_name: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch one BatchGetItem chunk, retrying unprocessed keys.
+
+        Keys still unprocessed after the last retry, or a chunk that
+        errors outright, fall back to per-doc ``get``.
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        request: Dict[str, Any] = {"Keys": [{"_id": {"S": doc_id}} for doc_id in doc_ids]}
+        try:
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                response = self.client.batch_get_item(RequestItems={table_name: request})
+                for item in response.get("Responses", {}).get(table_name, []):
+                    doc = {k: _deserializer.deserialize(v) for k, v in item.items()}
+                    found[doc["_id"]] = self._from_item(table_name, doc)
+                request = response.get("UnprocessedKeys", {}).get(table_name)
+                if not request or not request.get("Keys"):
+                    return found
+                if attempt < BATCH_MAX_RETRIES:
+                    self._backoff(attempt)
+            leftover = [key["_id"]["S"] for key in request["Keys"]]
+        except ClientError as e:
+            print(f"DynamoDB batch_get_item failed, falling back to per-doc get: {e}")
+            leftover = [doc_id for doc_id in doc_ids if doc_id not in found]
+        for doc_id, doc in super().get_many(table_name, leftover).items():
+            if doc is not None:
+                found[doc_id] = doc
+        return found
+
+    def get_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Bulk fetch via BatchGetItem (100 keys per request, chunks in parallel).
+
+        Missing docs map to None.
+        """
+        if not doc_ids:
+            return {}
+        self._get_or_create_table(db_name)
+        # BatchGetItem rejects duplicate keys within one request.
+        unique_ids = list(dict.fromkeys(doc_ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        chunks = _chunks(unique_ids, BATCH_GET_MAX_KEYS)
+        for chunk_found in self._run_chunks(
+            lambda chunk: self._batch_get_chunk(db_name, chunk), chunks
+        ):
+            found.update(chunk_found)
+        return {doc_id: found.get(doc_id) for doc_id in doc_ids}
@@ -1,12 +1,34 @@
-from typing import Any, Dict, List, Optional
+import functools
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 from fastapi import HTTPException
-from firebase_admin import firestore
-from .base import DatabaseService
+from firebase_admin import firestore, firestore_async
+from .aggregates import Buckets, greater, new_bucket
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, decode_cursor, encode_cursor
+from .instrumentation import note_query
+from .scans import SCAN_PAGE_SIZE, SegmentReader
+from .selectors import conditions, effective_sort, prefix_upper_bound
+
+# Firestore caps a WriteBatch at 500 writes; reads are chunked the same
+# way to keep each BatchGetDocuments request bounded.
+BATCH_MAX_DOCS = 500
+
+# Selector operator -> Firestore where() operator.  $prefix is expanded
+# to a >= / < pair in _build_query.
+_WHERE_OPS = {"$eq": "==", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$in": "in"}
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
 
 class FirestoreDBService(DatabaseService):
     """Firestore implementation of the DatabaseService."""
 
+    # Expired documents are removed by a TTL policy on EXPIRES_AT_FIELD,
+    # created once per collection group (see retention.py).
+    native_ttl = True
+
     def __init__(self):
         try:
             self.db = firestore.client()
@@ -14,6 +36,15 @@ class FirestoreDBService(DatabaseService):
         except Exception as e:
             print(f"Failed to connect to Firestore: {e}")
             raise ConnectionError(f"Could not connect to Firestore: {e}") from e
+        # Native async client for the a* methods.  Created lazily so a
+        # sync-only process (scripts, tests) never opens a second gRPC
+        # channel.
+        self._async_db = None
+
+    def _get_async_client(self):
+        if self._async_db is None:
+            self._async_db = firestore_async.client()
+        return self._async_db
 
     def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
         doc_ref = self.db.collection(db_name).document(doc_id)
@@ -27,7 +58,18 @@ class FirestoreDBService(DatabaseService):
         data['_id'] = doc.id
         return data
 
-    def save(self, db_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    def _expiry_value(self, epoch: float) -> Any:
+        # TTL policies only act on timestamp fields.
+        return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        self._stamp_expiry(db_name, doc, expires_at)
         doc_ref = self.db.collection(db_name).document(doc_id)
         # The document being saved already contains '_id' from model_dump(by_alias=True)
         doc_ref.set(doc)
@@ -41,16 +83,37 @@ class FirestoreDBService(DatabaseService):
         doc_ref.delete()
 
     def list_all(self, db_name: str) -> List[Dict[str, Any]]:
-        docs_stream = self.db.collection(db_name).stream()
-        # MODIFICATION: Iterate and add the document ID to each result.
-        results = []
-        for doc in docs_stream:
+        return list(self.list_all_iter(db_name))
+
+    def _scan_segments(self, db_name: str, segments: int) -> List[SegmentReader]:
+        """Stream the collection, split by partition query when parallel.
+
+        Partition queries are only offered on collection groups.  The
+        app has no subcollections, so the group named ``db_name`` is
+        just this collection.  Firestore may return fewer partitions
+        than asked for.
+        """
+        if segments == 1:
+            queries = [self.db.collection(db_name)]
+        else:
+            partitions = self.db.collection_group(db_name).get_partitions(segments)
+            queries = [partition.query() for partition in partitions]
+        return [functools.partial(self._stream_pages, query) for query in queries]
+
+    @staticmethod
+    def _stream_pages(query) -> Iterator[List[Dict[str, Any]]]:
+        page: List[Dict[str, Any]] = []
+        for doc in query.stream():
             data = doc.to_dict()
-            # This is the critical fix. The document ID must be included.
+            # The document ID must be included.
             # Use '_id' to match the Pydantic model's alias.
             data['_id'] = doc.id
-            results.append(data)
-        return results
+            page.append(data)
+            if len(page) >= SCAN_PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
 
     def find(
         self,
@@ -58,29 +121,293 @@ class FirestoreDBService(DatabaseService):
         selector: Dict[str, Any],
         fields: Optional[List[str]] = None,
         limit: int = 10000,
+        sort: Optional[List[Any]] = None,
     ) -> List[Dict[str, Any]]:
         """Query using Firestore's native where() filters.
 
         Firestore automatically indexes all fields, so equality
         queries are efficient without explicit index creation.
-        Composite queries on 2+ fields may require a composite index
-        in Firestore — these are created automatically or via the
-        Firebase console when first needed.
+        Composite queries on 2+ fields (including an equality filter
+        plus a range filter or ``order_by``) may require a composite
+        index in Firestore — these are created automatically or via the
+        Firebase console when first needed.  When ``fields`` is given
+        the projection runs server-side via select(), so only those
+        fields are downloaded.
         """
         try:
-            query = self.db.collection(db_name)
-            for field, value in selector.items():
-                query = query.where(field, "==", value)
-            query = query.limit(limit)
-
-            results = []
-            for doc in query.stream():
-                data = doc.to_dict()
-                data["_id"] = doc.id
-                if fields:
-                    data = {f: data.get(f) for f in set(fields) | {"_id"}}
-                results.append(data)
-            return results
+            query = self._build_query(self.db.collection(db_name), selector, fields, limit, sort)
+            return [self._project(doc, fields) for doc in query.stream()]
         except Exception as e:
             print(f"Firestore find failed, falling back to list_all filter: {e}")
-            return super().find(db_name, selector, fields, limit)
\ No newline at end of file
+            note_query(fallback="list_all", scan=True)
+            return super().find(db_name, selector, fields, limit, sort)
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page ordered by document ID; the cursor is the last ID (start_after)."""
+        query = self._page_query(self.db.collection(db_name), selector, fields, page_size, cursor)
+        docs = [self._project(doc, fields) for doc in query.stream()]
+        return docs, self._next_cursor(docs, page_size)
+
+    def _page_query(self, collection, selector, fields, page_size, cursor):
+        query = self._build_query(collection, selector, fields, page_size).order_by("__name__")
+        if cursor:
+            query = query.start_after({"__name__": decode_cursor(cursor, str)})
+        return query
+
+    @staticmethod
+    def _next_cursor(docs: List[Dict[str, Any]], page_size: int) -> Optional[str]:
+        return encode_cursor(docs[-1]["_id"]) if len(docs) == page_size else None
+
+    @staticmethod
+    def _build_query(
+        collection,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]],
+        limit: Optional[int],
+        sort: Optional[List[Any]] = None,
+    ):
+        """where() per selector condition, order_by() per sort field, plus a
+        server-side select() projection.  ``limit=None`` leaves it unbounded.
+
+        ``$prefix`` becomes a ``>=`` / ``<`` range on the field.  The
+        document ID is not a stored field, so ``_id`` is never sent to
+        select(); _project adds it back from the snapshot.
+        """
+        query = collection
+        for field, value in selector.items():
+            for op, operand in conditions(value).items():
+                if op == "$prefix":
+                    query = query.where(field, ">=", operand)
+                    upper = prefix_upper_bound(operand)
+                    if upper is not None:
+                        query = query.where(field, "<", upper)
+                else:
+                    query = query.where(field, _WHERE_OPS[op], list(operand) if op == "$in" else operand)
+        for field, descending in effective_sort(selector, sort):
+            query = query.order_by(field, direction="DESCENDING" if descending else "ASCENDING")
+        if fields:
+            query = query.select(sorted(set(fields) - {"_id"}))
+        return query.limit(limit) if limit is not None else query
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        """Ungrouped aggregates run as Firestore aggregation queries.
+
+        count() and sum() come back from one RunAggregationQuery without
+        reading documents, plus a count() per sum field of the documents
+        holding a number; each max is an ``order_by(field desc).limit(1)``
+        read.  Firestore has no GROUP BY, so grouped aggregates (and any
+        query Firestore rejects, e.g. for a missing composite index) use
+        the streaming default.
+        """
+        if group_by:
+            return super().aggregate(db_name, selector, group_by, sum_fields, max_fields)
+        try:
+            query = self._build_query(self.db.collection(db_name), selector, None, None)
+            agg = query.count(alias="count")
+            for i, field in enumerate(sum_fields):
+                agg = agg.sum(field, alias=f"sum_{i}")
+            values = {result.alias: result.value for row in agg.get() for result in row}
+            if not values.get("count"):
+                return {}
+            bucket = new_bucket(sum_fields, max_fields)
+            bucket["count"] = int(values["count"])
+            for i, field in enumerate(sum_fields):
+                bucket["sum"][field] = values.get(f"sum_{i}") or 0
+                # Range filters only match values of the operand's type,
+                # so this counts the documents with a number to sum.
+                numeric = query.where(field, ">=", float("-inf")).count(alias="count")
+                bucket["counts"][field] = sum(int(result.value) for row in numeric.get() for result in row)
+            for field in max_fields:
+                top = query.order_by(field, direction="DESCENDING").select([field]).limit(1)
+                for doc in top.stream():
+                    value = (doc.to_dict() or {}).get(field)
+                    if greater(value, None):
+                        bucket["max"][field] = value
+            return {(): bucket}
+        except Exception as e:
+            print(f"Firestore aggregation query failed, falling back to streaming: {e}")
+            return super().aggregate(db_name, selector, group_by, sum_fields, max_fields)
+
+    @staticmethod
+    def _project(doc, fields: Optional[List[str]]) -> Dict[str, Any]:
+        data = doc.to_dict() or {}
+        data["_id"] = doc.id
+        if fields:
+            data = {f: data.get(f) for f in set(fields) | {"_id"}}
+        return data
+
+    # --- Bulk APIs (get_all / WriteBatch) ------------------------------
+
+    def save_many(
+        self,
+        db_name: str,
+        docs: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Bulk save via WriteBatch, one commit per 500 documents.
+
+        A batch commits atomically, so if a commit fails every document
+        in that chunk is reported ``ok=False`` with the error; other
+        chunks are unaffected.
+        """
+        if not docs:
+            return []
+        collection = self.db.collection(db_name)
+        for doc in docs:
+            self._stamp_expiry(db_name, doc)
+        results: List[Dict[str, Any]] = [{} for _ in docs]
+        pending: List[int] = []
+        for i, doc in enumerate(docs):
+            if doc.get("_id"):
+                pending.append(i)
+            else:
+                results[i] = {"ok": False, "id": None, "error": "missing _id"}
+
+        for chunk in _chunks(pending, BATCH_MAX_DOCS):
+            batch = self.db.batch()
+            for i in chunk:
+                batch.set(collection.document(docs[i]["_id"]), docs[i])
+            try:
+                batch.commit()
+                error = None
+            except Exception as exc:
+                error = str(exc)
+            for i in chunk:
+                doc_id = docs[i]["_id"]
+                if error is None:
+                    results[i] = {"ok": True, "id": doc_id, "rev": "firestore-rev"}
+                else:
+                    results[i] = {"ok": False, "id": doc_id, "error": error}
+        return results
+
+    def delete_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Bulk delete via WriteBatch, one commit per 500 documents.
+
+        Firestore deletes of missing documents succeed, which matches
+        the idempotent contract without a read first.
+        """
+        if not doc_ids:
+            return []
+        collection = self.db.collection(db_name)
+        results: List[Dict[str, Any]] = []
+        for chunk in _chunks(doc_ids, BATCH_MAX_DOCS):
+            batch = self.db.batch()
+            for doc_id in chunk:
+                batch.delete(collection.document(doc_id))
+            try:
+                batch.commit()
+                results.extend({"ok": True, "id": doc_id} for doc_id in chunk)
+            except Exception as exc:
+                results.extend({"ok": False, "id": doc_id, "error": str(exc)} for doc_id in chunk)
+        return results
+
+    def get_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Bulk fetch via get_all (one BatchGetDocuments per 500 ids).
+
+        Missing docs map to None.  get_all streams snapshots in no
+        particular order, so results are keyed back by snapshot id.
+        """
+        if not doc_ids:
+            return {}
+        collection = self.db.collection(db_name)
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            for chunk in _chunks(list(dict.fromkeys(doc_ids)), BATCH_MAX_DOCS):
+                for snap in self.db.get_all([collection.document(doc_id) for doc_id in chunk]):
+                    if snap.exists:
+                        found[snap.id] = self._project(snap, None)
+        except Exception as exc:
+            print(f"Firestore get_many failed, falling back to per-doc get: {exc}")
+            return super().get_many(db_name, doc_ids)
+        return {doc_id: found.get(doc_id) for doc_id in doc_ids}
+
+    # --- Native async (google.cloud.firestore.AsyncClient) ---------------
+    # Bulk methods keep the thread-pool adapter from the base class.
+
+    async def aget(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        doc = await self._get_async_client().collection(db_name).document(doc_id).get()
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
+        data = doc.to_dict()
+        data['_id'] = doc.id
+        return data
+
+    async def asave(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        self._stamp_expiry(db_name, doc, expires_at)
+        await self._get_async_client().collection(db_name).document(doc_id).set(doc)
+        return {"id": doc_id, "rev": "firestore-rev"}
+
+    async def adelete(self, db_name: str, doc_id: str):
+        doc_ref = self._get_async_client().collection(db_name).document(doc_id)
+        if not (await doc_ref.get()).exists:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
+        await doc_ref.delete()
+
+    async def alist_all(self, db_name: str) -> List[Dict[str, Any]]:
+        if self.scan_parallelism > 1:
+            # Partitions are read concurrently on sync clients.
+            return await self._run_sync(self.list_all, db_name)
+        results = []
+        async for doc in self._get_async_client().collection(db_name).stream():
+            data = doc.to_dict()
+            data['_id'] = doc.id
+            results.append(data)
+        return results
+
+    async def afind_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = self._page_query(
+            self._get_async_client().collection(db_name), selector, fields, page_size, cursor
+        )
+        docs = [self._project(doc, fields) async for doc in query.stream()]
+        return docs, self._next_cursor(docs, page_size)
+
+    async def afind(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        try:
+            query = self._build_query(
+                self._get_async_client().collection(db_name), selector, fields, limit, sort
+            )
+            return [self._project(doc, fields) async for doc in query.stream()]
+        except Exception as e:
+            print(f"Firestore async find failed, falling back to sync find: {e}")
+            return await super().afind(db_name, selector, fields, limit, sort)
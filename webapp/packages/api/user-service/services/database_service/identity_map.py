@@ -0,0 +1,132 @@
+"""Request-scoped identity map: each document is read at most once per scope.
+
+One request often fetches the same document several times:
+``call_llm`` reads the user in ``require_allowance`` and again in
+``get_effective_api_key``, ``get_available_providers`` reads it once per
+provider, and ``build_agent_chain`` re-loads agents it has already
+visited.  ``IdentityMapDatabaseService`` remembers every ``get`` /
+``get_many`` result for the rest of the current scope and answers
+repeats from memory.
+
+A scope is opened per HTTP request by :class:`IdentityScopeMiddleware`,
+or explicitly with :func:`identity_scope` (a script, a background
+job).  It lives in a contextvar, so tasks and worker threads started
+from the request share it, and nothing outlives it: the next request
+reads fresh.  Outside a scope every call passes straight through.
+
+It is the same write-through cache as :class:`CachingDatabaseService`
+with the per-collection caches held by the scope instead of the
+process: a write through the service in the same scope drops the
+entry (even when the write fails, since a 409 means our copy is
+stale), and documents are deep-copied in and out.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import math
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .base import DatabaseService
+from .caching import CachePolicy, CachingDatabaseService, _CollectionCache
+
+# Documents one scope remembers per collection; a long agent run walking
+# many documents evicts the oldest instead of growing without bound.
+IDENTITY_MAP_MAX_ENTRIES = 1000
+
+_SCOPE_POLICY = CachePolicy(ttl_seconds=math.inf, max_entries=IDENTITY_MAP_MAX_ENTRIES)
+
+# db_name -> that collection's cache for the current scope.
+_current_scope: contextvars.ContextVar[Optional[Dict[str, _CollectionCache]]] = contextvars.ContextVar(
+    "database_identity_scope", default=None
+)
+
+
+@contextlib.contextmanager
+def identity_scope() -> Iterator[None]:
+    """Dedupe document reads until the block exits.
+
+    Nested scopes join the outer one, so a helper can open a scope
+    without splitting its caller's.
+    """
+    if _current_scope.get() is not None:
+        yield
+        return
+    token = _current_scope.set({})
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+class IdentityScopeMiddleware:
+    """ASGI middleware opening one identity scope per HTTP request.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware`` so the scope also
+    covers a streamed response body.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with identity_scope():
+            await self.app(scope, receive, send)
+
+
+def parse_identity_map_config(spec: Optional[str]) -> Optional[Callable[[str], bool]]:
+    """Parse ``DATABASE_IDENTITY_MAP_COLLECTIONS`` into a collection filter.
+
+    ``"*"`` covers every collection, a comma-separated list just those,
+    and an empty value returns None (identity map disabled).
+    """
+    names = {name.strip() for name in (spec or "").split(",") if name.strip()}
+    if not names:
+        return None
+    if "*" in names:
+        return lambda db_name: True
+    return names.__contains__
+
+
+class _ScopeCaches:
+    """The current scope's caches, limited to the collections a wrapper covers.
+
+    Stands in for ``CachingDatabaseService._caches``; collections get a
+    cache the first time they are touched in a scope.
+    """
+
+    def __init__(self, scope: Optional[Dict[str, _CollectionCache]], covers: Callable[[str], bool]):
+        self._scope = scope
+        self._covers = covers
+
+    def get(self, db_name: str, default: Any = None) -> Optional[_CollectionCache]:
+        if self._scope is None or not self._covers(db_name):
+            return default
+        return self._scope.setdefault(db_name, _CollectionCache(_SCOPE_POLICY))
+
+    def __contains__(self, db_name: str) -> bool:
+        return self._scope is not None and self._covers(db_name)
+
+    def items(self) -> Iterable:
+        return list(self._scope.items()) if self._scope is not None else []
+
+
+class IdentityMapDatabaseService(CachingDatabaseService):
+    """DatabaseService wrapper deduping ``get``/``get_many`` within an identity scope."""
+
+    def __init__(self, inner: DatabaseService, covers: Callable[[str], bool]):
+        super().__init__(inner, {})
+        self._covers = covers
+
+    @property
+    def _caches(self) -> _ScopeCaches:  # type: ignore[override]
+        return _ScopeCaches(_current_scope.get(), self._covers)
+
+    @_caches.setter
+    def _caches(self, value: Dict[str, _CollectionCache]) -> None:
+        # CachingDatabaseService.__init__ assigns its process-wide
+        # caches; this wrapper keeps none.
+        pass
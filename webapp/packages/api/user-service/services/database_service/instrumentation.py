@@ -0,0 +1,526 @@
+"""Query metrics and a slow-query log in front of any DatabaseService.
+
+``InstrumentedDatabaseService`` times every call to the backend it wraps
+and keeps per-collection, per-operation counters: calls, errors, total
+and max latency, documents returned (or written) and approximate bytes
+transferred (JSON size, estimated from a sample of the documents).
+Calls slower than ``slow_query_ms`` go to the ``slow-query`` log with
+the *shape* of the selector — field names and operators, never values.
+
+Backends report what actually happened through :func:`note_query`: a
+CouchDB ``_find`` that used no index, a DynamoDB Scan instead of a
+Query, or a fall back to ``list_all`` plus Python filtering after the
+native query failed.  Those are counted per collection and logged as
+warnings even when the call itself was fast, because they get slower
+as the collection grows.  ``list_all`` reads the whole collection by
+design, so it is counted under ``scans`` but only logged when slow.
+
+Only opt-in (DATABASE_METRICS_ENABLED); the factory installs it directly
+around the backend, inside any read-through cache, so cache hits are not
+counted as queries.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .aggregates import Buckets
+from .base import DEFAULT_PAGE_SIZE, DatabaseService
+from .selectors import conditions
+
+logger = logging.getLogger(__name__)
+
+# How many recent slow-query / full-scan entries to keep for inspection.
+SLOW_LOG_SIZE = 200
+
+# Documents serialized to estimate the byte volume of a multi-document
+# result; the rest are assumed to be the same average size.
+SIZE_SAMPLE = 5
+
+# Diagnostics for the call in flight.  The wrapper installs a fresh
+# dict around each call; backends add to it via note_query().  The dict
+# itself is shared (not copied) when _run_sync copies the context into
+# a worker thread, so notes made there are still seen by the wrapper.
+_query_notes: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "db_query_notes", default=None
+)
+
+
+def note_query(**info: Any) -> None:
+    """Attach backend diagnostics to the current instrumented call.
+
+    Recognised keys: ``fallback`` (str: what the backend fell back to,
+    e.g. ``"list_all"``), ``scan`` (bool: read the whole collection),
+    ``index`` (str or None: index used), ``execution_stats`` (dict:
+    backend-reported stats, e.g. CouchDB's).  No-op when the backend
+    isn't wrapped.
+    """
+    notes = _query_notes.get()
+    if notes is not None:
+        notes.update(info)
+
+
+def selector_shape(selector: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Field -> operator(s) for ``selector``, with all values dropped.
+
+    Safe to log: ``{"userId": "u1", "ts": {"$gt": "..."}}`` becomes
+    ``{"userId": "$eq", "ts": "$gt"}``.
+    """
+    shape: Dict[str, str] = {}
+    for field, value in (selector or {}).items():
+        try:
+            shape[field] = ",".join(sorted(conditions(value)))
+        except ValueError:
+            shape[field] = "?"
+    return shape
+
+
+def _json_size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _sampled_size(docs: Sequence[Any]) -> int:
+    """Approximate JSON size of ``docs`` from at most SIZE_SAMPLE of them.
+
+    Runs after every call, on the event loop for async ones, so large
+    results are never serialized in full.
+    """
+    if len(docs) <= SIZE_SAMPLE:
+        return _json_size(docs)
+    step = len(docs) / SIZE_SAMPLE
+    sample = [docs[int(i * step)] for i in range(SIZE_SAMPLE)]
+    return _json_size(sample) * len(docs) // SIZE_SAMPLE
+
+
+def find_instrumented(db: DatabaseService) -> Optional["InstrumentedDatabaseService"]:
+    """The InstrumentedDatabaseService in ``db``'s wrapper chain, if any."""
+    while db is not None:
+        if isinstance(db, InstrumentedDatabaseService):
+            return db
+        db = getattr(db, "inner", None)
+    return None
+
+
+class _OpStats:
+    """Counters for one (collection, operation) pair."""
+
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "docs", "bytes", "slow", "scans", "fallbacks")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.docs = 0
+        self.bytes = 0
+        self.slow = 0
+        self.scans = 0
+        self.fallbacks = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {name: getattr(self, name) for name in self.__slots__}
+        out["total_ms"] = round(self.total_ms, 3)
+        out["max_ms"] = round(self.max_ms, 3)
+        out["avg_ms"] = round(self.total_ms / self.calls, 3) if self.calls else 0.0
+        return out
+
+
+class InstrumentedDatabaseService(DatabaseService):
+    """DatabaseService wrapper that records per-collection query metrics."""
+
+    def __init__(self, inner: DatabaseService, slow_query_ms: float = 500):
+        self.inner = inner
+        self.slow_query_ms = slow_query_ms
+        self._stats: Dict[Tuple[str, str], _OpStats] = {}
+        self._slow_log: Deque[Dict[str, Any]] = deque(maxlen=SLOW_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    # --- recording -----------------------------------------------------------
+
+    @contextmanager
+    def _measure(
+        self,
+        op: str,
+        db_name: str,
+        selector: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Time the body; the caller stores the result under ``"result"``."""
+        call: Dict[str, Any] = {}
+        notes: Dict[str, Any] = {}
+        token = _query_notes.set(notes)
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            yield call
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _query_notes.reset(token)
+            self._record(op, db_name, selector, elapsed_ms, call, notes, error)
+
+    def _record(
+        self,
+        op: str,
+        db_name: str,
+        selector: Optional[Dict[str, Any]],
+        elapsed_ms: float,
+        call: Dict[str, Any],
+        notes: Dict[str, Any],
+        error: Optional[BaseException],
+    ) -> None:
+        docs, size = (0, 0) if error is not None else self._volume(op, call)
+        # list_all reads everything on purpose (startup, parallel scans);
+        # only an unplanned full read is worth a warning on a fast call.
+        scanned = (bool(notes.get("scan")) and op != "list_all") or bool(notes.get("fallback"))
+        slow = elapsed_ms >= self.slow_query_ms
+        with self._lock:
+            stats = self._stats.get((db_name, op))
+            if stats is None:
+                stats = self._stats[(db_name, op)] = _OpStats()
+            stats.calls += 1
+            stats.errors += error is not None
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.docs += docs
+            stats.bytes += size
+            stats.slow += slow
+            stats.scans += bool(notes.get("scan"))
+            stats.fallbacks += bool(notes.get("fallback"))
+        if not (slow or scanned):
+            return
+        entry = {
+            "ts": time.time(),
+            "collection": db_name,
+            "op": op,
+            "ms": round(elapsed_ms, 3),
+            "docs": docs,
+            "bytes": size,
+            "shape": selector_shape(selector),
+            **{k: v for k, v in notes.items() if k in ("fallback", "scan", "index", "execution_stats")},
+        }
+        if error is not None:
+            entry["error"] = type(error).__name__
+        with self._lock:
+            self._slow_log.append(entry)
+        if scanned:
+            logger.warning("Full collection read on %s.%s: %s", db_name, op, entry)
+        else:
+            logger.warning("Slow query on %s.%s: %s", db_name, op, entry)
+
+    @staticmethod
+    def _volume(op: str, call: Dict[str, Any]) -> Tuple[int, int]:
+        """(documents, approximate JSON bytes) moved by one call."""
+        result = call.get("result")
+        if op in ("save_many",):
+            docs = call.get("docs") or []
+            return len(docs), _sampled_size(docs)
+        if op == "save":
+            return 1, _json_size(call.get("doc"))
+        if op in ("delete", "delete_many", "ensure_index"):
+            return (len(call.get("doc_ids") or []) if op == "delete_many" else 0), 0
+        if op == "get":
+            return 1, _json_size(result)
+        if op == "get_many":
+            found = [doc for doc in (result or {}).values() if doc is not None]
+            return len(found), _sampled_size(found)
+        if op == "count":
+            return 0, 0
+        if op == "purge_expired":
+            return result or 0, 0
+        if op == "aggregate":
+            return 0, _sampled_size(list((result or {}).values()))
+        if op == "find_page":
+            page = result[0] if result else []
+            return len(page), _sampled_size(page)
+        # list_all / find
+        return len(result or []), _sampled_size(result or [])
+
+    def query_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """``{collection: {op: counters}}`` since start (or the last reset)."""
+        with self._lock:
+            out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (db_name, op), stats in sorted(self._stats.items()):
+                out.setdefault(db_name, {})[op] = stats.as_dict()
+            return out
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Most recent slow queries and full collection reads, oldest first."""
+        with self._lock:
+            return list(self._slow_log)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+
+    # --- sync API ------------------------------------------------------------
+
+    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        with self._measure("get", db_name) as call:
+            call["result"] = self.inner.get(db_name, doc_id)
+        return call["result"]
+
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        with self._measure("save", db_name) as call:
+            call["doc"] = doc
+            call["result"] = self.inner.save(db_name, doc_id, doc, expires_at=expires_at)
+        return call["result"]
+
+    def delete(self, db_name: str, doc_id: str):
+        with self._measure("delete", db_name) as call:
+            call["result"] = self.inner.delete(db_name, doc_id)
+        return call["result"]
+
+    def list_all(self, db_name: str) -> List[Dict[str, Any]]:
+        with self._measure("list_all", db_name) as call:
+            note_query(scan=True)
+            call["result"] = self.inner.list_all(db_name)
+        return call["result"]
+
+    def list_all_iter(
+        self,
+        db_name: str,
+        parallelism: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        return self.inner.list_all_iter(db_name, parallelism)
+
+    def find(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._measure("find", db_name, selector) as call:
+            call["result"] = self.inner.find(db_name, selector, fields, limit, sort)
+        return call["result"]
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        with self._measure("find_page", db_name, selector) as call:
+            call["result"] = self.inner.find_page(db_name, selector, fields, page_size, cursor)
+        return call["result"]
+
+    def count(self, db_name: str, selector: Dict[str, Any]) -> int:
+        with self._measure("count", db_name, selector) as call:
+            call["result"] = self.inner.count(db_name, selector)
+        return call["result"]
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        with self._measure("aggregate", db_name, selector) as call:
+            call["result"] = self.inner.aggregate(db_name, selector, group_by, sum_fields, max_fields)
+        return call["result"]
+
+    def ensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        with self._measure("ensure_index", db_name):
+            return self.inner.ensure_index(db_name, fields, index_name)
+
+    def partition_key(self, db_name: str, value: str) -> str:
+        return self.inner.partition_key(db_name, value)
+
+    def provision(self, collections: Iterable[str]) -> None:
+        return self.inner.provision(collections)
+
+    @property
+    def native_ttl(self) -> bool:  # type: ignore[override]
+        return self.inner.native_ttl
+
+    @property
+    def native_aggregate(self) -> bool:  # type: ignore[override]
+        return self.inner.native_aggregate
+
+    @property
+    def rejects_stale_writes(self) -> bool:  # type: ignore[override]
+        return self.inner.rejects_stale_writes
+
+    def configure_retention(self, policies: Dict[str, Optional[float]]) -> None:
+        return self.inner.configure_retention(policies)
+
+    def enable_ttl(self, db_name: str) -> None:
+        return self.inner.enable_ttl(db_name)
+
+    def purge_expired(self, db_name: str, now: Optional[float] = None) -> int:
+        with self._measure("purge_expired", db_name) as call:
+            call["result"] = self.inner.purge_expired(db_name, now)
+        return call["result"]
+
+    def save_many(self, db_name: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._measure("save_many", db_name) as call:
+            call["docs"] = docs
+            call["result"] = self.inner.save_many(db_name, docs)
+        return call["result"]
+
+    def delete_many(self, db_name: str, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        with self._measure("delete_many", db_name) as call:
+            call["doc_ids"] = doc_ids
+            call["result"] = self.inner.delete_many(db_name, doc_ids)
+        return call["result"]
+
+    def get_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        with self._measure("get_many", db_name) as call:
+            call["result"] = self.inner.get_many(db_name, doc_ids)
+        return call["result"]
+
+    # --- async API -----------------------------------------------------------
+    # Delegate to the inner backend's async methods so a native async
+    # client keeps working behind the wrapper.
+
+    async def _ameasure(
+        self,
+        op: str,
+        db_name: str,
+        fn: Callable[[], Any],
+        selector: Optional[Dict[str, Any]] = None,
+        **call_info: Any,
+    ) -> Any:
+        with self._measure(op, db_name, selector) as call:
+            call.update(call_info)
+            if op == "list_all":
+                note_query(scan=True)
+            call["result"] = await fn()
+        return call["result"]
+
+    async def aget(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        return await self._ameasure("get", db_name, lambda: self.inner.aget(db_name, doc_id))
+
+    async def asave(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        return await self._ameasure(
+            "save", db_name,
+            lambda: self.inner.asave(db_name, doc_id, doc, expires_at=expires_at),
+            doc=doc,
+        )
+
+    async def apurge_expired(self, db_name: str, now: Optional[float] = None) -> int:
+        return await self._ameasure(
+            "purge_expired", db_name, lambda: self.inner.apurge_expired(db_name, now)
+        )
+
+    async def adelete(self, db_name: str, doc_id: str):
+        return await self._ameasure("delete", db_name, lambda: self.inner.adelete(db_name, doc_id))
+
+    async def alist_all(self, db_name: str) -> List[Dict[str, Any]]:
+        return await self._ameasure("list_all", db_name, lambda: self.inner.alist_all(db_name))
+
+    async def afind(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._ameasure(
+            "find", db_name,
+            lambda: self.inner.afind(db_name, selector, fields, limit, sort),
+            selector,
+        )
+
+    async def afind_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await self._ameasure(
+            "find_page", db_name,
+            lambda: self.inner.afind_page(db_name, selector, fields, page_size, cursor),
+            selector,
+        )
+
+    async def acount(self, db_name: str, selector: Dict[str, Any]) -> int:
+        return await self._ameasure(
+            "count", db_name, lambda: self.inner.acount(db_name, selector), selector
+        )
+
+    async def aaggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        return await self._ameasure(
+            "aggregate", db_name,
+            lambda: self.inner.aaggregate(db_name, selector, group_by, sum_fields, max_fields),
+            selector,
+        )
+
+    async def aensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        return await self._ameasure(
+            "ensure_index", db_name, lambda: self.inner.aensure_index(db_name, fields, index_name)
+        )
+
+    async def asave_many(self, db_name: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await self._ameasure(
+            "save_many", db_name, lambda: self.inner.asave_many(db_name, docs), docs=docs
+        )
+
+    async def adelete_many(self, db_name: str, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        return await self._ameasure(
+            "delete_many", db_name, lambda: self.inner.adelete_many(db_name, doc_ids), doc_ids=doc_ids
+        )
+
+    async def aget_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        return await self._ameasure("get_many", db_name, lambda: self.inner.aget_many(db_name, doc_ids))
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
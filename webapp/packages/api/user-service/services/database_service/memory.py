@@ -1,6 +1,38 @@
-from typing import Any, Dict, List, Optional
+import itertools
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 from fastapi import HTTPException
-from .base import DatabaseService
+from .aggregates import Buckets, aggregate_docs
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, decode_cursor, encode_cursor
+from .instrumentation import note_query
+from .selectors import conditions, matches, normalize_sort, sort_docs
+
+# Hash index: index key (one value per indexed field) -> doc ids.  The
+# inner dict is used as an insertion-ordered set so find returns docs
+# in a stable order.
+_Index = Dict[Tuple[Any, ...], Dict[str, None]]
+
+
+def _hashable(value: Any) -> Any:
+    """Index-key form of a field value.
+
+    Lists and dicts can't be dict keys, so they're keyed by their JSON
+    encoding; equal values still produce equal keys.
+    """
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("__json__", json.dumps(value, sort_keys=True, default=str))
+
+
+def _project(doc_id: str, doc: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """``doc`` cut down to ``fields``; ``_id`` falls back to the store key."""
+    projected = {f: doc.get(f) for f in fields}
+    if "_id" in projected and projected["_id"] is None:
+        projected["_id"] = doc_id
+    return projected
 
 
 class MemoryDBService(DatabaseService):
@@ -8,28 +40,227 @@ class MemoryDBService(DatabaseService):
 
     def __init__(self):
         self.dbs: Dict[str, Dict[str, Any]] = {}
+        # Per collection: indexed field tuple -> hash index, plus the key
+        # each doc was filed under so updates and deletes can unfile it
+        # even if the stored doc was mutated in place.
+        self._indexes: Dict[str, Dict[Tuple[str, ...], _Index]] = {}
+        self._doc_keys: Dict[str, Dict[str, Dict[Tuple[str, ...], Tuple[Any, ...]]]] = {}
+        # The store dict each collection's indexes were built over; if
+        # something swaps self.dbs[name] out, the indexes are rebuilt.
+        self._indexed_stores: Dict[str, Dict[str, Any]] = {}
         print("Using in-memory database service.")
 
+    async def _run_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Nothing here does I/O, so the async API is just the sync one
+        # run inline — a thread hop would only add latency.
+        return fn(*args)
+
     def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
         if db_name not in self.dbs or doc_id not in self.dbs[db_name]:
             raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
         return self.dbs[db_name][doc_id]
 
-    def save(self, db_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        self._stamp_expiry(db_name, doc, expires_at)
         if db_name not in self.dbs:
             self.dbs[db_name] = {}
         self.dbs[db_name][doc_id] = doc
+        self._reindex(db_name, doc_id, doc)
         return {"id": doc_id, "rev": "memory-rev"}
 
     def delete(self, db_name: str, doc_id: str):
         if db_name in self.dbs and doc_id in self.dbs[db_name]:
             del self.dbs[db_name][doc_id]
+            self._reindex(db_name, doc_id, None)
         else:
             raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
 
     def list_all(self, db_name: str) -> List[Dict[str, Any]]:
         return list(self.dbs.get(db_name, {}).values())
 
+    # --- Hash indexes ---------------------------------------------------
+
+    def ensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        """Build a hash index over ``fields``; later writes maintain it.
+
+        find uses an index when the selector pins every indexed field
+        (equality or ``$in``).  Idempotent — an existing index on the
+        same field tuple is kept as is.
+        """
+        key_fields = tuple(fields)
+        if not key_fields or key_fields in self._indexes.get(db_name, {}):
+            return
+        self._check_store(db_name)
+        self._indexes.setdefault(db_name, {})[key_fields] = {}
+        doc_keys = self._doc_keys.setdefault(db_name, {})
+        index = self._indexes[db_name][key_fields]
+        for doc_id, doc in self.dbs.get(db_name, {}).items():
+            key = self._index_key(doc, key_fields)
+            index.setdefault(key, {})[doc_id] = None
+            doc_keys.setdefault(doc_id, {})[key_fields] = key
+
+    @staticmethod
+    def _index_key(doc: Dict[str, Any], key_fields: Tuple[str, ...]) -> Tuple[Any, ...]:
+        return tuple(_hashable(doc.get(f)) for f in key_fields)
+
+    def _check_store(self, db_name: str) -> None:
+        """Rebuild ``db_name``'s indexes if its store dict was replaced."""
+        store = self.dbs.get(db_name)
+        indexed = self._indexed_stores.get(db_name)
+        if store is indexed:
+            return
+        if store is None:
+            self._indexed_stores.pop(db_name, None)
+        else:
+            self._indexed_stores[db_name] = store
+        fields = list(self._indexes.get(db_name, {}))
+        self._indexes.pop(db_name, None)
+        self._doc_keys.pop(db_name, None)
+        for key_fields in fields:
+            self.ensure_index(db_name, list(key_fields))
+
+    def _reindex(self, db_name: str, doc_id: str, doc: Optional[Dict[str, Any]]) -> None:
+        """Move ``doc_id`` to the buckets for ``doc`` (None: it was deleted)."""
+        indexes = self._indexes.get(db_name)
+        if not indexes:
+            return
+        if self.dbs.get(db_name) is not self._indexed_stores.get(db_name):
+            # Rebuilding picks up this write too.
+            self._check_store(db_name)
+            return
+        doc_keys = self._doc_keys.setdefault(db_name, {})
+        old_keys = doc_keys.pop(doc_id, {})
+        for key_fields, key in old_keys.items():
+            bucket = indexes[key_fields].get(key)
+            if bucket is not None:
+                bucket.pop(doc_id, None)
+                if not bucket:
+                    del indexes[key_fields][key]
+        if doc is None:
+            return
+        new_keys = {}
+        for key_fields, index in indexes.items():
+            key = self._index_key(doc, key_fields)
+            index.setdefault(key, {})[doc_id] = None
+            new_keys[key_fields] = key
+        doc_keys[doc_id] = new_keys
+
+    def _candidate_ids(self, db_name: str, selector: Dict[str, Any]) -> Optional[Iterable[str]]:
+        """Doc ids from the most selective usable index, or None to scan.
+
+        An index is usable when every one of its fields is pinned to a
+        value or a ``$in`` list; ``$in`` unions the matching buckets.
+        """
+        self._check_store(db_name)
+        best: Optional[List[str]] = None
+        for key_fields, index in self._indexes.get(db_name, {}).items():
+            choices = []
+            for field in key_fields:
+                if field not in selector:
+                    break
+                conds = conditions(selector[field])
+                if set(conds) == {"$eq"}:
+                    choices.append([conds["$eq"]])
+                elif set(conds) == {"$in"}:
+                    choices.append(list(conds["$in"]))
+                else:
+                    break
+            else:
+                ids: Dict[str, None] = {}
+                for combo in itertools.product(*choices):
+                    ids.update(index.get(tuple(_hashable(v) for v in combo), {}))
+                if best is None or len(ids) < len(best):
+                    best = list(ids)
+        return best
+
+    def find(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Filter through the most selective hash index, else scan the store.
+
+        Matches are read straight from the store (no list_all copy) and
+        projected field by field, so a projected find never copies whole
+        documents.  A projected ``_id`` falls back to the store key, as
+        save() keeps documents without one.
+        """
+        store = self.dbs.get(db_name, {})
+        ids = self._candidate_ids(db_name, selector)
+        note_query(scan=ids is None, index=None if ids is None else "hash")
+        items = ((i, store[i]) for i in ids if i in store) if ids is not None else iter(store.items())
+        order = normalize_sort(sort)
+        results = []
+        for doc_id, doc in items:
+            if matches(doc, selector):
+                results.append((doc_id, doc))
+                if not order and len(results) >= limit:
+                    break
+        if order:
+            results = sort_docs(results, order, key=lambda item: item[1])[:limit]
+        if fields:
+            return [_project(doc_id, doc, fields) for doc_id, doc in results]
+        return [doc for _, doc in results]
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Walk the dict in key order; the cursor is the last key returned,
+        # so deletes between pages don't skip or repeat documents.
+        store = self.dbs.get(db_name, {})
+        after = decode_cursor(cursor, str) if cursor else None
+        ids = self._candidate_ids(db_name, selector)
+        note_query(scan=ids is None, index=None if ids is None else "hash")
+        page: List[Dict[str, Any]] = []
+        last_id = None
+        for doc_id in sorted(ids if ids is not None else store):
+            if after is not None and doc_id <= after:
+                continue
+            doc = store.get(doc_id)
+            if doc is None or not matches(doc, selector):
+                continue
+            if len(page) == page_size:
+                return page, encode_cursor(last_id)
+            page.append(_project(doc_id, doc, set(fields) | {"_id"}) if fields else doc)
+            last_id = doc_id
+        return page, None
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        """Fold the matches in place, through the same index lookup as find."""
+        store = self.dbs.get(db_name, {})
+        ids = self._candidate_ids(db_name, selector)
+        note_query(scan=ids is None, index=None if ids is None else "hash")
+        docs = (store[i] for i in ids if i in store) if ids is not None else iter(store.values())
+        return aggregate_docs(
+            (doc for doc in docs if matches(doc, selector)), group_by, sum_fields, max_fields
+        )
+
     def save_many(
         self,
         db_name: str,
@@ -43,7 +274,9 @@ class MemoryDBService(DatabaseService):
             if not doc_id:
                 results.append({"ok": False, "id": None, "error": "missing _id"})
                 continue
+            self._stamp_expiry(db_name, doc)
             self.dbs[db_name][doc_id] = doc
+            self._reindex(db_name, doc_id, doc)
             results.append({"ok": True, "id": doc_id, "rev": "memory-rev"})
         return results
 
@@ -55,7 +288,8 @@ class MemoryDBService(DatabaseService):
         store = self.dbs.get(db_name, {})
         results: List[Dict[str, Any]] = []
         for doc_id in doc_ids:
-            store.pop(doc_id, None)  # idempotent — missing is fine
+            if store.pop(doc_id, None) is not None:  # idempotent — missing is fine
+                self._reindex(db_name, doc_id, None)
             results.append({"ok": True, "id": doc_id})
         return results
 
@@ -65,4 +299,4 @@ class MemoryDBService(DatabaseService):
         doc_ids: List[str],
     ) -> Dict[str, "Optional[Dict[str, Any]]"]:
         store = self.dbs.get(db_name, {})
-        return {doc_id: store.get(doc_id) for doc_id in doc_ids}
\ No newline at end of file
+        return {doc_id: store.get(doc_id) for doc_id in doc_ids}
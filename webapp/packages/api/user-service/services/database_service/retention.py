@@ -0,0 +1,125 @@
+"""Document expiry (TTL) and the purge job for backends without native TTL.
+
+A document saved with ``expires_at`` (or into a collection with a
+configured retention) carries :data:`EXPIRES_AT_FIELD`.  What removes it
+afterwards depends on the backend:
+
+- DynamoDB: the field is the table's native TTL attribute (epoch
+  seconds); DynamoDB deletes expired items itself, usually within a day
+  or two.
+- Firestore: the field is a timestamp for a TTL policy on the
+  collection group.  The policy is created once per collection with
+  ``gcloud firestore fields ttls update ttlExpiresAt
+  --collection-group=<name> --enable-ttl``.
+- CouchDB, SQLite, memory: :class:`RetentionPurger` periodically calls
+  ``purge_expired``, which finds expired documents through an index on
+  the field and removes them with ``delete_many``.
+
+Expiry is a storage-reclamation mechanism, not an access check: until
+the purge runs, an expired document can still be read, so callers that
+care (sessions) keep checking their own expiry.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Absolute expiry time of a document.  Epoch seconds everywhere except
+# Firestore, whose TTL policies require a timestamp.
+EXPIRES_AT_FIELD = "ttlExpiresAt"
+
+# Documents removed per find + delete_many round in purge_expired.
+PURGE_BATCH_SIZE = 500
+
+DEFAULT_PURGE_INTERVAL_SECONDS = 3600
+
+
+def parse_retention_config(spec: Optional[str]) -> Dict[str, Optional[float]]:
+    """Parse ``DATABASE_RETENTION``, e.g. ``"tickets:86400,user_sessions"``.
+
+    ``name:seconds`` gives every document saved to ``name`` an expiry
+    that many seconds after its last save, unless the caller passes
+    ``expires_at``.  A bare ``name`` means documents only expire when
+    the caller sets ``expires_at``, but the collection is still
+    TTL-enabled and purged.  Invalid entries are skipped with a warning.
+    """
+    policies: Dict[str, Optional[float]] = {}
+    for entry in (spec or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, seconds = entry.partition(":")
+        name = name.strip()
+        try:
+            retention = float(seconds) if seconds.strip() else None
+        except ValueError:
+            print(f"Warning: ignoring invalid DATABASE_RETENTION entry '{entry}'")
+            continue
+        if not name or (retention is not None and retention <= 0):
+            print(f"Warning: ignoring invalid DATABASE_RETENTION entry '{entry}'")
+            continue
+        policies[name] = retention
+    return policies
+
+
+class RetentionPurger:
+    """Background task deleting expired documents on a fixed interval.
+
+    Runs on the event loop (started from the app lifespan) and only
+    touches collections whose backend has no native TTL.  ``get_db`` is
+    called on every pass rather than once, so the database service is
+    still built lazily by whichever comes first, a request or the
+    first purge.
+    """
+
+    def __init__(
+        self,
+        get_db: Callable[[], "object"],
+        collections: Dict[str, Optional[float]],
+        interval_seconds: float = DEFAULT_PURGE_INTERVAL_SECONDS,
+    ) -> None:
+        self._get_db = get_db
+        self._collections = list(collections)
+        self._interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self._collections and self._interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.purge_once()
+            except Exception:
+                # Never let one failed pass kill the loop.
+                logger.exception("RetentionPurger: purge failed; continuing")
+
+    async def purge_once(self) -> Dict[str, int]:
+        """Purge every configured collection once; returns deletions per collection."""
+        db = self._get_db()
+        if getattr(db, "native_ttl", False):
+            return {}
+        removed: Dict[str, int] = {}
+        for name in self._collections:
+            try:
+                removed[name] = await db.apurge_expired(name)
+            except Exception:
+                logger.exception("RetentionPurger: purging %s failed", name)
+        if any(removed.values()):
+            logger.info("RetentionPurger: removed expired documents %s", removed)
+        return removed
@@ -0,0 +1,90 @@
+"""Parallel segmented reads of a whole collection.
+
+A backend that can split a full read into independent pieces
+(DynamoDB ``Segment``/``TotalSegments``, Firestore partition queries,
+CouchDB ``_all_docs`` key ranges) returns one *segment reader* per
+piece from ``_scan_segments``.  :func:`merge_segments` runs the readers
+on their own threads and yields their pages as they arrive, so a
+caller streaming ``list_all_iter`` sees the first documents after one
+round trip and holds at most a few pages per worker in memory.
+
+Pages from different segments interleave; there is no global order.
+"""
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+# A segment reader yields that segment's documents a page at a time.
+SegmentReader = Callable[[], Iterator[List[Dict[str, Any]]]]
+
+# Documents fetched per round trip by segment readers that choose their
+# own page size (CouchDB _all_docs, Firestore streams).
+SCAN_PAGE_SIZE = 1000
+
+# Pages buffered per worker before a segment waits for the consumer.
+PAGES_PER_WORKER = 2
+
+_DONE = object()
+
+
+def merge_segments(readers: Sequence[SegmentReader], parallelism: int) -> Iterator[Dict[str, Any]]:
+    """Yield the documents of every segment, reading up to ``parallelism`` at once.
+
+    Workers run on a short-lived pool of their own, never the shared
+    db-io pool, so a scan running *on* that pool can't wait on its own
+    workers.  An error in any segment is re-raised to the consumer;
+    closing the iterator early stops the remaining segments after
+    their current page.
+    """
+    if len(readers) == 1:
+        for page in readers[0]():
+            yield from page
+        return
+
+    pages: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, parallelism) * PAGES_PER_WORKER)
+    stop = threading.Event()
+
+    def _put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(reader: SegmentReader) -> None:
+        try:
+            for page in reader():
+                if not _put(page):
+                    return
+        except BaseException as exc:
+            _put(exc)
+            return
+        _put(_DONE)
+
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, min(parallelism, len(readers))),
+        thread_name_prefix="db-scan",
+    )
+    try:
+        for reader in readers:
+            # Each worker gets its own copy, so query notes still reach
+            # an instrumented caller.
+            pool.submit(contextvars.copy_context().run, _run, reader)
+        remaining = len(readers)
+        while remaining:
+            item = pages.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield from item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
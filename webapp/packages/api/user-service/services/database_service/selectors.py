@@ -0,0 +1,152 @@
+"""The selector language shared by every DatabaseService backend.
+
+A selector maps field names to conditions.  A plain value means
+equality; a dict of operators constrains the field further::
+
+    {"userId": "u1", "key": {"$prefix": "file:"}}
+    {"actorUid": "a1", "ts": {"$gte": "2024-01-01", "$lt": "2024-02-01"}}
+    {"status": {"$in": ["queued", "running"]}}
+
+Backends translate these to their native query language (Mango on
+CouchDB, key conditions / filter expressions on DynamoDB, where() on
+Firestore).  :func:`matches` is the reference semantics the in-memory
+and list_all fallbacks use, so every backend returns the same docs.
+
+Sort specs follow Mango: a list of field names or ``{field: "asc"|"desc"}``
+dicts, applied in order.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Every operator a selector condition may use.
+OPERATORS = frozenset({"$eq", "$gt", "$gte", "$lt", "$lte", "$in", "$prefix"})
+
+# Appended to a prefix to get an exclusive upper bound under CouchDB's
+# ICU collation, where it sorts after any character a key can
+# realistically contain.  Byte- or code-point-ordered stores use
+# prefix_upper_bound() instead.
+PREFIX_UPPER_BOUND = "\ufff0"
+
+
+def conditions(value: Any) -> Dict[str, Any]:
+    """Normalise one selector value to an ``{operator: operand}`` dict.
+
+    Raises ValueError for an unknown ``$`` operator, so a typo can't
+    silently turn into an equality match on a dict.
+    """
+    if isinstance(value, dict) and value and all(str(k).startswith("$") for k in value):
+        unknown = set(value) - OPERATORS
+        if unknown:
+            raise ValueError(f"Unsupported selector operator(s): {sorted(unknown)}")
+        if "$in" in value and not isinstance(value["$in"], (list, tuple)):
+            raise ValueError("$in needs a list of values")
+        return dict(value)
+    return {"$eq": value}
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with ``prefix``.
+
+    Exact for code-point order, which UTF-8 byte order preserves
+    (Firestore, SQLite).  None when there is no such bound (empty
+    prefix, or only U+10FFFF characters) — the range is then open.
+    """
+    stripped = prefix.rstrip(chr(0x10FFFF))
+    if not stripped:
+        return None
+    nxt = ord(stripped[-1]) + 1
+    if 0xD800 <= nxt <= 0xDFFF:
+        # Surrogates can't be encoded; skip to the next real character.
+        nxt = 0xE000
+    return stripped[:-1] + chr(nxt)
+
+
+def equality_value(selector: Dict[str, Any], field: str) -> Tuple[bool, Any]:
+    """``(True, value)`` if ``selector`` pins ``field`` to a single value."""
+    if field not in selector:
+        return False, None
+    conds = conditions(selector[field])
+    if set(conds) == {"$eq"}:
+        return True, conds["$eq"]
+    return False, None
+
+
+def _compare(actual: Any, op: str, operand: Any) -> bool:
+    if op == "$eq":
+        return actual == operand
+    if op == "$in":
+        return actual in operand
+    if actual is None:
+        return False
+    try:
+        if op == "$prefix":
+            return isinstance(actual, str) and actual.startswith(operand)
+        if op == "$gt":
+            return actual > operand
+        if op == "$gte":
+            return actual >= operand
+        if op == "$lt":
+            return actual < operand
+        if op == "$lte":
+            return actual <= operand
+    except TypeError:
+        # Mismatched types never satisfy a range condition.
+        return False
+    return False
+
+
+def matches(doc: Dict[str, Any], selector: Dict[str, Any]) -> bool:
+    """Whether ``doc`` satisfies every condition in ``selector``."""
+    for field, value in selector.items():
+        actual = doc.get(field)
+        for op, operand in conditions(value).items():
+            if not _compare(actual, op, operand):
+                return False
+    return True
+
+
+def normalize_sort(sort: Optional[Iterable[Any]]) -> List[Tuple[str, bool]]:
+    """Turn a Mango-style sort spec into ``[(field, descending), ...]``."""
+    out: List[Tuple[str, bool]] = []
+    for entry in sort or []:
+        if isinstance(entry, str):
+            out.append((entry, False))
+            continue
+        if not isinstance(entry, dict) or len(entry) != 1:
+            raise ValueError(f"Invalid sort entry: {entry!r}")
+        (field, direction), = entry.items()
+        if direction not in ("asc", "desc"):
+            raise ValueError(f"Sort direction must be 'asc' or 'desc', got {direction!r}")
+        out.append((field, direction == "desc"))
+    return out
+
+
+def effective_sort(
+    selector: Dict[str, Any],
+    sort: Optional[Iterable[Any]],
+) -> List[Tuple[str, bool]]:
+    """normalize_sort minus fields the selector pins to one value.
+
+    Ordering by a constant is a no-op, and dropping it lets a backend
+    serve e.g. ``{"actorUid": x}`` sorted by ``ts`` straight from an
+    index on ``(actorUid, ts)``.
+    """
+    return [(f, desc) for f, desc in normalize_sort(sort) if not equality_value(selector, f)[0]]
+
+
+def sort_docs(
+    docs: List[Any],
+    sort: List[Tuple[str, bool]],
+    key: Callable[[Any], Dict[str, Any]] = lambda doc: doc,
+) -> List[Any]:
+    """Stable multi-key sort; docs missing a field sort before the rest.
+
+    ``key`` picks the document out of each item, for callers sorting
+    (id, doc) pairs.
+    """
+    out = list(docs)
+    for field, descending in reversed(sort):
+        out.sort(
+            key=lambda item: (key(item).get(field) is not None, key(item).get(field)),
+            reverse=descending,
+        )
+    return out
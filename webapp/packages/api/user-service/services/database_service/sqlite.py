@@ -0,0 +1,522 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from .aggregates import Buckets, merge
+from .base import DEFAULT_PAGE_SIZE, DatabaseService, decode_cursor, encode_cursor
+from .selectors import conditions, matches, normalize_sort, prefix_upper_bound
+
+# Ids per IN (...) list.  Older SQLite builds cap bound parameters at 999.
+BATCH_MAX_IDS = 500
+
+DEFAULT_POOL_SIZE = 8
+
+# Milliseconds a connection waits on another writer's lock before
+# failing with "database is locked".
+BUSY_TIMEOUT_MS = 5000
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _quote(name: str) -> str:
+    """Quote an identifier (table / index name) for SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _path_expr(field: str, fn: str = "json_extract") -> str:
+    """``json_extract`` (or ``json_type``) expression for one top-level field.
+
+    The path is inlined as a literal rather than bound: SQLite only
+    uses an expression index when the query's expression is textually
+    the same as the indexed one.
+    """
+    if '"' in field or "\\" in field:
+        raise ValueError(f"Unsupported field name for SQLite queries: {field!r}")
+    path = '$."' + field + '"'
+    return fn + "(doc, '" + path.replace("'", "''") + "')"
+
+
+def _sql_value(value: Any) -> Tuple[bool, Any]:
+    """``(True, param)`` if ``value`` compares natively against json_extract.
+
+    json_extract returns TEXT / INTEGER / REAL / NULL for scalars, and
+    JSON booleans as 0 / 1, so bools would also match numbers; those,
+    and objects / arrays, are left to the in-Python check.
+    """
+    if value is None or isinstance(value, bool):
+        return False, None
+    if isinstance(value, (str, int, float)):
+        return True, value
+    return False, None
+
+
+class SqliteDBService(DatabaseService):
+    """Embedded SQLite implementation of the DatabaseService.
+
+    One table per collection, ``(id TEXT PRIMARY KEY, doc TEXT)``, with
+    the document stored as JSON.  ensure_index creates expression
+    indexes on ``json_extract`` paths, and find pushes selectors and
+    sort into SQL, reading rows only until ``limit`` match.  The
+    database runs in WAL mode so readers don't block the writer;
+    connections come from a fixed-size pool.
+    """
+
+    # Exact selectors aggregate in one GROUP BY query.
+    native_aggregate = True
+
+    def __init__(self, path: str, pool_size: int = DEFAULT_POOL_SIZE):
+        self.path = path
+        in_memory = path == ":memory:" or path.startswith("file::memory:")
+        if not in_memory:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        # Each ":memory:" connection is its own database, so an
+        # in-memory store is limited to one shared connection.
+        size = 1 if in_memory else max(1, pool_size or DEFAULT_POOL_SIZE)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        try:
+            for _ in range(size):
+                self._pool.put(self._connect())
+        except sqlite3.Error as e:
+            print(f"Failed to open SQLite database at {path}: {e}")
+            raise ConnectionError(f"Could not open SQLite database: {e}") from e
+        print(f"Using SQLite database at {path} (pool of {size}).")
+
+        # Collection registry: tables created this process lifetime.
+        self._tables: set = set()
+        self._tables_lock = threading.Lock()
+        self._ensured_indexes: set = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; multi-statement writes open their own
+        # transaction in _transaction().
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            uri=self.path.startswith("file:"),
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """A pooled connection inside BEGIN IMMEDIATE ... COMMIT.
+
+        IMMEDIATE takes the write lock up front, so two writers queue on
+        busy_timeout instead of deadlocking on a lock upgrade.
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _table(self, db_name: str) -> str:
+        """Quoted table name for ``db_name``, creating the table once."""
+        if db_name not in self._tables:
+            with self._tables_lock:
+                if db_name not in self._tables:
+                    with self._connection() as conn:
+                        conn.execute(
+                            f"CREATE TABLE IF NOT EXISTS {_quote(db_name)} "
+                            "(id TEXT PRIMARY KEY, doc TEXT NOT NULL)"
+                        )
+                    self._tables.add(db_name)
+        return _quote(db_name)
+
+    def provision(self, collections: Iterable[str]) -> None:
+        """Create each collection's table up front."""
+        for db_name in collections:
+            try:
+                self._table(db_name)
+            except Exception as e:
+                print(f"Warning: failed to provision table '{db_name}': {e}")
+
+    @staticmethod
+    def _load(doc_id: str, raw: str) -> Dict[str, Any]:
+        doc = json.loads(raw)
+        doc.setdefault("_id", doc_id)
+        return doc
+
+    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        table = self._table(db_name)
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT doc FROM {table} WHERE id = ?", (doc_id,)).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in '{db_name}'")
+        return self._load(doc_id, row[0])
+
+    def save(
+        self,
+        db_name: str,
+        doc_id: str,
+        doc: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        self._stamp_expiry(db_name, doc, expires_at)
+        table = self._table(db_name)
+        raw = json.dumps(doc)
+        with self._connection() as conn:
+            conn.execute(
+                f"INSERT INTO {table} (id, doc) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET doc = excluded.doc",
+                (doc_id, raw),
+            )
+        return {"id": doc_id, "rev": "sqlite-rev"}
+
+    def delete(self, db_name: str, doc_id: str):
+        table = self._table(db_name)
+        with self._connection() as conn:
+            deleted = conn.execute(f"DELETE FROM {table} WHERE id = ?", (doc_id,)).rowcount
+        if not deleted:
+            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found for deletion.")
+
+    def list_all(self, db_name: str) -> List[Dict[str, Any]]:
+        table = self._table(db_name)
+        with self._connection() as conn:
+            rows = conn.execute(f"SELECT id, doc FROM {table}").fetchall()
+        return [self._load(doc_id, raw) for doc_id, raw in rows]
+
+    # --- Queries --------------------------------------------------------
+
+    @staticmethod
+    def _where(selector: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """SQL WHERE clause narrowing rows to the selector's matches.
+
+        Conditions SQLite can't compare exactly (booleans, nulls,
+        objects, lists) are left out here; find re-checks every row
+        with selectors.matches, so the clause only has to be a superset.
+        """
+        clauses, params, _ = SqliteDBService._where_clauses(selector)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _where_clauses(selector: Dict[str, Any]) -> Tuple[List[str], List[Any], bool]:
+        """``(clauses, params, exact)`` for the selector.
+
+        ``exact`` is False when some condition was left to the Python
+        re-check.  Range comparisons carry a ``json_type`` guard so,
+        like selectors.matches, a number never satisfies a string bound
+        or vice versa.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        exact = True
+        for field, value in selector.items():
+            expr = "id" if field == "_id" else _path_expr(field)
+            for op, operand in conditions(value).items():
+                if op == "$in":
+                    values = [_sql_value(v) for v in operand]
+                    if values and all(ok for ok, _ in values):
+                        clauses.append(f"{expr} IN ({', '.join('?' for _ in values)})")
+                        params.extend(v for _, v in values)
+                    else:
+                        exact = False
+                    continue
+                if op == "$prefix":
+                    if isinstance(operand, str):
+                        # A range rather than LIKE, so an index on the
+                        # field can serve it.
+                        clauses.append(f"{expr} >= ?")
+                        params.append(operand)
+                        upper = prefix_upper_bound(operand)
+                        if upper is not None:
+                            clauses.append(f"{expr} < ?")
+                            params.append(upper)
+                    else:
+                        exact = False
+                    continue
+                ok, param = _sql_value(operand)
+                if not ok:
+                    exact = False
+                    continue
+                sql_op = {"$eq": "=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}[op]
+                clauses.append(f"{expr} {sql_op} ?")
+                params.append(param)
+                if op != "$eq" and field != "_id":
+                    kinds = "('text')" if isinstance(param, str) else "('integer', 'real', 'true', 'false')"
+                    clauses.append(f"{_path_expr(field, 'json_type')} IN {kinds}")
+        return clauses, params, exact
+
+    def find(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        limit: int = 10000,
+        sort: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """One SELECT with the selector and sort pushed into SQL.
+
+        Rows stream off the cursor and reading stops at ``limit``
+        matches, so a sorted "latest N" reads N rows when an index
+        covers the sort.
+        """
+        table = self._table(db_name)
+        where, params = self._where(selector)
+        order = normalize_sort(sort)
+        order_by = ""
+        if order:
+            order_by = " ORDER BY " + ", ".join(
+                ("id" if f == "_id" else _path_expr(f)) + (" DESC" if desc else " ASC")
+                for f, desc in order
+            )
+        results: List[Dict[str, Any]] = []
+        with self._connection() as conn:
+            rows = conn.execute(f"SELECT id, doc FROM {table}{where}{order_by}", params)
+            try:
+                for doc_id, raw in rows:
+                    doc = self._load(doc_id, raw)
+                    if not matches(doc, selector):
+                        continue
+                    results.append({f: doc.get(f) for f in fields} if fields else doc)
+                    if len(results) >= limit:
+                        break
+            finally:
+                # Finalize the statement so an early stop doesn't leave a
+                # read transaction open on the pooled connection.
+                rows.close()
+        return results
+
+    def find_page(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page ordered by id; the cursor is the last id returned."""
+        table = self._table(db_name)
+        where, params = self._where(selector)
+        if cursor:
+            where += (" AND " if where else " WHERE ") + "id > ?"
+            params.append(decode_cursor(cursor, str))
+        page: List[Dict[str, Any]] = []
+        with self._connection() as conn:
+            rows = conn.execute(f"SELECT id, doc FROM {table}{where} ORDER BY id", params)
+            try:
+                for doc_id, raw in rows:
+                    doc = self._load(doc_id, raw)
+                    if not matches(doc, selector):
+                        continue
+                    if len(page) == page_size:
+                        return page, encode_cursor(page[-1]["_id"])
+                    page.append({f: doc.get(f) for f in set(fields) | {"_id"}} if fields else doc)
+            finally:
+                rows.close()
+        return page, None
+
+    def aggregate(
+        self,
+        db_name: str,
+        selector: Dict[str, Any],
+        group_by: Sequence[str] = (),
+        sum_fields: Sequence[str] = (),
+        max_fields: Sequence[str] = (),
+    ) -> Buckets:
+        """One ``GROUP BY`` query when the selector translates to SQL exactly.
+
+        Selectors with conditions only the Python check can evaluate
+        fall back to the streaming default.
+        """
+        clauses, params, exact = self._where_clauses(selector)
+        if not exact:
+            return super().aggregate(db_name, selector, group_by, sum_fields, max_fields)
+        table = self._table(db_name)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        # Select the JSON type too, so booleans come back as bools
+        # rather than 0 / 1.
+        group_cols = [
+            col
+            for f in group_by
+            for col in (("id", "'text'") if f == "_id" else (_path_expr(f), _path_expr(f, "json_type")))
+        ]
+        numeric = "IN ('integer', 'real')"
+        columns = [*group_cols, "COUNT(*)"]
+        columns += [
+            f"COALESCE(SUM(CASE WHEN {_path_expr(f, 'json_type')} {numeric} THEN {_path_expr(f)} END), 0)"
+            for f in sum_fields
+        ]
+        columns += [
+            f"COUNT(CASE WHEN {_path_expr(f, 'json_type')} {numeric} THEN 1 END)"
+            for f in sum_fields
+        ]
+        columns += [
+            f"MAX(CASE WHEN {_path_expr(f, 'json_type')} IN ('integer', 'real', 'text') THEN {_path_expr(f)} END)"
+            for f in max_fields
+        ]
+        sql = f"SELECT {', '.join(columns)} FROM {table}{where}"
+        if group_cols:
+            sql += " GROUP BY " + ", ".join(group_cols)
+        buckets: Buckets = {}
+        with self._connection() as conn:
+            for row in conn.execute(sql, params):
+                key = tuple(
+                    self._group_value(row[2 * i], row[2 * i + 1]) for i in range(len(group_by))
+                )
+                rest = row[len(group_cols):]
+                if not rest[0]:
+                    continue
+                merge(buckets, key, {
+                    "count": rest[0],
+                    "sum": dict(zip(sum_fields, rest[1:1 + len(sum_fields)])),
+                    "counts": dict(zip(sum_fields, rest[1 + len(sum_fields):1 + 2 * len(sum_fields)])),
+                    "max": dict(zip(max_fields, rest[1 + 2 * len(sum_fields):])),
+                })
+        return buckets
+
+    @staticmethod
+    def _group_value(value: Any, kind: Optional[str]) -> Any:
+        """Turn a json_extract result back into the value aggregates.group_key uses."""
+        if kind in ("true", "false"):
+            return kind == "true"
+        if kind in ("object", "array"):
+            return json.dumps(json.loads(value), sort_keys=True, default=str)
+        return value
+
+    def ensure_index(
+        self,
+        db_name: str,
+        fields: List[str],
+        index_name: Optional[str] = None,
+    ) -> None:
+        """Create an expression index over ``json_extract`` of ``fields``.
+
+        Index names are global in SQLite, so the table name is prefixed.
+        Idempotent (IF NOT EXISTS), and tracked per process so repeat
+        calls cost nothing.
+        """
+        if not fields:
+            return
+        cache_key = (db_name, tuple(fields))
+        if cache_key in self._ensured_indexes:
+            return
+        try:
+            table = self._table(db_name)
+            name = f"{db_name}__{index_name or 'idx-' + '_'.join(fields)}"
+            columns = ", ".join(_path_expr(f) for f in fields)
+            with self._connection() as conn:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {table} ({columns})")
+            self._ensured_indexes.add(cache_key)
+        except Exception as e:
+            # Best-effort — queries still work (just slower) without it.
+            print(f"Warning: failed to ensure index on {db_name} {fields}: {e}")
+
+    # --- Bulk APIs (one statement / transaction per call) ----------------
+
+    def save_many(
+        self,
+        db_name: str,
+        docs: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Upsert every document in one transaction.
+
+        Documents without an ``_id`` or that can't be encoded as JSON
+        are reported ``ok=False`` and skipped; if the transaction itself
+        fails, every document in it is reported with the error.
+        """
+        if not docs:
+            return []
+        table = self._table(db_name)
+        results: List[Dict[str, Any]] = [{} for _ in docs]
+        rows: List[Tuple[str, str]] = []
+        pending: List[int] = []
+        for i, doc in enumerate(docs):
+            doc_id = doc.get("_id")
+            if not doc_id:
+                results[i] = {"ok": False, "id": None, "error": "missing _id"}
+                continue
+            self._stamp_expiry(db_name, doc)
+            try:
+                rows.append((doc_id, json.dumps(doc)))
+                pending.append(i)
+            except (TypeError, ValueError) as exc:
+                results[i] = {"ok": False, "id": doc_id, "error": str(exc)}
+        if rows:
+            try:
+                with self._transaction() as conn:
+                    conn.executemany(
+                        f"INSERT INTO {table} (id, doc) VALUES (?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET doc = excluded.doc",
+                        rows,
+                    )
+                error = None
+            except sqlite3.Error as exc:
+                error = str(exc)
+            for i in pending:
+                doc_id = docs[i]["_id"]
+                if error is None:
+                    results[i] = {"ok": True, "id": doc_id, "rev": "sqlite-rev"}
+                else:
+                    results[i] = {"ok": False, "id": doc_id, "error": error}
+        return results
+
+    def delete_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Delete every id in one transaction; missing ids count as deleted."""
+        if not doc_ids:
+            return []
+        table = self._table(db_name)
+        try:
+            with self._transaction() as conn:
+                for chunk in _chunks(doc_ids, BATCH_MAX_IDS):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                        chunk,
+                    )
+        except sqlite3.Error as exc:
+            return [{"ok": False, "id": doc_id, "error": str(exc)} for doc_id in doc_ids]
+        return [{"ok": True, "id": doc_id} for doc_id in doc_ids]
+
+    def get_many(
+        self,
+        db_name: str,
+        doc_ids: List[str],
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """One ``id IN (...)`` SELECT per 500 ids; missing docs map to None."""
+        if not doc_ids:
+            return {}
+        table = self._table(db_name)
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._connection() as conn:
+            for chunk in _chunks(list(dict.fromkeys(doc_ids)), BATCH_MAX_IDS):
+                rows = conn.execute(
+                    f"SELECT id, doc FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                )
+                for doc_id, raw in rows:
+                    found[doc_id] = self._load(doc_id, raw)
+        return {doc_id: found.get(doc_id) for doc_id in doc_ids}
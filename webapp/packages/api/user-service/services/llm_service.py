@@ -94,12 +94,12 @@ async def call_llm(
         user_id = "anonymous"
 
     if user_service and user_id:
-        user_service.require_allowance(user_id, basic_info=user_basic_info)
+        await user_service.arequire_allowance(user_id, basic_info=user_basic_info)
 
     # Get the effective API key (user's key takes precedence over env var)
     api_key = None
     if user_service and user_id:
-        api_key = user_service.get_effective_api_key(user_id, provider, basic_info=user_basic_info)
+        api_key = await user_service.aget_effective_api_key(user_id, provider, basic_info=user_basic_info)
     # If no user-specific key, litellm will use environment variables
     if api_key:
         kwargs["api_key"] = api_key
@@ -403,7 +403,7 @@ async def call_llm(
         except Exception:
             response_cost = None
         if response_cost is not None:
-            user_service.add_usage(user_id, response_cost, basic_info=user_basic_info)
+            await user_service.aadd_usage(user_id, response_cost, basic_info=user_basic_info)
 
     return content, thoughts
 
@@ -448,12 +448,12 @@ async def stream_llm(
         user_id = "anonymous"
 
     if user_service and user_id:
-        user_service.require_allowance(user_id, basic_info=user_basic_info)
+        await user_service.arequire_allowance(user_id, basic_info=user_basic_info)
 
     # Get the effective API key (user's key takes precedence over env var)
     api_key = None
     if user_service and user_id:
-        api_key = user_service.get_effective_api_key(user_id, provider, basic_info=user_basic_info)
+        api_key = await user_service.aget_effective_api_key(user_id, provider, basic_info=user_basic_info)
     
     # If no user-specific key, litellm will use environment variables
     if api_key:
@@ -17,7 +17,10 @@ allowed.
 
 Expiry is a hard wall: the ``expires_at`` field is checked on every
 access, and expired sessions are returned as "not authenticated" even
-if the cookie hasn't been cleared on the client.
+if the cookie hasn't been cleared on the client.  Sessions are also
+saved with ``expires_at`` so the database's TTL (or the retention purge
+job) removes them once expired, instead of only when the stale cookie
+is presented again.
 """
 import secrets
 from datetime import datetime, timedelta
@@ -91,10 +94,11 @@ class SessionService:
             expires_at=expires,
             last_refresh_at=now,
         )
-        self.db.save(
+        await self.db.asave(
             _SESSIONS_COLLECTION,
             sid,
             session.model_dump(by_alias=True, mode="json"),
+            expires_at=expires,
         )
         return session
 
@@ -107,7 +111,7 @@ class SessionService:
         if not sid:
             return None
         try:
-            doc = self.db.get(_SESSIONS_COLLECTION, sid)
+            doc = await self.db.aget(_SESSIONS_COLLECTION, sid)
         except HTTPException as e:
             if e.status_code == 404:
                 return None
@@ -118,7 +122,7 @@ class SessionService:
         except Exception:
             # Corrupt doc — treat as missing and evict.
             try:
-                self.db.delete(_SESSIONS_COLLECTION, sid)
+                await self.db.adelete(_SESSIONS_COLLECTION, sid)
             except Exception:
                 pass
             return None
@@ -126,7 +130,7 @@ class SessionService:
         if session.expires_at <= datetime.utcnow():
             # Best-effort eviction; ignore errors.
             try:
-                self.db.delete(_SESSIONS_COLLECTION, sid)
+                await self.db.adelete(_SESSIONS_COLLECTION, sid)
             except Exception:
                 pass
             return None
@@ -138,7 +142,7 @@ class SessionService:
         if not sid:
             return
         try:
-            self.db.delete(_SESSIONS_COLLECTION, sid)
+            await self.db.adelete(_SESSIONS_COLLECTION, sid)
         except HTTPException as e:
             if e.status_code == 404:
                 return
@@ -192,10 +196,11 @@ class SessionService:
         session.updated_at = datetime.utcnow()
         session.last_refresh_at = session.updated_at
 
-        self.db.save(
+        await self.db.asave(
             _SESSIONS_COLLECTION,
             session.id,
             session.model_dump(by_alias=True, mode="json"),
+            expires_at=session.expires_at,
         )
         return session, diff
 
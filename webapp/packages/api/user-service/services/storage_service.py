@@ -1,5 +1,9 @@
+import os
+import tempfile
+
 import boto3
 from botocore.client import Config
+from botocore.exceptions import ClientError
 from config import settings
 from google.cloud import storage
 
@@ -7,6 +11,12 @@ class StorageService:
     def upload(self, file_name: str, file_obj):
         raise NotImplementedError
 
+    def download(self, file_name: str) -> bytes:
+        raise NotImplementedError
+
+    def exists(self, file_name: str) -> bool:
+        raise NotImplementedError
+
     def get_public_url(self, file_name: str) -> str:
         raise NotImplementedError
 
@@ -26,14 +36,54 @@ class S3StorageService(StorageService):
         self.s3_client.upload_fileobj(file_obj, self.bucket_name, file_name)
         print(f"Uploaded {file_name} to {self.bucket_name}")
 
+    def download(self, file_name: str) -> bytes:
+        obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_name)
+        return obj["Body"].read()
+
+    def exists(self, file_name: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=file_name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
     def get_public_url(self, file_name: str) -> str:
         # Note: This requires the object to have public-read ACL
         return f"{settings.S3_ENDPOINT_URL}/{self.bucket_name}/{file_name}"
 
 class LocalDiskStorageService(StorageService):
+    def __init__(self, root: str | None = None):
+        self.root = root or settings.LOCAL_STORAGE_PATH
+
+    def _path(self, file_name: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, file_name))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage path: {file_name}")
+        return path
+
     def upload(self, file_name: str, file_obj):
-        # Implementation for saving to local disk
-        pass
+        path = self._path(file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so a reader never sees a partial file.  The
+        # temp name is unique per call: threads may upload the same name.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_obj.read())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def download(self, file_name: str) -> bytes:
+        with open(self._path(file_name), "rb") as f:
+            return f.read()
+
+    def exists(self, file_name: str) -> bool:
+        return os.path.exists(self._path(file_name))
 
 class GCSStorageService(StorageService):
     def __init__(self):
@@ -51,6 +101,13 @@ class GCSStorageService(StorageService):
         blob.upload_from_file(file_obj)
         print(f"Uploaded {file_name} to GCS bucket {self.bucket_name}")
 
+    def download(self, file_name: str) -> bytes:
+        bucket = self.storage_client.bucket(self.bucket_name)
+        return bucket.blob(file_name).download_as_bytes()
+
+    def exists(self, file_name: str) -> bool:
+        return self.storage_client.bucket(self.bucket_name).blob(file_name).exists()
+
     def get_public_url(self, file_name: str) -> str:
         return f"https://storage.googleapis.com/{self.bucket_name}/{file_name}"
 
@@ -45,6 +45,17 @@ class UserService:
         user = self._create_default_user(user_id, basic_info)
         return self.save_user(user)
 
+    async def aget_user(self, user_id: str, basic_info: Optional[dict] = None) -> User:
+        """Awaitable :meth:`get_user` for callers on the event loop."""
+        try:
+            doc = await self.db.aget("users", user_id)
+            return User(**doc)
+        except HTTPException as exc:
+            if exc.status_code != 404:
+                raise
+        user = self._create_default_user(user_id, basic_info)
+        return await self.asave_user(user)
+
     def list_users(self) -> List[User]:
         return [User(**user_doc) for user_doc in self.db.list_all("users")]
 
@@ -54,12 +65,24 @@ class UserService:
         user.rev = saved.get("rev")
         return user
 
+    async def asave_user(self, user: User) -> User:
+        user.updated_at = datetime.utcnow()
+        saved = await self.db.asave("users", user.id, user.model_dump(by_alias=True, mode="json"))
+        user.rev = saved.get("rev")
+        return user
+
     def require_allowance(self, user_id: str, minimum_remaining: float = 1.0, basic_info: Optional[dict] = None) -> User:
         user = self.get_user(user_id, basic_info)
         if user.usage_info.spend_remaining <= minimum_remaining:
             raise HTTPException(status_code=402, detail="Insufficient spend allowance to complete request")
         return user
 
+    async def arequire_allowance(self, user_id: str, minimum_remaining: float = 1.0, basic_info: Optional[dict] = None) -> User:
+        user = await self.aget_user(user_id, basic_info)
+        if user.usage_info.spend_remaining <= minimum_remaining:
+            raise HTTPException(status_code=402, detail="Insufficient spend allowance to complete request")
+        return user
+
     def set_monthly_allowance(self, user_id: str, amount: float, basic_info: Optional[dict] = None) -> User:
         user = self.get_user(user_id, basic_info)
         user.usage_info.monthly_allowance = amount
@@ -113,6 +136,12 @@ class UserService:
         user.usage_info.spend_remaining = max(0.0, user.usage_info.spend_remaining - response_cost)
         return self.save_user(user)
 
+    async def aadd_usage(self, user_id: str, response_cost: float, metadata: Optional[Any] = None, basic_info: Optional[dict] = None) -> User:
+        user = await self.aget_user(user_id, basic_info)
+        user.usage_info.usage.append(UsageEntry(responseCost=response_cost, metadata=metadata))
+        user.usage_info.spend_remaining = max(0.0, user.usage_info.spend_remaining - response_cost)
+        return await self.asave_user(user)
+
     def get_api_keys(self, user_id: str, basic_info: Optional[dict] = None) -> ApiKeys:
         """Get the user's API keys (masked for security)"""
         user = self.get_user(user_id, basic_info)
@@ -148,10 +177,17 @@ class UserService:
         First checks user's stored keys, then falls back to environment variables.
         Returns None if no key is available.
         """
+        user = self.get_user(user_id, basic_info)
+        return self._effective_api_key(user, provider)
+
+    async def aget_effective_api_key(self, user_id: str, provider: str, basic_info: Optional[dict] = None) -> Optional[str]:
+        user = await self.aget_user(user_id, basic_info)
+        return self._effective_api_key(user, provider)
+
+    @staticmethod
+    def _effective_api_key(user: User, provider: str) -> Optional[str]:
         import os
         from config.provider_config import PROVIDER_CONFIG
-        
-        user = self.get_user(user_id, basic_info)
 
         # First, check user's stored API keys
         key_field = PROVIDER_KEY_MAP.get(provider)
@@ -168,7 +204,6 @@ class UserService:
         
         return None
 
-
 _user_service_instance: Optional[UserService] = None
 
 
@@ -173,6 +173,33 @@ def test_admin_routes_require_password(monkeypatch):
         app.dependency_overrides = {}
 
 
+def test_admin_database_metrics(monkeypatch):
+    from services.database_service import InstrumentedDatabaseService, MemoryDBService
+
+    app = create_app()
+    db = InstrumentedDatabaseService(MemoryDBService(), slow_query_ms=10_000)
+    db.save("t", "a", {"n": 1})
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "ADMIN_PANEL_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_PANEL_PASSWORD", "secret")
+
+    try:
+        assert client.get("/admin/database/metrics").status_code == 401
+        response = client.get("/admin/database/metrics", headers={"X-Admin-Password": "secret"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["enabled"] is True
+        assert body["stats"]["t"]["save"]["calls"] == 1
+        assert body["slowQueries"] == []
+
+        app.dependency_overrides[get_db] = lambda: db.inner
+        response = client.get("/admin/database/metrics", headers={"X-Admin-Password": "secret"})
+        assert response.json() == {"enabled": False, "stats": {}, "slowQueries": []}
+    finally:
+        app.dependency_overrides = {}
+
+
 def test_log_client_enriches_metadata_with_dependency_overrides():
     app = create_app()
     fake_logger = Mock()
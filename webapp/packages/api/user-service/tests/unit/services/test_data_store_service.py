@@ -17,6 +17,7 @@ from services.data_store_service import (
     DATA_STORE_DB,
     _STANDARD_INDEXES,
 )
+from services.database_service import selector_matches
 
 
 # =============================================================================
@@ -38,7 +39,7 @@ def mock_db():
         all_docs = db.list_all(db_name)
         results = []
         for doc in all_docs:
-            if all(doc.get(k) == v for k, v in selector.items()):
+            if selector_matches(doc, selector):
                 if fields:
                     results.append({f: doc.get(f) for f in fields})
                 else:
@@ -48,8 +49,9 @@ def mock_db():
         return results
 
     db.find.side_effect = _find
-    # ensure_index is a no-op by default
+    # ensure_index is a no-op and partition_key the identity by default
     db.ensure_index.return_value = None
+    db.partition_key.side_effect = lambda db_name, value: value
     return db
 
 
@@ -7,6 +7,7 @@ from unittest.mock import Mock, patch
 import pytest
 
 from services import llm_service
+from services.user_service import UserService
 
 
 pytestmark = pytest.mark.unit
@@ -37,7 +38,7 @@ async def test_call_llm_acompletion_success(monkeypatch):
     monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
     monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-    user_service = Mock()
+    user_service = Mock(spec=UserService)
 
     content, thoughts = await llm_service.call_llm(
         provider="openai",
@@ -50,8 +51,8 @@ async def test_call_llm_acompletion_success(monkeypatch):
 
     assert content == "hello"
     assert thoughts is None
-    user_service.require_allowance.assert_called_once_with("user-1", basic_info=None)
-    user_service.add_usage.assert_called_once_with("user-1", 1.23, basic_info=None)
+    user_service.arequire_allowance.assert_awaited_once_with("user-1", basic_info=None)
+    user_service.aadd_usage.assert_awaited_once_with("user-1", 1.23, basic_info=None)
 
 
 @pytest.mark.asyncio
@@ -63,7 +64,7 @@ async def test_call_llm_acompletion_error(monkeypatch):
     monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
     monkeypatch.setattr(llm_service, "get_observability_service", lambda: observability)
 
-    user_service = Mock()
+    user_service = Mock(spec=UserService)
 
     with pytest.raises(RuntimeError, match="boom"):
         await llm_service.call_llm(
@@ -114,7 +115,7 @@ async def test_stream_llm_success(monkeypatch):
     monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
     monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-    user_service = Mock()
+    user_service = Mock(spec=UserService)
 
     received_chunks = []
     async for chunk in llm_service.stream_llm(
@@ -131,7 +132,7 @@ async def test_stream_llm_success(monkeypatch):
     assert received_chunks[0].choices[0].delta.content == "Hello"
     assert received_chunks[1].choices[0].delta.content == " "
     assert received_chunks[2].choices[0].delta.content == "World"
-    user_service.require_allowance.assert_called_once_with("user-1", basic_info=None)
+    user_service.arequire_allowance.assert_awaited_once_with("user-1", basic_info=None)
 
 
 @pytest.mark.asyncio
@@ -144,7 +145,7 @@ async def test_stream_llm_error(monkeypatch):
     monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
     monkeypatch.setattr(llm_service, "get_observability_service", lambda: observability)
 
-    user_service = Mock()
+    user_service = Mock(spec=UserService)
 
     with pytest.raises(RuntimeError, match="stream error"):
         async for _ in llm_service.stream_llm(
@@ -174,7 +175,7 @@ async def test_stream_llm_filters_none_params(monkeypatch):
 
     monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
     monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
-    monkeypatch.setattr(llm_service, "get_user_service", lambda _: Mock())
+    monkeypatch.setattr(llm_service, "get_user_service", lambda _: Mock(spec=UserService))
     monkeypatch.setattr(llm_service, "get_database_service", lambda _: Mock())
 
     async for _ in llm_service.stream_llm(
@@ -208,8 +209,8 @@ class TestLLMServiceApiKeys:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "user-specific-api-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "user-specific-api-key"
 
         content, thoughts = await llm_service.call_llm(
             provider="openai",
@@ -223,7 +224,7 @@ class TestLLMServiceApiKeys:
         # Verify the user API key was passed to litellm
         assert "api_key" in call_kwargs
         assert call_kwargs["api_key"] == "user-specific-api-key"
-        user_service.get_effective_api_key.assert_called_once_with("user-1", "openai", basic_info=None)
+        user_service.aget_effective_api_key.assert_awaited_once_with("user-1", "openai", basic_info=None)
 
     @pytest.mark.asyncio
     async def test_call_llm_no_api_key_when_not_set(self, monkeypatch):
@@ -237,8 +238,8 @@ class TestLLMServiceApiKeys:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None
 
         content, thoughts = await llm_service.call_llm(
             provider="openai",
@@ -267,8 +268,8 @@ class TestLLMServiceApiKeys:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "user-streaming-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "user-streaming-key"
 
         async for _ in llm_service.stream_llm(
             provider="anthropic",
@@ -283,7 +284,7 @@ class TestLLMServiceApiKeys:
         # Verify the user API key was passed
         assert "api_key" in call_kwargs
         assert call_kwargs["api_key"] == "user-streaming-key"
-        user_service.get_effective_api_key.assert_called_once_with("user-2", "anthropic", basic_info=None)
+        user_service.aget_effective_api_key.assert_awaited_once_with("user-2", "anthropic", basic_info=None)
 
     @pytest.mark.asyncio
     async def test_stream_llm_no_api_key_when_not_set(self, monkeypatch):
@@ -300,8 +301,8 @@ class TestLLMServiceApiKeys:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None
 
         async for _ in llm_service.stream_llm(
             provider="openai",
@@ -318,7 +319,7 @@ class TestLLMServiceApiKeys:
 
     @pytest.mark.asyncio
     async def test_call_llm_with_user_basic_info(self, monkeypatch):
-        """Test that user_basic_info is passed to get_effective_api_key."""
+        """Test that user_basic_info is passed to aget_effective_api_key."""
         call_kwargs = {}
 
         async def fake_acompletion(**kwargs):
@@ -328,8 +329,8 @@ class TestLLMServiceApiKeys:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "user-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "user-key"
 
         user_basic_info = {"email": "test@example.com", "name": "Test User"}
 
@@ -344,7 +345,7 @@ class TestLLMServiceApiKeys:
         )
 
         # Verify user_basic_info was passed to get_effective_api_key
-        user_service.get_effective_api_key.assert_called_once_with("user-1", "openai", basic_info=user_basic_info)
+        user_service.aget_effective_api_key.assert_awaited_once_with("user-1", "openai", basic_info=user_basic_info)
 
     @pytest.mark.asyncio
     async def test_call_llm_different_providers_use_different_keys(self, monkeypatch):
@@ -366,8 +367,8 @@ class TestLLMServiceApiKeys:
         ]
 
         for provider, model, expected_key in providers_and_keys:
-            user_service = Mock()
-            user_service.get_effective_api_key.return_value = expected_key
+            user_service = Mock(spec=UserService)
+            user_service.aget_effective_api_key.return_value = expected_key
 
             await llm_service.call_llm(
                 provider=provider,
@@ -379,7 +380,7 @@ class TestLLMServiceApiKeys:
             )
 
             # Verify get_effective_api_key was called with the correct provider
-            user_service.get_effective_api_key.assert_called_once_with("user-1", provider, basic_info=None)
+            user_service.aget_effective_api_key.assert_awaited_once_with("user-1", provider, basic_info=None)
 
         # Verify all calls had their respective API keys
         for i, (provider, _, expected_key) in enumerate(providers_and_keys):
@@ -398,9 +399,9 @@ class TestLLMServiceApiKeys:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
+        user_service = Mock(spec=UserService)
         # Empty string is falsy, so the code shouldn't pass it
-        user_service.get_effective_api_key.return_value = ""  # Empty string
+        user_service.aget_effective_api_key.return_value = ""  # Empty string
 
         await llm_service.call_llm(
             provider="openai",
@@ -431,8 +432,8 @@ class TestBedrockProvider:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "bedrock-api-key-12345"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "bedrock-api-key-12345"
 
         content, thoughts = await llm_service.call_llm(
             provider="bedrock",
@@ -447,7 +448,7 @@ class TestBedrockProvider:
         assert "api_key" in call_kwargs
         assert call_kwargs["api_key"] == "bedrock-api-key-12345"
         assert call_kwargs["model"] == "bedrock/us.anthropic.claude-opus-4-5-20251101-v1:0"
-        user_service.get_effective_api_key.assert_called_once_with("user-1", "bedrock", basic_info=None)
+        user_service.aget_effective_api_key.assert_awaited_once_with("user-1", "bedrock", basic_info=None)
 
     @pytest.mark.asyncio
     async def test_call_llm_bedrock_model_string_format(self, monkeypatch):
@@ -461,8 +462,8 @@ class TestBedrockProvider:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None
 
         await llm_service.call_llm(
             provider="bedrock",
@@ -491,8 +492,8 @@ class TestBedrockProvider:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "bedrock-stream-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "bedrock-stream-key"
 
         async for _ in llm_service.stream_llm(
             provider="bedrock",
@@ -520,8 +521,8 @@ class TestBedrockProvider:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: Mock())
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "bedrock-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "bedrock-key"
 
         await llm_service.call_llm(
             provider="bedrock",
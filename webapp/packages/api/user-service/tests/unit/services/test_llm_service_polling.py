@@ -12,6 +12,7 @@ import pytest
 import asyncio
 
 from services import llm_service
+from services.user_service import UserService
 
 
 pytestmark = pytest.mark.unit
@@ -71,8 +72,8 @@ class TestLLMServicePolling:
             return await original_sleep(0.01)
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "user-specific-key-123"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "user-specific-key-123"
         
         content, thoughts = await llm_service.call_llm(
             provider="openai",
@@ -124,8 +125,8 @@ class TestLLMServicePolling:
             pass
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None  # No user key
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None  # No user key
         
         content, thoughts = await llm_service.call_llm(
             provider="openai",
@@ -181,8 +182,8 @@ class TestLLMServicePolling:
             pass
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "test-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "test-key"
         
         content, thoughts = await llm_service.call_llm(
             provider="openai",
@@ -242,8 +243,8 @@ class TestLLMServicePolling:
             pass
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "test-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "test-key"
         
         with pytest.raises(Exception, match="Polling for OpenAI Responses API timed out"):
             await llm_service.call_llm(
@@ -293,8 +294,8 @@ class TestLLMServicePolling:
             pass
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = "test-key"
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = "test-key"
         
         content, thoughts = await llm_service.call_llm(
             provider="openai",
@@ -347,9 +348,9 @@ class TestLLMServiceResponsesApiKeyHandling:
             pass
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
+        user_service = Mock(spec=UserService)
         # Simulate a user-specific key
-        user_service.get_effective_api_key.return_value = "user-personal-key"
+        user_service.aget_effective_api_key.return_value = "user-personal-key"
         
         await llm_service.call_llm(
             provider="openai",
@@ -395,9 +396,9 @@ class TestLLMServiceResponsesApiKeyHandling:
             pass
         monkeypatch.setattr(asyncio, "sleep", fast_sleep)
         
-        user_service = Mock()
+        user_service = Mock(spec=UserService)
         # Empty string should be treated as no key
-        user_service.get_effective_api_key.return_value = ""
+        user_service.aget_effective_api_key.return_value = ""
         
         await llm_service.call_llm(
             provider="openai",
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import io
+import threading
 from unittest.mock import Mock
 
 import pytest
@@ -69,3 +70,38 @@ def test_gcs_storage_upload_and_url(monkeypatch):
 
     assert uploaded == {"name": "file.txt", "content": b"hello-gcs"}
     assert service.get_public_url("file.txt") == "https://storage.googleapis.com/gcs-bucket/file.txt"
+
+
+def test_local_disk_storage_round_trip(tmp_path):
+    service = storage_service.LocalDiskStorageService(str(tmp_path))
+
+    service.upload("data-store/abc.json", io.BytesIO(b"hello-disk"))
+
+    assert service.download("data-store/abc.json") == b"hello-disk"
+    assert (tmp_path / "data-store" / "abc.json").read_bytes() == b"hello-disk"
+    with pytest.raises(ValueError):
+        service.upload("../outside.txt", io.BytesIO(b"x"))
+
+
+def test_local_disk_storage_concurrent_uploads_of_one_name(tmp_path):
+    service = storage_service.LocalDiskStorageService(str(tmp_path))
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def upload():
+        barrier.wait()
+        try:
+            service.upload("data-store/same.json", io.BytesIO(b"same-bytes"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert service.exists("data-store/same.json")
+    assert not service.exists("data-store/other.json")
+    assert [p.name for p in (tmp_path / "data-store").iterdir()] == ["same.json"]
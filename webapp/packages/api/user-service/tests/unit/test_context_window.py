@@ -19,6 +19,7 @@ from config import provider_config
 from config.provider_config import PROVIDER_CONFIG
 import dependencies as dependencies_module
 from services import llm_service
+from services.user_service import UserService
 from agent_factory import prompts
 
 
@@ -205,8 +206,8 @@ class TestContextWindowOverflowHandling:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: observability)
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None
 
         with pytest.raises(ValueError, match="context window"):
             await llm_service.call_llm(
@@ -235,8 +236,8 @@ class TestContextWindowOverflowHandling:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: observability)
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None
 
         with pytest.raises(ValueError) as exc_info:
             await llm_service.call_llm(
@@ -263,8 +264,8 @@ class TestContextWindowOverflowHandling:
         monkeypatch.setattr(llm_service.litellm, "acompletion", fake_acompletion)
         monkeypatch.setattr(llm_service, "get_observability_service", lambda: observability)
 
-        user_service = Mock()
-        user_service.get_effective_api_key.return_value = None
+        user_service = Mock(spec=UserService)
+        user_service.aget_effective_api_key.return_value = None
 
         with pytest.raises(RuntimeError, match="some unrelated error"):
             await llm_service.call_llm(
@@ -0,0 +1,202 @@
+"""Unit tests for the pooled-HTTP async CouchDB backend."""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from services.database_service import AsyncCouchDBService, request_timeout
+from services.database_service.couchdb import parse_partitioned_config
+
+pytestmark = pytest.mark.unit
+
+
+class FakeCouch:
+    """Just enough of CouchDB's HTTP API, rows written one per line."""
+
+    def __init__(self) -> None:
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[httpx.Request] = []
+        self.refuse_sorts = False
+
+    def _rows_body(self, header: str, rows: List[Dict[str, Any]], footer: str) -> bytes:
+        lines = [header] + [json.dumps(r) + ("," if i < len(rows) - 1 else "") for i, r in enumerate(rows)]
+        return ("\r\n".join(lines + [footer])).encode()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        parts = request.url.raw_path.decode().split("?")[0].split("/")[2:]
+        body = json.loads(request.content) if request.content else None
+        if parts == ["_find"] or parts[0] == "_partition":
+            if body.get("sort") and self.refuse_sorts:
+                return httpx.Response(400, json={"error": "no_usable_index", "reason": "No index exists for this sort."})
+            docs = [d for d in self.docs.values() if all(d.get(k) == v for k, v in body["selector"].items())]
+            docs = docs[:body["limit"]]
+            return httpx.Response(200, content=self._rows_body(
+                '{"docs":[', docs, '],\r\n"bookmark": "bm",\r\n"execution_stats": {"docs_examined": 1}}'
+            ))
+        if parts == ["_all_docs"]:
+            keys = body["keys"] if body else sorted(self.docs)
+            rows = [
+                {"key": k, "id": k, "doc": self.docs[k]} if k in self.docs else {"key": k, "error": "not_found"}
+                for k in keys
+            ]
+            return httpx.Response(200, content=self._rows_body(
+                '{"total_rows":%d,"offset":0,"rows":[' % len(self.docs), rows, "]}"
+            ))
+        if parts == ["_bulk_docs"]:
+            out = []
+            for doc in body["docs"]:
+                current = self.docs.get(doc["_id"])
+                if current and current["_rev"] != doc.get("_rev"):
+                    out.append({"id": doc["_id"], "error": "conflict", "reason": "Document update conflict."})
+                    continue
+                out.append({"id": doc["_id"], "ok": True, "rev": self._store(doc)})
+            return httpx.Response(201, json=out)
+        if parts == ["_index"]:
+            return httpx.Response(200, json={"result": "created"})
+        doc_id = httpx.URL("/" + parts[0]).path[1:]
+        current = self.docs.get(doc_id)
+        if request.method in ("GET", "HEAD"):
+            if current is None:
+                return httpx.Response(404, json={"error": "not_found", "reason": "missing"})
+            return httpx.Response(200, json=current, headers={"ETag": f'"{current["_rev"]}"'})
+        if request.method == "PUT":
+            if current and current["_rev"] != body.get("_rev"):
+                return httpx.Response(409, json={"error": "conflict"})
+            return httpx.Response(201, json={"ok": True, "id": doc_id, "rev": self._store(body)})
+        if request.method == "DELETE":
+            assert request.url.params["rev"] == current["_rev"]
+            del self.docs[doc_id]
+            return httpx.Response(200, json={"ok": True})
+        raise AssertionError(f"unexpected {request.method} {parts}")
+
+    def _store(self, doc: Dict[str, Any]) -> str:
+        n = int(doc.get("_rev", "0-x").split("-")[0]) + 1
+        if doc.get("_deleted"):
+            self.docs.pop(doc["_id"], None)
+            return f"{n}-d"
+        self.docs[doc["_id"]] = dict(doc, _rev=f"{n}-x")
+        return f"{n}-x"
+
+
+@pytest.fixture
+def couch():
+    fake = FakeCouch()
+    db = AsyncCouchDBService.__new__(AsyncCouchDBService)
+    db._dbs = {"t": object()}
+    db._dbs_lock = threading.Lock()
+    db._ensured_indexes = set()
+    db._partition_fields = {}
+    db._client = httpx.AsyncClient(base_url="http://couch", transport=httpx.MockTransport(fake))
+    db._client_loop = None
+    db._http = lambda: db._client  # type: ignore[assignment]
+    return db, fake
+
+
+@pytest.mark.asyncio
+async def test_document_round_trip(couch) -> None:
+    db, fake = couch
+    saved = await db.asave("t", "u:ns:k", {"v": 1})
+    assert saved["rev"] == "1-x"
+    assert fake.requests[-1].url.raw_path == b"/t/u%3Ans%3Ak"
+    assert (await db.aget("t", "u:ns:k"))["v"] == 1
+
+    with pytest.raises(HTTPException) as conflict:
+        await db.asave("t", "u:ns:k", {"v": 2})
+    assert conflict.value.status_code == 409
+    await db.asave("t", "u:ns:k", {"v": 2, "_rev": saved["rev"]})
+
+    await db.adelete("t", "u:ns:k")
+    for call in (db.aget, db.adelete):
+        with pytest.raises(HTTPException) as missing:
+            await call("t", "u:ns:k")
+        assert missing.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_bulk_calls_and_streamed_rows(couch) -> None:
+    db, fake = couch
+    results = await db.asave_many("t", [{"_id": f"d{i}", "n": i} for i in range(3)])
+    assert [r["ok"] for r in results] == [True, True, True]
+    stale = await db.asave_many("t", [{"_id": "d0", "_rev": "9-z"}])
+    assert stale == [{"ok": False, "id": "d0", "error": "conflict"}]
+
+    fetched = await db.aget_many("t", ["d1", "gone"])
+    assert fetched["d1"]["n"] == 1 and fetched["gone"] is None
+    assert [d["_id"] for d in await db.alist_all("t")] == ["d0", "d1", "d2"]
+
+    assert [d["_id"] for d in await db.afind("t", {"n": 2})] == ["d2"]
+    page, cursor = await db.afind_page("t", {}, page_size=2)
+    assert len(page) == 2 and cursor is not None
+
+    deleted = await db.adelete_many("t", ["d0", "gone"])
+    assert deleted == [{"ok": True, "id": "d0"}, {"ok": True, "id": "gone"}]
+    assert "d0" not in fake.docs
+
+    await db.aensure_index("t", ["n"])
+    await db.aensure_index("t", ["n"])
+    assert sum(r.url.path.endswith("/_index") for r in fake.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_partitioned_find_and_request_timeout(couch) -> None:
+    db, fake = couch
+    db._partition_fields = parse_partitioned_config("t:userId")
+    db._partitioned = {"t"}
+    with request_timeout(2.5):
+        await db.afind("t", {"userId": "u1"})
+    request = fake.requests[-1]
+    assert request.url.path == "/t/_partition/u1/_find"
+    assert request.extensions["timeout"]["read"] == 2.5
+
+
+@pytest.mark.asyncio
+async def test_find_falls_back_only_without_a_usable_index(couch, monkeypatch) -> None:
+    db, fake = couch
+    monkeypatch.setattr(db, "list_all", lambda db_name: [{"_id": "b", "n": 2}, {"_id": "a", "n": 1}])
+    fake.refuse_sorts = True
+    assert await db.afind("t", {}, sort=["n"]) == [{"_id": "a", "n": 1}, {"_id": "b", "n": 2}]
+
+    monkeypatch.setattr(db, "_apost_find", _raise_server_error)
+    with pytest.raises(httpx.HTTPStatusError):
+        await db.afind("t", {}, sort=["n"])
+
+
+async def _raise_server_error(*args: Any) -> Dict[str, Any]:
+    request = httpx.Request("POST", "http://couch/t/_find")
+    response = httpx.Response(500, json={"error": "unknown_error"}, request=request)
+    raise httpx.HTTPStatusError("server error", request=request, response=response)
+
+
+@pytest.mark.asyncio
+async def test_stream_rows_parses_compact_bodies() -> None:
+    response = httpx.Response(200, content=b'{"docs":[{"_id":"a"},{"_id":"b"}],"bookmark":"x"}')
+    envelope: Dict[str, Any] = {}
+    rows = [r async for r in AsyncCouchDBService._stream_rows(response, "docs", envelope)]
+    assert rows == [{"_id": "a"}, {"_id": "b"}]
+    assert envelope == {"bookmark": "x"}
+
+
+def test_client_is_recreated_per_event_loop() -> None:
+    db = AsyncCouchDBService.__new__(AsyncCouchDBService)
+    db._base_url = "http://couch"
+    db._auth = ("u", "p")
+    db._limits = httpx.Limits(max_connections=3, max_keepalive_connections=3)
+    db._timeout = 5
+    db._client = None
+    db._client_loop = None
+
+    async def client():
+        first = db._http()
+        assert db._http() is first
+        return first
+
+    first = asyncio.run(client())
+    assert asyncio.run(client()) is not first
+    asyncio.run(db.aclose())
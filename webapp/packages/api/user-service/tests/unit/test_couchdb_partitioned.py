@@ -0,0 +1,219 @@
+"""Unit tests for partitioned CouchDB databases and their migration."""
+from __future__ import annotations
+
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import couchdb
+import pytest
+
+from services.data_store_service import DataStoreService
+from services.database_service import CouchDBService, InstrumentedDatabaseService
+from services.database_service.couchdb import parse_partitioned_config
+
+pytestmark = pytest.mark.unit
+
+
+class FakeDB:
+    def __init__(self, partitioned: bool = False):
+        self.partitioned = partitioned
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.posts: List[Any] = []
+        self.scans = 0
+        self.resource = SimpleNamespace(post_json=self._post_json)
+
+    def info(self):
+        return {"props": {"partitioned": True} if self.partitioned else {}}
+
+    def _post_json(self, path, body=None, **params):
+        self.posts.append((path, body))
+        if path != "_index" and body.get("sort"):
+            # Like Mango: a sort needs an index of the query's kind
+            # (partition or global) covering the sorted fields.
+            partition_query = path != "_find"
+            sorted_fields = {f for clause in body["sort"] for f in clause}
+            if not any(
+                b.get("partitioned", self.partitioned) == partition_query
+                and sorted_fields <= set(b["index"]["fields"])
+                for p, b in self.posts
+                if p == "_index"
+            ):
+                raise couchdb.http.ServerError((400, ("no_usable_index", "No index exists for this sort")))
+        return None, None, {"docs": []}
+
+    def view(self, name, **options):
+        assert name == "_all_docs"
+        self.scans += 1
+        ids = sorted(k for k in self.docs if "startkey" not in options or k >= options["startkey"])
+        ids = ids[options.get("skip", 0):][:options["limit"]]
+        return [SimpleNamespace(id=k, doc=dict(self.docs[k])) for k in ids]
+
+    def update(self, docs, new_edits=True):
+        assert new_edits is False
+        for doc in docs:
+            self.docs[doc["_id"]] = doc
+
+
+class FakeServer(dict):
+    def __init__(self):
+        super().__init__()
+        self.resource = SimpleNamespace(put_json=self._put_json)
+
+    def __missing__(self, name):
+        raise couchdb.http.ResourceNotFound(("not_found", "Database does not exist."))
+
+    def _put_json(self, path, **params):
+        self[path[0]] = FakeDB(partitioned=params.get("partitioned", False))
+
+    def create(self, name):
+        self[name] = FakeDB()
+        return self[name]
+
+
+def _service(server: FakeServer, partitioned: str = "agent_data_store:userId") -> CouchDBService:
+    db = CouchDBService.__new__(CouchDBService)
+    db.server = server
+    db._dbs = {}
+    db._dbs_lock = threading.Lock()
+    db._ensured_indexes = set()
+    db._partition_fields = parse_partitioned_config(partitioned)
+    db._partitioned = set()
+    return db
+
+
+def test_parse_partitioned_config() -> None:
+    assert parse_partitioned_config(" agent_data_store:userId, bad ,") == {"agent_data_store": "userId"}
+    assert parse_partitioned_config(None) == {}
+
+
+def test_user_queries_are_routed_to_their_partition() -> None:
+    server = FakeServer()
+    db = _service(server)
+    db.find("agent_data_store", {"userId": "u1", "namespace": "n"})
+    db.find_page("agent_data_store", {"userId": "github:42"})
+    db.find("agent_data_store", {"userId": "github:43"})
+    db.find("agent_data_store", {"namespace": "n"})
+    db.find("agents", {"userId": "u1"})
+
+    store = server["agent_data_store"]
+    assert store.partitioned  # created partitioned on first use
+    # The whole user id is the partition: users of one provider don't share one.
+    assert [p for p, _ in store.posts if p != "_index"] == [
+        ["_partition", "u1", "_find"],
+        ["_partition", "github%3A42", "_find"],
+        ["_partition", "github%3A43", "_find"],
+        "_find",
+    ]
+    assert [p for p, _ in server["agents"].posts] == ["_find"]
+
+    db.ensure_index("agent_data_store", ["userId", "namespace"])
+    db.ensure_index("agent_data_store", ["namespace"])
+    db.ensure_index("agents", ["userId"])
+    indexes = [b for p, b in store.posts if p == "_index"]
+    # The userId index only serves partition queries; the other is built both ways.
+    assert [(b["name"], b["partitioned"]) for b in indexes] == [
+        ("idx-userId_namespace", True),
+        ("idx-namespace", False),
+        ("idx-namespace-partitioned", True),
+    ]
+    assert indexes[2]["ddoc"] == "idx-namespace-partitioned"
+    assert "partitioned" not in server["agents"].posts[-1][1]
+
+
+def test_partition_key_escapes_the_whole_value() -> None:
+    server = FakeServer()
+    db = _service(server)
+    assert db.partition_key("agent_data_store", "github:42") == "github%3A42"
+    assert db.partition_key("agent_data_store", "_x%y") == "%5Fx%25y"
+    assert db.partition_key("agents", "github:42") == "github:42"
+
+    server["legacy"] = FakeDB()
+    db._partition_fields["legacy"] = "userId"
+    assert db.partition_key("legacy", "github:42") == "github:42"
+
+
+def test_ranged_listing_uses_a_partitioned_index() -> None:
+    server = FakeServer()
+    store = DataStoreService(_service(server))
+    assert store.list_keys("github:42", "ns", start_after="a", limit=10) == []
+
+    db = server["agent_data_store"]
+    sorted_finds = [p for p, b in db.posts if p != "_index" and b.get("sort")]
+    assert sorted_finds == [["_partition", "github%3A42", "_find"]]
+    assert db.scans == 0  # served by the partitioned scope-key index, no list_all
+
+
+def test_find_falls_back_to_list_all_only_without_a_usable_index(capsys) -> None:
+    server = FakeServer()
+    db = InstrumentedDatabaseService(_service(server), slow_query_ms=10_000)
+    assert db.find("agent_data_store", {"userId": "u1"}, sort=["missing"]) == []
+    assert server["agent_data_store"].scans == 1
+    (entry,) = db.slow_queries()
+    assert entry["fallback"] == "list_all"
+    assert "no index" in capsys.readouterr().out
+
+    def fail(path, body=None, **params):
+        raise couchdb.http.ServerError((500, ("unknown_error", "badarg")))
+
+    server["agent_data_store"].resource.post_json = fail
+    with pytest.raises(couchdb.http.ServerError):
+        db.find("agent_data_store", {"userId": "u1"}, sort=["missing"])
+    assert server["agent_data_store"].scans == 1
+
+
+def test_unmigrated_database_stays_global(capsys) -> None:
+    server = FakeServer()
+    server["agent_data_store"] = FakeDB()
+    db = _service(server)
+    db.find("agent_data_store", {"userId": "u1"})
+    db.ensure_index("agent_data_store", ["userId"])
+    assert [p for p, _ in server["agent_data_store"].posts] == ["_find", "_index"]
+    assert "partitioned" not in server["agent_data_store"].posts[-1][1]
+    assert "couchdb_migrate" in capsys.readouterr().out
+
+
+def test_migrate_to_partitioned_keeps_documents(monkeypatch) -> None:
+    monkeypatch.setattr("services.database_service.couchdb.SCAN_PAGE_SIZE", 2)
+    server = FakeServer()
+    source = server["agent_data_store"] = FakeDB()
+    source.docs = {f"u{i}:ns:k": {"_id": f"u{i}:ns:k", "_rev": "3-a"} for i in range(5)}
+    source.docs["_design/idx"] = {"_id": "_design/idx"}
+    db = _service(server)
+
+    assert db.migrate_to_partitioned("agent_data_store") == 5
+    migrated = server["agent_data_store"]
+    assert migrated is not source and migrated.partitioned
+    assert sorted(migrated.docs) == sorted(k for k in source.docs if not k.startswith("_design/"))
+    assert all(d["_rev"] == "3-a" for d in migrated.docs.values())
+    assert set(server) == {"agent_data_store"}
+    assert db.migrate_to_partitioned("agent_data_store") == 0
+
+
+def test_migrate_refuses_ids_without_partition() -> None:
+    server = FakeServer()
+    source = server["agent_data_store"] = FakeDB()
+    source.docs = {"u1:ns:k": {"_id": "u1:ns:k"}, "legacy": {"_id": "legacy"}}
+    db = _service(server)
+
+    with pytest.raises(ValueError, match="legacy"):
+        db.migrate_to_partitioned("agent_data_store")
+    assert server["agent_data_store"] is source
+    assert set(server) == {"agent_data_store"}
+
+
+def test_migrate_rewrites_user_ids_to_their_partition() -> None:
+    server = FakeServer()
+    source = server["agent_data_store"] = FakeDB()
+    source.docs = {
+        "github:42:ns:k": {"_id": "github:42:ns:k", "userId": "github:42", "_rev": "1-a"},
+        "u1:ns:k": {"_id": "u1:ns:k", "userId": "u1", "_rev": "1-b"},
+    }
+    db = _service(server)
+
+    assert db.migrate_to_partitioned("agent_data_store") == 2
+    migrated = server["agent_data_store"].docs
+    assert sorted(migrated) == ["github%3A42:ns:k", "u1:ns:k"]
+    assert migrated["github%3A42:ns:k"]["userId"] == "github:42"
+    assert migrated["github%3A42:ns:k"]["_rev"] == "1-a"
+    assert db.partition_key("agent_data_store", "github:42") == "github%3A42"
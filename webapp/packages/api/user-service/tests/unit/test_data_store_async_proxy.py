@@ -0,0 +1,108 @@
+"""Unit tests for the awaitable AgentDataStoreProxy methods."""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+
+import pytest
+
+import dependencies as dependencies_module
+from services.data_store_cache import DataStoreRunCache
+from services.data_store_service import AgentDataStoreProxy, DataStoreService
+from services.database_service.memory import MemoryDBService
+from services.database_service.sqlite import SqliteDBService
+
+pytestmark = pytest.mark.unit
+
+
+class RecordingDB(MemoryDBService):
+    """Records reads and counts bulk writes."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.reads: List[str] = []
+        self.calls: Counter = Counter()
+
+    def get(self, db_name, doc_id):
+        self.reads.append(doc_id)
+        return super().get(db_name, doc_id)
+
+    def save_many(self, db_name, docs):
+        self.calls["save_many"] += 1
+        return super().save_many(db_name, docs)
+
+
+@pytest.fixture
+def store():
+    db = RecordingDB()
+    service = DataStoreService(db)
+    ops: List[Dict[str, Any]] = []
+    return AgentDataStoreProxy(service, "u1", "agent", ops_log=ops), service, db, ops
+
+
+@pytest.mark.asyncio
+async def test_async_methods_match_sync(store) -> None:
+    proxy, service, _, ops = store
+    await proxy.aset("a", {"n": 1})
+    assert await proxy.aset_many({"b": 2, "c": 3}) == 2
+    assert await proxy.aget("a") == {"n": 1}
+    assert await proxy.aget("missing", "dflt") == "dflt"
+    assert await proxy.aget_many(["a", "b", "missing"]) == {"a": {"n": 1}, "b": 2}
+    assert await proxy.aget_all() == proxy.get_all()
+    assert await proxy.alist_keys(start_after="a") == ["b", "c"]
+    assert [item async for item in proxy.aiter_items(page_size=2)] == list(proxy.iter_items())
+    assert await proxy.alist_namespaces() == ["default"]
+    assert await proxy.adelete("a") is True
+    assert await proxy.adelete("a") is False
+    assert await proxy.aclear() == 2
+    assert service.list_keys("u1", "default") == []
+    assert [op["op"] for op in ops[:4]] == ["set", "set_many", "get", "get"]
+
+
+@pytest.mark.asyncio
+async def test_reads_run_off_the_event_loop(tmp_path) -> None:
+    threads: List[str] = []
+
+    class ThreadRecordingSqlite(SqliteDBService):
+        def get(self, db_name, doc_id):
+            threads.append(threading.current_thread().name)
+            return super().get(db_name, doc_id)
+
+    db = ThreadRecordingSqlite(str(tmp_path / "ds.sqlite3"))
+    proxy = AgentDataStoreProxy(DataStoreService(db), "u1", "agent")
+    proxy.set("a", 1)
+    results = await asyncio.gather(*(proxy.aget("a") for _ in range(5)))
+    assert results == [1] * 5
+    assert threads and threading.current_thread().name not in threads
+
+
+@pytest.mark.asyncio
+async def test_async_batch_and_run_cache(store) -> None:
+    proxy, service, db, _ = store
+    proxy._run_cache = DataStoreRunCache()
+    async with proxy.abatch(max_ops=10):
+        for i in range(25):
+            await proxy.aset(f"k{i:02d}", i)
+        assert await proxy.aget("k24") == 24  # a read of a pending key flushes
+    assert db.calls["save_many"] == 3
+    assert len(service.list_keys("u1", "default")) == 25
+
+    db.reads.clear()
+    assert await proxy.aget_many(["k00", "k01"]) == {"k00": 0, "k01": 1}
+    assert db.reads == []  # the flush filled the run cache
+
+
+@pytest.mark.asyncio
+async def test_agent_code_can_await_the_data_store() -> None:
+    db = MemoryDBService()
+    code = """
+async def run(input_dict, tools):
+    await data_store.aset_many({"a": 1, "b": 2})
+    values = await asyncio.gather(data_store.aget("a"), data_store.aget("b"))
+    return sum(values)
+"""
+    result, ops = await dependencies_module._execute_agent_code(code, {}, {}, [], db, user_id="u1")
+    assert result == 3
+    assert [op["op"] for op in ops] == ["set_many", "get", "get"]
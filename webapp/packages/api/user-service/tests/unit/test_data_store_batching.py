@@ -0,0 +1,212 @@
+"""Unit tests for buffered write batching in AgentDataStoreProxy."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from typing import Any, Dict, List
+
+import pytest
+
+import dependencies as dependencies_module
+from models.agent import Agent
+from services.data_store_cache import DataStoreRunCache
+from services.data_store_service import (
+    DATA_STORE_DB,
+    AgentDataStoreProxy,
+    DataStoreBatchError,
+    DataStoreService,
+)
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+class CountingDB(MemoryDBService):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+
+    def save(self, db_name, doc_id, doc):
+        self.calls["save"] += 1
+        return super().save(db_name, doc_id, doc)
+
+    def save_many(self, db_name, docs):
+        self.calls["save_many"] += 1
+        return super().save_many(db_name, docs)
+
+    def delete_many(self, db_name, doc_ids):
+        self.calls["delete_many"] += 1
+        return super().delete_many(db_name, doc_ids)
+
+
+@pytest.fixture
+def store():
+    db = CountingDB()
+    service = DataStoreService(db)
+    ops: List[Dict[str, Any]] = []
+    return AgentDataStoreProxy(service, "u1", "agent", ops_log=ops), service, db
+
+
+def test_batch_turns_many_sets_into_a_few_bulk_calls(store) -> None:
+    proxy, service, db = store
+    with proxy.batch(max_ops=500):
+        for i in range(2000):
+            proxy.set(f"k{i}", {"i": i})
+        proxy.delete("k0")
+    assert db.calls == Counter(save_many=4, delete_many=1)
+    assert len(service.list_keys("u1", "default")) == 1999
+    assert not proxy._writes.enabled  # the block turned batching back off
+
+
+def test_reads_see_buffered_writes(store) -> None:
+    proxy, service, db = store
+    proxy.enable_batching(max_ops=100, max_seconds=60)
+    proxy.set("a", {"v": 1}, metadata={"x": 1})
+    proxy.set("a", {"v": 2}, metadata={"y": 2})
+    proxy.use_namespace("other").set("b", 1)
+    assert db.calls["save_many"] == 0
+
+    assert proxy.get("untouched") is None
+    assert db.calls["save_many"] == 0
+    assert proxy.get("a") == {"v": 2}  # a read of a pending key flushes
+    assert db.calls["save_many"] == 1
+    doc = db.get(DATA_STORE_DB, service._make_doc_id("u1", "default", "a"))
+    assert doc["metadata"] == {"x": 1, "y": 2}
+    assert proxy.use_namespace("other").get("b") == 1
+
+
+def test_values_are_captured_when_buffered(store) -> None:
+    proxy, _, _ = store
+    value = {"items": [1]}
+    with proxy.batch():
+        proxy.set("k", value)
+        value["items"].append(2)
+    assert proxy.get("k") == {"items": [1]}
+
+
+def test_time_threshold_flushes_on_next_write(store, monkeypatch) -> None:
+    proxy, _, db = store
+    now = [100.0]
+    monkeypatch.setattr("services.data_store_service.time.monotonic", lambda: now[0])
+    proxy.enable_batching(max_ops=100, max_seconds=5)
+    proxy.set("a", 1)
+    now[0] += 6
+    proxy.set("b", 2)
+    assert db.calls["save_many"] == 1
+
+
+def test_flush_failures_are_reported(store) -> None:
+    proxy, service, db = store
+    cache = DataStoreRunCache()
+    proxy._run_cache = cache
+    proxy.set("a", "old")
+
+    def fail_save(user_id, items, agent_name):
+        return [(ns, key) for ns, key, _, _ in items if key == "a"]
+
+    service.save_items = fail_save
+    proxy.enable_batching()
+    proxy.set("a", "new")
+    proxy.set("b", "fine")
+    with pytest.raises(DataStoreBatchError) as err:
+        proxy.flush()
+    assert err.value.failed == [("default", "a")]
+    assert cache.lookup("u1", "default", "a") == (False, None)
+    assert cache.lookup("u1", "default", "b") == (True, "fine")
+    assert proxy.flush() == 0  # failed writes are not retried
+
+
+def test_batch_body_error_wins_over_flush_error(store) -> None:
+    proxy, service, _ = store
+    service.save_items = lambda user_id, items, agent_name: [(ns, key) for ns, key, _, _ in items]
+    with pytest.raises(KeyError, match="agent bug"):
+        with proxy.batch():
+            proxy.set("a", 1)
+            raise KeyError("agent bug")
+    assert not proxy._writes.enabled
+
+
+def test_batch_body_error_still_flushes_earlier_writes(store) -> None:
+    proxy, service, _ = store
+    with pytest.raises(KeyError):
+        with proxy.batch():
+            proxy.set("a", 1)
+            raise KeyError("agent bug")
+    assert service.get("u1", "default", "a")["value"] == 1
+    assert proxy.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_abatch_body_error_wins_over_flush_error(store) -> None:
+    proxy, service, _ = store
+
+    async def fail_save(user_id, items, agent_name):
+        return [(ns, key) for ns, key, _, _ in items]
+
+    service.asave_items = fail_save
+    with pytest.raises(KeyError, match="agent bug"):
+        async with proxy.abatch():
+            await proxy.aset("a", 1)
+            raise KeyError("agent bug")
+    assert not proxy._writes.enabled
+
+
+@pytest.mark.asyncio
+async def test_aget_waits_for_the_flush_in_flight(store) -> None:
+    proxy, service, _ = store
+    service.set("u1", "default", "a", 1)
+    release = asyncio.Event()
+    save_items = service.asave_items
+
+    async def slow_save(user_id, items, agent_name):
+        await release.wait()
+        return await save_items(user_id, items, agent_name)
+
+    service.asave_items = slow_save
+    proxy.enable_batching(max_ops=1)
+    writer = asyncio.create_task(proxy.aset("a", 2))  # due at once: drains and flushes
+    await asyncio.sleep(0)
+    reader = asyncio.create_task(proxy.aget("a"))
+    await asyncio.sleep(0)
+    assert not reader.done()  # the write is in flight, not lost from view
+
+    release.set()
+    await writer
+    assert await reader == 2
+
+
+@pytest.mark.asyncio
+async def test_run_end_flushes_pending_writes() -> None:
+    db = MemoryDBService()
+    code = """
+async def run(input_dict, tools):
+    data_store.enable_batching()
+    data_store.set("k", "v")
+    return "done"
+"""
+    result, ops = await dependencies_module._execute_agent_code(code, {}, {}, [], db, user_id="u1")
+    assert result == "done"
+    assert DataStoreService(db).get("u1", "default", "k")["value"] == "v"
+    assert [op["op"] for op in ops] == ["set", "flush"]
+
+
+@pytest.mark.asyncio
+async def test_nested_agent_sees_the_callers_batched_writes() -> None:
+    db = MemoryDBService()
+    db.save("agents", "child-id", Agent(
+        name="child", description="", code="""
+async def run(input_dict, tools):
+    return data_store.get("k")
+""", tools={}, gofannon_agents=[], input_schema={}, output_schema={},
+    ).model_dump(by_alias=True))
+    code = """
+async def run(input_dict, tools):
+    data_store.enable_batching()
+    data_store.set("k", "v")
+    return await gofannon_client.call("child", {})
+"""
+    result, ops = await dependencies_module._execute_agent_code(
+        code, {}, {}, ["child-id"], db, user_id="u1"
+    )
+    assert result == "v"
+    assert [op["op"] for op in ops] == ["set", "flush"]
@@ -0,0 +1,108 @@
+"""Unit tests for offloading large data store values to blob storage."""
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+
+from services.data_store_blobs import DataStoreBlobStore
+from services.data_store_service import DATA_STORE_DB, DataStoreService
+from services.database_service.memory import MemoryDBService
+from services.storage_service import LocalDiskStorageService
+
+pytestmark = pytest.mark.unit
+
+BIG = {"content": "x" * 500}
+
+
+class CountingStorage(LocalDiskStorageService):
+    def __init__(self, root: str) -> None:
+        super().__init__(root)
+        self.calls: Counter = Counter()
+
+    def upload(self, file_name, file_obj):
+        self.calls["upload"] += 1
+        return super().upload(file_name, file_obj)
+
+    def download(self, file_name):
+        self.calls["download"] += 1
+        return super().download(file_name)
+
+
+@pytest.fixture
+def store(tmp_path):
+    storage = CountingStorage(str(tmp_path))
+    db = MemoryDBService()
+    return DataStoreService(db, DataStoreBlobStore(100, storage)), db, storage
+
+
+def test_large_values_keep_only_a_pointer(store) -> None:
+    service, db, _ = store
+    returned = service.set("u1", "ns", "big", BIG)
+    service.set("u1", "ns", "small", "tiny")
+
+    doc = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "big"))
+    assert doc["value"] is None
+    assert doc["valueSize"] == doc["valueRef"]["size"] > 500
+    assert doc["valueRef"]["key"] == f"data-store/{doc['valueRef']['sha256']}.json"
+    assert returned["value"] == BIG
+    assert "valueRef" not in db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "small"))
+
+    assert service.get("u1", "ns", "big", agent_name="agent")["value"] == BIG
+    # Access tracking saved the pointer record, not the inflated one.
+    assert db.get(DATA_STORE_DB, doc["_id"])["value"] is None
+
+    service.set("u1", "ns", "big", "now small")
+    doc = db.get(DATA_STORE_DB, doc["_id"])
+    assert doc["value"] == "now small" and "valueRef" not in doc
+
+
+def test_bulk_reads_fetch_blobs_and_stats_do_not(store, tmp_path) -> None:
+    service, _, storage = store
+    items = [("ns", f"k{i}", {**BIG, "i": i}, None) for i in range(4)]
+    assert service.set_many("u1", items + [("ns", "dup", {**BIG, "i": 0}, None)]) == 5
+    assert len(list((tmp_path / "data-store").iterdir())) == 4  # "dup" shares k0's blob
+
+    expected = {f"k{i}": {**BIG, "i": i} for i in range(4)}
+    assert service.get_many("u1", "ns", ["k0", "k3"]) == {"k0": expected["k0"], "k3": expected["k3"]}
+    assert {k: v for k, v in service.get_all("u1", "ns").items() if k != "dup"} == expected
+    assert dict(service.iter_items("u1", "ns", prefix="k", page_size=3)) == expected
+
+    downloads = storage.calls["download"]
+    stats = service.namespace_stats("u1")["ns"]
+    assert stats["recordCount"] == 5 and stats["sizeBytes"] > 2500
+    assert service.list_keys("u1", "ns") == ["dup", "k0", "k1", "k2", "k3"]
+    assert storage.calls["download"] == downloads
+
+
+def test_equal_values_in_one_batch_share_a_blob(store, tmp_path) -> None:
+    service, _, storage = store
+    assert service.set_many("u1", [("ns", f"k{i}", BIG, None) for i in range(8)]) == 8
+    assert [p.name for p in (tmp_path / "data-store").iterdir()] == [
+        f"{service._blobs.offload(BIG)['sha256']}.json"
+    ]
+    # The blob already exists, so writing the value again skips the upload.
+    uploads = storage.calls["upload"]
+    service.set("u1", "ns", "again", BIG)
+    assert storage.calls["upload"] == uploads
+
+
+def test_offloaded_records_read_back_with_offload_off(store) -> None:
+    service, db, storage = store
+    service.set("u1", "ns", "big", BIG)
+    reader = DataStoreService(db, DataStoreBlobStore(0, storage))
+    assert reader.get("u1", "ns", "big")["value"] == BIG
+    reader.set("u1", "ns", "other", BIG)
+    assert db.get(DATA_STORE_DB, reader._make_doc_id("u1", "ns", "other"))["value"] == BIG
+
+
+@pytest.mark.asyncio
+async def test_async_paths_offload_and_inflate(store) -> None:
+    service, db, _ = store
+    await service.aset("u1", "ns", "a", BIG)
+    await service.aset_many("u1", [("ns", "b", BIG, None)])
+    assert db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "b"))["value"] is None
+    assert (await service.aget("u1", "ns", "a"))["value"] == BIG
+    assert await service.aget_many("u1", "ns", ["a", "b"]) == {"a": BIG, "b": BIG}
+    assert await service.aget_all("u1", "ns") == {"a": BIG, "b": BIG}
+    assert [item async for item in service.aiter_items("u1", "ns")] == [("a", BIG), ("b", BIG)]
@@ -0,0 +1,96 @@
+"""Unit tests for compressed data store values."""
+from __future__ import annotations
+
+import base64
+import os
+
+import pytest
+
+from services import data_store_codec
+from services.data_store_blobs import DataStoreBlobStore
+from services.data_store_codec import DataStoreCodec
+from services.data_store_service import DATA_STORE_DB, DataStoreService
+from services.database_service.memory import MemoryDBService
+from services.storage_service import LocalDiskStorageService
+
+pytestmark = pytest.mark.unit
+
+SOURCE = {"path": "src/main.py", "content": "def main():\n    return 42\n" * 200}
+
+
+@pytest.fixture
+def store():
+    db = MemoryDBService()
+    return DataStoreService(db, DataStoreBlobStore(0), DataStoreCodec(256)), db
+
+
+def test_large_values_are_stored_compressed(store) -> None:
+    service, db = store
+    returned = service.set("u1", "ns", "big", SOURCE)
+    service.set("u1", "ns", "small", "tiny")
+
+    doc = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "big"))
+    assert doc["value"] is None and doc["valueCodec"] == "gzip"
+    assert doc["storedSize"] == len(doc["valueEncoded"]) < doc["valueSize"] // 5
+    assert returned["value"] == SOURCE
+    assert "valueCodec" not in db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "small"))
+
+    assert service.get("u1", "ns", "big", agent_name="agent")["value"] == SOURCE
+    assert db.get(DATA_STORE_DB, doc["_id"])["value"] is None
+    assert service.get_many("u1", "ns", ["big", "small"]) == {"big": SOURCE, "small": "tiny"}
+    assert service.get_all("u1", "ns") == {"big": SOURCE, "small": "tiny"}
+    assert dict(service.iter_items("u1", "ns")) == {"big": SOURCE, "small": "tiny"}
+
+    service.set("u1", "ns", "big", "short again")
+    doc = db.get(DATA_STORE_DB, doc["_id"])
+    assert doc["value"] == "short again"
+    assert not {"valueCodec", "valueEncoded", "storedSize"} & set(doc)
+
+
+def test_incompressible_values_stay_plain() -> None:
+    codec = DataStoreCodec(16)
+    noise = base64.b64encode(os.urandom(64)).decode()
+    assert codec.encode(noise) == {"value": noise, "valueSize": len(noise) + 2}
+
+
+def test_sizes_report_raw_and_stored(store) -> None:
+    service, _ = store
+    raw, stored = service._estimate_size(SOURCE)
+    assert stored < raw
+    service.set_many("u1", [("ns", "big", SOURCE, None), ("ns", "small", "tiny", None)])
+
+    stats = service.namespace_stats("u1")["ns"]
+    assert stats["sizeBytes"] == raw + len('"tiny"')
+    assert stats["storedBytes"] == stored + len('"tiny"')
+
+
+@pytest.mark.asyncio
+async def test_async_paths_and_stats_agree(store) -> None:
+    service, db = store
+    await service.aset("u1", "ns", "a", SOURCE)
+    await service.aset_many("u1", [("ns", "b", SOURCE, None)])
+    assert db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "b"))["valueCodec"] == "gzip"
+    assert (await service.aget("u1", "ns", "a"))["value"] == SOURCE
+    assert await service.aget_all("u1", "ns") == {"a": SOURCE, "b": SOURCE}
+    assert await service.anamespace_stats("u1") == service.namespace_stats("u1")
+
+
+def test_compression_happens_before_offload(tmp_path) -> None:
+    db = MemoryDBService()
+    blobs = DataStoreBlobStore(2000, LocalDiskStorageService(str(tmp_path)))
+    service = DataStoreService(db, blobs, DataStoreCodec(256))
+    noise = base64.b64encode(os.urandom(3000)).decode()
+    service.set_many("u1", [("ns", "fits", SOURCE, None), ("ns", "noise", noise, None)])
+
+    fits = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "fits"))
+    assert fits["valueCodec"] == "gzip" and "valueRef" not in fits  # compressed under 2000
+    offloaded = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "noise"))
+    assert offloaded["valueRef"] and "valueCodec" not in offloaded
+    assert service.get_all("u1", "ns") == {"fits": SOURCE, "noise": noise}
+
+
+def test_zstd_without_the_package_falls_back(monkeypatch) -> None:
+    monkeypatch.setattr(data_store_codec, "zstandard", None)
+    assert DataStoreCodec(10, "zstd").codec == "gzip"
+    with pytest.raises(RuntimeError):
+        DataStoreCodec.decode({"valueCodec": "zstd", "valueEncoded": ""})
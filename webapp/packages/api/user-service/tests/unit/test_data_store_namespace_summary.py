@@ -0,0 +1,179 @@
+"""Unit tests for incrementally maintained namespace summaries."""
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+
+from services import data_store_summary_rebuild
+from services.data_store_service import DataStoreService
+from services.data_store_summary import SUMMARY_DB, NamespaceSummaries
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+COUNTS = ("recordCount", "sizeBytes", "storedBytes")
+
+
+class CountingDB(MemoryDBService):
+    """Counts queries against the records and conflicts summary saves on demand."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+        self.conflicts = 0
+
+    def find(self, db_name, selector, fields=None, limit=10000, sort=None):
+        self.calls["find"] += 1
+        return super().find(db_name, selector, fields, limit, sort)
+
+    def aggregate(self, db_name, *args, **kwargs):
+        self.calls["aggregate"] += 1
+        return super().aggregate(db_name, *args, **kwargs)
+
+    def save_many(self, db_name, docs):
+        if db_name == SUMMARY_DB and self.conflicts:
+            self.conflicts -= 1
+            return [{"ok": False, "id": doc["_id"], "error": "conflict"} for doc in docs]
+        return super().save_many(db_name, docs)
+
+
+@pytest.fixture
+def store():
+    db = CountingDB()
+    return DataStoreService(db, summaries=NamespaceSummaries(db)), db
+
+
+def _write_mix(service: DataStoreService) -> None:
+    service.set("u1", "ns", "a", {"v": 1}, agent_name="writer")
+    service.set("u1", "ns", "a", {"v": "longer value"}, agent_name="writer")  # overwrite
+    service.set_many("u1", [("ns", "b", [1, 2, 3], None), ("other", "c", "x", None)], agent_name="bulk")
+    service.set_many("u1", [("ns", "b", [1], None)], agent_name="bulk")
+    service.set("u1", "gone", "k1", 1)
+    service.set("u1", "gone", "k2", 2)
+    service.delete("u1", "other", "c")
+    service.delete("u1", "other", "missing")
+    service.delete_many("u1", "ns", ["a", "missing"])
+    service.clear_namespace("u1", "gone")
+    service.set("u1", "gone", "k3", "back", agent_name="late")
+
+
+def test_summary_tracks_writes(store) -> None:
+    service, db = store
+    assert service.list_namespaces("u1") == []  # builds the (empty) summary
+    _write_mix(service)
+
+    stats = service.namespace_stats("u1")
+    expected = service._aggregate_stats("u1")
+    assert sorted(stats) == sorted(expected) == service.list_namespaces("u1") == ["gone", "ns"]
+    for ns, entry in stats.items():
+        assert {field: entry[field] for field in COUNTS} == {field: expected[ns][field] for field in COUNTS}
+    # Agents are only forgotten when a namespace is cleared or emptied.
+    assert stats["ns"]["agents"] == ["bulk", "writer"]
+    assert stats["gone"]["agents"] == ["late"]
+    assert service.namespace_stats("u1", "gone") == {"gone": stats["gone"]}
+    assert service.namespace_stats("u1", "nope") == {}
+
+
+def test_reads_are_one_summary_read(store) -> None:
+    service, db = store
+    service.set("u1", "ns", "a", 1)
+    service.list_namespaces("u1")  # first read builds the summary
+    db.calls.clear()
+
+    service.set("u1", "ns", "b", 2)
+    assert service.list_namespaces("u1") == ["ns"]
+    assert service.namespace_stats("u1")["ns"]["recordCount"] == 2
+    assert db.calls == Counter()
+
+
+def test_existing_records_are_summarized_once() -> None:
+    db = MemoryDBService()
+    DataStoreService(db).set_many("u1", [("ns", f"k{i}", i, None) for i in range(5)])
+    service = DataStoreService(db, summaries=NamespaceSummaries(db))
+    service.set("u1", "ns", "k5", 5)  # buffered before any summary exists
+
+    assert service.namespace_stats("u1")["ns"]["recordCount"] == 6
+    assert db.get(SUMMARY_DB, "u1")["namespaces"]["ns"]["recordCount"] == 6
+
+
+def test_conflicting_flushes_retry_and_keep_deltas(store) -> None:
+    service, db = store
+    service.list_namespaces("u1")
+    service.set("u1", "ns", "a", 1)
+    db.conflicts = 2
+    assert service.list_namespaces("u1") == ["ns"]  # third attempt lands
+
+    service.set("u1", "ns", "b", 2)
+    db.conflicts = 3
+    assert service._summaries.flush() == 0
+    assert service._summaries._buffer["u1"]["ns"]["recordCount"] == 1
+    service.set("u1", "ns", "c", 3)
+    assert service.namespace_stats("u1")["ns"]["recordCount"] == 3
+
+
+def test_partial_clear_rebuilds_on_next_read(store) -> None:
+    service, db = store
+    service.set_many("u1", [("ns", "a", 1, None), ("ns", "b", 2, None)])
+    service.list_namespaces("u1")
+    failing = service._make_doc_id("u1", "ns", "b")
+    delete_many = db.delete_many
+
+    def partly_failing(db_name, doc_ids):
+        results = delete_many(db_name, [doc_id for doc_id in doc_ids if doc_id != failing])
+        return results + [{"ok": False, "id": failing} for doc_id in doc_ids if doc_id == failing]
+
+    db.delete_many = partly_failing
+    assert service.clear_namespace("u1", "ns") == 1
+    assert "u1" not in db.dbs[SUMMARY_DB]
+    assert service.namespace_stats("u1")["ns"]["recordCount"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_paths_maintain_the_summary(store) -> None:
+    service, _ = store
+    assert await service.alist_namespaces("u1") == []
+    await service.aset("u1", "ns", "a", {"v": 1}, agent_name="agent")
+    await service.aset_many("u1", [("ns", "b", 2, None), ("tmp", "c", 3, None)])
+    await service.adelete("u1", "ns", "b")
+    await service.adelete_many("u1", "ns", ["nope"])
+    await service.aclear_namespace("u1", "tmp")
+    assert await service.alist_namespaces("u1") == ["ns"]
+    stats = (await service.anamespace_stats("u1"))["ns"]
+    expected = (await service._aaggregate_stats("u1"))["ns"]
+    # updatedAt is the namespace's last write, including the deleted "b".
+    assert stats.pop("updatedAt") >= expected.pop("updatedAt")
+    assert stats == expected
+    await service._summaries.stop()
+
+
+def test_rebuild_tool_fixes_drift(monkeypatch, capsys) -> None:
+    db = MemoryDBService()
+    service = DataStoreService(db, summaries=NamespaceSummaries(db))
+    service.set_many("u1", [("ns", "a", 1, None), ("ns", "b", 2, None)])
+    service.set("u2", "ns", "a", 1)
+    service.list_namespaces("u1")
+    db.dbs[SUMMARY_DB]["u1"]["namespaces"]["ns"]["recordCount"] = 40  # drifted
+
+    monkeypatch.setattr(data_store_summary_rebuild, "get_database_service", lambda settings: db)
+    data_store_summary_rebuild.main([])
+    assert db.get(SUMMARY_DB, "u1")["namespaces"]["ns"]["recordCount"] == 2
+    assert db.get(SUMMARY_DB, "u2")["namespaces"]["ns"]["recordCount"] == 1
+    assert "'u1': 1 namespaces, 2 records." in capsys.readouterr().out
+
+
+def test_summaries_are_only_enabled_where_stale_writes_are_rejected(monkeypatch, caplog) -> None:
+    from config import settings
+    from services import data_store_summary
+    from services.data_store_service import get_data_store_service
+    from services.database_service import CachingDatabaseService, CouchDBService
+
+    monkeypatch.setattr(settings, "DATA_STORE_NAMESPACE_SUMMARIES", True)
+    monkeypatch.setattr(data_store_summary, "_unsupported_warned", False)
+    assert get_data_store_service(MemoryDBService())._summaries is None
+    assert "summaries stay off" in caplog.text
+
+    couch = CouchDBService.__new__(CouchDBService)
+    monkeypatch.setattr(DataStoreService, "_ensure_standard_indexes", lambda self: None)
+    assert data_store_summary.summaries_supported(CachingDatabaseService(couch, {}))
+    assert get_data_store_service(couch)._summaries is data_store_summary.get_namespace_summaries(couch)
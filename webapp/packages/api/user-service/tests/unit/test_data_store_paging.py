@@ -0,0 +1,161 @@
+"""Unit tests for ranged, paginated key listing in the data store."""
+from __future__ import annotations
+
+from typing import List
+
+import pytest
+
+from services import data_store_key_scope_backfill, data_store_service
+from services.data_store_service import DATA_STORE_DB, AgentDataStoreProxy, DataStoreService
+from services.database_service.memory import MemoryDBService
+from services.database_service.sqlite import SqliteDBService
+
+pytestmark = pytest.mark.unit
+
+
+class RecordingDB(MemoryDBService):
+    def __init__(self) -> None:
+        super().__init__()
+        self.finds: List[dict] = []
+
+    def find(self, db_name, selector, fields=None, limit=10000, sort=None):
+        self.finds.append({"selector": selector, "limit": limit, "sort": sort})
+        return super().find(db_name, selector, fields, limit, sort)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    db = RecordingDB() if request.param == "memory" else SqliteDBService(str(tmp_path / "ds.sqlite3"))
+    service = DataStoreService(db)
+    service.set_many("u1", [("ns", f"file:{i:02d}", i, None) for i in range(25)])
+    service.set_many("u1", [("ns", "other", "x", None), ("ns2", "file:00", "y", None)])
+    return service
+
+
+def test_list_keys_pages_by_start_after(store) -> None:
+    assert store.list_keys("u1", "ns", "file:", limit=10) == [f"file:{i:02d}" for i in range(10)]
+    assert store.list_keys("u1", "ns", "file:", start_after="file:09", limit=3) == ["file:10", "file:11", "file:12"]
+    # A start_after before the prefix range doesn't hide any of it.
+    assert store.list_keys("u1", "ns", "file:", start_after="a", limit=1) == ["file:00"]
+    assert store.list_keys("u1", "ns", start_after="file:23") == ["file:24", "other"]
+    assert store.list_keys("u1", "ns", limit=0) == []
+    # The unpaged call is unchanged.
+    assert store.list_keys("u1", "ns") == sorted([f"file:{i:02d}" for i in range(25)] + ["other"])
+
+
+def test_iter_items_reads_one_page_at_a_time() -> None:
+    db = RecordingDB()
+    service = DataStoreService(db)
+    service.set_many("u1", [("ns", f"k{i:02d}", i, None) for i in range(7)])
+    db.finds.clear()
+
+    items = service.iter_items("u1", "ns", page_size=3)
+    assert next(items) == ("k00", 0)
+    assert len(db.finds) == 1 and db.finds[0]["limit"] == 3 and db.finds[0]["sort"] == ["key"]
+    assert list(items) == [(f"k{i:02d}", i) for i in range(1, 7)]
+    assert db.finds[-1]["selector"]["key"] == {"$gt": "k05"}
+
+
+def test_legacy_records_are_backfilled_once() -> None:
+    db = RecordingDB()
+    service = DataStoreService(db)
+    service.set_many("u1", [("ns", k, k, None) for k in ("a", "b", "c")])
+    legacy = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "b"))
+    del legacy["keyScope"]
+    db.save(DATA_STORE_DB, legacy["_id"], legacy)
+
+    db.rejects_stale_writes = True  # as on CouchDB
+
+    assert service.list_keys("u1", "ns", limit=10) == ["a", "b", "c"]
+    assert db.get(DATA_STORE_DB, legacy["_id"])["keyScope"] == "u1:ns"
+    # Checked once per database, not per service (services are per request).
+    db.finds.clear()
+    assert DataStoreService(db).list_keys("u1", "ns", limit=10) == ["a", "b", "c"]
+    assert [find["selector"]["keyScope"] for find in db.finds] == ["u1:ns"]
+
+
+def test_legacy_records_list_unscoped_until_migrated(monkeypatch, capsys) -> None:
+    db = RecordingDB()
+    service = DataStoreService(db)
+    service.set_many("u1", [("ns", k, k, None) for k in ("a", "b", "c")])
+    legacy = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", "b"))
+    del legacy["keyScope"]
+    db.save(DATA_STORE_DB, legacy["_id"], legacy)
+    db.finds.clear()
+
+    # The memory backend overwrites blindly, so nothing is rewritten
+    # behind a concurrent writer's back.
+    assert service.list_keys("u1", "ns", limit=10) == ["a", "b", "c"]
+    assert "keyScope" not in db.get(DATA_STORE_DB, legacy["_id"])
+    assert all("keyScope" not in find["selector"] for find in db.finds)
+    assert "lack keyScope" in capsys.readouterr().out
+
+    monkeypatch.setattr(data_store_key_scope_backfill, "get_database_service", lambda settings: db)
+    data_store_key_scope_backfill.main(["u1"])
+    assert db.get(DATA_STORE_DB, legacy["_id"])["keyScope"] == "u1:ns"
+    assert "'u1': stamped 1 records." in capsys.readouterr().out
+    # The backfill dropped the cached verdict, so listings use keyScope again.
+    db.finds.clear()
+    assert service.list_keys("u1", "ns", limit=10) == ["a", "b", "c"]
+    assert [find["selector"]["keyScope"] for find in db.finds] == ["u1:ns"]
+
+
+def _legacy_namespace(size: int):
+    db = RecordingDB()
+    service = DataStoreService(db)
+    service.set_many("u1", [("ns", f"k{i:02d}", i, None) for i in range(size)])
+    for i in range(size):
+        doc = dict(db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", f"k{i:02d}")))
+        del doc["keyScope"]
+        db.save(DATA_STORE_DB, doc["_id"], doc)
+    return db, service
+
+
+def test_unscoped_listing_streams_the_namespace_once() -> None:
+    db, service = _legacy_namespace(7)
+    db.finds.clear()
+
+    assert list(service.iter_items("u1", "ns", page_size=3)) == [(f"k{i:02d}", i) for i in range(7)]
+    assert service.list_keys("u1", "ns", start_after="k04", limit=10) == ["k05", "k06"]
+    # No ranged find per page: the keys come from one find_iter pass.
+    assert all(find["sort"] is None for find in db.finds)
+
+
+def test_unscoped_verdict_is_rechecked(monkeypatch) -> None:
+    db, service = _legacy_namespace(3)
+    assert service.list_keys("u1", "ns", limit=10) == ["k00", "k01", "k02"]
+
+    # Another process runs the backfill; this one notices once the
+    # cached verdict is old enough.
+    for i in range(3):
+        doc = db.get(DATA_STORE_DB, service._make_doc_id("u1", "ns", f"k{i:02d}"))
+        db.save(DATA_STORE_DB, doc["_id"], {**doc, "keyScope": "u1:ns"})
+    db.finds.clear()
+    service.list_keys("u1", "ns", limit=10)
+    assert all("keyScope" not in find["selector"] for find in db.finds)
+
+    monkeypatch.setattr(data_store_service, "KEY_SCOPE_RECHECK_SECONDS", 0.0)
+    db.finds.clear()
+    assert service.list_keys("u1", "ns", limit=10) == ["k00", "k01", "k02"]
+    assert [find["selector"]["keyScope"] for find in db.finds] == ["u1:ns"]
+
+
+def test_proxy_pages_and_logs() -> None:
+    ops: List[dict] = []
+    service = DataStoreService(MemoryDBService())
+    proxy = AgentDataStoreProxy(service, "u1", "agent", "ns", ops_log=ops)
+    proxy.set_many({f"k{i}": i for i in range(5)})
+
+    assert proxy.list_keys(start_after="k1", limit=2) == ["k2", "k3"]
+    assert dict(proxy.iter_items(prefix="k", page_size=2)) == {f"k{i}": i for i in range(5)}
+    assert [(op["op"], op["count"]) for op in ops[1:]] == [("list_keys", 2), ("iter_items", 5)]
+
+
+@pytest.mark.asyncio
+async def test_async_listing_matches_sync(store) -> None:
+    assert await store.alist_keys("u1", "ns", "file:", start_after="file:20") == store.list_keys(
+        "u1", "ns", "file:", start_after="file:20"
+    )
+    items = [item async for item in store.aiter_items("u1", "ns2", page_size=1)]
+    assert items == [("file:00", "y")]
+
@@ -0,0 +1,132 @@
+"""Unit tests for the per-run data store read cache."""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Dict, List
+
+import pytest
+
+import dependencies as dependencies_module
+from config import settings
+from models.agent import Agent
+from services.agent_trace import Trace
+from services.data_store_cache import DataStoreRunCache
+from services.data_store_service import AgentDataStoreProxy, DataStoreService
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+class CountingService(DataStoreService):
+    def __init__(self) -> None:
+        super().__init__(MemoryDBService())
+        self.calls: Counter = Counter()
+
+    def get(self, *args, **kwargs):
+        self.calls["get"] += 1
+        return super().get(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        self.calls["get_many"] += 1
+        return super().get_many(*args, **kwargs)
+
+    def get_all(self, *args, **kwargs):
+        self.calls["get_all"] += 1
+        return super().get_all(*args, **kwargs)
+
+
+@pytest.fixture
+def proxy():
+    service = CountingService()
+    service.set("u1", "default", "a", {"n": 1})
+    service.set("u1", "default", "b", {"n": 2})
+    ops: List[Dict[str, Any]] = []
+    return AgentDataStoreProxy(service, "u1", "agent", ops_log=ops, run_cache=DataStoreRunCache()), service, ops
+
+
+def test_repeated_reads_are_served_from_the_run(proxy) -> None:
+    store, service, ops = proxy
+    first = store.get("a")
+    first["n"] = 99  # callers can't corrupt the cached copy
+    assert store.get("a") == {"n": 1}
+    assert store.get("missing", "dflt") == "dflt"
+    assert store.get("missing", "dflt") == "dflt"
+    assert store.get_many(["a", "b", "missing"]) == {"a": {"n": 1}, "b": {"n": 2}}
+    assert store.get_many(["b"]) == {"b": {"n": 2}}
+    assert service.calls == Counter(get=2, get_many=1)
+    assert [op.get("cached") for op in ops] == [None, True, None, True, False, True]
+    assert ops[4]["cacheHits"] == 2
+
+
+def test_run_reads_its_own_writes(proxy) -> None:
+    store, service, _ = proxy
+    assert store.get_all() == {"a": {"n": 1}, "b": {"n": 2}}
+    store.set("c", 3)
+    store.delete("a")
+    store.use_namespace("default").set_many({"d": 4})
+    assert store.get_all() == {"b": {"n": 2}, "c": 3, "d": 4}
+    assert store.get("a") is None and store.get("c") == 3
+    assert service.calls == Counter(get_all=1)
+
+    store.clear()
+    assert store.get_all() == {} and store.get("b") is None
+    assert service.calls == Counter(get_all=1)
+
+
+def test_failed_write_forgets_the_key(proxy) -> None:
+    store, service, _ = proxy
+    store.get("a")
+
+    def conflict(*args, **kwargs):
+        raise RuntimeError("conflict")
+
+    service.set, original = conflict, service.set
+    with pytest.raises(RuntimeError):
+        store.set("a", "stale")
+    service.set = original
+    assert store.get("a") == {"n": 1}
+    assert service.calls["get"] == 2
+
+
+def test_eviction_drops_namespace_completeness() -> None:
+    cache = DataStoreRunCache(max_entries=2)
+    cache.store_namespace("u", "ns", {"a": 1, "b": 2})
+    assert cache.namespace("u", "ns") == {"a": 1, "b": 2}
+    cache.store("u", "other", "x", 1)
+    assert cache.namespace("u", "ns") is None
+    assert cache.lookup("u", "ns", "a") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_nested_agents_share_the_run_cache(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "DATA_STORE_RUN_CACHE", True)
+    db = MemoryDBService()
+    DataStoreService(db).set("u1", "default", "k", "v")
+    db.save("agents", "child-id", Agent(
+        name="child", description="", code="""
+async def run(input_dict, tools):
+    return data_store.get("k")
+""", tools={}, gofannon_agents=[], input_schema={}, output_schema={},
+    ).model_dump(by_alias=True))
+    reads: Counter = Counter()
+    original_get = db.get
+
+    def counting_get(db_name, doc_id):
+        reads[db_name] += 1
+        return original_get(db_name, doc_id)
+
+    db.get = counting_get
+    code = """
+async def run(input_dict, tools):
+    first = data_store.get("k")
+    nested = await gofannon_client.call("child", {})
+    return [first, nested]
+"""
+    trace = Trace()
+    result, _ = await dependencies_module._execute_agent_code(
+        code, {}, {}, ["child-id"], db, user_id="u1", trace=trace,
+    )
+    assert result == ["v", "v"]
+    assert reads["agent_data_store"] == 1
+    events = [e for e in trace.events if e["type"] == "data_store"]
+    assert [e["cached"] for e in events] == [None, True]
@@ -0,0 +1,215 @@
+"""Unit tests for DatabaseService.count / aggregate and the namespace stats
+built on them."""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from services.data_store_service import DATA_STORE_DB, DataStoreService
+from services.database_service import CouchDBService, DatabaseService, MemoryDBService
+from services.database_service.aggregates import aggregate_docs
+from services.database_service.dynamodb import DynamoDBService
+from services.database_service.sqlite import SqliteDBService
+
+pytestmark = pytest.mark.unit
+
+DOCS = [
+    {"_id": "a", "user": "u", "ns": "n1", "size": 10, "ts": "2024-01-02", "flag": True},
+    {"_id": "b", "user": "u", "ns": "n1", "size": 5, "ts": "2024-01-05"},
+    {"_id": "c", "user": "u", "ns": "n2", "size": "big", "ts": "2024-01-01", "flag": 1},
+    {"_id": "d", "user": "other", "ns": "n1", "size": 100, "ts": "2025-01-01"},
+    {"_id": "e", "user": "u", "size": 1.5},
+]
+
+EXPECTED = {
+    ("n1",): {"count": 2, "sum": {"size": 15}, "counts": {"size": 2}, "max": {"ts": "2024-01-05"}},
+    ("n2",): {"count": 1, "sum": {"size": 0}, "counts": {"size": 0}, "max": {"ts": "2024-01-01"}},
+    (None,): {"count": 1, "sum": {"size": 1.5}, "counts": {"size": 1}, "max": {"ts": None}},
+}
+
+
+class StreamingOnly(MemoryDBService):
+    """Memory backend forced through the base-class streaming aggregate."""
+
+    aggregate = DatabaseService.aggregate
+
+
+@pytest.fixture(params=["memory", "streaming", "sqlite"])
+def db(request, tmp_path):
+    if request.param == "sqlite":
+        svc = SqliteDBService(str(tmp_path / "agg.sqlite3"))
+    else:
+        svc = StreamingOnly() if request.param == "streaming" else MemoryDBService()
+    svc.save_many("t", [dict(d) for d in DOCS])
+    yield svc
+    if request.param == "sqlite":
+        svc.close()
+
+
+def test_aggregate_groups_counts_sums_and_maxes(db) -> None:
+    out = db.aggregate("t", {"user": "u"}, group_by=["ns"], sum_fields=["size"], max_fields=["ts"])
+    assert out == EXPECTED
+
+
+def test_aggregate_without_group_and_count(db) -> None:
+    assert db.aggregate("t", {"ts": {"$gte": "2024-01-02"}}, sum_fields=["size"]) == {
+        (): {"count": 3, "sum": {"size": 115}, "counts": {"size": 3}, "max": {}},
+    }
+    assert db.count("t", {"user": "u"}) == 4
+    assert db.count("t", {"user": "nobody"}) == 0
+    assert db.aggregate("t", {"user": "nobody"}, group_by=["ns"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_async_aggregate_matches_sync(db) -> None:
+    assert await db.acount("t", {"ns": "n1"}) == 3
+    out = await db.aaggregate("t", {"user": "u"}, group_by=["ns"], sum_fields=["size"], max_fields=["ts"])
+    assert out == EXPECTED
+
+
+def test_sqlite_aggregates_in_sql_and_falls_back_for_inexact_selectors(tmp_path, monkeypatch) -> None:
+    db = SqliteDBService(str(tmp_path / "x.sqlite3"))
+    db.save_many("t", [dict(d) for d in DOCS])
+    monkeypatch.setattr(db, "find_iter", lambda *a, **kw: pytest.fail("streamed an exact selector"))
+    assert db.count("t", {"size": {"$gt": 4}}) == 3  # the string "big" never matches a number
+    monkeypatch.undo()
+    # A boolean can't be compared exactly in SQL, so this one streams
+    # (and, as in Python, True == 1).
+    assert db.count("t", {"flag": True}) == 2
+    db.close()
+
+
+def test_dynamodb_count_uses_select_count() -> None:
+    calls: List[Dict[str, Any]] = []
+
+    class Table:
+        def scan(self, **kwargs):
+            calls.append(dict(kwargs))
+            if "ExclusiveStartKey" not in kwargs:
+                return {"Count": 3, "LastEvaluatedKey": {"_id": "x"}}
+            return {"Count": 2}
+
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._indexes = {"t": {}}
+    db._indexes_refresh_at = {"t": float("inf")}
+    db._get_or_create_table = lambda name: Table()  # type: ignore[assignment]
+    assert db.count("t", {"status": "open"}) == 5
+    assert all(c["Select"] == "COUNT" and "FilterExpression" in c for c in calls)
+
+
+def test_couchdb_aggregate_uses_views() -> None:
+    puts: Dict[str, Dict[str, Any]] = {}
+    queries: List[Any] = []
+
+    class Resource:
+        def put_json(self, path, body):
+            puts["/".join(path)] = body
+            return 201, {}, {"ok": True}
+
+        def post_json(self, path, body):
+            assert path[-2:] == ["_view", "v"]
+            ddoc_id = "/".join(path[:-2])
+            queries.append((ddoc_id, body))
+            view = puts[ddoc_id]["views"]["v"]
+            if view.get("reduce") == "_stats":
+                return 200, {}, {"rows": [
+                    {"key": ["u", "n1"], "value": [{"count": 2, "sum": 15}, {"count": 2, "sum": 2}]},
+                    {"key": ["u", None], "value": [{"count": 1, "sum": 0}, {"count": 1, "sum": 0}]},
+                ]}
+            if body["start_key"][1] == "n1":
+                return 200, {}, {"rows": [{"key": ["u", "n1", "2024-01-05"], "value": None}]}
+            return 200, {}, {"rows": []}
+
+    class FakeDB:
+        resource = Resource()
+
+    db = CouchDBService.__new__(CouchDBService)
+    db._dbs = {"t": FakeDB()}
+    db._dbs_lock = threading.Lock()
+    db._ensured_indexes = set()
+
+    out = db.aggregate("t", {"user": "u"}, group_by=["ns"], sum_fields=["size"], max_fields=["ts"])
+    assert out == {
+        ("n1",): {"count": 2, "sum": {"size": 15}, "counts": {"size": 2}, "max": {"ts": "2024-01-05"}},
+        (None,): {"count": 1, "sum": {"size": 0}, "counts": {"size": 0}, "max": {"ts": None}},
+    }
+    assert len(puts) == 2 and all(p.startswith("_design/gofannon-agg-") for p in puts)
+    stats_query = queries[0][1]
+    assert stats_query["start_key"] == ["u"] and stats_query["end_key"] == ["u", {}]
+    assert stats_query["group_level"] == 2
+    # Views are created once per process.
+    db.aggregate("t", {"user": "u"}, group_by=["ns"], sum_fields=["size"], max_fields=["ts"])
+    assert len(puts) == 2
+
+
+def test_couchdb_aggregate_streams_for_range_selectors() -> None:
+    db = CouchDBService.__new__(CouchDBService)
+    db.find_iter = lambda *a, **kw: iter([{"_id": "a", "n": 1}, {"_id": "b", "n": 2}])  # type: ignore[assignment]
+    assert db.aggregate("t", {"n": {"$gt": 0}}, sum_fields=["n"]) == {
+        (): {"count": 2, "sum": {"n": 3}, "counts": {"n": 2}, "max": {}},
+    }
+
+
+# --- namespace stats ------------------------------------------------------
+
+@pytest.fixture(params=["memory", "sqlite"])
+def stats_store(request, tmp_path):
+    db = SqliteDBService(str(tmp_path / "stats.sqlite3")) if request.param == "sqlite" else MemoryDBService()
+    store = DataStoreService(db)
+    store.set("u", "ns1", "a", {"x": 1}, agent_name="writer")
+    store.set("u", "ns1", "b", "hello", agent_name="reader")
+    store.set("u", "ns2", "c", [1, 2, 3])
+    store.set("other", "ns1", "z", "not mine", agent_name="intruder")
+    yield store
+    if request.param == "sqlite":
+        db.close()
+
+
+def test_namespace_stats_never_read_values(stats_store, monkeypatch) -> None:
+    db = stats_store.db
+    reads: List[str] = []
+    find_iter, aggregate = db.find_iter, db.aggregate
+
+    def tracked_find_iter(db_name, selector, fields=None, *args, **kwargs):
+        reads.append("find_iter")
+        assert fields and "value" not in fields
+        return find_iter(db_name, selector, fields, *args, **kwargs)
+
+    def tracked_aggregate(*args, **kwargs):
+        reads.append("aggregate")
+        return aggregate(*args, **kwargs)
+
+    monkeypatch.setattr(db, "find_iter", tracked_find_iter)
+    monkeypatch.setattr(db, "aggregate", tracked_aggregate)
+    monkeypatch.setattr(db, "get_many", lambda *a: pytest.fail("re-read records"))
+    stats = stats_store.namespace_stats("u")
+    # Two server-side aggregates, or else one streaming pass.
+    assert reads == (["aggregate", "aggregate"] if db.native_aggregate else ["find_iter"])
+    assert stats["ns1"]["recordCount"] == 2
+    assert stats["ns1"]["sizeBytes"] == len('{"x": 1}') + len('"hello"')
+    assert stats["ns1"]["agents"] == ["reader", "writer"]
+    assert stats["ns2"] == {
+        "recordCount": 1, "sizeBytes": len("[1, 2, 3]"), "storedBytes": len("[1, 2, 3]"), "agents": [],
+        "updatedAt": stats["ns2"]["updatedAt"],
+    }
+    assert list(stats_store.namespace_stats("u", "ns2")) == ["ns2"]
+
+
+@pytest.mark.asyncio
+async def test_namespace_stats_stream_legacy_records(stats_store, monkeypatch) -> None:
+    db = stats_store.db
+    expected = stats_store.namespace_stats("u")
+    legacy = db.get(DATA_STORE_DB, stats_store._make_doc_id("u", "ns2", "c"))
+    del legacy["valueSize"]
+    db.save(DATA_STORE_DB, legacy["_id"], legacy)
+    get_many = db.get_many
+    reread: List[List[str]] = []
+    monkeypatch.setattr(db, "get_many", lambda name, ids: reread.append(ids) or get_many(name, ids))
+    assert stats_store.namespace_stats("u") == expected
+    assert reread == [[legacy["_id"]]]
+    assert await stats_store.anamespace_stats("u") == expected
+def test_aggregate_docs_folds_unhashable_groups() -> None:
+    out = aggregate_docs([{"g": [1]}, {"g": [1]}, {"g": {"a": 1}}], ["g"], [], [])
+    assert {k: v["count"] for k, v in out.items()} == {("[1]",): 2, ('{"a": 1}',): 1}
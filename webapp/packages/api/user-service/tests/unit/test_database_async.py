@@ -0,0 +1,145 @@
+"""Unit tests for the async DatabaseService API (aget / asave / afind ...).
+
+Covers the thread-pool adapter in the base class, the inline path on
+the memory backend, and the async DataStoreService methods built on
+top of them.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+from typing import Any, Dict, List
+
+import pytest
+from fastapi import HTTPException
+
+from services.data_store_service import DataStoreService
+from services.database_service.base import DatabaseService
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+_probe: contextvars.ContextVar[str] = contextvars.ContextVar("_probe", default="unset")
+
+
+class ThreadRecordingDB(DatabaseService):
+    """Minimal sync backend that records which thread served each call."""
+
+    def __init__(self) -> None:
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.threads: List[str] = []
+        self.seen_probe: List[str] = []
+
+    def _note(self) -> None:
+        self.threads.append(threading.current_thread().name)
+        self.seen_probe.append(_probe.get())
+
+    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        self._note()
+        if doc_id not in self.docs:
+            raise HTTPException(status_code=404, detail="missing")
+        return self.docs[doc_id]
+
+    def save(self, db_name: str, doc_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        self._note()
+        self.docs[doc_id] = doc
+        return {"id": doc_id, "rev": "1"}
+
+    def delete(self, db_name: str, doc_id: str) -> None:
+        self._note()
+        self.docs.pop(doc_id)
+
+    def list_all(self, db_name: str) -> List[Dict[str, Any]]:
+        self._note()
+        return list(self.docs.values())
+
+
+# --- base-class adapter ------------------------------------------------
+
+async def test_default_adapter_runs_off_the_event_loop() -> None:
+    db = ThreadRecordingDB()
+    await db.asave("t", "a", {"_id": "a", "v": 1})
+    assert (await db.aget("t", "a"))["v"] == 1
+    assert all(name.startswith("db-io") for name in db.threads)
+    assert threading.current_thread().name not in db.threads
+
+
+async def test_default_adapter_propagates_contextvars() -> None:
+    db = ThreadRecordingDB()
+    token = _probe.set("request-42")
+    try:
+        await db.alist_all("t")
+    finally:
+        _probe.reset(token)
+    assert db.seen_probe == ["request-42"]
+
+
+async def test_default_adapter_surfaces_backend_exceptions() -> None:
+    db = ThreadRecordingDB()
+    with pytest.raises(HTTPException) as exc_info:
+        await db.aget("t", "missing")
+    assert exc_info.value.status_code == 404
+
+
+async def test_default_bulk_and_find_adapters() -> None:
+    db = ThreadRecordingDB()
+    results = await db.asave_many("t", [{"_id": "a", "k": 1}, {"_id": "b", "k": 2}])
+    assert [r["ok"] for r in results] == [True, True]
+    assert await db.afind("t", {"k": 2}) == [{"_id": "b", "k": 2}]
+    assert (await db.aget_many("t", ["a", "zz"]))["zz"] is None
+    assert [r["ok"] for r in await db.adelete_many("t", ["a"])] == [True]
+
+
+# --- memory backend -----------------------------------------------------
+
+async def test_memory_async_api_runs_inline() -> None:
+    db = MemoryDBService()
+    await db.asave("t", "a", {"_id": "a", "v": 1})
+    assert await db.aget("t", "a") == {"_id": "a", "v": 1}
+    assert await db.alist_all("t") == [{"_id": "a", "v": 1}]
+    await db.adelete("t", "a")
+    assert await db.alist_all("t") == []
+
+
+# --- DataStoreService async methods -------------------------------------
+
+async def test_data_store_async_round_trip() -> None:
+    svc = DataStoreService(MemoryDBService())
+    await svc.aset("u1", "ns", "k1", {"a": 1})
+    await svc.aset("u1", "ns", "k2", "v2")
+
+    record = await svc.aget("u1", "ns", "k1")
+    assert record["value"] == {"a": 1}
+    assert await svc.alist_keys("u1", "ns") == ["k1", "k2"]
+    assert await svc.alist_namespaces("u1") == ["ns"]
+    assert await svc.aget_all("u1", "ns") == {"k1": {"a": 1}, "k2": "v2"}
+    assert await svc.aget_many("u1", "ns", ["k2", "nope"]) == {"k2": "v2"}
+
+    assert await svc.adelete("u1", "ns", "k1") is True
+    assert await svc.adelete("u1", "ns", "k1") is False
+    assert await svc.aclear_namespace("u1", "ns") == 1
+    assert await svc.alist_keys("u1", "ns") == []
+
+
+async def test_data_store_aset_merges_on_conflict() -> None:
+    db = MemoryDBService()
+    svc = DataStoreService(db)
+    first = await svc.aset("u1", "ns", "k", "old", metadata={"a": 1})
+
+    original_asave = db.asave
+    calls = {"n": 0}
+
+    async def conflicting_asave(db_name, doc_id, doc):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise HTTPException(status_code=409, detail="conflict")
+        return await original_asave(db_name, doc_id, doc)
+
+    db.asave = conflicting_asave  # type: ignore[assignment]
+
+    result = await svc.aset("u1", "ns", "k", "new", metadata={"b": 2})
+    assert calls["n"] == 2
+    assert result["value"] == "new"
+    assert result["createdAt"] == first["createdAt"]
+    assert result["metadata"] == {"a": 1, "b": 2}
@@ -0,0 +1,183 @@
+"""Unit tests for the read-through CachingDatabaseService wrapper."""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+from fastapi import HTTPException
+
+from services.database_service.caching import (
+    CachePolicy,
+    CachingDatabaseService,
+    parse_cache_config,
+)
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+class CountingDB(MemoryDBService):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Dict[str, int] = {}
+
+    def _bump(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def get(self, db_name: str, doc_id: str) -> Dict[str, Any]:
+        self._bump("get")
+        return super().get(db_name, doc_id)
+
+    def get_many(self, db_name: str, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        self._bump("get_many")
+        return super().get_many(db_name, doc_ids)
+
+
+@pytest.fixture
+def inner() -> CountingDB:
+    db = CountingDB()
+    db.save("agents", "a1", {"_id": "a1", "name": "one"})
+    db.save("agents", "a2", {"_id": "a2", "name": "two"})
+    db.save("tickets", "t1", {"_id": "t1", "status": "pending"})
+    return db
+
+
+@pytest.fixture
+def cached(inner: CountingDB) -> CachingDatabaseService:
+    return CachingDatabaseService(inner, {"agents": CachePolicy(ttl_seconds=60, max_entries=10)})
+
+
+# --- config parsing -----------------------------------------------------
+
+def test_parse_cache_config() -> None:
+    policies = parse_cache_config("agents:30:500, deployments , users:5,bad:x")
+    assert policies["agents"] == CachePolicy(ttl_seconds=30, max_entries=500)
+    assert policies["deployments"] == CachePolicy()
+    assert policies["users"].ttl_seconds == 5
+    assert "bad" not in policies
+    assert parse_cache_config("") == {}
+    assert parse_cache_config(None) == {}
+
+
+# --- read-through -------------------------------------------------------
+
+def test_repeat_get_served_from_cache(cached, inner) -> None:
+    assert cached.get("agents", "a1")["name"] == "one"
+    assert cached.get("agents", "a1")["name"] == "one"
+    assert inner.calls["get"] == 1
+    assert cached.cache_stats()["agents"]["hits"] == 1
+    assert cached.cache_stats()["agents"]["misses"] == 1
+
+
+def test_uncached_collection_passes_through(cached, inner) -> None:
+    cached.get("tickets", "t1")
+    cached.get("tickets", "t1")
+    assert inner.calls["get"] == 2
+
+
+def test_returned_docs_are_isolated_from_cache(cached) -> None:
+    doc = cached.get("agents", "a1")
+    doc["name"] = "mutated"
+    assert cached.get("agents", "a1")["name"] == "one"
+
+
+def test_missing_doc_is_not_cached(cached, inner) -> None:
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            cached.get("agents", "missing")
+    assert inner.calls["get"] == 2
+
+
+def test_ttl_expiry_refetches(inner) -> None:
+    cached = CachingDatabaseService(inner, {"agents": CachePolicy(ttl_seconds=0)})
+    cached.get("agents", "a1")
+    cached.get("agents", "a1")
+    assert inner.calls["get"] == 2
+
+
+def test_lru_eviction(inner) -> None:
+    cached = CachingDatabaseService(inner, {"agents": CachePolicy(max_entries=1)})
+    cached.get("agents", "a1")
+    cached.get("agents", "a2")  # evicts a1
+    cached.get("agents", "a1")
+    assert inner.calls["get"] == 3
+    assert cached.cache_stats()["agents"]["evictions"] == 2
+
+
+def test_get_many_mixes_hits_and_misses(cached, inner) -> None:
+    cached.get("agents", "a1")
+    out = cached.get_many("agents", ["a2", "a1", "nope"])
+    assert list(out) == ["a2", "a1", "nope"]
+    assert out["a1"]["name"] == "one"
+    assert out["nope"] is None
+    assert inner.calls["get_many"] == 1
+    # Now both are warm: no further backend calls.
+    cached.get_many("agents", ["a1", "a2"])
+    assert inner.calls["get_many"] == 1
+
+
+# --- write-through invalidation -----------------------------------------
+
+def test_save_invalidates(cached) -> None:
+    cached.get("agents", "a1")
+    cached.save("agents", "a1", {"_id": "a1", "name": "renamed"})
+    assert cached.get("agents", "a1")["name"] == "renamed"
+
+
+def test_delete_invalidates(cached) -> None:
+    cached.get("agents", "a1")
+    cached.delete("agents", "a1")
+    with pytest.raises(HTTPException):
+        cached.get("agents", "a1")
+
+
+def test_bulk_writes_invalidate(cached) -> None:
+    cached.get_many("agents", ["a1", "a2"])
+    cached.save_many("agents", [{"_id": "a1", "name": "bulk"}])
+    cached.delete_many("agents", ["a2"])
+    out = cached.get_many("agents", ["a1", "a2"])
+    assert out["a1"]["name"] == "bulk"
+    assert out["a2"] is None
+
+
+def test_fill_racing_a_write_is_dropped(cached, inner) -> None:
+    """A read that started before a write must not cache the old doc."""
+    original_get = inner.get
+
+    def get_then_concurrent_write(db_name, doc_id):
+        doc = dict(original_get(db_name, doc_id))
+        cached.save("agents", doc_id, {"_id": doc_id, "name": "newer"})
+        return doc
+
+    inner.get = get_then_concurrent_write  # type: ignore[assignment]
+    assert cached.get("agents", "a1")["name"] == "one"
+    inner.get = original_get  # type: ignore[assignment]
+    assert cached.get("agents", "a1")["name"] == "newer"
+
+
+def test_fill_racing_a_clear_is_dropped(cached, inner) -> None:
+    """A read that started before a clear (after a purge, say) must not refill the cache."""
+    original_get = inner.get
+
+    def get_then_concurrent_clear(db_name, doc_id):
+        doc = original_get(db_name, doc_id)
+        cached.clear_cache("agents")
+        return doc
+
+    inner.get = get_then_concurrent_clear  # type: ignore[assignment]
+    cached.get("agents", "a1")
+    inner.get = original_get  # type: ignore[assignment]
+    cached.get("agents", "a1")
+    assert cached.cache_stats()["agents"]["hits"] == 0
+
+
+# --- async API ----------------------------------------------------------
+
+async def test_async_api_uses_cache(cached, inner) -> None:
+    assert (await cached.aget("agents", "a1"))["name"] == "one"
+    assert (await cached.aget("agents", "a1"))["name"] == "one"
+    assert inner.calls["get"] == 1
+    await cached.asave("agents", "a1", {"_id": "a1", "name": "async"})
+    assert (await cached.aget("agents", "a1"))["name"] == "async"
+    out = await cached.aget_many("agents", ["a1", "a2"])
+    assert out["a2"]["name"] == "two"
@@ -0,0 +1,168 @@
+"""Unit tests for cursor paging (find_page / find_iter / afind_iter)."""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from services.database_service.base import DatabaseService, decode_cursor, encode_cursor
+from services.database_service.couchdb import CouchDBService
+from services.database_service.dynamodb import DynamoDBService
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+class ListOnlyDB(DatabaseService):
+    """Backend with only the abstract methods, to exercise the defaults."""
+
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+
+    def get(self, db_name, doc_id):
+        raise NotImplementedError
+
+    def save(self, db_name, doc_id, doc):
+        raise NotImplementedError
+
+    def delete(self, db_name, doc_id):
+        raise NotImplementedError
+
+    def list_all(self, db_name):
+        return list(self.docs)
+
+
+def _seed(db: MemoryDBService, n: int) -> None:
+    for i in range(n):
+        db.save("t", f"d{i:03d}", {"_id": f"d{i:03d}", "kind": "even" if i % 2 == 0 else "odd", "n": i})
+
+
+def test_cursor_round_trip_and_rejects_garbage() -> None:
+    state = {"plan": ["idx", "userId", None], "key": {"_id": "a/b"}}
+    assert decode_cursor(encode_cursor(state)) == state
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
+
+
+def test_memory_find_page_walks_all_pages() -> None:
+    db = MemoryDBService()
+    _seed(db, 25)
+    page, cursor = db.find_page("t", {"kind": "even"}, page_size=5)
+    assert [d["n"] for d in page] == [0, 2, 4, 6, 8]
+    seen = [d["n"] for d in page]
+    while cursor:
+        page, cursor = db.find_page("t", {"kind": "even"}, page_size=5, cursor=cursor)
+        seen.extend(d["n"] for d in page)
+    assert seen == list(range(0, 25, 2))
+
+
+def test_memory_find_iter_survives_deletes_between_pages() -> None:
+    db = MemoryDBService()
+    _seed(db, 10)
+    seen = []
+    for doc in db.find_iter("t", {}, fields=["n"], page_size=3):
+        seen.append(doc["n"])
+        db.delete("t", doc["_id"])
+    assert seen == list(range(10))
+    assert db.list_all("t") == []
+
+
+def test_default_find_page_pages_over_list_all() -> None:
+    db = ListOnlyDB([{"_id": k, "v": i} for i, k in enumerate("dbca")])
+    page, cursor = db.find_page("t", {}, fields=["v"], page_size=3)
+    assert [d["_id"] for d in page] == ["a", "b", "c"]
+    assert set(page[0]) == {"_id", "v"}
+    page, cursor = db.find_page("t", {}, page_size=3, cursor=cursor)
+    assert [d["_id"] for d in page] == ["d"] and cursor is None
+
+
+async def test_afind_iter_streams_every_match() -> None:
+    db = MemoryDBService()
+    _seed(db, 12)
+    seen = [doc["n"] async for doc in db.afind_iter("t", {"kind": "odd"}, page_size=4)]
+    assert seen == list(range(1, 12, 2))
+
+
+# --- native backends ----------------------------------------------------
+
+class PagedTable:
+    """Fake DynamoDB table returning LastEvaluatedKey after each page."""
+
+    def __init__(self, items: List[Dict[str, Any]]) -> None:
+        self.items = items
+        self.calls: List[Dict[str, Any]] = []
+
+    def _page(self, **kwargs):
+        self.calls.append(dict(kwargs))
+        start = 0
+        if "ExclusiveStartKey" in kwargs:
+            start = next(i for i, it in enumerate(self.items) if it["_id"] == kwargs["ExclusiveStartKey"]["_id"]) + 1
+        chunk = self.items[start:start + kwargs["Limit"]]
+        response: Dict[str, Any] = {"Items": chunk}
+        if start + len(chunk) < len(self.items):
+            response["LastEvaluatedKey"] = {"_id": chunk[-1]["_id"]}
+        return response
+
+    query = _page
+    scan = _page
+
+
+def test_dynamodb_find_page_resumes_from_last_evaluated_key() -> None:
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._indexes = {"t": {}}
+    db._indexes_refresh_at = {}
+    db._tables = {}
+    db._tables_lock = threading.Lock()
+    table = PagedTable([{"_id": f"d{i}"} for i in range(7)])
+    db._get_or_create_table = lambda name: table  # type: ignore[assignment]
+
+    ids = [doc["_id"] for doc in db.find_iter("t", {}, page_size=3)]
+    assert ids == [f"d{i}" for i in range(7)]
+    assert [c["Limit"] for c in table.calls] == [3, 3, 3]
+    assert table.calls[1]["ExclusiveStartKey"] == {"_id": "d2"}
+
+
+def test_foreign_or_tampered_cursors_are_rejected() -> None:
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._indexes = {"t": {}}
+    db._indexes_refresh_at = {}
+    db._get_or_create_table = lambda name: PagedTable([])  # type: ignore[assignment]
+    for state in ["abc", {"plan": None}, {"key": "d1"}, {"plan": "x", "key": {"_id": "d1"}}]:
+        with pytest.raises(ValueError):
+            db.find_page("t", {}, cursor=encode_cursor(state))
+
+    memory = MemoryDBService()
+    _seed(memory, 3)
+    with pytest.raises(ValueError):
+        memory.find_page("t", {}, cursor=encode_cursor({"plan": None, "key": {"_id": "d1"}}))
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(["d1"]), str)
+
+
+def test_couchdb_find_page_uses_bookmarks() -> None:
+    posts: List[Dict[str, Any]] = []
+    pages = [
+        {"docs": [{"_id": "a"}, {"_id": "b"}], "bookmark": "bm-1"},
+        {"docs": [{"_id": "c"}], "bookmark": "bm-2"},
+    ]
+
+    class Resource:
+        def post_json(self, path, body):
+            assert path == "_find"
+            posts.append(body)
+            return 200, {}, pages[len(posts) - 1]
+
+    class FakeDB:
+        resource = Resource()
+
+    db = CouchDBService.__new__(CouchDBService)
+    db._dbs = {"t": FakeDB()}
+    db._dbs_lock = threading.Lock()
+    db._ensured_indexes = set()
+
+    ids = [doc["_id"] for doc in db.find_iter("t", {"userId": "u"}, page_size=2)]
+    assert ids == ["a", "b", "c"]
+    assert "bookmark" not in posts[0]
+    assert posts[1]["bookmark"] == "bm-1"
+    assert posts[1]["selector"] == {"userId": "u"}
@@ -0,0 +1,127 @@
+"""Unit tests for the request-scoped identity map."""
+from __future__ import annotations
+
+from collections import Counter
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from services.database_service import (
+    IdentityMapDatabaseService,
+    IdentityScopeMiddleware,
+    MemoryDBService,
+    identity_scope,
+)
+from services.database_service.identity_map import parse_identity_map_config
+
+pytestmark = pytest.mark.unit
+
+
+class CountingDB(MemoryDBService):
+    def __init__(self) -> None:
+        super().__init__()
+        self.reads: Counter = Counter()
+
+    def get(self, db_name, doc_id):
+        self.reads[(db_name, doc_id)] += 1
+        return super().get(db_name, doc_id)
+
+    def get_many(self, db_name, doc_ids):
+        for doc_id in doc_ids:
+            self.reads[(db_name, doc_id)] += 1
+        return {doc_id: self._peek(db_name, doc_id) for doc_id in doc_ids}
+
+    def _peek(self, db_name, doc_id):
+        try:
+            return super().get(db_name, doc_id)
+        except HTTPException:
+            return None
+
+
+@pytest.fixture
+def backend():
+    inner = CountingDB()
+    inner.save("users", "u1", {"name": "Ada"})
+    inner.save("users", "u2", {"name": "Bob"})
+    inner.save("tickets", "t1", {"status": "open"})
+    return inner, IdentityMapDatabaseService(inner, parse_identity_map_config("users"))
+
+
+def test_parse_identity_map_config() -> None:
+    assert parse_identity_map_config("") is None
+    assert parse_identity_map_config("*")("anything")
+    covers = parse_identity_map_config("users, agents")
+    assert covers("agents") and not covers("tickets")
+
+
+def test_reads_are_deduped_within_a_scope_only(backend) -> None:
+    inner, db = backend
+    db.get("users", "u1")
+    db.get("users", "u1")
+    assert inner.reads[("users", "u1")] == 2  # no scope: pass-through
+
+    with identity_scope():
+        first = db.get("users", "u1")
+        first["name"] = "mutated"
+        with identity_scope():  # nested scopes join the outer one
+            assert db.get("users", "u1")["name"] == "Ada"
+        assert db.get_many("users", ["u1", "u2", "nope"])["u2"]["name"] == "Bob"
+        assert db.get_many("users", ["u2", "nope"])["nope"] is None
+        db.get("tickets", "t1")
+        db.get("tickets", "t1")
+    assert inner.reads[("users", "u1")] == 3
+    assert inner.reads[("users", "u2")] == 1
+    assert inner.reads[("users", "nope")] == 2  # misses are not remembered
+    assert inner.reads[("tickets", "t1")] == 2  # collection not covered
+
+    with identity_scope():
+        db.get("users", "u1")
+    assert inner.reads[("users", "u1")] == 4  # a new scope reads fresh
+
+
+def test_writes_in_scope_invalidate_even_when_they_fail(backend) -> None:
+    inner, db = backend
+    with identity_scope():
+        doc = db.get("users", "u1")
+        db.save("users", "u1", dict(doc, name="Eve"))
+        assert db.get("users", "u1")["name"] == "Eve"
+
+        db.get("users", "u2")
+
+        def conflict(*args, **kwargs):
+            raise HTTPException(status_code=409, detail="conflict")
+
+        inner.save, original = conflict, inner.save
+        with pytest.raises(HTTPException):
+            db.save("users", "u2", {"name": "stale"})
+        inner.save = original
+        db.get("users", "u2")
+    assert inner.reads[("users", "u2")] == 2
+
+
+@pytest.mark.asyncio
+async def test_async_reads_share_the_scope(backend) -> None:
+    inner, db = backend
+    with identity_scope():
+        await db.aget("users", "u1")
+        # The sync read runs on a worker thread with a copy of the context.
+        await db._run_sync(db.get, "users", "u1")
+        await db.aget_many("users", ["u1"])
+    assert inner.reads[("users", "u1")] == 1
+
+
+def test_middleware_opens_one_scope_per_request(backend) -> None:
+    inner, db = backend
+    app = FastAPI()
+    app.add_middleware(IdentityScopeMiddleware)
+
+    @app.get("/user")
+    async def read_user():
+        await db.aget("users", "u1")
+        return await db.aget("users", "u1")
+
+    client = TestClient(app)
+    assert client.get("/user").json()["name"] == "Ada"
+    assert client.get("/user").json()["name"] == "Ada"
+    assert inner.reads[("users", "u1")] == 2
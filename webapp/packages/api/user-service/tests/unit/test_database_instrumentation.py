@@ -0,0 +1,165 @@
+"""Unit tests for the query-metrics / slow-query wrapper."""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from services.database_service import (
+    CouchDBService,
+    InstrumentedDatabaseService,
+    MemoryDBService,
+)
+from services.database_service import CachingDatabaseService
+from services.database_service.instrumentation import (
+    SIZE_SAMPLE,
+    _json_size,
+    find_instrumented,
+    note_query,
+    selector_shape,
+)
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db() -> InstrumentedDatabaseService:
+    inner = MemoryDBService()
+    inner.save_many("t", [{"_id": f"d{i}", "user": f"u{i % 2}", "n": i} for i in range(10)])
+    return InstrumentedDatabaseService(inner, slow_query_ms=10_000)
+
+
+def test_selector_shape_drops_values() -> None:
+    shape = selector_shape({"userId": "secret", "ts": {"$gte": 1, "$lt": 2}, "k": {"$prefix": "x"}})
+    assert shape == {"userId": "$eq", "ts": "$gte,$lt", "k": "$prefix"}
+    assert selector_shape({"bad": {"$nope": 1}}) == {"bad": "?"}
+
+
+def test_counts_calls_docs_and_bytes(db) -> None:
+    db.inner.ensure_index("t", ["user"])
+    assert len(db.find("t", {"user": "u1"})) == 5
+    db.get("t", "d1")
+    db.get_many("t", ["d1", "missing"])
+    with pytest.raises(Exception):
+        db.get("t", "missing")
+
+    stats = db.query_stats()["t"]
+    assert stats["find"]["calls"] == 1 and stats["find"]["docs"] == 5
+    assert stats["find"]["bytes"] > 0 and stats["find"]["scans"] == 0
+    assert stats["get"]["calls"] == 2 and stats["get"]["errors"] == 1 and stats["get"]["docs"] == 1
+    assert stats["get_many"]["docs"] == 1
+    assert db.slow_queries() == []
+
+
+def test_large_results_are_sized_from_a_sample(monkeypatch, db) -> None:
+    serialized: List[int] = []
+    real = _json_size
+    monkeypatch.setattr(
+        "services.database_service.instrumentation._json_size",
+        lambda value: serialized.append(len(value)) or real(value),
+    )
+    docs = db.list_all("t")
+    assert serialized == [SIZE_SAMPLE]
+    stats = db.query_stats()["t"]["list_all"]
+    assert stats["docs"] == 10
+    assert abs(stats["bytes"] - real(docs)) <= len(docs)
+
+
+def test_list_all_is_counted_but_only_logged_when_slow(db, caplog) -> None:
+    with caplog.at_level(logging.WARNING):
+        db.list_all("t")
+    assert db.query_stats()["t"]["list_all"]["scans"] == 1
+    assert db.slow_queries() == [] and not caplog.records
+
+    db.slow_query_ms = 0
+    db.list_all("t")
+    (entry,) = db.slow_queries()
+    assert entry["op"] == "list_all" and entry["scan"] is True
+
+
+def test_find_instrumented_looks_through_wrappers(db) -> None:
+    assert find_instrumented(CachingDatabaseService(db, {})) is db
+    assert find_instrumented(MemoryDBService()) is None
+
+
+def test_unindexed_find_is_flagged_as_scan(db, caplog) -> None:
+    with caplog.at_level(logging.WARNING):
+        db.find("t", {"n": {"$gt": 7}}, limit=5)
+    assert db.query_stats()["t"]["find"]["scans"] == 1
+    (entry,) = db.slow_queries()
+    assert entry["shape"] == {"n": "$gt"} and entry["scan"] is True
+    assert "Full collection read on t.find" in caplog.text
+
+
+def test_slow_queries_are_logged_with_shape() -> None:
+    class Slow(MemoryDBService):
+        def find(self, *args, **kwargs):
+            note_query(index="hash")
+            return [{"_id": "a"}]
+
+    db = InstrumentedDatabaseService(Slow(), slow_query_ms=0)
+    db.find("t", {"userId": "u-123"})
+    (entry,) = db.slow_queries()
+    assert entry["op"] == "find" and entry["shape"] == {"userId": "$eq"}
+    assert "u-123" not in repr(entry)
+    assert db.query_stats()["t"]["find"]["slow"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_calls_see_notes_from_worker_threads(db) -> None:
+    # afind runs the memory backend on the db-io pool; the note made
+    # there must still reach the wrapper.
+    await db.afind("t", {"n": 3})
+    await db.asave("t", "x", {"n": 99})
+    stats = db.query_stats()["t"]
+    assert stats["find"]["scans"] == 1
+    assert stats["save"]["docs"] == 1
+
+
+def test_note_query_outside_a_wrapped_call_is_a_no_op() -> None:
+    note_query(scan=True)
+    MemoryDBService().find("t", {})
+
+
+def _couch(responses: List[Dict[str, Any]], posts: List[Dict[str, Any]]) -> CouchDBService:
+    class Resource:
+        def post_json(self, path, body):
+            assert path == "_find"
+            posts.append(body)
+            return 200, {}, responses[len(posts) - 1]
+
+    class FakeDB:
+        resource = Resource()
+
+    couch = CouchDBService.__new__(CouchDBService)
+    couch._dbs = {"t": FakeDB()}
+    couch._dbs_lock = threading.Lock()
+    couch._ensured_indexes = set()
+    return couch
+
+
+def test_couchdb_reports_execution_stats_and_missing_index(caplog) -> None:
+    posts: List[Dict[str, Any]] = []
+    stats = {"total_docs_examined": 5000, "results_returned": 1}
+    couch = _couch([
+        {
+            "docs": [{"_id": "a", "status": "x"}],
+            "warning": "No matching index found, create an index to optimize query time.",
+            "execution_stats": stats,
+        },
+        {"docs": [], "execution_stats": {"total_docs_examined": 0}},
+    ], posts)
+    db = InstrumentedDatabaseService(couch, slow_query_ms=10_000)
+
+    with caplog.at_level(logging.WARNING):
+        assert db.find("t", {"status": "x"}) == [{"_id": "a", "status": "x"}]
+    assert posts[0]["execution_stats"] is True
+    (entry,) = db.slow_queries()
+    assert entry["scan"] is True and entry["execution_stats"] == stats
+    assert "Full collection read on t.find" in caplog.text
+
+    db.find_page("t", {"userId": "u"})
+    assert db.query_stats()["t"]["find_page"]["scans"] == 0
+    assert len(db.slow_queries()) == 1
@@ -0,0 +1,185 @@
+"""Unit tests for the per-process collection registry.
+
+CouchDB database handles and DynamoDB Table handles are validated once
+and reused; a not-found error from an operation re-provisions the
+collection and retries.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List
+
+import couchdb
+import pytest
+from botocore.exceptions import ClientError
+
+from services.database_service import DEFAULT_COLLECTIONS
+from services.database_service.couchdb import CouchDBService
+from services.database_service.dynamodb import DynamoDBService
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+def _missing_table() -> ClientError:
+    return ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "GetItem")
+
+
+# --- DynamoDB -----------------------------------------------------------
+
+class FakeTable:
+    def __init__(self, name: str, resource: "FakeResource") -> None:
+        self.name = name
+        self._resource = resource
+
+    def load(self) -> None:
+        self._resource.loads.append(self.name)
+        if self.name not in self._resource.existing:
+            raise _missing_table()
+
+    def get_item(self, Key):
+        if self.name not in self._resource.existing:
+            raise _missing_table()
+        item = self._resource.items.get(Key["_id"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item):
+        if self.name not in self._resource.existing:
+            raise _missing_table()
+        self._resource.items[Item["_id"]] = Item
+
+
+class FakeResource:
+    def __init__(self, existing: List[str]) -> None:
+        self.existing = set(existing)
+        self.loads: List[str] = []
+        self.created: List[str] = []
+        self.items: Dict[str, Any] = {}
+
+    def Table(self, name: str) -> FakeTable:
+        return FakeTable(name, self)
+
+    def create_table(self, TableName, **kwargs):
+        self.created.append(TableName)
+        self.existing.add(TableName)
+        table = FakeTable(TableName, self)
+        waiter = type("W", (), {"wait": staticmethod(lambda **kw: None)})()
+        client = type("C", (), {"get_waiter": staticmethod(lambda name: waiter)})()
+        table.meta = type("M", (), {"client": client})()
+        return table
+
+
+def make_dynamo(existing: List[str]) -> DynamoDBService:
+    db = DynamoDBService.__new__(DynamoDBService)
+    db.dynamodb = FakeResource(existing)
+    db._tables = {}
+    db._tables_lock = threading.Lock()
+    db._indexes = {}
+    db._indexes_refresh_at = {}
+    return db
+
+
+def test_dynamodb_describes_each_table_once() -> None:
+    db = make_dynamo(["agents"])
+    db.save("agents", "a", {"v": 1})
+    db.get("agents", "a")
+    db.get("agents", "a")
+    assert db.dynamodb.loads == ["agents"]
+
+
+def test_dynamodb_provision_registers_and_creates() -> None:
+    db = make_dynamo(["agents"])
+    db.provision(["agents", "tickets"])
+    assert db.dynamodb.created == ["tickets"]
+    loads = list(db.dynamodb.loads)
+    db.save("tickets", "t", {"v": 1})
+    assert db.dynamodb.loads == loads
+
+
+def test_dynamodb_reprovisions_when_table_disappears() -> None:
+    db = make_dynamo(["agents"])
+    db.provision(["agents"])
+    db.dynamodb.existing.discard("agents")  # deleted out of band
+
+    db.save("agents", "a", {"v": 1})
+    assert db.dynamodb.created == ["agents"]
+    assert db.get("agents", "a")["v"] == 1
+
+
+# --- CouchDB ------------------------------------------------------------
+
+class FakeCouchDB:
+    def __init__(self, server: "FakeServer", name: str) -> None:
+        self._server = server
+        self.name = name
+
+    def save(self, doc):
+        if self.name not in self._server.dbs:
+            raise couchdb.http.ResourceNotFound(("not_found", "Database does not exist."))
+        self._server.dbs[self.name][doc["_id"]] = doc
+        return doc["_id"], "1-x"
+
+    def get(self, doc_id):
+        return self._server.dbs.get(self.name, {}).get(doc_id)
+
+
+class FakeServer:
+    def __init__(self, existing: List[str]) -> None:
+        self.dbs: Dict[str, Dict[str, Any]] = {name: {} for name in existing}
+        self.heads: List[str] = []
+        self.created: List[str] = []
+
+    def __getitem__(self, name: str) -> FakeCouchDB:
+        self.heads.append(name)
+        if name not in self.dbs:
+            raise couchdb.http.ResourceNotFound(("not_found", "Database does not exist."))
+        return FakeCouchDB(self, name)
+
+    def create(self, name: str) -> FakeCouchDB:
+        self.created.append(name)
+        self.dbs[name] = {}
+        return FakeCouchDB(self, name)
+
+
+def make_couch(existing: List[str]) -> CouchDBService:
+    db = CouchDBService.__new__(CouchDBService)
+    db.server = FakeServer(existing)
+    db._ensured_indexes = set()
+    db._dbs = {}
+    db._dbs_lock = threading.Lock()
+    return db
+
+
+def test_couchdb_heads_each_database_once() -> None:
+    db = make_couch(["agents"])
+    db.save("agents", "a", {"v": 1})
+    db.get("agents", "a")
+    db.get("agents", "a")
+    assert db.server.heads == ["agents"]
+
+
+def test_couchdb_reprovisions_when_database_disappears() -> None:
+    db = make_couch([])
+    db.provision(["agents"])
+    assert db.server.created == ["agents"]
+    del db.server.dbs["agents"]  # deleted out of band
+
+    db.save("agents", "a", {"v": 1})
+    assert db.server.created == ["agents", "agents"]
+    assert db.get("agents", "a")["v"] == 1
+
+
+def test_couchdb_missing_doc_is_not_mistaken_for_missing_db() -> None:
+    exc = couchdb.http.ResourceNotFound(("not_found", "missing"))
+    assert not CouchDBService._is_missing_db(exc)
+    assert CouchDBService._is_missing_db(
+        couchdb.http.ResourceNotFound(("not_found", "Database does not exist."))
+    )
+
+
+# --- default -------------------------------------------------------------
+
+def test_memory_provision_is_a_noop() -> None:
+    db = MemoryDBService()
+    db.provision(DEFAULT_COLLECTIONS)
+    assert db.list_all("agents") == []
@@ -0,0 +1,147 @@
+"""Unit tests for document expiry: stamping on save, purge_expired, the
+native TTL hooks and the purge job."""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import pytest
+
+from auth import UserInfo
+from services.database_service import (
+    EXPIRES_AT_FIELD,
+    CachingDatabaseService,
+    CachePolicy,
+    InstrumentedDatabaseService,
+    MemoryDBService,
+    RetentionPurger,
+    parse_retention_config,
+)
+from services.database_service.dynamodb import DynamoDBService
+from services.database_service.firestore import FirestoreDBService
+from services.database_service.sqlite import SqliteDBService
+from services.session_service import SessionService
+
+pytestmark = pytest.mark.unit
+
+
+def test_parse_retention_config() -> None:
+    assert parse_retention_config("tickets:86400, user_sessions ,bad:x,neg:-1,") == {
+        "tickets": 86400.0,
+        "user_sessions": None,
+    }
+    assert parse_retention_config(None) == {}
+
+
+def test_save_stamps_explicit_expiry_then_retention() -> None:
+    db = MemoryDBService()
+    db.configure_retention({"tickets": 60, "user_sessions": None})
+
+    db.save("user_sessions", "s", {"v": 1}, expires_at=datetime(2030, 1, 1))
+    assert db.get("user_sessions", "s")[EXPIRES_AT_FIELD] == int(
+        datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp()
+    )
+    db.save("user_sessions", "plain", {"v": 1})
+    assert EXPIRES_AT_FIELD not in db.get("user_sessions", "plain")
+
+    before = time.time()
+    db.save_many("tickets", [{"_id": "t1"}])
+    assert before + 59 <= db.get("tickets", "t1")[EXPIRES_AT_FIELD] <= time.time() + 61
+    db.save("agents", "a", {"v": 1})
+    assert EXPIRES_AT_FIELD not in db.get("agents", "a")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def purgeable(request, tmp_path):
+    db = SqliteDBService(str(tmp_path / "ttl.sqlite3")) if request.param == "sqlite" else MemoryDBService()
+    now = time.time()
+    db.save_many("tickets", [
+        {"_id": f"old{i}", EXPIRES_AT_FIELD: int(now) - 10} for i in range(7)
+    ] + [
+        {"_id": "fresh", EXPIRES_AT_FIELD: int(now) + 3600},
+        {"_id": "forever"},
+    ])
+    # Tickets are saved by key without an _id in the body.
+    db.save("tickets", "saved-old", {"status": "completed", EXPIRES_AT_FIELD: int(now) - 10})
+    yield db
+    if request.param == "sqlite":
+        db.close()
+
+
+def test_purge_expired_deletes_only_expired(purgeable, monkeypatch) -> None:
+    monkeypatch.setattr("services.database_service.base.PURGE_BATCH_SIZE", 3)
+    assert purgeable.purge_expired("tickets") == 8
+    assert sorted(d["_id"] for d in purgeable.list_all("tickets")) == ["forever", "fresh"]
+    assert purgeable.purge_expired("tickets") == 0
+
+
+@pytest.mark.asyncio
+async def test_purger_runs_once_and_skips_native_ttl() -> None:
+    db = MemoryDBService()
+    db.save("tickets", "old", {"_id": "old", EXPIRES_AT_FIELD: 1})
+    cached = CachingDatabaseService(InstrumentedDatabaseService(db), {"tickets": CachePolicy()})
+    assert cached.get("tickets", "old")
+
+    purger = RetentionPurger(lambda: cached, {"tickets": 60, "missing": None})
+    assert await purger.purge_once() == {"tickets": 1, "missing": 0}
+    # The wrapper dropped its cached copy along with the document.
+    with pytest.raises(Exception):
+        cached.get("tickets", "old")
+    assert cached.inner.query_stats()["tickets"]["purge_expired"]["docs"] == 1
+
+    class Native(MemoryDBService):
+        native_ttl = True
+
+        def purge_expired(self, db_name, now=None):
+            pytest.fail("purged a backend with native TTL")
+
+    assert await RetentionPurger(lambda: Native(), {"tickets": 60}).purge_once() == {}
+
+
+def test_firestore_stores_expiry_as_timestamp() -> None:
+    db = FirestoreDBService.__new__(FirestoreDBService)
+    db._retention = {}
+    doc = db._stamp_expiry("user_sessions", {}, 1_700_000_000)
+    assert doc[EXPIRES_AT_FIELD] == datetime.fromtimestamp(1_700_000_000, tz=timezone.utc)
+    assert db.native_ttl
+
+
+def test_dynamodb_enable_ttl_is_idempotent() -> None:
+    calls: List[Dict[str, Any]] = []
+
+    class Client:
+        status = "DISABLED"
+
+        def describe_time_to_live(self, TableName):
+            return {"TimeToLiveDescription": {"TimeToLiveStatus": self.status}}
+
+        def update_time_to_live(self, **kwargs):
+            calls.append(kwargs)
+            self.status = "ENABLING"
+
+    db = DynamoDBService.__new__(DynamoDBService)
+    db.client = Client()
+    db._get_or_create_table = lambda name: None  # type: ignore[assignment]
+    db.configure_retention({"tickets": 60})
+    db.enable_ttl("tickets")
+    assert calls == [{
+        "TableName": "tickets",
+        "TimeToLiveSpecification": {"Enabled": True, "AttributeName": EXPIRES_AT_FIELD},
+    }]
+    assert db._stamp_expiry("tickets", {})[EXPIRES_AT_FIELD] > time.time()
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_saved_with_their_expiry() -> None:
+    db = MemoryDBService()
+    db.configure_retention({"user_sessions": None})
+    service = SessionService(db)
+    session = await service.create_from_login(
+        UserInfo(provider_type="github", external_id="octo", display_name="Octo"), [], False,
+    )
+    stored = db.get("user_sessions", session.id)
+    expires = session.expires_at.replace(tzinfo=timezone.utc)
+    assert stored[EXPIRES_AT_FIELD] == int(expires.timestamp())
+    assert expires > datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert (await service.get_by_id(session.id)).id == session.id
@@ -0,0 +1,150 @@
+"""Unit tests for segmented parallel list_all."""
+from __future__ import annotations
+
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from services.database_service import CouchDBService, MemoryDBService
+from services.database_service.dynamodb import DynamoDBService
+from services.database_service.firestore import FirestoreDBService
+from services.database_service.scans import merge_segments
+
+pytestmark = pytest.mark.unit
+
+
+def test_merge_segments_reads_concurrently() -> None:
+    # Every reader waits for the others, so this only finishes if all
+    # segments run at the same time.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def reader(n: int):
+        def _read():
+            barrier.wait()
+            yield [{"_id": f"{n}-a"}]
+            yield [{"_id": f"{n}-b"}]
+        return _read
+
+    docs = list(merge_segments([reader(n) for n in range(3)], 3))
+    assert sorted(d["_id"] for d in docs) == sorted(f"{n}-{x}" for n in range(3) for x in "ab")
+
+
+def test_merge_segments_raises_errors_and_stops_early() -> None:
+    def broken():
+        yield [{"_id": "ok"}]
+        raise RuntimeError("segment failed")
+
+    with pytest.raises(RuntimeError, match="segment failed"):
+        list(merge_segments([broken, lambda: iter([[{"_id": "x"}]])], 2))
+
+    pages_read: List[int] = []
+
+    def endless():
+        n = 0
+        while True:
+            pages_read.append(n)
+            n += 1
+            yield [{"_id": str(n)}]
+
+    stream = merge_segments([endless, endless], 2)
+    assert next(stream)
+    stream.close()
+    read = len(pages_read)
+    threading.Event().wait(0.3)
+    assert len(pages_read) <= read + 2
+
+
+def test_memory_list_all_iter_falls_back_to_list_all() -> None:
+    db = MemoryDBService()
+    db.save_many("t", [{"_id": "a"}, {"_id": "b"}])
+    assert [d["_id"] for d in db.list_all_iter("t", parallelism=4)] == ["a", "b"]
+
+
+def test_dynamodb_parallel_scan_uses_segments() -> None:
+    calls: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    class Table:
+        def scan(self, **kwargs):
+            with lock:
+                calls.append(dict(kwargs))
+            segment = kwargs.get("Segment", 0)
+            if "ExclusiveStartKey" not in kwargs:
+                return {"Items": [{"_id": f"{segment}-1"}], "LastEvaluatedKey": {"_id": "k"}}
+            return {"Items": [{"_id": f"{segment}-2"}]}
+
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._get_or_create_table = lambda name: Table()  # type: ignore[assignment]
+    assert [d["_id"] for d in db.list_all("t")] == ["0-1", "0-2"]
+    assert "Segment" not in calls[0]
+
+    calls.clear()
+    db.scan_parallelism = 3
+    assert sorted(d["_id"] for d in db.list_all("t")) == sorted(
+        f"{s}-{n}" for s in range(3) for n in (1, 2)
+    )
+    assert sorted(c["Segment"] for c in calls) == [0, 0, 1, 1, 2, 2]
+    assert all(c["TotalSegments"] == 3 for c in calls)
+
+
+def test_couchdb_scans_all_docs_key_ranges(monkeypatch) -> None:
+    monkeypatch.setattr("services.database_service.couchdb.SCAN_PAGE_SIZE", 4)
+    ids = [f"doc{i:03d}" for i in range(30)]
+    requests: List[Dict[str, Any]] = []
+
+    class FakeDB:
+        def view(self, name, **options):
+            assert name == "_all_docs"
+            requests.append(options)
+            keys = [
+                k for k in ids
+                if ("startkey" not in options or k >= options["startkey"])
+                and ("endkey" not in options or k < options["endkey"])
+            ][options.get("skip", 0):][:options["limit"]]
+            rows = [SimpleNamespace(id=k, doc={"_id": k}) for k in keys]
+            return SimpleNamespace(total_rows=len(ids)) if options["limit"] == 0 else rows
+
+    db = CouchDBService.__new__(CouchDBService)
+    db._dbs = {"t": FakeDB()}
+    db._dbs_lock = threading.Lock()
+    db._ensured_indexes = set()
+
+    assert [d["_id"] for d in db.list_all("t")] == ids
+
+    requests.clear()
+    assert sorted(d["_id"] for d in db.list_all_iter("t", parallelism=3)) == ids
+    ranges = {(r.get("startkey"), r.get("endkey")) for r in requests if r.get("include_docs") and "skip" not in r}
+    assert ranges == {(None, "doc010"), ("doc010", "doc020"), ("doc020", None)}
+
+
+def test_firestore_parallel_scan_uses_partitions() -> None:
+    class Snapshot:
+        def __init__(self, doc_id):
+            self.id = doc_id
+
+        def to_dict(self):
+            return {"v": self.id}
+
+    class Query:
+        def __init__(self, ids):
+            self.ids = ids
+
+        def stream(self):
+            return iter(Snapshot(i) for i in self.ids)
+
+    asked: List[int] = []
+
+    class Group:
+        def get_partitions(self, count):
+            asked.append(count)
+            return iter([SimpleNamespace(query=lambda: Query(["a", "b"])),
+                         SimpleNamespace(query=lambda: Query(["c"]))])
+
+    db = FirestoreDBService.__new__(FirestoreDBService)
+    db.db = SimpleNamespace(collection=lambda name: Query(["a", "b", "c"]),
+                            collection_group=lambda name: Group())
+    assert db.list_all("t") == [{"v": i, "_id": i} for i in "abc"]
+    assert sorted(d["_id"] for d in db.list_all_iter("t", parallelism=4)) == ["a", "b", "c"]
+    assert asked == [4]
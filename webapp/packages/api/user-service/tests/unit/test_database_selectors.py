@@ -0,0 +1,206 @@
+"""Unit tests for selector operators, sort and limit across backends."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from services.audit_service import AuditService
+from services.data_store_service import DataStoreService
+from services.database_service.couchdb import CouchDBService
+from services.database_service.dynamodb import DynamoDBService
+from services.database_service.firestore import FirestoreDBService
+from services.database_service.memory import MemoryDBService
+from services.database_service.selectors import PREFIX_UPPER_BOUND, matches, prefix_upper_bound
+
+pytestmark = pytest.mark.unit
+
+
+# --- reference semantics ------------------------------------------------
+
+def test_matches_operators() -> None:
+    doc = {"key": "file:a.py", "n": 5, "status": "queued"}
+    assert matches(doc, {"key": {"$prefix": "file:"}})
+    assert not matches(doc, {"key": {"$prefix": "cache:"}})
+    assert matches(doc, {"n": {"$gte": 5, "$lt": 6}})
+    assert not matches(doc, {"n": {"$gt": 5}})
+    assert matches(doc, {"status": {"$in": ["queued", "running"]}})
+    assert not matches(doc, {"missing": {"$gt": 0}})
+    assert not matches(doc, {"key": {"$gt": 3}})  # mismatched types never match
+    assert matches(doc, {"n": 5, "status": "queued"})
+
+
+def test_prefix_upper_bound() -> None:
+    assert prefix_upper_bound("file:") == "file;"
+    assert prefix_upper_bound("a\U0010ffff") == "b"
+    assert prefix_upper_bound(chr(0xD7FF)) == chr(0xE000)
+    assert prefix_upper_bound("") is None
+    # Everything that starts with the prefix sorts below the bound,
+    # including characters past U+FFF0.
+    assert "file:\U0001f600" < prefix_upper_bound("file:")
+
+
+def test_unknown_operator_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        matches({"n": 1}, {"n": {"$regex": "1"}})
+
+
+def test_memory_find_sorts_before_limit_and_projects() -> None:
+    db = MemoryDBService()
+    for i, ts in enumerate(["2024-01-03", "2024-01-01", "2024-01-04", "2024-01-02"]):
+        db.save("t", f"d{i}", {"_id": f"d{i}", "actor": "a", "ts": ts})
+    db.save("t", "other", {"_id": "other", "actor": "b", "ts": "2024-12-31"})
+    out = db.find("t", {"actor": "a"}, fields=["ts"], limit=2, sort=[{"ts": "desc"}])
+    assert out == [{"ts": "2024-01-04"}, {"ts": "2024-01-03"}]
+
+
+def test_list_keys_pushes_prefix_into_selector() -> None:
+    db = MemoryDBService()
+    store = DataStoreService(db)
+    store.set_many("u", [("ns", k, 1, None) for k in ["file:b", "file:a", "cache:x"]])
+    calls: List[Dict[str, Any]] = []
+    find = db.find
+    db.find = lambda name, selector, *a, **kw: calls.append(selector) or find(name, selector, *a, **kw)  # type: ignore[assignment]
+    assert store.list_keys("u", "ns", prefix="file:") == ["file:a", "file:b"]
+    assert calls[-1]["key"] == {"$prefix": "file:"}
+    assert asyncio.run(store.alist_keys("u", "ns", prefix="cache:")) == ["cache:x"]
+
+
+def test_audit_list_for_actor_returns_newest_first() -> None:
+    db = MemoryDBService()
+    svc = AuditService(db)
+    for i in range(5):
+        db.save("site_admin_audit", f"e{i}", {
+            "_id": f"e{i}", "actorUid": "admin", "route": "/r", "method": "GET",
+            "ts": f"2024-01-0{i + 1}T00:00:00",
+        })
+    entries = asyncio.run(svc.list_for_actor("admin", limit=2))
+    assert [e.id for e in entries] == ["e4", "e3"]
+
+
+# --- CouchDB ------------------------------------------------------------
+
+def test_couchdb_mango_translation() -> None:
+    query = CouchDBService._mango_query(
+        {"userId": "u", "key": {"$prefix": "file:"}, "n": {"$in": [1, 2]}},
+        fields=["key"], limit=10,
+    )
+    assert query["selector"] == {
+        "userId": "u",
+        "key": {"$gte": "file:", "$lt": "file:" + PREFIX_UPPER_BOUND},
+        "n": {"$in": [1, 2]},
+    }
+    assert "sort" not in query
+
+
+def test_couchdb_sort_drops_pinned_fields_and_requires_sort_field() -> None:
+    query = CouchDBService._mango_query(
+        {"actorUid": "a"}, None, 5, sort=[{"actorUid": "asc"}, {"ts": "desc"}],
+    )
+    assert query["sort"] == [{"ts": "desc"}]
+    assert query["selector"] == {"actorUid": "a", "ts": {"$exists": True}}
+
+
+# --- DynamoDB -----------------------------------------------------------
+
+class RecordingTable:
+    def __init__(self, items: List[Dict[str, Any]]) -> None:
+        self.items = items
+        self.queries: List[Dict[str, Any]] = []
+        self.scans: List[Dict[str, Any]] = []
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        return {"Items": list(self.items)}
+
+    def scan(self, **kwargs):
+        self.scans.append(kwargs)
+        return {"Items": list(self.items)}
+
+
+def make_dynamo(indexes: Dict[str, tuple], items: List[Dict[str, Any]]):
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._indexes = {"t": indexes}
+    db._indexes_refresh_at = {}
+    table = RecordingTable(items)
+    db._get_or_create_table = lambda name: table  # type: ignore[assignment]
+    return db, table
+
+
+def test_dynamodb_prefix_on_range_key_is_a_key_condition() -> None:
+    db, table = make_dynamo({"user-key": ("userId", "key")}, [])
+    assert db._pick_index("t", {"userId": "u", "key": {"$prefix": "f"}}) == ("user-key", "userId", "key")
+    db.find("t", {"userId": "u", "key": {"$prefix": "f"}})
+    (query,) = table.queries
+    key_expr = query["KeyConditionExpression"].get_expression()
+    assert key_expr["operator"] == "AND"
+    assert key_expr["values"][1].get_expression()["operator"] == "begins_with"
+    assert "FilterExpression" not in query
+
+
+def test_dynamodb_between_and_filter_operators() -> None:
+    cond = DynamoDBService._key_condition("ts", {"$gte": "a", "$lte": "b"})
+    assert cond.get_expression()["operator"] == "BETWEEN"
+    assert DynamoDBService._key_condition("ts", {"$gt": "a", "$lt": "b"}) is None
+    assert DynamoDBService._key_condition("ts", {"$in": ["a"]}) is None
+    expr = DynamoDBService._filter_expression({"status": {"$in": ["a", "b"]}})
+    assert expr.get_expression()["operator"] == "IN"
+
+
+def test_dynamodb_sort_on_range_key_uses_scan_index_forward() -> None:
+    db, table = make_dynamo({"actor-ts": ("actorUid", "ts")}, [{"_id": "x"}])
+    db.find("t", {"actorUid": "a"}, limit=3, sort=[{"ts": "desc"}])
+    (query,) = table.queries
+    assert query["IndexName"] == "actor-ts"
+    assert query["ScanIndexForward"] is False
+    assert query["Limit"] == 3
+
+
+def test_dynamodb_other_sorts_are_applied_after_reading_all() -> None:
+    items = [{"_id": "a", "n": "2"}, {"_id": "b", "n": "3"}, {"_id": "c", "n": "1"}]
+    db, table = make_dynamo({}, items)
+    out = db.find("t", {}, fields=["_id"], limit=2, sort=[{"n": "desc"}])
+    assert out == [{"_id": "b"}, {"_id": "a"}]
+    (scan,) = table.scans
+    assert "Limit" not in scan
+    assert set(scan["ExpressionAttributeNames"].values()) == {"_id", "n"}
+
+
+# --- Firestore ----------------------------------------------------------
+
+class QueryRecorder:
+    def __init__(self) -> None:
+        self.ops: List[tuple] = []
+
+    def where(self, field, op, value):
+        self.ops.append(("where", field, op, value))
+        return self
+
+    def order_by(self, field, direction="ASCENDING"):
+        self.ops.append(("order_by", field, direction))
+        return self
+
+    def select(self, fields):
+        self.ops.append(("select", tuple(fields)))
+        return self
+
+    def limit(self, n):
+        self.ops.append(("limit", n))
+        return self
+
+
+def test_firestore_build_query_translates_operators_and_sort() -> None:
+    query = FirestoreDBService._build_query(
+        QueryRecorder(),
+        {"userId": "u", "key": {"$prefix": "f"}, "n": {"$in": (1, 2)}},
+        None, 20, sort=[{"userId": "asc"}, {"key": "desc"}],
+    )
+    assert query.ops == [
+        ("where", "userId", "==", "u"),
+        ("where", "key", ">=", "f"),
+        ("where", "key", "<", "g"),
+        ("where", "n", "in", [1, 2]),
+        ("order_by", "key", "DESCENDING"),
+        ("limit", 20),
+    ]
@@ -1,7 +1,7 @@
 """Unit tests for dependencies utilities."""
 from __future__ import annotations
 
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from fastapi import HTTPException
@@ -152,10 +152,10 @@ async def test_process_chat_gofannon_flow(monkeypatch):
     ticket_saves = []
     db_service = Mock()
 
-    def save(collection, key, data):
+    async def asave(collection, key, data):
         ticket_saves.append((collection, key, data))
 
-    def get(collection, key):
+    async def aget(collection, key):
         if collection == "deployments":
             return {"agentId": "agent-1"}
         if collection == "agents":
@@ -169,8 +169,8 @@ async def test_process_chat_gofannon_flow(monkeypatch):
             return ticket_saves[-1][2]
         raise KeyError(f"Unexpected collection {collection}")
 
-    db_service.save.side_effect = save
-    db_service.get.side_effect = get
+    db_service.asave = AsyncMock(side_effect=asave)
+    db_service.aget = AsyncMock(side_effect=aget)
 
     fake_user_service = Mock()
 
@@ -205,6 +205,9 @@ async def test_process_chat_gofannon_flow(monkeypatch):
     assert ticket_saves[-1][2]["status"] == "completed"
     assert ticket_saves[-1][2]["result"]["content"] == "agent:hello"
     assert ticket_saves[-1][2]["result"]["model"] == "gofannon/agent-friendly"
+    # The chat worker runs on the event loop, so it must not block on sync DB calls.
+    db_service.get.assert_not_called()
+    db_service.save.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -213,11 +216,11 @@ async def test_process_chat_non_gofannon_flow(monkeypatch):
     ticket_saves = []
     db_service = Mock()
 
-    def save(collection, key, data):
+    async def asave(collection, key, data):
         ticket_saves.append((collection, key, data))
 
-    db_service.save.side_effect = save
-    db_service.get = Mock()
+    db_service.asave = AsyncMock(side_effect=asave)
+    db_service.aget = AsyncMock()
 
     fake_user_service = Mock()
 
@@ -256,6 +259,9 @@ async def test_process_chat_non_gofannon_flow(monkeypatch):
     assert ticket_saves[-1][2]["status"] == "completed"
     assert ticket_saves[-1][2]["result"]["content"] == "llm response"
     assert ticket_saves[-1][2]["result"]["model"] == "openai/gpt-4o-mini"
+    # The chat worker runs on the event loop, so it must not block on sync DB calls.
+    db_service.get.assert_not_called()
+    db_service.save.assert_not_called()
 
 
 class TestGetAvailableProviders:
@@ -0,0 +1,275 @@
+"""Unit tests for the DynamoDB bulk APIs (BatchGetItem / BatchWriteItem).
+
+A fake low-level client stands in for boto3 so chunking, concurrency
+and the UnprocessedItems / UnprocessedKeys retry loop can be checked
+without a DynamoDB endpoint.  Real round trips are covered by
+tests/integration/test_dynamodb.py.
+"""
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import pytest
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from services.database_service import dynamodb as dynamodb_module
+from services.database_service.dynamodb import DynamoDBService
+
+pytestmark = pytest.mark.unit
+
+_de = TypeDeserializer()
+
+
+class FakeClient:
+    """Stores items in a dict; can withhold items/keys on the first N calls."""
+
+    def __init__(self, unprocessed_rounds: int = 0) -> None:
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.write_batches: List[int] = []
+        self.get_batches: List[int] = []
+        self.unprocessed_rounds = unprocessed_rounds
+        self._lock = threading.Lock()
+
+    def _withhold(self) -> bool:
+        with self._lock:
+            if self.unprocessed_rounds > 0:
+                self.unprocessed_rounds -= 1
+                return True
+            return False
+
+    def batch_write_item(self, RequestItems):
+        (table, requests), = RequestItems.items()
+        assert len(requests) <= 25
+        with self._lock:
+            self.write_batches.append(len(requests))
+        if self._withhold() and len(requests) > 1:
+            done, left = requests[:1], requests[1:]
+        else:
+            done, left = requests, []
+        for request in done:
+            if "PutRequest" in request:
+                item = request["PutRequest"]["Item"]
+                self.items[item["_id"]["S"]] = item
+            else:
+                self.items.pop(request["DeleteRequest"]["Key"]["_id"]["S"], None)
+        return {"UnprocessedItems": {table: left} if left else {}}
+
+    def batch_get_item(self, RequestItems):
+        (table, request), = RequestItems.items()
+        keys = request["Keys"]
+        assert len(keys) <= 100
+        assert len({k["_id"]["S"] for k in keys}) == len(keys)
+        with self._lock:
+            self.get_batches.append(len(keys))
+        if self._withhold() and len(keys) > 1:
+            keys, left = keys[:1], keys[1:]
+        else:
+            left = []
+        found = [self.items[k["_id"]["S"]] for k in keys if k["_id"]["S"] in self.items]
+        response: Dict[str, Any] = {"Responses": {table: found}}
+        if left:
+            response["UnprocessedKeys"] = {table: {"Keys": left}}
+        return response
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(dynamodb_module.time, "sleep", lambda _s: None)
+
+
+def make_db(client: FakeClient) -> DynamoDBService:
+    db = DynamoDBService.__new__(DynamoDBService)
+    db.client = client
+    db._get_or_create_table = lambda name: None  # type: ignore[assignment]
+    return db
+
+
+def test_save_many_chunks_by_25_and_converts_floats() -> None:
+    client = FakeClient()
+    db = make_db(client)
+    docs = [{"_id": f"d{i}", "score": 1.5} for i in range(60)]
+    results = db.save_many("t", docs)
+    assert [r["ok"] for r in results] == [True] * 60
+    assert sorted(client.write_batches) == [10, 25, 25]
+    assert _de.deserialize(client.items["d7"]["score"]) == Decimal("1.5")
+
+
+def test_save_many_retries_unprocessed_items() -> None:
+    client = FakeClient(unprocessed_rounds=3)
+    db = make_db(client)
+    results = db.save_many("t", [{"_id": f"d{i}"} for i in range(5)])
+    assert all(r["ok"] for r in results)
+    assert len(client.items) == 5
+    assert len(client.write_batches) == 4
+
+
+def test_save_many_reports_items_left_after_retries(monkeypatch) -> None:
+    monkeypatch.setattr(dynamodb_module, "BATCH_MAX_RETRIES", 1)
+    client = FakeClient(unprocessed_rounds=100)
+    db = make_db(client)
+    results = db.save_many("t", [{"_id": "a"}, {"_id": "b"}, {"_id": "c"}])
+    assert results[0] == {"ok": True, "id": "a", "rev": "dynamodb-rev"}
+    assert results[1]["ok"] is True
+    assert results[2] == {"ok": False, "id": "c", "error": "unprocessed"}
+
+
+def test_save_many_missing_id_and_duplicates() -> None:
+    client = FakeClient()
+    db = make_db(client)
+    results = db.save_many("t", [{"_id": "a", "v": 1}, {"v": 2}, {"_id": "a", "v": 3}])
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert results[1]["error"] == "missing _id"
+    assert client.write_batches == [1]
+    assert _de.deserialize(client.items["a"]["v"]) == 3
+
+
+def test_save_many_chunk_client_error_fails_only_that_chunk() -> None:
+    client = FakeClient()
+    original = client.batch_write_item
+
+    def flaky(RequestItems):
+        (_, requests), = RequestItems.items()
+        if any(r["PutRequest"]["Item"]["_id"]["S"] == "bad" for r in requests):
+            raise ClientError({"Error": {"Code": "ValidationException"}}, "BatchWriteItem")
+        return original(RequestItems)
+
+    client.batch_write_item = flaky  # type: ignore[assignment]
+    db = make_db(client)
+    docs = [{"_id": "bad"}] + [{"_id": f"d{i}"} for i in range(30)]
+    results = db.save_many("t", docs)
+    failed = [r["id"] for r in results if not r["ok"]]
+    assert "bad" in failed and len(failed) == 25
+    assert results[-1]["ok"] is True
+
+
+def test_delete_many_is_idempotent() -> None:
+    client = FakeClient()
+    db = make_db(client)
+    db.save_many("t", [{"_id": "a"}, {"_id": "b"}])
+    results = db.delete_many("t", ["a", "missing"])
+    assert results == [{"ok": True, "id": "a"}, {"ok": True, "id": "missing"}]
+    assert set(client.items) == {"b"}
+
+
+def test_get_many_chunks_dedupes_and_preserves_order() -> None:
+    client = FakeClient()
+    db = make_db(client)
+    db.save_many("t", [{"_id": f"d{i}", "n": i} for i in range(150)])
+    ids = ["d149", "nope", "d0", "d0"] + [f"d{i}" for i in range(1, 120)]
+    out = db.get_many("t", ids)
+    assert list(out)[:3] == ["d149", "nope", "d0"]
+    assert out["nope"] is None
+    assert out["d149"]["n"] == 149
+    assert sorted(client.get_batches) == [22, 100]
+
+
+def test_get_many_retries_unprocessed_keys() -> None:
+    client = FakeClient()
+    db = make_db(client)
+    db.save_many("t", [{"_id": k} for k in "abc"])
+    client.unprocessed_rounds = 2
+    out = db.get_many("t", ["a", "b", "c"])
+    assert all(out[k] == {"_id": k} for k in "abc")
+    assert client.get_batches == [3, 2, 1]
+
+
+# --- Packed attributes -------------------------------------------------------
+
+BIG_VALUE = {"source": "x = 1\n" * 400, "scores": [0.5, 1.25], "nested": {"ok": True}}
+
+
+def test_parse_packed_fields() -> None:
+    assert dynamodb_module.parse_packed_fields("agent_data_store:value|meta, t:_id,bad") == {
+        "agent_data_store": frozenset({"value", "meta"}),
+    }
+
+
+def test_packed_fields_are_one_compressed_binary_attribute() -> None:
+    client = FakeClient()
+    db = make_db(client)
+    db._packed_fields = {"t": frozenset({"value"})}
+    db.save_many("t", [
+        {"_id": "big", "userId": "u", "value": BIG_VALUE},
+        {"_id": "small", "userId": "u", "value": [1.5, "a"]},
+    ])
+    stored = client.items["big"]
+    assert set(stored["value"]) == {"B"} and stored["userId"] == {"S": "u"}
+    assert stored["value"]["B"][:1] == dynamodb_module.PACK_ZLIB
+    assert len(stored["value"]["B"]) < len("x = 1\n" * 400) / 10
+    assert client.items["small"]["value"]["B"][:1] == dynamodb_module.PACK_JSON
+
+    out = db.get_many("t", ["big", "small"])
+    assert out["big"]["value"] == BIG_VALUE
+    assert out["small"]["value"] == [1.5, "a"]
+    assert isinstance(out["small"]["value"][0], float)
+
+
+def test_packed_fields_read_legacy_items_and_filter_in_python() -> None:
+    class Table:
+        def __init__(self) -> None:
+            self.items: Dict[str, Dict[str, Any]] = {}
+
+        def put_item(self, Item):
+            self.items[Item["_id"]] = Item
+
+        def get_item(self, Key):
+            return {"Item": self.items[Key["_id"]]} if Key["_id"] in self.items else {}
+
+        def scan(self, **kwargs):
+            assert "FilterExpression" not in kwargs
+            return {"Items": list(self.items.values())}
+
+    table = Table()
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._packed_fields = {"t": frozenset({"value"})}
+    db._get_or_create_table = lambda name: table  # type: ignore[assignment]
+
+    db.save("t", "new", {"value": {"k": 2.5}})
+    assert isinstance(table.items["new"]["value"], bytes)
+    table.items["old"] = {"_id": "old", "value": {"k": Decimal("1")}}
+    assert db.get("t", "new")["value"] == {"k": 2.5}
+    assert db.get("t", "old")["value"] == {"k": Decimal("1")}
+    assert [d["_id"] for d in db.find("t", {"value": {"k": 2.5}})] == ["new"]
+
+
+def test_packed_fields_are_decoded_only_when_read(monkeypatch) -> None:
+    class Table:
+        def __init__(self, items) -> None:
+            self.items = items
+
+        def scan(self, **kwargs):
+            names = kwargs.get("ExpressionAttributeNames")
+            if names is None:
+                return {"Items": list(self.items)}
+            return {"Items": [{k: v for k, v in item.items() if k in names.values()} for item in self.items]}
+
+    pack = dynamodb_module.pack_value
+    table = Table([
+        {"_id": f"d{i}", "tag": pack(f"t{i % 2}"), "value": pack({"n": i})} for i in range(4)
+    ])
+    db = DynamoDBService.__new__(DynamoDBService)
+    db._packed_fields = {"t": frozenset({"tag", "value"})}
+    db._get_or_create_table = lambda name: table  # type: ignore[assignment]
+    decoded: List[Any] = []
+    unpack = dynamodb_module.unpack_value
+    monkeypatch.setattr(dynamodb_module, "unpack_value", lambda data: decoded.append(data) or unpack(data))
+
+    assert db.count("t", {"tag": "t1"}) == 2
+    assert len(decoded) == 4  # tag only, never value
+
+    decoded.clear()
+    assert db.find("t", {"tag": "t1"}, sort=[{"_id": "desc"}]) == [
+        {"_id": "d3", "tag": "t1", "value": {"n": 3}},
+        {"_id": "d1", "tag": "t1", "value": {"n": 1}},
+    ]
+    assert len(decoded) == 6  # every tag, value for the two matches
+
+    page, cursor = db.find_page("t", {"tag": "t0"}, fields=["value"], page_size=1)
+    assert page == [{"_id": "d0", "value": {"n": 0}}]
+    assert db.find_page("t", {"tag": "t0"}, fields=["value"], cursor=cursor) == (
+        [{"_id": "d2", "value": {"n": 2}}], None
+    )
+    assert db._from_item("t", {"_id": "x", "tag": pack("a"), "value": pack(1)}, ["tag"])["value"] == pack(1)
@@ -0,0 +1,225 @@
+"""Unit tests for DynamoDB GSI management and the Query path in find."""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import pytest
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from botocore.exceptions import ClientError
+
+from services.database_service import dynamodb as dynamodb_module
+from services.database_service.dynamodb import DynamoDBService
+
+pytestmark = pytest.mark.unit
+
+
+class FakeClient:
+    """describe_table / update_table against an in-memory GSI list."""
+
+    def __init__(self, gsis: List[Dict[str, Any]] = None, polls_until_active: int = 0) -> None:
+        self.gsis = gsis or []
+        self.updates: List[Dict[str, Any]] = []
+        self.describes = 0
+        self.polls_until_active = polls_until_active
+
+    def describe_table(self, TableName):
+        self.describes += 1
+        if self.polls_until_active > 0:
+            self.polls_until_active -= 1
+        else:
+            for gsi in self.gsis:
+                gsi["IndexStatus"] = "ACTIVE"
+        return {"Table": {
+            "TableName": TableName,
+            "GlobalSecondaryIndexes": self.gsis,
+            "BillingModeSummary": {"BillingMode": "PAY_PER_REQUEST"},
+        }}
+
+    def update_table(self, **kwargs):
+        self.updates.append(kwargs)
+        create = kwargs["GlobalSecondaryIndexUpdates"][0]["Create"]
+        self.gsis.append({
+            "IndexName": create["IndexName"],
+            "KeySchema": create["KeySchema"],
+            "IndexStatus": "CREATING",
+        })
+
+
+class FakeTable:
+    def __init__(self, items: List[Dict[str, Any]]) -> None:
+        self.items = items
+        self.queries: List[Dict[str, Any]] = []
+        self.scans: List[Dict[str, Any]] = []
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        return {"Items": list(self.items)}
+
+    def scan(self, **kwargs):
+        self.scans.append(kwargs)
+        return {"Items": list(self.items)}
+
+
+def _gsi(name: str, hash_key: str, range_key: str = None, status: str = "ACTIVE") -> Dict[str, Any]:
+    keys = [{"AttributeName": hash_key, "KeyType": "HASH"}]
+    if range_key:
+        keys.append({"AttributeName": range_key, "KeyType": "RANGE"})
+    return {"IndexName": name, "KeySchema": keys, "IndexStatus": status}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(dynamodb_module.time, "sleep", lambda _s: None)
+
+
+def make_db(client: FakeClient, items: List[Dict[str, Any]] = None):
+    db = DynamoDBService.__new__(DynamoDBService)
+    db.client = client
+    db._indexes = {}
+    db._indexes_refresh_at = {}
+    db._index_requests = {}
+    table = FakeTable(items or [])
+    db._get_or_create_table = lambda name: table  # type: ignore[assignment]
+    return db, table
+
+
+# --- index selection ----------------------------------------------------
+
+def test_pick_index_prefers_index_matching_both_keys() -> None:
+    client = FakeClient([_gsi("by-user", "userId"), _gsi("user-ns", "userId", "namespace")])
+    db, _ = make_db(client)
+    assert db._pick_index("t", {"userId": "u", "namespace": "n"}) == ("user-ns", "userId", "namespace")
+    assert db._pick_index("t", {"userId": "u"})[0] in {"by-user", "user-ns"}
+    assert db._pick_index("t", {"_id": "doc-1"}) == (None, "_id", None)
+    assert db._pick_index("t", {"status": "x"}) is None
+
+
+def test_pick_index_ignores_non_string_values_and_pending_indexes() -> None:
+    client = FakeClient([_gsi("by-user", "userId"), _gsi("by-owner", "owner", status="CREATING")],
+                        polls_until_active=1)
+    db, _ = make_db(client)
+    assert db._pick_index("t", {"userId": 7}) is None
+    assert db._pick_index("t", {"owner": "o"}) is None
+
+
+# --- find ---------------------------------------------------------------
+
+def test_find_queries_gsi_and_filters_remaining_fields() -> None:
+    client = FakeClient([_gsi("user-namespace-index", "userId", "namespace")])
+    db, table = make_db(client, [{"_id": "a", "userId": "u", "namespace": "n", "key": "k"}])
+    out = db.find("t", {"userId": "u", "namespace": "n", "key": "k"}, fields=["key"], limit=5)
+    assert out == [{"_id": "a", "userId": "u", "namespace": "n", "key": "k"}]
+    assert table.scans == []
+    (query,) = table.queries
+    assert query["IndexName"] == "user-namespace-index"
+    assert "FilterExpression" in query
+    assert "ProjectionExpression" in query
+    assert query["Limit"] == 5
+
+
+def test_find_without_matching_index_scans() -> None:
+    db, table = make_db(FakeClient())
+    db.find("t", {"status": "pending"})
+    assert table.queries == []
+    assert len(table.scans) == 1
+
+
+def test_find_falls_back_to_scan_when_query_errors() -> None:
+    client = FakeClient([_gsi("by-user", "userId")])
+    db, table = make_db(client, [{"_id": "a", "userId": "u"}])
+
+    def failing_query(**kwargs):
+        raise ClientError({"Error": {"Code": "ValidationException"}}, "Query")
+
+    table.query = failing_query  # type: ignore[assignment]
+    assert db.find("t", {"userId": "u"}) == [{"_id": "a", "userId": "u"}]
+    assert len(table.scans) == 1
+
+
+# --- ensure_index -------------------------------------------------------
+
+def test_ensure_index_creates_gsi_without_waiting(monkeypatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(dynamodb_module.time, "monotonic", lambda: now[0])
+    client = FakeClient(polls_until_active=3)
+    db, table = make_db(client, [{"_id": "a", "userId": "u", "namespace": "n"}])
+    db.ensure_index("t", ["userId", "namespace"], index_name="user-namespace-index")
+
+    (update,) = client.updates
+    create = update["GlobalSecondaryIndexUpdates"][0]["Create"]
+    assert create["IndexName"] == "user-namespace-index"
+    assert [k["KeyType"] for k in create["KeySchema"]] == ["HASH", "RANGE"]
+    assert "ProvisionedThroughput" not in create
+    assert client.describes == 2  # one before the create, none waiting on it
+
+    # Requested: repeat calls make no further describe/update calls.
+    describes = client.describes
+    db.ensure_index("t", ["userId", "namespace"], index_name="user-namespace-index")
+    assert client.describes == describes
+    assert len(client.updates) == 1
+
+    # find scans while the index backfills, then queries it once ACTIVE.
+    db.find("t", {"userId": "u", "namespace": "n"})
+    assert table.queries == [] and len(table.scans) == 1
+    now[0] += dynamodb_module.INDEX_REFRESH_SECONDS + 1
+    db.find("t", {"userId": "u", "namespace": "n"})
+    assert table.queries == [] and len(table.scans) == 2
+    now[0] += dynamodb_module.INDEX_REFRESH_SECONDS + 1
+    db.find("t", {"userId": "u", "namespace": "n"})
+    assert table.queries[0]["IndexName"] == "user-namespace-index"
+    assert db._indexes["t"] == {"user-namespace-index": ("userId", "namespace")}
+
+
+def test_ensure_index_retries_a_create_refused_while_another_builds(monkeypatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(dynamodb_module.time, "monotonic", lambda: now[0])
+    client = FakeClient(polls_until_active=100)
+    refuse = [True]
+    update_table = client.update_table
+
+    def limited(**kwargs):
+        if refuse[0]:
+            raise ClientError({"Error": {"Code": "LimitExceededException"}}, "UpdateTable")
+        return update_table(**kwargs)
+
+    client.update_table = limited  # type: ignore[assignment]
+    db, _ = make_db(client)
+    db.ensure_index("t", ["keyScope", "key"], index_name="scope-key-index")
+    db.ensure_index("t", ["keyScope", "key"], index_name="scope-key-index")
+    assert client.updates == []
+
+    refuse[0] = False
+    now[0] += dynamodb_module.INDEX_REFRESH_SECONDS + 1
+    db.ensure_index("t", ["keyScope", "key"], index_name="scope-key-index")
+    assert len(client.updates) == 1
+
+
+def test_ensure_index_reuses_existing_gsi() -> None:
+    client = FakeClient([_gsi("user-namespace-index", "userId", "namespace")])
+    db, _ = make_db(client)
+    db.ensure_index("t", ["userId", "namespace"], index_name="user-namespace-index")
+    assert client.updates == []
+
+
+def test_dynamodb_bounds_a_multi_condition_range_key() -> None:
+    builder = ConditionExpressionBuilder()
+    # A paged prefix listing: the tightest bounds become the key
+    # condition and the filter re-applies the exact entry.
+    cond, exact = DynamoDBService._range_condition("key", {"$prefix": "file:", "$gt": "file:09"})
+    assert not exact
+    expr = builder.build_expression(cond, is_key_condition=True)
+    assert "BETWEEN" in expr.condition_expression
+    assert sorted(expr.attribute_value_placeholders.values()) == ["file:09", "file;"]
+
+    assert DynamoDBService._range_condition("key", {"$gt": "b", "$lt": "a"}) == (None, False)
+    assert DynamoDBService._range_condition("key", {"$in": ["a"]}) == (None, False)
+
+    client = FakeClient([_gsi("user-namespace-index", "userId", "namespace"), _gsi("scope-key-index", "keyScope", "key")])
+    db, table = make_db(client)
+    db.find("t", {"keyScope": "u:n", "userId": "u", "namespace": "n",
+                  "key": {"$prefix": "file:", "$gt": "file:09"}}, limit=3, sort=["key"])
+    (query,) = table.queries
+    assert query["IndexName"] == "scope-key-index"
+    assert query["ScanIndexForward"] is True
+    filter_expr = builder.build_expression(query["FilterExpression"]).condition_expression
+    assert "begins_with" in filter_expr and ">" in filter_expr
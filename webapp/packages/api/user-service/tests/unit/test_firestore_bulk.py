@@ -0,0 +1,198 @@
+"""Unit tests for the Firestore bulk APIs and select() projections.
+
+A fake client records every round trip (batch commits, get_all calls,
+query streams) so the tests can lock in the call counts the data store
+relies on, the same way test_data_store_perf.py does for the service
+layer.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from services.data_store_service import DataStoreService
+from services.database_service.firestore import FirestoreDBService
+
+pytestmark = pytest.mark.unit
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeRef:
+    def __init__(self, store: "FakeFirestore", collection: str, doc_id: str) -> None:
+        self.store = store
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self) -> FakeSnapshot:
+        self.store.calls.append("get")
+        return FakeSnapshot(self.id, self.store.data.get(self.collection, {}).get(self.id))
+
+    def set(self, doc: Dict[str, Any]) -> None:
+        self.store.calls.append("set")
+        self.store.data.setdefault(self.collection, {})[self.id] = dict(doc)
+
+
+class FakeQuery:
+    def __init__(self, store: "FakeFirestore", collection: str) -> None:
+        self.store = store
+        self.collection = collection
+        self.filters: List[tuple] = []
+        self.selected: Optional[List[str]] = None
+        self._limit: Optional[int] = None
+
+    def document(self, doc_id: str) -> FakeRef:
+        return FakeRef(self.store, self.collection, doc_id)
+
+    def where(self, field, op, value) -> "FakeQuery":
+        self.filters.append((field, value))
+        return self
+
+    def select(self, field_paths: List[str]) -> "FakeQuery":
+        self.selected = list(field_paths)
+        return self
+
+    def limit(self, n: int) -> "FakeQuery":
+        self._limit = n
+        return self
+
+    def stream(self):
+        self.store.calls.append("stream")
+        self.store.queries.append(self)
+        docs = self.store.data.get(self.collection, {})
+        out = []
+        for doc_id, data in docs.items():
+            if all(data.get(f) == v for f, v in self.filters):
+                if self.selected is not None:
+                    data = {f: data[f] for f in self.selected if f in data}
+                out.append(FakeSnapshot(doc_id, data))
+        return iter(out[: self._limit])
+
+
+class FakeBatch:
+    def __init__(self, store: "FakeFirestore") -> None:
+        self.store = store
+        self.ops: List[tuple] = []
+
+    def set(self, ref: FakeRef, doc: Dict[str, Any]) -> None:
+        self.ops.append(("set", ref, dict(doc)))
+
+    def delete(self, ref: FakeRef) -> None:
+        self.ops.append(("delete", ref, None))
+
+    def commit(self) -> None:
+        assert len(self.ops) <= 500
+        self.store.calls.append("commit")
+        if self.store.fail_commits:
+            self.store.fail_commits -= 1
+            raise RuntimeError("commit failed")
+        for op, ref, doc in self.ops:
+            bucket = self.store.data.setdefault(ref.collection, {})
+            if op == "set":
+                bucket[ref.id] = doc
+            else:
+                bucket.pop(ref.id, None)
+
+
+class FakeFirestore:
+    def __init__(self) -> None:
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.calls: List[str] = []
+        self.queries: List[FakeQuery] = []
+        self.fail_commits = 0
+
+    def collection(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def get_all(self, refs: List[FakeRef]):
+        self.calls.append("get_all")
+        # Firestore returns snapshots in arbitrary order.
+        snaps = [FakeSnapshot(r.id, self.data.get(r.collection, {}).get(r.id)) for r in refs]
+        return list(reversed(snaps))
+
+
+@pytest.fixture
+def db() -> FirestoreDBService:
+    svc = FirestoreDBService.__new__(FirestoreDBService)
+    svc.db = FakeFirestore()
+    svc._async_db = None
+    return svc
+
+
+def test_save_many_commits_one_batch_per_500(db) -> None:
+    docs = [{"_id": f"d{i}", "n": i} for i in range(1200)] + [{"n": -1}]
+    results = db.save_many("t", docs)
+    assert db.db.calls.count("commit") == 3
+    assert all(r["ok"] for r in results[:-1])
+    assert results[0] == {"ok": True, "id": "d0", "rev": "firestore-rev"}
+    assert results[-1] == {"ok": False, "id": None, "error": "missing _id"}
+    assert len(db.db.data["t"]) == 1200
+
+
+def test_save_many_failed_commit_reports_only_that_chunk(db) -> None:
+    db.db.fail_commits = 1
+    results = db.save_many("t", [{"_id": f"d{i}"} for i in range(600)])
+    assert [r["ok"] for r in results[:500]] == [False] * 500
+    assert results[0]["error"] == "commit failed"
+    assert all(r["ok"] for r in results[500:])
+
+
+def test_delete_many_batches_and_is_idempotent(db) -> None:
+    db.save_many("t", [{"_id": "a"}, {"_id": "b"}])
+    db.db.calls.clear()
+    results = db.delete_many("t", ["a", "missing"])
+    assert results == [{"ok": True, "id": "a"}, {"ok": True, "id": "missing"}]
+    assert db.db.calls == ["commit"]
+    assert set(db.db.data["t"]) == {"b"}
+
+
+def test_get_many_uses_get_all_and_keeps_input_order(db) -> None:
+    db.save_many("t", [{"_id": "a", "v": 1}, {"_id": "b", "v": 2}])
+    db.db.calls.clear()
+    out = db.get_many("t", ["b", "nope", "a", "b"])
+    assert db.db.calls == ["get_all"]
+    assert list(out) == ["b", "nope", "a"]
+    assert out["a"] == {"_id": "a", "v": 1}
+    assert out["nope"] is None
+
+
+def test_find_projects_server_side(db) -> None:
+    db.save_many("t", [{"_id": "a", "user": "u", "key": "k", "value": "x" * 1000}])
+    out = db.find("t", {"user": "u"}, fields=["_id", "key"])
+    assert out == [{"_id": "a", "key": "k"}]
+    (query,) = db.db.queries
+    assert query.selected == ["key"]
+
+
+def test_data_store_bulk_paths_are_constant_round_trips(db) -> None:
+    """set_many / get_many / clear_namespace stay O(1) round trips on Firestore."""
+    store = DataStoreService(db)
+    items = {f"k{i}": i for i in range(50)}
+    db.db.calls.clear()
+    store.set_many("u", [("ns", k, v, None) for k, v in items.items()])
+    assert "get" not in db.db.calls and "set" not in db.db.calls
+    assert db.db.calls.count("commit") <= 2
+
+    db.db.calls.clear()
+    assert store.get_many("u", "ns", list(items)) == items
+    assert db.db.calls == ["get_all"]
+
+    db.db.calls.clear()
+    assert store.clear_namespace("u", "ns") == 50
+    assert db.db.calls.count("commit") == 1
+    assert "get" not in db.db.calls
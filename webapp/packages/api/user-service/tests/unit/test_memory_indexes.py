@@ -0,0 +1,86 @@
+"""Unit tests for the memory backend's hash indexes."""
+from __future__ import annotations
+
+import pytest
+
+from services.data_store_service import DATA_STORE_DB, DataStoreService
+from services.database_service.memory import MemoryDBService
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db() -> MemoryDBService:
+    db = MemoryDBService()
+    for i in range(20):
+        db.save("t", f"d{i:02d}", {"_id": f"d{i:02d}", "user": f"u{i % 4}", "ns": f"n{i % 2}", "n": i})
+    return db
+
+
+def _bucket(db: MemoryDBService, fields, key):
+    return list(db._indexes["t"][tuple(fields)].get(key, {}))
+
+
+def test_ensure_index_builds_over_existing_docs(db) -> None:
+    db.ensure_index("t", ["user", "ns"])
+    assert _bucket(db, ["user", "ns"], ("u1", "n1")) == ["d01", "d05", "d09", "d13", "d17"]
+
+
+def test_find_reads_only_the_index_bucket(db) -> None:
+    db.ensure_index("t", ["user", "ns"])
+    # A scan would raise on the first doc it touched outside the bucket.
+    db.dbs["t"] = _Tripwire(db.dbs["t"], allowed={"d01", "d05", "d09", "d13", "d17"})
+    db._indexed_stores["t"] = db.dbs["t"]
+    out = db.find("t", {"user": "u1", "ns": "n1", "n": {"$gt": 5}}, fields=["n"])
+    assert out == [{"n": 9}, {"n": 13}, {"n": 17}]
+
+
+def test_find_picks_most_selective_index_and_unions_in(db) -> None:
+    db.ensure_index("t", ["ns"])
+    db.ensure_index("t", ["user"])
+    assert set(db._candidate_ids("t", {"ns": "n0", "user": "u2"})) == {"d02", "d06", "d10", "d14", "d18"}
+    assert len(db._candidate_ids("t", {"user": {"$in": ["u0", "u1"]}})) == 10
+    assert db._candidate_ids("t", {"n": 3}) is None
+
+
+def test_writes_keep_indexes_current(db) -> None:
+    db.ensure_index("t", ["user"])
+    doc = db.get("t", "d00")
+    doc["user"] = "moved"  # mutated in place, then saved
+    db.save("t", "d00", doc)
+    assert "d00" not in _bucket(db, ["user"], ("u0",))
+    assert db.find("t", {"user": "moved"}) == [doc]
+
+    db.delete("t", "d04")
+    db.delete_many("t", ["d08", "missing"])
+    db.save_many("t", [{"_id": "new", "user": "u0"}])
+    assert _bucket(db, ["user"], ("u0",)) == ["d12", "d16", "new"]
+
+
+def test_replaced_store_triggers_rebuild(db) -> None:
+    db.ensure_index("t", ["user"])
+    db.dbs["t"] = {"x": {"_id": "x", "user": "u1"}}
+    assert db.find("t", {"user": "u1"}) == [{"_id": "x", "user": "u1"}]
+
+
+def test_data_store_queries_use_standard_index() -> None:
+    db = MemoryDBService()
+    store = DataStoreService(db)
+    store.set_many("big", [("ns", f"k{i}", i, None) for i in range(200)])
+    store.set_many("tiny", [("ns", "only", 1, None)])
+    ids = db._candidate_ids(DATA_STORE_DB, {"userId": "tiny", "namespace": "ns"})
+    assert len(ids) == 1
+    assert store.list_keys("tiny", "ns") == ["only"]
+
+
+class _Tripwire(dict):
+    def __init__(self, data, allowed) -> None:
+        super().__init__(data)
+        self.allowed = allowed
+
+    def __getitem__(self, key):
+        assert key in self.allowed, f"read {key} outside the index bucket"
+        return super().__getitem__(key)
+
+    def values(self):
+        raise AssertionError("find scanned the whole collection")
@@ -0,0 +1,138 @@
+"""Unit tests for the embedded SQLite backend.
+
+Runs against a real SQLite file in tmp_path, so these exercise the
+actual SQL (expression indexes, WAL, transactions) rather than a fake.
+"""
+from __future__ import annotations
+
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from services.data_store_service import DATA_STORE_DB, DataStoreService
+from services.database_service.sqlite import SqliteDBService, _path_expr
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db(tmp_path):
+    svc = SqliteDBService(str(tmp_path / "sub" / "test.sqlite3"), pool_size=4)
+    yield svc
+    svc.close()
+
+
+def test_crud_round_trip(db) -> None:
+    assert db.save("t", "a", {"_id": "a", "v": 1, "tags": ["x"]}) == {"id": "a", "rev": "sqlite-rev"}
+    assert db.get("t", "a") == {"_id": "a", "v": 1, "tags": ["x"]}
+    db.save("t", "a", {"_id": "a", "v": 2})
+    assert db.list_all("t") == [{"_id": "a", "v": 2}]
+    db.delete("t", "a")
+    with pytest.raises(HTTPException) as exc:
+        db.get("t", "a")
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException):
+        db.delete("t", "a")
+
+
+def test_runs_in_wal_mode_and_persists(tmp_path) -> None:
+    path = str(tmp_path / "p.sqlite3")
+    first = SqliteDBService(path)
+    first.save("t", "a", {"v": 1})
+    with first._connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    first.close()
+    second = SqliteDBService(path)
+    assert second.get("t", "a") == {"_id": "a", "v": 1}
+    second.close()
+
+
+def test_bulk_ops(db) -> None:
+    results = db.save_many("t", [{"_id": f"d{i}", "n": i} for i in range(1200)] + [{"n": -1}])
+    assert all(r["ok"] for r in results[:-1])
+    assert results[-1] == {"ok": False, "id": None, "error": "missing _id"}
+    out = db.get_many("t", ["d5", "nope", "d1100"])
+    assert list(out) == ["d5", "nope", "d1100"]
+    assert out["d5"]["n"] == 5 and out["nope"] is None
+    assert all(r["ok"] for r in db.delete_many("t", [f"d{i}" for i in range(1000)] + ["missing"]))
+    assert len(db.list_all("t")) == 200
+
+
+def test_save_many_reports_unencodable_docs(db) -> None:
+    results = db.save_many("t", [{"_id": "ok"}, {"_id": "bad", "v": object()}])
+    assert results[0]["ok"] and not results[1]["ok"]
+    assert db.get_many("t", ["ok", "bad"])["bad"] is None
+
+
+def test_find_operators_sort_limit_and_projection(db) -> None:
+    db.save_many("t", [
+        {"_id": f"d{i}", "user": f"u{i % 2}", "key": k, "ts": f"2024-01-{i + 10}", "flag": i == 3}
+        for i, k in enumerate(["file:a", "file:b", "cache:x", "file:c", "file:\U0001f600"])
+    ])
+    assert [d["key"] for d in db.find("t", {"user": "u0", "key": {"$prefix": "file:"}})] == [
+        "file:a", "file:\U0001f600",
+    ]
+    latest = db.find("t", {"key": {"$prefix": "file:"}}, fields=["ts"], limit=2, sort=[{"ts": "desc"}])
+    assert latest == [{"ts": "2024-01-14"}, {"ts": "2024-01-13"}]
+    assert [d["_id"] for d in db.find("t", {"flag": True})] == ["d3"]
+    assert [d["_id"] for d in db.find("t", {"user": {"$in": ["u1"]}, "ts": {"$gte": "2024-01-12"}})] == ["d3"]
+
+
+def test_ensure_index_is_used_by_find(db) -> None:
+    db.save("t", "a", {"userId": "u", "namespace": "n"})
+    db.ensure_index("t", ["userId", "namespace"], index_name="user-namespace-index")
+    where, params = db._where({"userId": "u", "namespace": "n"})
+    with db._connection() as conn:
+        plan = " ".join(str(row) for row in conn.execute(f'EXPLAIN QUERY PLAN SELECT id, doc FROM "t"{where}', params))
+    assert "t__user-namespace-index" in plan
+
+
+def test_find_page_walks_all_pages(db) -> None:
+    db.save_many("t", [{"_id": f"d{i:02d}", "kind": "even" if i % 2 == 0 else "odd"} for i in range(25)])
+    ids, cursor = [], None
+    while True:
+        page, cursor = db.find_page("t", {"kind": "even"}, page_size=5, cursor=cursor)
+        ids.extend(d["_id"] for d in page)
+        if cursor is None:
+            break
+    assert ids == [f"d{i:02d}" for i in range(0, 25, 2)]
+
+
+def test_concurrent_writers_and_readers(db) -> None:
+    errors = []
+
+    def work(n: int) -> None:
+        try:
+            for i in range(20):
+                db.save_many("t", [{"_id": f"w{n}-{i}", "n": n}])
+                db.find("t", {"n": n})
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(db.list_all("t")) == 160
+
+
+def test_path_expr_rejects_quoted_fields() -> None:
+    with pytest.raises(ValueError):
+        _path_expr('a"b')
+
+
+# --- data store contracts (see test_data_store_perf.py) ------------------
+
+def test_data_store_round_trips_on_sqlite(db) -> None:
+    store = DataStoreService(db)
+    items = {f"k{i}": {"i": i} for i in range(50)}
+    store.set_many("u", [("ns", k, v, None) for k, v in items.items()])
+    store.set("u", "ns", "file:x", "v")
+    assert store.get_many("u", "ns", list(items)) == items
+    assert store.list_keys("u", "ns", prefix="file:") == ["file:x"]
+    assert store.list_namespaces("u") == ["ns"]
+    assert store.clear_namespace("u", "ns") == 51
+    assert db.find(DATA_STORE_DB, {"userId": "u"}) == []
@@ -1,7 +1,7 @@
 """Unit tests for UserService."""
 import pytest
 from datetime import datetime
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from fastapi import HTTPException
 
 from services.user_service import UserService, get_user_service
@@ -448,3 +448,131 @@ class TestUserServiceApiKeys:
 
         # Empty string is falsy, so should fall back to env var
         assert effective_key == "env-key"
+
+
+class TestUserServiceAsync:
+    """Test suite for the awaitable UserService methods."""
+
+    @pytest.fixture
+    def mock_db(self):
+        """Create a mock database service with awaitable get/save."""
+        db = Mock()
+        db.aget = AsyncMock()
+        db.asave = AsyncMock(return_value={"rev": "test-rev"})
+        return db
+
+    @pytest.fixture
+    def user_service(self, mock_db):
+        """Create a UserService instance with mock database."""
+        return UserService(mock_db)
+
+    @pytest.mark.asyncio
+    async def test_aget_user_existing(self, user_service, mock_db):
+        """Test getting an existing user without touching the sync API."""
+        user_data = UserFactory.build()
+        mock_db.aget.return_value = user_data
+
+        user = await user_service.aget_user("test-user-id")
+
+        mock_db.aget.assert_awaited_once_with("users", "test-user-id")
+        mock_db.get.assert_not_called()
+        assert user.id == user_data["_id"]
+
+    @pytest.mark.asyncio
+    async def test_aget_user_not_found_creates_new(self, user_service, mock_db):
+        """Test that a missing user is created and saved asynchronously."""
+        mock_db.aget.side_effect = HTTPException(status_code=404, detail="Not found")
+
+        user = await user_service.aget_user("new-user-id", {"email": "new@example.com"})
+
+        assert user.id == "new-user-id"
+        assert user.basic_info.email == "new@example.com"
+        assert user.rev == "test-rev"
+        mock_db.asave.assert_awaited_once()
+        mock_db.save.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_aget_user_other_error_raises(self, user_service, mock_db):
+        """Test that non-404 errors are raised."""
+        mock_db.aget.side_effect = HTTPException(status_code=500, detail="Server error")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await user_service.aget_user("test-user-id")
+
+        assert exc_info.value.status_code == 500
+        mock_db.asave.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_asave_user(self, user_service, mock_db):
+        """Test saving a user updates the updated_at field."""
+        user = User(**UserFactory.build())
+        original_updated_at = user.updated_at
+
+        saved_user = await user_service.asave_user(user)
+
+        assert saved_user.updated_at > original_updated_at
+        assert saved_user.rev == "test-rev"
+        mock_db.asave.assert_awaited_once()
+        assert mock_db.asave.await_args.args[:2] == ("users", user.id)
+
+    @pytest.mark.asyncio
+    async def test_arequire_allowance_sufficient(self, user_service, mock_db):
+        """Test arequire_allowance when user has sufficient allowance."""
+        user_data = UserFactory.build()
+        mock_db.aget.return_value = user_data
+
+        user = await user_service.arequire_allowance("test-user-id", minimum_remaining=1.0)
+
+        assert user.id == user_data["_id"]
+
+    @pytest.mark.asyncio
+    async def test_arequire_allowance_insufficient(self, user_service, mock_db):
+        """Test arequire_allowance raises 402 when allowance is exhausted."""
+        user = User(**UserFactory.build())
+        user.usage_info.spend_remaining = 0.5
+        mock_db.aget.return_value = user.model_dump(by_alias=True, mode="json")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await user_service.arequire_allowance("test-user-id", minimum_remaining=1.0)
+
+        assert exc_info.value.status_code == 402
+
+    @pytest.mark.asyncio
+    async def test_aadd_usage(self, user_service, mock_db):
+        """Test adding usage deducts from the remaining allowance."""
+        user = User(**UserFactory.build())
+        user.usage_info.spend_remaining = 10.0
+        initial_usage_count = len(user.usage_info.usage)
+        mock_db.aget.return_value = user.model_dump(by_alias=True, mode="json")
+
+        updated_user = await user_service.aadd_usage("test-user-id", response_cost=25.0, metadata={"model": "gpt-4"})
+
+        assert len(updated_user.usage_info.usage) == initial_usage_count + 1
+        assert updated_user.usage_info.usage[-1].response_cost == 25.0
+        assert updated_user.usage_info.spend_remaining == 0.0
+        mock_db.asave.assert_awaited_once()
+        mock_db.save.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_aget_effective_api_key_prefers_user_key(self, user_service, mock_db):
+        """Test that the user's stored key wins over the environment."""
+        user = User(**UserFactory.build())
+        user.api_keys.openai_api_key = "user-openai-key"
+        mock_db.aget.return_value = user.model_dump(by_alias=True, mode="json")
+
+        with patch.dict("os.environ", {"OPENAI_API_KEY": "env-key"}):
+            effective_key = await user_service.aget_effective_api_key("test-user-id", "openai")
+
+        assert effective_key == "user-openai-key"
+
+    @pytest.mark.asyncio
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "env-key"}, clear=True)
+    async def test_aget_effective_api_key_falls_back_to_env(self, user_service, mock_db):
+        """Test that a missing user key falls back to the environment."""
+        user = User(**UserFactory.build())
+        user.api_keys.openai_api_key = None
+        mock_db.aget.return_value = user.model_dump(by_alias=True, mode="json")
+
+        effective_key = await user_service.aget_effective_api_key("test-user-id", "openai")
+
+        assert effective_key == "env-key"
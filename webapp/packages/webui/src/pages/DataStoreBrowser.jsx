@@ -56,10 +56,11 @@ const formatDateTime = (iso) => {
   return d.toLocaleString();
 };
 
-// Estimate record size from its JSON value length. Cheap and good enough
-// for the "1.8 KB" chips next to each record.
-const recordSize = (value) => {
-  try { return new Blob([JSON.stringify(value)]).size; } catch { return 0; }
+// Record size for the "1.8 KB" chips next to each record: the recorded
+// valueSize (raw JSON size) when present, else estimated from the value.
+const recordSize = (rec) => {
+  if (typeof rec?.valueSize === 'number') return rec.valueSize;
+  try { return new Blob([JSON.stringify(rec?.value)]).size; } catch { return 0; }
 };
 
 // Group records by their leading path segment (everything before the first
@@ -85,6 +86,8 @@ const groupByPrefix = (records) => {
 const recordType = (rec) => {
   const explicit = rec?.metadata?.type;
   if (explicit) return String(explicit);
+  if (rec?.valueRef && rec?.value == null) return 'blob';
+  if (rec?.valueCodec && rec?.value == null) return 'compressed';
   const v = rec?.value;
   if (v === null) return 'null';
   if (Array.isArray(v)) return 'array';
@@ -149,7 +152,7 @@ const PrefixGroup = ({ prefix, records, onSelect, selectedKey }) => {
                   </TableCell>
                   <TableCell align="right">
                     <Typography variant="body2" color="text.secondary">
-                      {formatBytes(recordSize(rec.value))}
+                      {formatBytes(recordSize(rec))}
                     </Typography>
                   </TableCell>
                 </TableRow>
@@ -165,7 +168,7 @@ const PrefixGroup = ({ prefix, records, onSelect, selectedKey }) => {
 const RecordDrawer = ({ record, onClose, onCopy, onDelete, onEdit }) => {
   if (!record) return null;
   const typeLabel = recordType(record);
-  const sizeBytes = recordSize(record.value);
+  const sizeBytes = recordSize(record);
   const valueStr = typeof record.value === 'string'
     ? record.value
     : JSON.stringify(record.value, null, 2);
@@ -186,6 +189,13 @@ const RecordDrawer = ({ record, onClose, onCopy, onDelete, onEdit }) => {
             sx={{ height: 22, bgcolor: '#f1f5f9', color: '#334155' }}
           />
           <Chip label={formatBytes(sizeBytes)} size="small" sx={{ height: 22 }} />
+          {typeof record.storedSize === 'number' && (
+            <Chip
+              label={`${formatBytes(record.storedSize)} stored (${record.valueCodec})`}
+              size="small"
+              sx={{ height: 22 }}
+            />
+          )}
         </Box>
       </Box>
 
@@ -338,6 +348,21 @@ const DataStoreBrowser = () => {
 
   const grouped = useMemo(() => groupByPrefix(filtered), [filtered]);
 
+  // Compressed values and values in blob storage aren't in the list
+  // response (valueCodec / valueRef is set, value is null); fetch the
+  // full record on open.
+  const handleSelect = async (rec) => {
+    if (!rec.valueRef && !rec.valueCodec) {
+      setSelected(rec);
+      return;
+    }
+    try {
+      setSelected(await dataStoreService.getRecord(namespace, rec.key));
+    } catch (err) {
+      setSnack({ severity: 'error', message: err.message || 'Failed to load record.' });
+    }
+  };
+
   const handleCopy = () => {
     if (!selected) return;
     const str = typeof selected.value === 'string'
@@ -400,6 +425,9 @@ const DataStoreBrowser = () => {
               <Stack direction="row" spacing={2} sx={{ mb: 2, flexWrap: 'wrap' }}>
                 <Chip label={`${(stats.recordCount || 0).toLocaleString()} records`} sx={{ fontWeight: 500 }} />
                 <Chip label={`${formatBytes(stats.sizeBytes || 0)} total size`} />
+                {stats.storedBytes > 0 && stats.storedBytes !== stats.sizeBytes && (
+                  <Chip label={`${formatBytes(stats.storedBytes)} stored`} />
+                )}
                 <Chip label={`Updated ${formatDateTime(stats.updatedAt)}`} />
               </Stack>
               {(stats.agents || []).length > 0 && (
@@ -460,7 +488,7 @@ const DataStoreBrowser = () => {
                 prefix={prefix}
                 records={recs}
                 selectedKey={selected?.key}
-                onSelect={setSelected}
+                onSelect={handleSelect}
               />
             ))}
           </Box>
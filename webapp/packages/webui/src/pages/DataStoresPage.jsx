@@ -125,6 +125,11 @@ const DataStoresPage = () => {
           <Typography variant="h6" sx={{ fontWeight: 600 }}>
             {formatBytes(data.totalSizeBytes || 0)}
           </Typography>
+          {data.totalStoredBytes > 0 && data.totalStoredBytes !== data.totalSizeBytes && (
+            <Typography variant="caption" color="text.secondary">
+              {formatBytes(data.totalStoredBytes)} stored
+            </Typography>
+          )}
         </Paper>
       </Stack>
 